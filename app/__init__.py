@@ -11,24 +11,46 @@ db = SQLAlchemy()
 migrate = Migrate()
 
 
-def create_app(config_name=None):
-    """Application factory pattern"""
+def create_app(config_name=None, config_overrides=None):
+    """Application factory pattern
+
+    config_overrides: 設定クラスの値より優先する設定
+    （例: スクリプトでアプリ内スケジューラを無効化 {"UPDATE_SCHEDULER_ENABLED": False}）
+    """
 
     if config_name is None:
         config_name = os.environ.get("FLASK_ENV", "development")
 
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    # Serialize JSON responses with orjson (stdlib json fallback)
+    from app.utils.json_provider import FastJSONProvider
+
+    app.json = FastJSONProvider(app)
 
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Track per-table data versions for cache invalidation
+    from app.utils.data_version import register_data_version_listeners
+
+    register_data_version_listeners()
+
     # Setup logging
     from app.utils.logger import setup_logger
 
     setup_logger(app)
 
+    # Apply the SQLite storage profile (WAL, pragmas) at connect time
+    from app.utils.database import configure_sqlite
+
+    with app.app_context():
+        configure_sqlite(app, db.engine)
+
     # Import models (required for Flask-Migrate)
     with app.app_context():
         from app import models
@@ -43,16 +65,26 @@ def create_app(config_name=None):
     if not gitkeep_file.exists():
         gitkeep_file.touch()
 
-    # Auto backup on startup (non-testing environments only)
+    # Auto backup on startup (non-testing environments only). Runs in a background
+    # thread only in long-lived server processes (AUTO_BACKUP_BACKGROUND); CLI
+    # commands such as `flask db upgrade` and scripts wait for it to finish.
     if not app.config.get("TESTING"):
         try:
             from app.utils.backup import create_auto_backup
 
-            create_auto_backup(app)
+            create_auto_backup(
+                app, background=app.config.get("AUTO_BACKUP_BACKGROUND", False)
+            )
         except Exception as e:
             # バックアップ失敗してもアプリは起動する
             app.logger.warning(f"自動バックアップ失敗: {e}")
 
+    # Market-calendar-aware incremental update scheduler
+    if app.config.get("UPDATE_SCHEDULER_ENABLED") and not app.config.get("TESTING"):
+        from app.services.update_scheduler import UpdateScheduler
+
+        UpdateScheduler.start_background(app)
+
     # Register blueprints
     from app.routes import api, main, upload
 
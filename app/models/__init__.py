@@ -1,9 +1,14 @@
 from app.models.benchmark_price import BenchmarkPrice
+from app.models.data_version import DataVersion
 from app.models.dividend import Dividend
 from app.models.holding import Holding
+from app.models.portfolio_snapshot import PortfolioSnapshot
 from app.models.realized_pnl import RealizedPnl
+from app.models.refresh_stage_run import RefreshStageRun
+from app.models.scheduler_lease import SchedulerLease
 from app.models.stock_metrics import StockMetrics
 from app.models.stock_price import StockPrice
+from app.models.sync_state import SyncState
 from app.models.transaction import Transaction
 
 __all__ = [
@@ -14,4 +19,9 @@ __all__ = [
     "RealizedPnl",
     "StockMetrics",
     "BenchmarkPrice",
+    "DataVersion",
+    "PortfolioSnapshot",
+    "SyncState",
+    "SchedulerLease",
+    "RefreshStageRun",
 ]
@@ -0,0 +1,30 @@
+"""テーブル単位のデータバージョンモデル"""
+
+from datetime import datetime
+
+from app import db
+
+
+class DataVersion(db.Model):
+    """テーブルごとの書き込みバージョン
+
+    書き込みのたびにインクリメントされ、集計結果のキャッシュキーとして使用する
+    （app.utils.data_version 参照）
+    """
+
+    __tablename__ = "data_versions"
+
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """辞書形式に変換"""
+        return {
+            "table_name": self.table_name,
+            "version": self.version,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f"<DataVersion {self.table_name} v{self.version}>"
@@ -9,7 +9,7 @@ class Dividend(db.Model):
     __tablename__ = "dividends"
 
     id = db.Column(db.Integer, primary_key=True)
-    ticker_symbol = db.Column(db.String(20), nullable=False, index=True)
+    ticker_symbol = db.Column(db.String(20), nullable=False)
     ex_dividend_date = db.Column(db.Date, nullable=False, index=True)  # 権利落ち日
     payment_date = db.Column(db.Date)  # 支払日
     dividend_amount = db.Column(db.Numeric(15, 6))  # 1株あたり配当額
@@ -19,6 +19,11 @@ class Dividend(db.Model):
     source = db.Column(db.String(50))  # データソース（yahoo/tradingview/manual）
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # 銘柄ごとの権利落ち日順の取得・重複確認用
+    __table_args__ = (
+        db.Index("ix_dividends_ticker_ex_date", "ticker_symbol", "ex_dividend_date"),
+    )
+
     def __repr__(self):
         return f"<Dividend {self.ticker_symbol} {self.ex_dividend_date} {self.dividend_amount}>"
 
@@ -0,0 +1,42 @@
+"""ポートフォリオの日次スナップショットモデル"""
+
+from datetime import datetime
+
+from app import db
+
+
+class PortfolioSnapshot(db.Model):
+    """ポートフォリオ全体の日次評価スナップショット（円建て）
+
+    株価一括更新のたびに当日分を保存し、損益推移の未実現損益に使用する
+    """
+
+    __tablename__ = "portfolio_snapshots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False, unique=True, index=True)
+    holdings_count = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Numeric(20, 4), nullable=False)  # 総取得コスト
+    market_value = db.Column(db.Numeric(20, 4), nullable=False)  # 評価額
+    unrealized_pnl = db.Column(db.Numeric(20, 4), nullable=False)  # 未実現損益
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    def to_dict(self):
+        """辞書形式に変換"""
+        return {
+            "snapshot_date": self.snapshot_date.isoformat(),
+            "holdings_count": self.holdings_count,
+            "total_cost": float(self.total_cost) if self.total_cost else 0,
+            "market_value": float(self.market_value) if self.market_value else 0,
+            "unrealized_pnl": (
+                float(self.unrealized_pnl) if self.unrealized_pnl else 0
+            ),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return f"<PortfolioSnapshot {self.snapshot_date} {self.market_value}>"
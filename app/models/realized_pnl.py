@@ -9,7 +9,7 @@ class RealizedPnl(db.Model):
     __tablename__ = "realized_pnl"
 
     id = db.Column(db.Integer, primary_key=True)
-    ticker_symbol = db.Column(db.String(20), nullable=False, index=True)
+    ticker_symbol = db.Column(db.String(20), nullable=False)
     sell_date = db.Column(db.Date, nullable=False, index=True)
     quantity = db.Column(db.Numeric(15, 4), nullable=False)
     average_cost = db.Column(db.Numeric(15, 4), nullable=False)  # 売却時の平均取得単価
@@ -20,6 +20,11 @@ class RealizedPnl(db.Model):
     currency = db.Column(db.String(3))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # 銘柄ごとの売却日順の取得用
+    __table_args__ = (
+        db.Index("ix_realized_pnl_ticker_sell_date", "ticker_symbol", "sell_date"),
+    )
+
     def __repr__(self):
         return (
             f"<RealizedPnl {self.ticker_symbol} {self.sell_date} {self.realized_pnl}>"
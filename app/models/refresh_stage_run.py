@@ -0,0 +1,51 @@
+"""更新パイプラインのステージ実行記録モデル"""
+
+import json
+
+from app import db
+
+
+class RefreshStageRun(db.Model):
+    """更新パイプラインの1実行・1ステージの記録
+
+    ステージの状態・所要時間・出力（後続ステージの入力）を保存し、
+    中断した実行を完了済みステージから再開する際のチェックポイントとする
+    （app.services.refresh_pipeline 参照）
+    """
+
+    __tablename__ = "refresh_stage_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(32), nullable=False, index=True)
+    stage = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(10), nullable=False)  # running, success, ...
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    output = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.UniqueConstraint("run_id", "stage", name="uix_refresh_run_stage"),
+    )
+
+    def load_output(self):
+        """保存した出力を復元"""
+        return json.loads(self.output) if self.output else None
+
+    def to_dict(self):
+        """辞書形式に変換"""
+        return {
+            "run_id": self.run_id,
+            "stage": self.stage,
+            "status": self.status,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "seconds": (
+                self.duration_ms / 1000 if self.duration_ms is not None else None
+            ),
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"<RefreshStageRun {self.run_id}:{self.stage} {self.status}>"
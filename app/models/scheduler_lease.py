@@ -0,0 +1,21 @@
+"""スケジューラのリーダー選出用リースモデル"""
+
+from app import db
+
+
+class SchedulerLease(db.Model):
+    """名前付きリース
+
+    期限切れまたは自分が保持しているリースだけを条件付きUPDATEで取得するため、
+    SQLiteの書き込みロックにより同時に1プロセスだけがリーダーになる
+    """
+
+    __tablename__ = "scheduler_leases"
+
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    acquired_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} {self.owner} until {self.expires_at}>"
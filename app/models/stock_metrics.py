@@ -16,7 +16,7 @@ class StockMetrics(db.Model):
     - 企業価値指標 (EV/Revenue、EV/EBITDA)
     - 財務指標 (売上、利益率)
     - 株価レンジ (52週高値・安値)
-    - リターン指標 (YTD、1年)
+    - リターン指標 (YTD、3ヶ月、6ヶ月、1年、3年、5年)・ボラティリティ
     """
 
     __tablename__ = "stock_metrics"
@@ -46,10 +46,17 @@ class StockMetrics(db.Model):
     # リターン指標
     ytd_return = db.Column(db.Numeric(10, 4))  # YTD Return（小数形式）
     one_year_return = db.Column(db.Numeric(10, 4))  # 1-Year Return（小数形式）
+    three_month_return = db.Column(db.Numeric(10, 4))  # 3-Month Return（小数形式）
+    six_month_return = db.Column(db.Numeric(10, 4))  # 6-Month Return（小数形式）
+    three_year_return = db.Column(db.Numeric(10, 4))  # 3-Year Return（小数形式）
+    five_year_return = db.Column(db.Numeric(10, 4))  # 5-Year Return（小数形式）
+    volatility = db.Column(db.Numeric(10, 4))  # 年率ボラティリティ（小数形式）
 
     # メタデータ
     currency = db.Column(db.String(3))  # 通貨コード
     last_updated = db.Column(db.DateTime)  # 最終更新日時
+    info_updated_at = db.Column(db.DateTime)  # Yahoo Finance (.info) の最終取得日時
+    reference_price = db.Column(db.Numeric(15, 4))  # 株価連動指標の基準株価
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # 作成日時
 
     def to_dict(self):
@@ -79,10 +86,26 @@ class StockMetrics(db.Model):
             "one_year_return": (
                 float(self.one_year_return) if self.one_year_return else None
             ),
+            "three_month_return": (
+                float(self.three_month_return) if self.three_month_return else None
+            ),
+            "six_month_return": (
+                float(self.six_month_return) if self.six_month_return else None
+            ),
+            "three_year_return": (
+                float(self.three_year_return) if self.three_year_return else None
+            ),
+            "five_year_return": (
+                float(self.five_year_return) if self.five_year_return else None
+            ),
+            "volatility": float(self.volatility) if self.volatility else None,
             "currency": self.currency,
             "last_updated": (
                 self.last_updated.isoformat() if self.last_updated else None
             ),
+            "info_updated_at": (
+                self.info_updated_at.isoformat() if self.info_updated_at else None
+            ),
         }
 
     def __repr__(self):
@@ -0,0 +1,52 @@
+"""データ更新の同期状態モデル"""
+
+from datetime import datetime
+
+from app import db
+
+
+class SyncState(db.Model):
+    """更新ジョブ・銘柄ごとの最終同期状態
+
+    市場の取引日（セッション）単位で、どこまで更新済みかを記録する
+    （app.services.update_scheduler 参照）
+    """
+
+    __tablename__ = "sync_states"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(20), nullable=False)  # prices, dividends, ...
+    key = db.Column(db.String(20), nullable=False)  # 銘柄・ベンチマーク
+    market = db.Column(db.String(10))
+    last_session_date = db.Column(db.Date)  # 同期済みの最終取引日
+    # 取得できる最古の取引日（prices: 期間の途中で上場した銘柄の上場日）
+    first_available_date = db.Column(db.Date)
+    last_success_at = db.Column(db.DateTime)
+    last_attempt_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint("job", "key", name="uix_sync_job_key"),)
+
+    def to_dict(self):
+        """辞書形式に変換"""
+        return {
+            "job": self.job,
+            "key": self.key,
+            "market": self.market,
+            "last_session_date": (
+                self.last_session_date.isoformat() if self.last_session_date else None
+            ),
+            "first_available_date": (
+                self.first_available_date.isoformat()
+                if self.first_available_date
+                else None
+            ),
+            "last_success_at": (
+                self.last_success_at.isoformat() if self.last_success_at else None
+            ),
+            "last_error": self.last_error,
+        }
+
+    def __repr__(self):
+        return f"<SyncState {self.job}:{self.key} {self.last_session_date}>"
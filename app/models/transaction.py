@@ -1,4 +1,8 @@
+import hashlib
 from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event
 
 from app import db
 
@@ -10,7 +14,7 @@ class Transaction(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     transaction_date = db.Column(db.Date, nullable=False, index=True)
-    ticker_symbol = db.Column(db.String(20), nullable=False, index=True)
+    ticker_symbol = db.Column(db.String(20), nullable=False)
     security_name = db.Column(db.String(200))
     transaction_type = db.Column(db.String(10), nullable=False)  # 'BUY' or 'SELL'
     currency = db.Column(db.String(3), nullable=False)  # 'JPY', 'USD', etc.
@@ -20,11 +24,52 @@ class Transaction(db.Model):
     settlement_amount = db.Column(db.Numeric(15, 4))
     exchange_rate = db.Column(db.Numeric(10, 4))  # 為替レート（外国株の場合）
     settlement_currency = db.Column(db.String(3))  # 受渡通貨
+    # 重複判定用ハッシュ（取引日・銘柄・数量・単価）
+    fingerprint = db.Column(db.String(64), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    # 一覧取得のキーセットページングとフィルター用インデックス
+    # 銘柄単位の取得は (銘柄, 取引日, ID) 順の再計算・保有数量索引と、
+    # 銘柄・売買区分ごとの受渡金額の集計（カバリングインデックス）で使用
+    __table_args__ = (
+        db.Index("ix_transactions_date_id", "transaction_date", "id"),
+        db.Index("ix_transactions_type_date", "transaction_type", "transaction_date"),
+        db.Index("ix_transactions_currency_date", "currency", "transaction_date"),
+        db.Index(
+            "ix_transactions_ticker_date_id", "ticker_symbol", "transaction_date", "id"
+        ),
+        db.Index(
+            "ix_transactions_ticker_type_amount",
+            "ticker_symbol",
+            "transaction_type",
+            "settlement_amount",
+        ),
+    )
+
+    @staticmethod
+    def compute_fingerprint(transaction_date, ticker_symbol, quantity, unit_price):
+        """
+        重複判定用ハッシュを計算
+
+        数量・単価はカラム精度（小数4桁）に揃えるため、float/Decimal/文字列の
+        いずれで渡しても同じ値になる
+        """
+        if not isinstance(transaction_date, str):
+            transaction_date = transaction_date.isoformat()
+        scale = Decimal("0.0001")
+        payload = "|".join(
+            [
+                transaction_date,
+                ticker_symbol,
+                str(Decimal(str(quantity)).quantize(scale)),
+                str(Decimal(str(unit_price)).quantize(scale)),
+            ]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
     def __repr__(self):
         return f"<Transaction {self.ticker_symbol} {self.transaction_type} {self.quantity}@{self.unit_price}>"
 
@@ -50,3 +95,15 @@ class Transaction(db.Model):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+@event.listens_for(Transaction, "before_insert")
+@event.listens_for(Transaction, "before_update")
+def _set_fingerprint(mapper, connection, target):
+    """INSERT/UPDATE時に重複判定用ハッシュを更新"""
+    target.fingerprint = Transaction.compute_fingerprint(
+        target.transaction_date,
+        target.ticker_symbol,
+        target.quantity,
+        target.unit_price,
+    )
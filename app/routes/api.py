@@ -2,13 +2,24 @@
 API endpoints for data operations
 """
 
-from flask import Blueprint, current_app, jsonify, request
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
 
 from app.models import Dividend, Holding, RealizedPnl, StockPrice, Transaction
 from app.services import (
+    ApiSerializer,
+    DividendAggregationService,
     DividendFetcher,
     ExchangeRateFetcher,
+    ExportService,
     PerformanceService,
+    PnlHistoryService,
     StockMetricsFetcher,
     StockPriceFetcher,
 )
@@ -21,11 +32,15 @@ from app.utils.errors import (
     validate_positive_number,
     validate_required_fields,
 )
+from app.utils.http_cache import conditional_response
 from app.utils.logger import get_logger, log_api_call
 
 bp = Blueprint("api", __name__, url_prefix="/api")
 logger = get_logger("api")
 
+# 為替レートを使う集計のETagを更新する間隔（秒）
+EXTERNAL_DATA_MAX_AGE = 300
+
 
 @bp.route("/stock-price/<ticker>", methods=["GET"])
 def get_stock_price(ticker):
@@ -155,20 +170,13 @@ def get_all_dividends():
     """Get all dividends or filter by ticker"""
     ticker = request.args.get("ticker")
 
-    if ticker:
-        dividends = (
-            Dividend.query.filter_by(ticker_symbol=ticker)
-            .order_by(Dividend.ex_dividend_date.desc())
-            .all()
-        )
-    else:
-        dividends = Dividend.query.order_by(Dividend.ex_dividend_date.desc()).all()
+    dividends = ApiSerializer.dividends(ticker)
 
     return jsonify(
         {
             "success": True,
             "count": len(dividends),
-            "dividends": [d.to_dict() for d in dividends],
+            "dividends": dividends,
         }
     )
 
@@ -176,18 +184,14 @@ def get_all_dividends():
 @bp.route("/dividends/<ticker>", methods=["GET"])
 def get_dividends(ticker):
     """Get dividends for a specific ticker"""
-    dividends = (
-        Dividend.query.filter_by(ticker_symbol=ticker)
-        .order_by(Dividend.ex_dividend_date.desc())
-        .all()
-    )
+    dividends = ApiSerializer.dividends(ticker)
 
     return jsonify(
         {
             "success": True,
             "ticker": ticker,
             "count": len(dividends),
-            "dividends": [d.to_dict() for d in dividends],
+            "dividends": dividends,
         }
     )
 
@@ -222,178 +226,28 @@ def update_all_dividends():
 @bp.route("/dividends/summary", methods=["GET"])
 def get_dividend_summary():
     """Get dividend summary by ticker with yearly breakdown"""
-    from collections import defaultdict
-    from decimal import Decimal
-
-    # Get all dividends
-    dividends = Dividend.query.order_by(
-        Dividend.ticker_symbol, Dividend.ex_dividend_date
-    ).all()
-
-    # Group dividends by ticker
-    ticker_dividends = defaultdict(list)
-    for div in dividends:
-        ticker_dividends[div.ticker_symbol].append(div)
-
-    # Get all transactions to get security names and calculate total investment
-    transactions = Transaction.query.all()
-
-    # Build ticker info map
-    ticker_info = {}
-    for t in transactions:
-        if t.ticker_symbol not in ticker_info:
-            ticker_info[t.ticker_symbol] = {
-                "security_name": t.security_name,
-                "total_investment": Decimal("0"),
-            }
-
-        # Calculate total investment (all purchases in JPY)
-        if t.transaction_type == "BUY":
-            ticker_info[t.ticker_symbol]["total_investment"] += t.settlement_amount
-
-    # Aggregate dividend data
-    dividend_summary = []
-    total_all_dividends_jpy = Decimal("0")
-    yearly_totals_jpy = defaultdict(lambda: Decimal("0"))
-
-    # Get all required exchange rates for dividends
-    div_currencies = set(
-        d.currency
-        for d in dividends
-        if d.currency and d.currency not in ["JPY", "日本円"]
-    )
-    div_rates = (
-        ExchangeRateFetcher.get_multiple_rates(list(div_currencies))
-        if div_currencies
-        else {}
-    )
-
-    def div_to_jpy(amount, currency):
-        if not amount or not currency:
-            return Decimal("0")
-        curr = str(currency).strip().upper()
-        if curr in ["JPY", "日本円"]:
-            return Decimal(str(amount))
-        rate_entry = div_rates.get(curr)
-        if rate_entry:
-            rate = rate_entry.get("rate")
-            if rate:
-                return Decimal(str(amount)) * Decimal(str(rate))
-        return Decimal(str(amount))
-
-    for ticker_symbol, divs in ticker_dividends.items():
-        if ticker_symbol not in ticker_info:
-            continue
-
-        total_dividends_ticker_jpy = Decimal("0")
-        yearly_dividends_ticker_jpy = defaultdict(lambda: Decimal("0"))
-
-        for div in divs:
-            div_jpy = div_to_jpy(div.total_dividend, div.currency)
-            total_dividends_ticker_jpy += div_jpy
-
-            # Group by year
-            year = div.ex_dividend_date.year
-            if year <= 2022:
-                yearly_dividends_ticker_jpy["2022年以前"] += div_jpy
-            else:
-                yearly_dividends_ticker_jpy[year] += div_jpy
-
-        # Skip if total dividends is 0
-        if total_dividends_ticker_jpy == 0:
-            continue
-
-        # Calculate dividend yield (JPY / JPY)
-        total_investment = ticker_info[ticker_symbol]["total_investment"]
-        dividend_yield = (
-            (total_dividends_ticker_jpy / total_investment * 100)
-            if total_investment > 0
-            else Decimal("0")
-        )
-
-        # Add to totals
-        total_all_dividends_jpy += total_dividends_ticker_jpy
-        for year, amount in yearly_dividends_ticker_jpy.items():
-            yearly_totals_jpy[year] += amount
-
-        # Sort years: numeric years descending, then "2022年以前" at the end
-        sorted_years = []
-        pre_2022_amount = None
-        for year, amount in yearly_dividends_ticker_jpy.items():
-            if year == "2022年以前":
-                pre_2022_amount = ("2022年以前", amount)
-            else:
-                sorted_years.append((year, amount))
-
-        sorted_years.sort(key=lambda x: x[0], reverse=True)
-        if pre_2022_amount:
-            sorted_years.append(pre_2022_amount)
-
-        dividend_summary.append(
-            {
-                "ticker_symbol": ticker_symbol,
-                "security_name": ticker_info[ticker_symbol]["security_name"],
-                "total_dividends": float(total_dividends_ticker_jpy),
-                "total_investment": float(total_investment),
-                "dividend_yield": float(dividend_yield),
-                "yearly_dividends": {
-                    str(year): float(amount) for year, amount in sorted_years
-                },
-            }
-        )
-
-    # Sort by ticker symbol
-    dividend_summary.sort(key=lambda x: x["ticker_symbol"])
-
-    # Calculate overall dividend yield
-    total_investment_all = sum(
-        ticker_info[ticker]["total_investment"] for ticker in ticker_info.keys()
-    )
-    overall_dividend_yield = (
-        (total_all_dividends_jpy / total_investment_all * 100)
-        if total_investment_all > 0
-        else Decimal("0")
-    )
-
-    # Sort yearly totals: numeric years descending, then "2022年以前" at the end
-    sorted_yearly_totals = []
-    pre_2022_total = None
-    for year, amount in yearly_totals_jpy.items():
-        if year == "2022年以前":
-            pre_2022_total = ("2022年以前", amount)
-        else:
-            sorted_yearly_totals.append((year, amount))
-
-    sorted_yearly_totals.sort(key=lambda x: x[0], reverse=True)
-    if pre_2022_total:
-        sorted_yearly_totals.append(pre_2022_total)
+    summary = DividendAggregationService.get_dividend_summary()
 
     return jsonify(
         {
             "success": True,
-            "dividends": dividend_summary,
-            "totals": {
-                "total_dividends": float(total_all_dividends_jpy),
-                "total_investment": float(total_investment_all),
-                "dividend_yield": float(overall_dividend_yield),
-                "yearly_totals": {
-                    str(year): float(amount) for year, amount in sorted_yearly_totals
-                },
-            },
+            "dividends": summary["dividends"],
+            "totals": summary["totals"],
         }
     )
 
 
 @bp.route("/holdings", methods=["GET"])
+@conditional_response(["holdings"])
 def get_holdings():
     """Get all holdings"""
-    holdings = Holding.query.all()
+    holdings = ApiSerializer.holdings()
 
     return jsonify(
         {
             "success": True,
             "count": len(holdings),
-            "holdings": [h.to_dict() for h in holdings],
+            "holdings": holdings,
         }
     )
 
@@ -523,33 +377,78 @@ def delete_holding(ticker):
         )
 
 
+def _parse_transaction_filters():
+    """取引一覧・エクスポート共通のフィルター条件をクエリパラメータから取得"""
+    filters = {
+        "ticker_symbol": request.args.get("ticker"),
+        "start_date": None,
+        "end_date": None,
+        "transaction_type": None,
+        "currency": None,
+    }
+
+    if request.args.get("start_date"):
+        filters["start_date"] = validate_date_format(
+            request.args["start_date"], "開始日"
+        )
+    if request.args.get("end_date"):
+        filters["end_date"] = validate_date_format(request.args["end_date"], "終了日")
+
+    transaction_type = request.args.get("type")
+    if transaction_type:
+        transaction_type = transaction_type.upper()
+        if transaction_type not in ("BUY", "SELL"):
+            raise ValidationError(
+                "取引種別は'BUY'または'SELL'である必要があります",
+                payload={"transaction_type": transaction_type},
+            )
+        filters["transaction_type"] = transaction_type
+
+    currency = request.args.get("currency")
+    if currency:
+        filters["currency"] = currency.upper()
+
+    return filters
+
+
 @bp.route("/transactions", methods=["GET"])
 def get_transactions():
-    """Get all transactions"""
-    ticker = request.args.get("ticker")
-    limit = request.args.get("limit", type=int)
+    """Get transactions with keyset pagination, filters and NDJSON streaming"""
+    from app.services import TransactionService
 
-    query = Transaction.query
+    query = TransactionService.build_transaction_query(**_parse_transaction_filters())
 
-    if ticker:
-        query = query.filter_by(ticker_symbol=ticker)
+    # ORMオブジェクトを生成せず、to_dict() と同じカラムの行で読み込む
+    rows = ApiSerializer.transaction_rows(query)
 
-    query = query.order_by(Transaction.transaction_date.desc())
+    # NDJSON: 全件をバッチ読み込みしながら1行ずつ出力
+    if request.args.get("format") == "ndjson":
+        generate = ApiSerializer.iter_ndjson(
+            Transaction, TransactionService.iter_transactions(rows)
+        )
+        return Response(stream_with_context(generate), mimetype="application/x-ndjson")
 
-    # Get total count before applying limit
-    total_count = query.count()
+    limit = request.args.get("limit", type=int) or TransactionService.MAX_PAGE_SIZE
+    cursor = request.args.get("cursor")
 
-    if limit:
-        query = query.limit(limit)
+    # 総件数は先頭ページのみ計算
+    total_count = query.order_by(None).count() if not cursor else None
 
-    transactions = query.all()
+    try:
+        transactions, next_cursor = TransactionService.get_transactions_page(
+            rows, limit, cursor
+        )
+    except ValueError as e:
+        raise ValidationError(str(e), payload={"cursor": cursor})
 
     return jsonify(
         {
             "success": True,
             "count": len(transactions),
             "total_count": total_count,
-            "transactions": [t.to_dict() for t in transactions],
+            "transactions": ApiSerializer.to_dicts(Transaction, transactions),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
         }
     )
 
@@ -798,28 +697,19 @@ def delete_transactions():
         )
 
     try:
-        deleted_count = 0
-        affected_tickers = set()
-
-        for transaction_id in transaction_ids:
-            transaction = Transaction.query.get(transaction_id)
-            if transaction:
-                affected_tickers.add(transaction.ticker_symbol)
-                db.session.delete(transaction)
-                deleted_count += 1
-
-        db.session.commit()
-
-        # Recalculate holdings for affected tickers
-        for ticker in affected_tickers:
-            TransactionService.recalculate_holding(ticker)
+        result = TransactionService.delete_transactions(transaction_ids)
+        deleted_count = result["deleted_count"]
 
         return jsonify(
             {
                 "success": True,
                 "message": f"{deleted_count}件の取引を削除しました",
                 "deleted_count": deleted_count,
-                "affected_tickers": list(affected_tickers),
+                "affected_tickers": result["affected_tickers"],
+                "earliest_dates": {
+                    ticker: earliest.isoformat()
+                    for ticker, earliest in result["earliest_dates"].items()
+                },
             }
         )
     except Exception as e:
@@ -907,8 +797,13 @@ def get_realized_pnl():
 
     realized_pnl_list = []
     for ticker, data in ticker_data.items():
-        # Get security name from transaction
-        transaction = Transaction.query.filter_by(ticker_symbol=ticker).first()
+        # Get security name from the earliest transaction (explicit order keeps
+        # the chosen index and the result stable)
+        transaction = (
+            Transaction.query.filter_by(ticker_symbol=ticker)
+            .order_by(Transaction.transaction_date, Transaction.id)
+            .first()
+        )
         security_name = transaction.security_name if transaction else None
 
         # Determine correct currency based on ticker symbol
@@ -1064,6 +959,9 @@ def get_realized_pnl():
 
 
 @bp.route("/dashboard/summary", methods=["GET"])
+@conditional_response(
+    ["holdings", "realized_pnl", "dividends"], max_age=EXTERNAL_DATA_MAX_AGE
+)
 def get_dashboard_summary():
     """Get dashboard summary data with detailed breakdown"""
     from sqlalchemy import func
@@ -1217,61 +1115,31 @@ def get_portfolio_composition():
 @bp.route("/dashboard/pnl-history", methods=["GET"])
 def get_pnl_history():
     """Get P&L history data for trend chart"""
-    from datetime import datetime, timedelta
-
-    from sqlalchemy import func
-
     period = request.args.get("period", "30d")  # 30d, 1y, all
+    granularity = request.args.get("granularity", "daily")  # daily, weekly, monthly
 
-    # Get all transactions ordered by date
-    transactions = Transaction.query.order_by(Transaction.transaction_date).all()
-
-    if not transactions:
-        return jsonify({"success": True, "data": []})
-
-    # Calculate date range
-    end_date = datetime.now().date()
-    if period == "30d":
-        start_date = end_date - timedelta(days=30)
-    elif period == "1y":
-        start_date = end_date - timedelta(days=365)
-    else:  # 'all'
-        start_date = transactions[0].transaction_date
-
-    # Get realized P&L within date range
-    realized_records = (
-        RealizedPnl.query.filter(
-            RealizedPnl.sell_date >= start_date, RealizedPnl.sell_date <= end_date
-        )
-        .order_by(RealizedPnl.sell_date)
-        .all()
-    )
-
-    # Build daily P&L data
-    pnl_history = []
-    current_date = start_date
-
-    while current_date <= end_date:
-        # Calculate cumulative realized P&L up to this date
-        cumulative_realized = sum(
-            float(r.realized_pnl or 0)
-            for r in realized_records
-            if r.sell_date <= current_date
-        )
-
-        pnl_history.append(
-            {
-                "date": current_date.isoformat(),
-                "pnl": cumulative_realized,  # Simplified - only showing realized P&L for now
-            }
+    if granularity not in PnlHistoryService.GRANULARITIES:
+        raise ValidationError(
+            f"granularityは {', '.join(PnlHistoryService.GRANULARITIES)} のいずれかである必要があります"
         )
 
-        current_date += timedelta(days=1)
+    pnl_history = PnlHistoryService.get_pnl_history(period, granularity)
 
-    return jsonify({"success": True, "data": pnl_history})
+    return jsonify({"success": True, "granularity": granularity, "data": pnl_history})
 
 
 @bp.route("/performance/history", methods=["GET"])
+@conditional_response(
+    [
+        "transactions",
+        "holdings",
+        "realized_pnl",
+        "dividends",
+        "stock_prices",
+        "benchmark_prices",
+    ],
+    max_age=EXTERNAL_DATA_MAX_AGE,
+)
 def get_performance_history():
     """Get investment performance history (daily or monthly) with optional benchmark comparison"""
     try:
@@ -1333,7 +1201,7 @@ def get_performance_history():
         import traceback
 
         error_detail = traceback.format_exc()
-        print(f"ERROR in get_performance_history: {error_detail}")
+        logger.error(f"Error in get_performance_history: {e}", exc_info=True)
         return jsonify({"success": False, "error": str(e), "detail": error_detail}), 500
 
 
@@ -1353,7 +1221,7 @@ def get_performance_detail():
         import traceback
 
         error_details = traceback.format_exc()
-        print(f"Error in get_daily_detail: {error_details}")
+        logger.error(f"Error in get_daily_detail: {e}", exc_info=True)
         return (
             jsonify({"success": False, "error": str(e), "traceback": error_details}),
             500,
@@ -1598,14 +1466,7 @@ def get_stock_price_history(ticker):
 
         start_date = datetime.now().date() - timedelta(days=days)
 
-        prices = (
-            StockPrice.query.filter(
-                StockPrice.ticker_symbol == ticker_symbol,
-                StockPrice.price_date >= start_date,
-            )
-            .order_by(StockPrice.price_date.desc())
-            .all()
-        )
+        prices = ApiSerializer.stock_prices(ticker_symbol, start_date)
 
         log_api_call(logger, "/stock-price/history/<ticker>", "GET", response_code=200)
 
@@ -1614,7 +1475,7 @@ def get_stock_price_history(ticker):
                 "success": True,
                 "ticker": ticker_symbol,
                 "count": len(prices),
-                "prices": [p.to_dict() for p in prices],
+                "prices": prices,
             }
         )
 
@@ -1731,6 +1592,58 @@ def get_realized_portfolio_irr():
         raise DatabaseError(f"売却済みポートフォリオIRRの取得に失敗しました: {str(e)}")
 
 
+@bp.route("/export/<dataset>", methods=["GET"])
+def export_dataset(dataset):
+    """
+    データセットをCSV/NDJSONでストリーミング出力
+
+    dataset: transactions / realized-pnl / dividends / portfolio-history
+    """
+    from datetime import date
+
+    if dataset not in ExportService.DATASETS:
+        raise NotFoundError(
+            f"エクスポート対象が見つかりません: {dataset}",
+            payload={"available": list(ExportService.DATASETS)},
+        )
+
+    export_format = request.args.get("format", "csv").lower()
+    if export_format not in ExportService.FORMATS:
+        raise ValidationError(
+            "formatは'csv'または'ndjson'である必要があります",
+            payload={"format": export_format},
+        )
+
+    filters = _parse_transaction_filters()
+    use_gzip = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+
+    log_api_call(
+        logger,
+        "/export/<dataset>",
+        "GET",
+        {"dataset": dataset, "format": export_format, "gzip": use_gzip},
+    )
+
+    if export_format == "csv":
+        chunks = ExportService.stream_csv(dataset, **filters)
+        mimetype = "text/csv"
+    else:
+        chunks = ExportService.stream_ndjson(dataset, **filters)
+        mimetype = "application/x-ndjson"
+
+    filename = f"{dataset}_{date.today().strftime('%Y%m%d')}.{export_format}"
+    if use_gzip:
+        chunks = ExportService.gzip_stream(chunks)
+        mimetype = "application/gzip"
+        filename += ".gz"
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @bp.route("/health", methods=["GET"])
 def health_check():
     """ヘルスチェックエンドポイント"""
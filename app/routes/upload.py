@@ -77,8 +77,8 @@ def process_upload():
                 400,
             )
 
-        # データベースに保存
-        result = TransactionService.save_transactions(transactions)
+        # データベースに一括保存
+        result = TransactionService.save_transactions_bulk(transactions)
 
         # 保存エラーをフォーマット
         formatted_save_errors = []
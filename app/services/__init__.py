@@ -1,17 +1,46 @@
-from app.services.csv_parser import CSVParser
-from app.services.dividend_fetcher import DividendFetcher
-from app.services.exchange_rate_fetcher import ExchangeRateFetcher
-from app.services.performance_service import PerformanceService
-from app.services.stock_metrics_fetcher import StockMetricsFetcher
-from app.services.stock_price_fetcher import StockPriceFetcher
-from app.services.transaction_service import TransactionService
-
-__all__ = [
-    "CSVParser",
-    "TransactionService",
-    "StockPriceFetcher",
-    "ExchangeRateFetcher",
-    "DividendFetcher",
-    "PerformanceService",
-    "StockMetricsFetcher",
-]
+"""
+サービス層
+
+各サービスは初回参照時に読み込む（`from app.services import X` の時点で X の
+モジュールだけを import する）。pandas・yfinance 等の重い依存ライブラリを、
+それを使うサービスが呼ばれるまで読み込まないため、アプリ起動時間と
+ワーカーあたりのメモリを抑えられる。
+"""
+
+import importlib
+
+# {公開名: モジュール}
+_SERVICES = {
+    "CSVParser": "app.services.csv_parser",
+    "TransactionService": "app.services.transaction_service",
+    "StockPriceFetcher": "app.services.stock_price_fetcher",
+    "ExchangeRateFetcher": "app.services.exchange_rate_fetcher",
+    "DividendFetcher": "app.services.dividend_fetcher",
+    "PerformanceService": "app.services.performance_service",
+    "StockMetricsFetcher": "app.services.stock_metrics_fetcher",
+    "DividendAggregationService": "app.services.dividend_aggregation_service",
+    "PnlHistoryService": "app.services.pnl_history_service",
+    "ExportService": "app.services.export_service",
+    "PositionIndex": "app.services.position_index",
+    "ReturnsEngine": "app.services.returns_engine",
+    "RefreshPipeline": "app.services.refresh_pipeline",
+    "PriceArchive": "app.services.price_archive",
+    "AnalyticsLoader": "app.services.analytics_loader",
+    "ApiSerializer": "app.services.api_serializer",
+}
+
+__all__ = list(_SERVICES)
+
+
+def __getattr__(name):
+    module_name = _SERVICES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    # 2回目以降はモジュール属性として直接参照される
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,216 @@
+"""分析用データローダー
+
+損益推移・集計で使う取引・配当・確定損益・株価を、ORMオブジェクトを生成せずに
+SQLAlchemy Core の select() で必要なカラムだけ読み込み、DataFrame として返す。
+
+- Numeric カラムは Float として読み込む（行ごとの Decimal 変換を行わない）
+- Date カラムは格納された文字列のまま読み込み、pandas でまとめて変換する
+- アイデンティティマップ・変更追跡・Row を経由しないため、件数に比例するコストは
+  DBドライバのタプル生成とDataFrameへの変換のみ
+"""
+
+from datetime import date
+
+from sqlalchemy import Float, String, select, type_coerce
+
+from app.models import Dividend, RealizedPnl, StockPrice, Transaction
+from app.services.price_archive import PriceArchive
+from app.utils.database import readonly_connection
+from app.utils.logger import get_logger
+
+logger = get_logger("analytics_loader")
+
+
+class AnalyticsLoader:
+    """ORMを経由しない分析用データの読み込みクラス"""
+
+    # {カラム名: 型}（'float': float64, 'date': datetime64, それ以外はそのまま）
+    TRANSACTION_COLUMNS = {
+        "id": None,
+        "transaction_date": "date",
+        "ticker_symbol": None,
+        "transaction_type": None,
+        "currency": None,
+        "quantity": "float",
+        "unit_price": "float",
+        "commission": "float",
+        "settlement_amount": "float",
+    }
+    DIVIDEND_COLUMNS = {
+        "id": None,
+        "ticker_symbol": None,
+        "ex_dividend_date": "date",
+        "currency": None,
+        "dividend_amount": "float",
+        "quantity_held": "float",
+        "total_dividend": "float",
+    }
+    REALIZED_PNL_COLUMNS = {
+        "id": None,
+        "ticker_symbol": None,
+        "sell_date": "date",
+        "currency": None,
+        "quantity": "float",
+        "average_cost": "float",
+        "sell_price": "float",
+        "realized_pnl": "float",
+    }
+
+    @staticmethod
+    def transactions(ticker_symbols=None, start_date=None, end_date=None):
+        """
+        取引履歴を読み込み（取引日・ID順）
+
+        Args:
+            ticker_symbols: 対象銘柄（デフォルト: 全銘柄）
+            start_date: 取引日の開始日
+            end_date: 取引日の終了日
+
+        Returns:
+            DataFrame: TRANSACTION_COLUMNS のカラム（数値はfloat64、日付はdatetime64）
+        """
+        return AnalyticsLoader._load(
+            Transaction,
+            AnalyticsLoader.TRANSACTION_COLUMNS,
+            "transaction_date",
+            ticker_symbols,
+            start_date,
+            end_date,
+        )
+
+    @staticmethod
+    def dividends(ticker_symbols=None, start_date=None, end_date=None):
+        """
+        配当履歴を読み込み（権利落ち日・ID順）
+
+        Returns:
+            DataFrame: DIVIDEND_COLUMNS のカラム
+        """
+        return AnalyticsLoader._load(
+            Dividend,
+            AnalyticsLoader.DIVIDEND_COLUMNS,
+            "ex_dividend_date",
+            ticker_symbols,
+            start_date,
+            end_date,
+        )
+
+    @staticmethod
+    def realized_pnl(ticker_symbols=None, start_date=None, end_date=None):
+        """
+        確定損益を読み込み（売却日・ID順）
+
+        Returns:
+            DataFrame: REALIZED_PNL_COLUMNS のカラム
+        """
+        return AnalyticsLoader._load(
+            RealizedPnl,
+            AnalyticsLoader.REALIZED_PNL_COLUMNS,
+            "sell_date",
+            ticker_symbols,
+            start_date,
+            end_date,
+        )
+
+    @staticmethod
+    def price_matrix(ticker_symbols, start_date, end_date):
+        """
+        株価キャッシュから終値行列を読み込み
+
+        株価アーカイブが有効かつ最新であればアーカイブから読み込む
+
+        Returns:
+            DataFrame: index=日付(DatetimeIndex), columns=銘柄, 値=終値(float)
+        """
+        import pandas as pd
+
+        if PriceArchive.is_enabled():
+            matrix = PriceArchive.load_matrix(ticker_symbols, start_date, end_date)
+            if matrix is not None:
+                return matrix
+
+        frame = AnalyticsLoader._load(
+            StockPrice,
+            {"ticker_symbol": None, "price_date": "date", "close_price": "float"},
+            "price_date",
+            ticker_symbols,
+            start_date,
+            end_date,
+        )
+        if frame.empty:
+            return pd.DataFrame(columns=ticker_symbols, dtype=float)
+
+        matrix = frame.pivot(
+            index="price_date", columns="ticker_symbol", values="close_price"
+        )
+        matrix.index.name = "date"
+        matrix.columns.name = "ticker"
+        return matrix.reindex(columns=ticker_symbols)
+
+    @staticmethod
+    def records(frame):
+        """
+        行ごとの処理向けに、日付を date に戻した名前付きタプルのリストに変換
+
+        Args:
+            frame: 各ローダーの結果
+
+        Returns:
+            list: カラム名を属性に持つ名前付きタプル
+        """
+        import numpy as np
+        import pandas as pd
+
+        frame = frame.copy()
+        for column in frame.columns:
+            if pd.api.types.is_datetime64_dtype(frame[column]):
+                frame[column] = np.array(frame[column].dt.date, dtype=object)
+        return list(frame.itertuples(index=False, name="Row"))
+
+    @staticmethod
+    def _load(model, columns, date_column, ticker_symbols, start_date, end_date):
+        """必要なカラムだけを select() で読み込み、型を揃えた DataFrame を作成"""
+        import pandas as pd
+
+        selected = []
+        for name, kind in columns.items():
+            column = getattr(model, name)
+            if kind == "float":
+                # SQLiteでは格納値（REAL/INTEGER）をそのまま受け取る
+                column = type_coerce(column, Float)
+            elif kind == "date":
+                column = type_coerce(column, String)
+            selected.append(column.label(name))
+
+        date_attr = getattr(model, date_column)
+        stmt = select(*selected).order_by(date_attr, model.id)
+        if ticker_symbols is not None:
+            stmt = stmt.where(model.ticker_symbol.in_(list(ticker_symbols)))
+        if start_date is not None:
+            stmt = stmt.where(date_attr >= start_date)
+        if end_date is not None:
+            stmt = stmt.where(date_attr <= end_date)
+
+        with readonly_connection() as connection:
+            result = connection.execute(stmt)
+            # Row を生成せず、DBドライバのタプルをそのまま受け取る
+            rows = result.cursor.fetchall()
+            result.close()
+
+        frame = pd.DataFrame.from_records(rows, columns=list(columns))
+        for name, kind in columns.items():
+            if kind == "float":
+                frame[name] = frame[name].astype("float64")
+            elif kind == "date":
+                frame[name] = AnalyticsLoader._to_datetime(frame[name])
+        return frame
+
+    @staticmethod
+    def _to_datetime(values):
+        """格納形式（'YYYY-MM-DD' 文字列 または date）の日付を datetime64 に変換"""
+        import pandas as pd
+
+        if not values.empty and not isinstance(values.iloc[0], date):
+            values = pd.to_datetime(values, format="%Y-%m-%d")
+        # date から変換した場合と同じ秒単位に揃える
+        return values.astype("datetime64[s]")
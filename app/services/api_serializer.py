@@ -0,0 +1,185 @@
+"""API レスポンス用シリアライザ
+
+一覧系APIのレスポンスを、ORMオブジェクトと to_dict() を経由せずに
+SQLAlchemy Core の select() の行タプルから直接組み立てる。
+
+- 数値カラムはSQL側で CAST(... AS FLOAT) し、to_dict() と同じ既定値
+  （NULL/0 → 0 または None）も COALESCE / NULLIF で適用する
+  （行ごとの Decimal 生成と float() 変換が発生しない）
+- 日付・日時は date/datetime のまま返し、JSONプロバイダ（orjson）が
+  ISO 8601 に変換する
+- 出力するキーと値は各モデルの to_dict() と同じ
+"""
+
+from sqlalchemy import Float, cast, func, select, type_coerce
+
+from app.models import Dividend, Holding, StockPrice, Transaction
+from app.utils.database import readonly_connection
+from app.utils.json_provider import dumps_bytes
+from app.utils.logger import get_logger
+
+logger = get_logger("api_serializer")
+
+# 数値カラムの既定値（to_dict() の `float(x) if x else 0` / `else None` に対応）
+ZERO = "zero"
+NONE = "none"
+
+
+class ApiSerializer:
+    """行タプルからのAPIレスポンス組み立てクラス"""
+
+    # {モデル: {キー: 数値の既定値（数値以外は None）}}（to_dict() と同じ順序）
+    FIELDS = {
+        Holding: {
+            "id": None,
+            "ticker_symbol": None,
+            "security_name": None,
+            "total_quantity": ZERO,
+            "average_cost": ZERO,
+            "currency": None,
+            "total_cost": ZERO,
+            "current_price": NONE,
+            "previous_close": NONE,
+            "day_change_pct": NONE,
+            "current_value": NONE,
+            "unrealized_pnl": NONE,
+            "unrealized_pnl_pct": NONE,
+            "last_updated": None,
+            "created_at": None,
+        },
+        Transaction: {
+            "id": None,
+            "transaction_date": None,
+            "ticker_symbol": None,
+            "security_name": None,
+            "transaction_type": None,
+            "currency": None,
+            "quantity": ZERO,
+            "unit_price": ZERO,
+            "commission": ZERO,
+            "settlement_amount": ZERO,
+            "exchange_rate": NONE,
+            "settlement_currency": None,
+            "created_at": None,
+            "updated_at": None,
+        },
+        Dividend: {
+            "id": None,
+            "ticker_symbol": None,
+            "ex_dividend_date": None,
+            "payment_date": None,
+            "dividend_amount": ZERO,
+            "currency": None,
+            "total_dividend": ZERO,
+            "quantity_held": ZERO,
+            "source": None,
+            "created_at": None,
+        },
+        StockPrice: {
+            "id": None,
+            "ticker_symbol": None,
+            "price_date": None,
+            "close_price": ZERO,
+            "currency": None,
+            "created_at": None,
+        },
+    }
+
+    @staticmethod
+    def columns(model):
+        """
+        to_dict() と同じキー・値を返す select 用のカラム式
+
+        Args:
+            model: FIELDS に定義したモデル
+
+        Returns:
+            list: ラベル付きのカラム式
+        """
+        selected = []
+        for name, default in ApiSerializer.FIELDS[model].items():
+            column = getattr(model, name)
+            if default == ZERO:
+                column = type_coerce(func.coalesce(cast(column, Float), 0), Float)
+            elif default == NONE:
+                column = type_coerce(func.nullif(cast(column, Float), 0), Float)
+            selected.append(column.label(name))
+        return selected
+
+    @staticmethod
+    def to_dicts(model, rows):
+        """行タプルを to_dict() と同じ形式の辞書のリストに変換"""
+        keys = list(ApiSerializer.FIELDS[model])
+        return [dict(zip(keys, row)) for row in rows]
+
+    @staticmethod
+    def fetch(model, *criteria, order_by=()):
+        """
+        条件に一致する行を to_dict() と同じ形式で取得
+
+        Args:
+            model: FIELDS に定義したモデル
+            *criteria: WHERE 条件
+            order_by: 並び順
+
+        Returns:
+            list: 辞書のリスト
+        """
+        stmt = select(*ApiSerializer.columns(model)).where(*criteria)
+        if order_by:
+            stmt = stmt.order_by(*order_by)
+        with readonly_connection() as connection:
+            rows = connection.execute(stmt).all()
+        return ApiSerializer.to_dicts(model, rows)
+
+    @staticmethod
+    def holdings():
+        """保有銘柄の一覧"""
+        return ApiSerializer.fetch(Holding)
+
+    @staticmethod
+    def dividends(ticker_symbol=None):
+        """配当の一覧（権利落ち日の降順）"""
+        criteria = [Dividend.ticker_symbol == ticker_symbol] if ticker_symbol else []
+        return ApiSerializer.fetch(
+            Dividend, *criteria, order_by=[Dividend.ex_dividend_date.desc()]
+        )
+
+    @staticmethod
+    def stock_prices(ticker_symbol, start_date):
+        """株価履歴（日付の降順）"""
+        return ApiSerializer.fetch(
+            StockPrice,
+            StockPrice.ticker_symbol == ticker_symbol,
+            StockPrice.price_date >= start_date,
+            order_by=[StockPrice.price_date.desc()],
+        )
+
+    @staticmethod
+    def transaction_rows(query):
+        """
+        取引クエリを to_dict() と同じカラムの行を返すクエリに変換
+
+        Args:
+            query: TransactionService.build_transaction_query() で作成したクエリ
+
+        Returns:
+            Query: 行（属性でカラムを参照可能）を返すクエリ
+        """
+        return query.with_entities(*ApiSerializer.columns(Transaction))
+
+    @staticmethod
+    def iter_ndjson(model, rows):
+        """
+        行を NDJSON（1行1オブジェクト）のバイト列として1行ずつ返す
+
+        Args:
+            model: FIELDS に定義したモデル
+            rows: 行タプルのイテラブル
+
+        Yields:
+            bytes: 改行で終わる JSON
+        """
+        keys = list(ApiSerializer.FIELDS[model])
+        for row in rows:
+            yield dumps_bytes(dict(zip(keys, row))) + b"\n"
@@ -5,7 +5,6 @@ import ssl
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 
-import yfinance as yf
 from sqlalchemy.exc import IntegrityError
 
 from app import db
@@ -58,6 +57,8 @@ class BenchmarkFetcher:
             {'price': float, 'currency': str, 'timestamp': datetime,
              'previous_close': float} または None
         """
+        import yfinance as yf
+
         benchmark = BenchmarkFetcher.BENCHMARKS.get(benchmark_key)
         if not benchmark:
             logger.error(f"Unknown benchmark key: {benchmark_key}")
@@ -174,6 +175,8 @@ class BenchmarkFetcher:
         Returns:
             [{'date': date, 'close': float, 'previous_close': float}]
         """
+        import yfinance as yf
+
         benchmark = BenchmarkFetcher.BENCHMARKS.get(benchmark_key)
         if not benchmark:
             logger.error(f"Unknown benchmark key: {benchmark_key}")
@@ -1,5 +1,6 @@
 import csv
-from datetime import datetime
+import os
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 
 import chardet
@@ -8,6 +9,32 @@ import chardet
 class CSVParser:
     """SBI証券CSV解析クラス"""
 
+    # 文字コード判定に使う先頭バイト数
+    ENCODING_SAMPLE_BYTES = 64 * 1024
+
+    # このサイズ以上のファイルはpandasで一括読み込み・ベクトル化変換する
+    PANDAS_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+    # pandas読み込み時の1チャンクの行数
+    PANDAS_CHUNK_ROWS = 50000
+
+    # 対応する日付フォーマット（先頭行から1つに決定）
+    DATE_FORMATS = [
+        "%Y/%m/%d",
+        "%Y-%m-%d",
+        "%Y年%m月%d日",
+        "%Y/%m/%d %H:%M:%S",
+        "%Y-%m-%d %H:%M:%S",
+    ]
+
+    NUMBER_FIELDS = [
+        "quantity",
+        "unit_price",
+        "commission",
+        "settlement_amount",
+        "exchange_rate",
+    ]
+
     # SBI証券CSVカラムマッピング（日本語・英語両対応）
     COLUMN_MAPPING = {
         # 日本語ヘッダー
@@ -54,29 +81,61 @@ class CSVParser:
     }
 
     @staticmethod
-    def detect_encoding(file_path):
-        """文字コードを自動判定"""
+    def detect_encoding(file_path, sample_size=None):
+        """文字コードを先頭サンプルから自動判定"""
+        sample_size = sample_size or CSVParser.ENCODING_SAMPLE_BYTES
         with open(file_path, "rb") as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
-            return result["encoding"]
+            raw_data = f.read(sample_size)
+
+        # マルチバイト文字の途中で切れないよう最後の改行までを判定に使う
+        if len(raw_data) == sample_size and b"\n" in raw_data:
+            raw_data = raw_data[: raw_data.rfind(b"\n") + 1]
+
+        encoding = chardet.detect(raw_data)["encoding"]
+
+        # サンプルがASCIIのみでも以降に日本語が含まれうるためUTF-8として読む
+        if not encoding or encoding.lower() == "ascii":
+            return "utf-8"
+        # Shift_JISはWindows拡張文字（①、髙など）も読めるcp932として扱う
+        if encoding.lower() == "shift_jis":
+            return "cp932"
+        return encoding
+
+    @staticmethod
+    def infer_date_format(date_str):
+        """日付文字列に一致するフォーマットを判定（判定できなければNone）"""
+        if not isinstance(date_str, str) or not date_str:
+            return None
+
+        for fmt in CSVParser.DATE_FORMATS:
+            try:
+                datetime.strptime(date_str.strip(), fmt)
+                return fmt
+            except ValueError:
+                continue
+        return None
 
     @staticmethod
-    def parse_date(date_str):
-        """日付文字列を解析"""
+    def parse_date(date_str, date_format=None):
+        """
+        日付文字列を解析
+
+        Args:
+            date_str: 日付文字列
+            date_format: 推定済みのフォーマット（一致しない場合は全フォーマットを試行）
+        """
+        if isinstance(date_str, date):
+            return date_str
         if not date_str:
             return None
 
-        # 複数の日付フォーマットに対応
-        date_formats = [
-            "%Y/%m/%d",
-            "%Y-%m-%d",
-            "%Y年%m月%d日",
-            "%Y/%m/%d %H:%M:%S",
-            "%Y-%m-%d %H:%M:%S",
-        ]
+        if date_format:
+            try:
+                return datetime.strptime(date_str.strip(), date_format).date()
+            except ValueError:
+                pass
 
-        for fmt in date_formats:
+        for fmt in CSVParser.DATE_FORMATS:
             try:
                 return datetime.strptime(date_str.strip(), fmt).date()
             except ValueError:
@@ -97,6 +156,20 @@ class CSVParser:
         except (ValueError, InvalidOperation):
             raise ValueError(f"無効な数値形式: {num_str}")
 
+    @staticmethod
+    def parse_number_fast(num_str, thousands=True):
+        """
+        数値文字列を解析（ファイル単位で推定した桁区切りの有無を利用）
+
+        Decimal変換に失敗した場合は parse_number にフォールバックする
+        """
+        if num_str is None:
+            return None
+        try:
+            return Decimal(num_str.replace(",", "") if thousands else num_str)
+        except InvalidOperation:
+            return CSVParser.parse_number(num_str)
+
     @classmethod
     def parse_csv(cls, file_path):
         """
@@ -106,25 +179,127 @@ class CSVParser:
             list: 解析された取引データのリスト
             list: エラーメッセージのリスト
         """
-        # 文字コード判定
+        errors = []
+        transactions = list(cls.iter_csv(file_path, errors))
+        return transactions, errors
+
+    @classmethod
+    def iter_csv(cls, file_path, errors=None, use_pandas=None):
+        """
+        CSVファイルを逐次解析して取引データを1件ずつ返す
+
+        日付・数値の書式は最初のデータ行から1度だけ推定する。
+        大きなファイルはpandasで読み込み、日付と桁区切りをベクトル化して変換する。
+
+        Args:
+            file_path: CSVファイルパス
+            errors: 解析エラーを追加するリスト（Noneの場合は破棄）
+            use_pandas: pandasで読み込むか（Noneの場合はファイルサイズで判定）
+
+        Yields:
+            dict: バリデーション済みの取引データ
+        """
         encoding = cls.detect_encoding(file_path)
+        if use_pandas is None:
+            use_pandas = os.path.getsize(file_path) >= cls.PANDAS_THRESHOLD_BYTES
 
-        transactions = []
-        errors = []
+        if use_pandas:
+            rows = cls._iter_rows_pandas(file_path, encoding)
+        else:
+            rows = cls._iter_rows_csv(file_path, encoding)
 
+        formats = None
+        for row_num, normalized_row, raw_row in rows:
+            try:
+                if formats is None:
+                    formats = cls._infer_formats(normalized_row)
+                transaction = cls._build_transaction(normalized_row, formats)
+                if transaction:
+                    yield transaction
+            except Exception as e:
+                if errors is not None:
+                    errors.append({"row": row_num, "error": str(e), "data": raw_row})
+
+    @classmethod
+    def _header_map(cls, fieldnames):
+        """CSVヘッダーから 列名 -> 正規化項目名 の対応を作成"""
+        return {
+            name: cls.COLUMN_MAPPING[name]
+            for name in fieldnames or []
+            if name in cls.COLUMN_MAPPING
+        }
+
+    @classmethod
+    def _iter_rows_csv(cls, file_path, encoding):
+        """csvモジュールで1行ずつ読み込む"""
         with open(file_path, "r", encoding=encoding) as f:
-            # CSVリーダー
             reader = csv.DictReader(f)
+            header_map = cls._header_map(reader.fieldnames)
 
             for row_num, row in enumerate(reader, start=2):  # ヘッダー行をスキップ
-                try:
-                    transaction = cls._parse_row(row)
-                    if transaction:
-                        transactions.append(transaction)
-                except Exception as e:
-                    errors.append({"row": row_num, "error": str(e), "data": row})
+                normalized_row = {
+                    field: row[name] for name, field in header_map.items()
+                }
+                yield row_num, normalized_row, row
 
-        return transactions, errors
+    @classmethod
+    def _iter_rows_pandas(cls, file_path, encoding):
+        """pandasでチャンク単位に読み込み、日付と数値をベクトル化して前処理する"""
+        import pandas as pd
+
+        reader = pd.read_csv(
+            file_path,
+            encoding=encoding,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=cls.PANDAS_CHUNK_ROWS,
+        )
+
+        row_num = 2
+        date_format = None
+        for chunk in reader:
+            header_map = cls._header_map(list(chunk.columns))
+            frame = pd.DataFrame(
+                {field: chunk[name] for name, field in header_map.items()}
+            )
+
+            if "transaction_date" in frame and len(frame):
+                if date_format is None:
+                    date_format = cls.infer_date_format(
+                        frame["transaction_date"].iat[0]
+                    )
+                if date_format:
+                    parsed = pd.to_datetime(
+                        frame["transaction_date"].str.strip(),
+                        format=date_format,
+                        errors="coerce",
+                    )
+                    # 変換できなかった行は元の文字列のまま行単位の解析に任せる
+                    frame["transaction_date"] = parsed.dt.date.astype(object).where(
+                        parsed.notna(), frame["transaction_date"]
+                    )
+
+            for field in cls.NUMBER_FIELDS:
+                if field in frame:
+                    frame[field] = frame[field].str.replace(",", "", regex=False)
+
+            fields = list(frame.columns)
+            columns = list(chunk.columns)
+            for raw, values in zip(
+                chunk.itertuples(index=False, name=None),
+                frame.itertuples(index=False, name=None),
+            ):
+                yield row_num, dict(zip(fields, values)), dict(zip(columns, raw))
+                row_num += 1
+
+    @classmethod
+    def _infer_formats(cls, normalized_row):
+        """最初のデータ行から日付フォーマットと桁区切りの有無を推定"""
+        numbers = [normalized_row.get(field) for field in cls.NUMBER_FIELDS]
+        return {
+            "date": cls.infer_date_format(normalized_row.get("transaction_date")),
+            "thousands": any("," in value for value in numbers if value),
+        }
 
     @classmethod
     def _parse_row(cls, row):
@@ -135,6 +310,24 @@ class CSVParser:
             if key in cls.COLUMN_MAPPING:
                 normalized_row[cls.COLUMN_MAPPING[key]] = value
 
+        return cls._build_transaction(normalized_row)
+
+    @classmethod
+    def _build_transaction(cls, normalized_row, formats=None):
+        """正規化済みの行を取引データに変換"""
+        if formats is None:
+            parse_date = cls.parse_date
+            parse_number = cls.parse_number
+        else:
+
+            def parse_date(value):
+                return cls.parse_date(value, formats["date"])
+
+            def parse_number(value):
+                if not value or not value.strip():
+                    return None
+                return cls.parse_number_fast(value, formats["thousands"])
+
         # 必須項目チェック
         required_fields = [
             "transaction_date",
@@ -159,20 +352,18 @@ class CSVParser:
 
         # データ変換
         transaction_data = {
-            "transaction_date": cls.parse_date(normalized_row["transaction_date"]),
+            "transaction_date": parse_date(normalized_row["transaction_date"]),
             "ticker_symbol": ticker_symbol,
             "security_name": normalized_row.get("security_name", "").strip(),
             "transaction_type": cls._parse_transaction_type(
                 normalized_row["transaction_type"]
             ),
-            "quantity": cls.parse_number(normalized_row["quantity"]),
-            "unit_price": cls.parse_number(normalized_row["unit_price"]),
-            "commission": cls.parse_number(normalized_row.get("commission", "0")),
-            "settlement_amount": cls.parse_number(
-                normalized_row.get("settlement_amount")
-            ),
+            "quantity": parse_number(normalized_row["quantity"]),
+            "unit_price": parse_number(normalized_row["unit_price"]),
+            "commission": parse_number(normalized_row.get("commission", "0")),
+            "settlement_amount": parse_number(normalized_row.get("settlement_amount")),
             "currency": currency,
-            "exchange_rate": cls.parse_number(normalized_row.get("exchange_rate")),
+            "exchange_rate": parse_number(normalized_row.get("exchange_rate")),
             "settlement_currency": currency,
         }
 
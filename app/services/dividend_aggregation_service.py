@@ -0,0 +1,240 @@
+"""配当集計サービス
+
+配当サマリー（銘柄別・年別の円換算配当と投資額）をGROUP BYクエリで集計する
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import case, extract, func
+
+from app import db
+from app.models import Dividend, Transaction
+from app.services.exchange_rate_fetcher import ExchangeRateFetcher
+from app.utils.data_version import cached_by_data_version
+from app.utils.logger import get_logger
+
+logger = get_logger("dividend_aggregation_service")
+
+
+class DividendAggregationService:
+    """配当集計クラス
+
+    - 配当: (銘柄, 通貨, 年) 単位で合計し、為替換算は通貨バケットごとに1回
+    - 投資額: 銘柄単位で買付の受渡金額を合計
+    - 結果は dividends / transactions のデータバージョンでキャッシュ
+    """
+
+    # この年以前の配当は1つの区分にまとめる
+    PRE_YEAR_THRESHOLD = 2022
+    PRE_YEAR_LABEL = "2022年以前"
+
+    # 為替レートの変動を反映するための最大キャッシュ保持秒数
+    CACHE_MAX_AGE = 300
+
+    JPY_CURRENCIES = ("JPY", "日本円")
+
+    @staticmethod
+    def get_dividend_summary():
+        """配当サマリーを取得（キャッシュ付き）
+
+        Returns:
+            dict: {'dividends': [...], 'totals': {...}}
+        """
+        return cached_by_data_version(
+            "dividend_summary",
+            ["dividends", "transactions"],
+            DividendAggregationService.build_dividend_summary,
+            max_age=DividendAggregationService.CACHE_MAX_AGE,
+        )
+
+    @staticmethod
+    def aggregate_dividends():
+        """(銘柄, 通貨, 年) 単位の配当合計を取得
+
+        Returns:
+            list: [(ticker_symbol, currency, year, total_dividend), ...]
+        """
+        year = extract("year", Dividend.ex_dividend_date)
+        return (
+            db.session.query(
+                Dividend.ticker_symbol,
+                Dividend.currency,
+                year.label("year"),
+                func.sum(Dividend.total_dividend).label("total"),
+            )
+            .group_by(Dividend.ticker_symbol, Dividend.currency, year)
+            .all()
+        )
+
+    @staticmethod
+    def aggregate_investments():
+        """銘柄単位の銘柄名と総投資額（買付の受渡金額合計）を取得
+
+        Returns:
+            dict: {ticker: {'security_name': str, 'total_investment': Decimal}}
+        """
+        rows = (
+            db.session.query(
+                Transaction.ticker_symbol,
+                func.min(Transaction.id).label("first_id"),
+                func.sum(
+                    case(
+                        (
+                            Transaction.transaction_type == "BUY",
+                            Transaction.settlement_amount,
+                        ),
+                        else_=None,
+                    )
+                ).label("total_investment"),
+            )
+            .group_by(Transaction.ticker_symbol)
+            .all()
+        )
+
+        # 銘柄名は各銘柄の最初の取引から取得
+        first_ids = [row.first_id for row in rows]
+        names = {}
+        if first_ids:
+            names = dict(
+                db.session.query(Transaction.id, Transaction.security_name)
+                .filter(Transaction.id.in_(first_ids))
+                .all()
+            )
+
+        return {
+            row.ticker_symbol: {
+                "security_name": names.get(row.first_id),
+                "total_investment": Decimal(str(row.total_investment or 0)),
+            }
+            for row in rows
+        }
+
+    @staticmethod
+    def _get_rates(currencies):
+        """通貨バケットに必要な為替レートを取得
+
+        Returns:
+            dict: {正規化済み通貨: Decimal(rate)}
+        """
+        normalized = {str(c).strip().upper() for c in currencies if c}
+        foreign = normalized - set(DividendAggregationService.JPY_CURRENCIES)
+        if not foreign:
+            return {}
+
+        rates = {}
+        for currency, rate_entry in ExchangeRateFetcher.get_multiple_rates(
+            sorted(foreign)
+        ).items():
+            rate = rate_entry.get("rate") if rate_entry else None
+            if rate:
+                rates[currency] = Decimal(str(rate))
+        return rates
+
+    @staticmethod
+    def _to_jpy(amount, currency, rates):
+        """通貨バケットの合計額を円換算（レート未取得の場合は換算なし）"""
+        if not amount or not currency:
+            return Decimal("0")
+        amount = Decimal(str(amount))
+        curr = str(currency).strip().upper()
+        if curr in DividendAggregationService.JPY_CURRENCIES:
+            return amount
+        rate = rates.get(curr)
+        return amount * rate if rate else amount
+
+    @staticmethod
+    def _year_key(year):
+        year = int(year)
+        if year <= DividendAggregationService.PRE_YEAR_THRESHOLD:
+            return DividendAggregationService.PRE_YEAR_LABEL
+        return year
+
+    @staticmethod
+    def _sorted_years(yearly):
+        """年を降順に並べ、'2022年以前' を末尾に配置"""
+        label = DividendAggregationService.PRE_YEAR_LABEL
+        years = sorted((y for y in yearly if y != label), reverse=True)
+        if label in yearly:
+            years.append(label)
+        return {str(year): float(yearly[year]) for year in years}
+
+    @staticmethod
+    def build_dividend_summary():
+        """配当サマリーを集計
+
+        Returns:
+            dict: {'dividends': [...], 'totals': {...}}
+        """
+        buckets = DividendAggregationService.aggregate_dividends()
+        ticker_info = DividendAggregationService.aggregate_investments()
+        rates = DividendAggregationService._get_rates({b.currency for b in buckets})
+
+        ticker_yearly = defaultdict(lambda: defaultdict(Decimal))
+        for bucket in buckets:
+            if bucket.ticker_symbol not in ticker_info:
+                continue
+            amount_jpy = DividendAggregationService._to_jpy(
+                bucket.total, bucket.currency, rates
+            )
+            year_key = DividendAggregationService._year_key(bucket.year)
+            ticker_yearly[bucket.ticker_symbol][year_key] += amount_jpy
+
+        dividend_summary = []
+        total_all_dividends_jpy = Decimal("0")
+        yearly_totals_jpy = defaultdict(Decimal)
+
+        for ticker_symbol in sorted(ticker_yearly):
+            yearly = ticker_yearly[ticker_symbol]
+            total_dividends = sum(yearly.values(), Decimal("0"))
+            if total_dividends == 0:
+                continue
+
+            total_investment = ticker_info[ticker_symbol]["total_investment"]
+            dividend_yield = (
+                total_dividends / total_investment * 100
+                if total_investment > 0
+                else Decimal("0")
+            )
+
+            total_all_dividends_jpy += total_dividends
+            for year, amount in yearly.items():
+                yearly_totals_jpy[year] += amount
+
+            dividend_summary.append(
+                {
+                    "ticker_symbol": ticker_symbol,
+                    "security_name": ticker_info[ticker_symbol]["security_name"],
+                    "total_dividends": float(total_dividends),
+                    "total_investment": float(total_investment),
+                    "dividend_yield": float(dividend_yield),
+                    "yearly_dividends": DividendAggregationService._sorted_years(
+                        yearly
+                    ),
+                }
+            )
+
+        total_investment_all = sum(
+            (info["total_investment"] for info in ticker_info.values()), Decimal("0")
+        )
+        overall_dividend_yield = (
+            total_all_dividends_jpy / total_investment_all * 100
+            if total_investment_all > 0
+            else Decimal("0")
+        )
+
+        logger.info(
+            f"配当サマリー集計: 銘柄={len(dividend_summary)}, バケット={len(buckets)}"
+        )
+
+        return {
+            "dividends": dividend_summary,
+            "totals": {
+                "total_dividends": float(total_all_dividends_jpy),
+                "total_investment": float(total_investment_all),
+                "dividend_yield": float(overall_dividend_yield),
+                "yearly_totals": DividendAggregationService._sorted_years(
+                    yearly_totals_jpy
+                ),
+            },
+        }
@@ -15,11 +15,12 @@ import os
 import ssl
 from datetime import datetime, timedelta
 
-import yfinance as yf
-
 from app import db
 from app.models.dividend import Dividend
 from app.models.holding import Holding
+from app.utils.logger import get_logger
+
+logger = get_logger("dividend_fetcher")
 
 os.environ["PYTHONHTTPSVERIFY"] = "0"
 os.environ["CURL_CA_BUNDLE"] = ""
@@ -43,28 +44,9 @@ class DividendFetcher:
         Returns:
             float: Quantity held at that date
         """
-        from decimal import Decimal
-
-        from app.models.transaction import Transaction
-
-        # Get all transactions up to and including the target date
-        transactions = (
-            Transaction.query.filter(
-                Transaction.ticker_symbol == ticker_symbol,
-                Transaction.transaction_date <= target_date,
-            )
-            .order_by(Transaction.transaction_date)
-            .all()
-        )
-
-        quantity = Decimal("0")
-        for tx in transactions:
-            if tx.transaction_type == "BUY":
-                quantity += Decimal(str(tx.quantity))
-            elif tx.transaction_type == "SELL":
-                quantity -= Decimal(str(tx.quantity))
+        from app.services.position_index import PositionIndex
 
-        return float(quantity)
+        return PositionIndex.load().quantity_on(ticker_symbol, target_date)
 
     @staticmethod
     def fetch_dividends_yahoo(ticker_symbol, start_date=None, end_date=None):
@@ -79,6 +61,8 @@ class DividendFetcher:
         Returns:
             list: [{'ex_date': datetime, 'amount': float, 'currency': str}]
         """
+        import yfinance as yf
+
         if start_date is None:
             start_date = datetime.now() - timedelta(days=365 * 5)  # 過去5年分
         if end_date is None:
@@ -132,23 +116,26 @@ class DividendFetcher:
             return dividend_list
 
         except Exception as e:
-            print(f"Error fetching dividends for {ticker_symbol}: {e}")
+            logger.error(f"Error fetching dividends for {ticker_symbol}: {e}")
             return []
 
     @staticmethod
-    def save_dividends_to_db(ticker_symbol, security_name=None):
+    def save_dividends_to_db(ticker_symbol, security_name=None, start_date=None):
         """
         Fetch dividends and save to database
 
         Args:
             ticker_symbol: Stock ticker symbol
             security_name: Optional security name
+            start_date: Only save dividends on or after this date (default: 5 years ago)
 
         Returns:
             dict: Summary of saved dividends
         """
         # Fetch from Yahoo Finance
-        dividends = DividendFetcher.fetch_dividends_yahoo(ticker_symbol)
+        dividends = DividendFetcher.fetch_dividends_yahoo(
+            ticker_symbol, start_date=start_date
+        )
 
         results = {
             "ticker": ticker_symbol,
@@ -158,6 +145,14 @@ class DividendFetcher:
             "errors": [],
         }
 
+        # Quantities held at every ex-dividend date in one batch lookup
+        from app.services.position_index import PositionIndex
+
+        ex_dates = [div_data["ex_date"] for div_data in dividends]
+        quantities = dict(
+            zip(ex_dates, PositionIndex.load().quantity_at(ticker_symbol, ex_dates))
+        )
+
         for div_data in dividends:
             try:
                 # Check if dividend already exists
@@ -167,9 +162,7 @@ class DividendFetcher:
 
                 if existing:
                     # Update existing dividend - recalculate quantity at ex-dividend date
-                    quantity_held = DividendFetcher._calculate_quantity_at_date(
-                        ticker_symbol, div_data["ex_date"]
-                    )
+                    quantity_held = quantities[div_data["ex_date"]]
                     existing.dividend_amount = div_data["amount"]
                     existing.currency = div_data["currency"]
                     existing.source = div_data["source"]
@@ -177,10 +170,8 @@ class DividendFetcher:
                     existing.total_dividend = float(div_data["amount"]) * quantity_held
                     results["existing"] += 1
                 else:
-                    # Calculate quantity held at ex-dividend date
-                    quantity_held = DividendFetcher._calculate_quantity_at_date(
-                        ticker_symbol, div_data["ex_date"]
-                    )
+                    # Quantity held at ex-dividend date
+                    quantity_held = quantities[div_data["ex_date"]]
 
                     # Create new dividend record
                     dividend = Dividend(
@@ -322,7 +313,7 @@ class DividendFetcher:
             list: Dividend data
         """
         # TODO: Implement TradingView scraping
-        print("TradingView fetching not yet implemented")
+        logger.warning("TradingView fetching not yet implemented")
         return []
 
     @staticmethod
@@ -335,5 +326,5 @@ class DividendFetcher:
             list: Dividend data
         """
         # TODO: Implement Investing.com scraping
-        print("Investing.com fetching not yet implemented")
+        logger.warning("Investing.com fetching not yet implemented")
         return []
@@ -10,7 +10,7 @@ import os
 import ssl
 from datetime import datetime, timedelta
 
-import yfinance as yf
+from app.utils.logger import get_logger
 
 os.environ["PYTHONHTTPSVERIFY"] = "0"
 os.environ["CURL_CA_BUNDLE"] = ""
@@ -18,6 +18,8 @@ os.environ["REQUESTS_CA_BUNDLE"] = ""
 os.environ["SSL_CERT_FILE"] = ""
 ssl._create_default_https_context = ssl._create_unverified_context
 
+logger = get_logger("exchange_rate_fetcher")
+
 
 class ExchangeRateFetcher:
     """Fetch currency exchange rates"""
@@ -49,6 +51,8 @@ class ExchangeRateFetcher:
             dict: {'rate': float, 'from': str, 'to': str, 'timestamp': datetime}
             None: If fetch fails
         """
+        import yfinance as yf
+
         # Same currency
         if from_currency == to_currency:
             return {
@@ -78,7 +82,7 @@ class ExchangeRateFetcher:
             pair_symbol = f"{from_currency}{to_currency}=X"
 
         if not pair_symbol:
-            print(f"Unsupported currency pair: {from_currency}/{to_currency}")
+            logger.warning(f"Unsupported currency pair: {from_currency}/{to_currency}")
             return None
 
         try:
@@ -106,7 +110,7 @@ class ExchangeRateFetcher:
             }
 
         except Exception as e:
-            print(
+            logger.error(
                 f"Error fetching exchange rate for {from_currency}/{to_currency}: {e}"
             )
             return None
@@ -177,6 +181,8 @@ class ExchangeRateFetcher:
             dict: {'rate': float, 'date': datetime, ...}
             None: If fetch fails
         """
+        import yfinance as yf
+
         # Same currency
         if from_currency == to_currency:
             return {"rate": 1.0, "from": from_currency, "to": to_currency, "date": date}
@@ -188,7 +194,7 @@ class ExchangeRateFetcher:
             pair_symbol = f"{from_currency}{to_currency}=X"
 
         if not pair_symbol:
-            print(f"Unsupported currency pair: {from_currency}/{to_currency}")
+            logger.warning(f"Unsupported currency pair: {from_currency}/{to_currency}")
             return None
 
         try:
@@ -219,7 +225,7 @@ class ExchangeRateFetcher:
             }
 
         except Exception as e:
-            print(
+            logger.error(
                 f"Error fetching historical rate for {from_currency}/{to_currency} on {date}: {e}"
             )
             return None
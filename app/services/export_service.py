@@ -0,0 +1,245 @@
+"""データエクスポートサービス
+
+取引・確定損益・配当・日次ポートフォリオ履歴をCSV/NDJSONで逐次出力する。
+SQLAlchemy Core の select をサーバーサイドカーソル（yield_per）で読み込み、
+ORMオブジェクトを生成せずに行単位で書き出すため、件数によらずメモリ使用量は一定。
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app.models import Dividend, PortfolioSnapshot, RealizedPnl, Transaction
+from app.utils.database import readonly_connection
+from app.utils.logger import get_logger
+
+logger = get_logger("export_service")
+
+
+class ExportService:
+    """データエクスポートクラス"""
+
+    # DBから一度に読み込む行数
+    FETCH_SIZE = 1000
+
+    # CSV出力時に1チャンクへまとめる行数
+    ROWS_PER_CHUNK = 500
+
+    # gzip出力で SYNC_FLUSH するまでにまとめる入力バイト数
+    # （フラッシュごとに圧縮ブロックが区切られるため、1行ごとでは圧縮率が落ちる）
+    GZIP_FLUSH_BYTES = 64 * 1024
+
+    FORMATS = ("csv", "ndjson")
+
+    # データセット名 -> (モデル, 出力カラム, 日付カラム)
+    DATASETS = {
+        "transactions": (
+            Transaction,
+            [
+                "id",
+                "transaction_date",
+                "ticker_symbol",
+                "security_name",
+                "transaction_type",
+                "currency",
+                "quantity",
+                "unit_price",
+                "commission",
+                "settlement_amount",
+                "exchange_rate",
+                "settlement_currency",
+            ],
+            "transaction_date",
+        ),
+        "realized-pnl": (
+            RealizedPnl,
+            [
+                "id",
+                "ticker_symbol",
+                "sell_date",
+                "quantity",
+                "average_cost",
+                "sell_price",
+                "realized_pnl",
+                "realized_pnl_pct",
+                "commission",
+                "currency",
+            ],
+            "sell_date",
+        ),
+        "dividends": (
+            Dividend,
+            [
+                "id",
+                "ticker_symbol",
+                "ex_dividend_date",
+                "payment_date",
+                "dividend_amount",
+                "currency",
+                "total_dividend",
+                "quantity_held",
+                "source",
+            ],
+            "ex_dividend_date",
+        ),
+        "portfolio-history": (
+            PortfolioSnapshot,
+            [
+                "snapshot_date",
+                "holdings_count",
+                "total_cost",
+                "market_value",
+                "unrealized_pnl",
+            ],
+            "snapshot_date",
+        ),
+    }
+
+    @staticmethod
+    def get_columns(dataset):
+        """データセットの出力カラム名リストを取得"""
+        return list(ExportService.DATASETS[dataset][1])
+
+    @staticmethod
+    def build_select(dataset, **filters):
+        """
+        エクスポート用のCore selectを作成（日付・ID昇順）
+
+        Args:
+            dataset: DATASETS のキー
+            **filters: start_date / end_date / ticker_symbol / transaction_type / currency
+                （データセットに該当カラムがない条件は無視）
+
+        Returns:
+            Select: 出力カラムのみを選択するselect文
+        """
+        model, columns, date_column = ExportService.DATASETS[dataset]
+        table = model.__table__
+        date_col = table.c[date_column]
+
+        stmt = select(*[table.c[name] for name in columns])
+
+        if filters.get("start_date"):
+            stmt = stmt.where(date_col >= filters["start_date"])
+        if filters.get("end_date"):
+            stmt = stmt.where(date_col <= filters["end_date"])
+        for key in ("ticker_symbol", "transaction_type", "currency"):
+            if filters.get(key) and key in table.c:
+                stmt = stmt.where(table.c[key] == filters[key])
+
+        return stmt.order_by(date_col, table.c.id)
+
+    @staticmethod
+    def iter_rows(dataset, **filters):
+        """
+        サーバーサイドカーソルで行タプルを逐次取得
+
+        Yields:
+            Row: 出力カラム順の行
+        """
+        stmt = ExportService.build_select(dataset, **filters).execution_options(
+            yield_per=ExportService.FETCH_SIZE
+        )
+        with readonly_connection() as connection:
+            result = connection.execute(stmt)
+            try:
+                yield from result
+            finally:
+                result.close()
+
+    @staticmethod
+    def _csv_value(value):
+        if value is None:
+            return ""
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _json_value(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def stream_csv(dataset, **filters):
+        """
+        CSVを逐次生成（Excel向けにBOM付きUTF-8）
+
+        Yields:
+            str: 複数行をまとめたCSVチャンク
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        buffer.write("\ufeff")
+        writer.writerow(ExportService.get_columns(dataset))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+        count = 0
+        for row in ExportService.iter_rows(dataset, **filters):
+            writer.writerow([ExportService._csv_value(v) for v in row])
+            count += 1
+            if count % ExportService.ROWS_PER_CHUNK == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+        logger.info(f"CSVエクスポート完了: {dataset} {count}件")
+
+    @staticmethod
+    def stream_ndjson(dataset, **filters):
+        """
+        NDJSON（1行1レコード）を逐次生成
+
+        Yields:
+            str: 1レコード分のJSON行
+        """
+        columns = ExportService.get_columns(dataset)
+
+        count = 0
+        for row in ExportService.iter_rows(dataset, **filters):
+            record = {
+                name: ExportService._json_value(value)
+                for name, value in zip(columns, row)
+            }
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+            count += 1
+
+        logger.info(f"NDJSONエクスポート完了: {dataset} {count}件")
+
+    @staticmethod
+    def gzip_stream(chunks):
+        """
+        文字列チャンクをgzip圧縮しながら逐次出力
+
+        入力が GZIP_FLUSH_BYTES たまるごとにSYNC_FLUSHするため、
+        クライアントは先頭から順に展開できる
+
+        Yields:
+            bytes: 圧縮済みチャンク
+        """
+        compressor = zlib.compressobj(wbits=31)  # wbits=31: gzipヘッダー付き
+        pending = 0
+        for chunk in chunks:
+            raw = chunk.encode("utf-8")
+            data = compressor.compress(raw)
+            pending += len(raw)
+            if pending >= ExportService.GZIP_FLUSH_BYTES:
+                data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                pending = 0
+            if data:
+                yield data
+        yield compressor.flush()
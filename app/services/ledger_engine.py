@@ -0,0 +1,203 @@
+"""高速台帳計算エンジン
+
+取引履歴の再生（移動平均法による保有情報・確定損益の計算）を、
+数量は int64 固定小数点（小数4桁 = DBカラム精度）、金額は float64 で行う。
+数量の比較（売却可否・全量売却の判定）は整数演算のため誤差が出ない。
+
+Decimal による基準実装（transaction_service.replay_ledger）との差分を検出する
+検証モードを備え、高速化による円単位の精度劣化を見逃さないようにする。
+"""
+
+from app.utils.logger import get_logger
+
+logger = get_logger("ledger_engine")
+
+
+class LedgerEngine:
+    """float64 / int64固定小数点の台帳計算クラス"""
+
+    ENGINES = ("decimal", "float")
+
+    # 数量の固定小数点スケール（Numeric(15, 4) に合わせる）
+    QUANTITY_SCALE = 10_000
+
+    # 検証モードの既定許容誤差（円）
+    DEFAULT_TOLERANCE = 1.0
+
+    @staticmethod
+    def to_fixed(value):
+        """数量を int64 固定小数点に変換"""
+        return int(round(float(value or 0) * LedgerEngine.QUANTITY_SCALE))
+
+    @staticmethod
+    def replay(transactions, ticker_symbol=None):
+        """
+        1銘柄の取引を日付順に再生（replay_ledger の float 版）
+
+        Args:
+            transactions: 取引日順の Transaction または LedgerEntry のリスト
+            ticker_symbol: 銘柄（省略時は各取引の ticker_symbol 属性）
+
+        Returns:
+            tuple: (保有情報dict or None, 確定損益dictのリスト)
+        """
+        scale = LedgerEngine.QUANTITY_SCALE
+
+        # 1銘柄分の短い系列ではNumPy配列化のコストが計算量を上回るため、
+        # 固定小数点の整数とfloatのスカラーに1回だけ変換して走査する
+        columns = [
+            (
+                tx.transaction_type == "BUY",
+                tx.transaction_type == "SELL",
+                int(round(float(tx.quantity or 0) * scale)),
+                float(tx.unit_price or 0),
+                float(tx.commission or 0),
+                float(tx.settlement_amount or 0),
+            )
+            for tx in transactions
+        ]
+
+        held = 0  # 固定小数点
+        average_cost = 0.0
+        total_cost = 0.0
+        first = None
+        pnl_records = []
+
+        for tx, (is_buy, is_sell, qty, price, commission, settlement) in zip(
+            transactions, columns
+        ):
+            if is_buy:
+                quantity = qty / scale
+                # 受渡金額を使用（手数料込みの実際の支払額）
+                cost = settlement if settlement else quantity * price + commission
+
+                if first is not None:
+                    total_cost += cost
+                    held += qty
+                    average_cost = total_cost / (held / scale)
+                else:
+                    first = tx
+                    held = qty
+                    total_cost = cost
+                    average_cost = cost / quantity
+
+            elif is_sell:
+                if first is None or held < qty:
+                    # データ不整合の場合はスキップ
+                    continue
+
+                quantity = qty / scale
+                cost_basis = average_cost * quantity
+                realized_pnl = settlement - cost_basis
+
+                pnl_records.append(
+                    {
+                        "ticker_symbol": ticker_symbol or tx.ticker_symbol,
+                        "sell_date": tx.transaction_date,
+                        "quantity": quantity,
+                        "average_cost": average_cost,
+                        "sell_price": price,
+                        "realized_pnl": realized_pnl,
+                        "realized_pnl_pct": (
+                            realized_pnl / cost_basis * 100
+                            if average_cost > 0
+                            else None
+                        ),
+                        "commission": (
+                            commission if tx.commission is not None else None
+                        ),
+                        "currency": tx.currency,
+                    }
+                )
+
+                held -= qty
+                total_cost = (held / scale) * average_cost
+
+                if held == 0:
+                    first = None
+                    average_cost = 0.0
+                    total_cost = 0.0
+
+        if first is None or held <= 0:
+            return None, pnl_records
+
+        return {
+            "ticker_symbol": ticker_symbol or first.ticker_symbol,
+            "security_name": first.security_name,
+            "total_quantity": held / scale,
+            "average_cost": average_cost,
+            "currency": first.currency,
+            "total_cost": total_cost,
+        }, pnl_records
+
+    @staticmethod
+    def find_divergences(expected, actual, tolerance=None):
+        """
+        基準実装（Decimal）と高速実装の結果を比較
+
+        Args:
+            expected: replay_ledger の結果 (holding, pnl_records)
+            actual: LedgerEngine.replay の結果 (holding, pnl_records)
+            tolerance: 許容誤差（円・株）
+
+        Returns:
+            list: 差分のリスト [{'field', 'expected', 'actual'}, ...]
+        """
+        if tolerance is None:
+            tolerance = LedgerEngine.DEFAULT_TOLERANCE
+
+        divergences = []
+
+        def check(field, expected_value, actual_value):
+            if expected_value is None or actual_value is None:
+                if expected_value is not actual_value:
+                    divergences.append(
+                        {
+                            "field": field,
+                            "expected": expected_value,
+                            "actual": actual_value,
+                        }
+                    )
+                return
+            if abs(float(expected_value) - float(actual_value)) > tolerance:
+                divergences.append(
+                    {
+                        "field": field,
+                        "expected": float(expected_value),
+                        "actual": float(actual_value),
+                    }
+                )
+
+        expected_holding, expected_pnl = expected
+        actual_holding, actual_pnl = actual
+
+        if (expected_holding is None) != (actual_holding is None):
+            divergences.append(
+                {
+                    "field": "holding",
+                    "expected": expected_holding is not None,
+                    "actual": actual_holding is not None,
+                }
+            )
+        elif expected_holding is not None:
+            for field in ("total_quantity", "average_cost", "total_cost"):
+                check(
+                    f"holding.{field}",
+                    expected_holding[field],
+                    actual_holding[field],
+                )
+
+        if len(expected_pnl) != len(actual_pnl):
+            divergences.append(
+                {
+                    "field": "realized_pnl.count",
+                    "expected": len(expected_pnl),
+                    "actual": len(actual_pnl),
+                }
+            )
+        else:
+            for index, (exp, act) in enumerate(zip(expected_pnl, actual_pnl)):
+                for field in ("quantity", "average_cost", "realized_pnl"):
+                    check(f"realized_pnl[{index}].{field}", exp[field], act[field])
+
+        return divergences
@@ -0,0 +1,180 @@
+"""評価指標の更新計画
+
+Yahoo Financeの `.info` 取得は1銘柄1回のAPI呼び出しで全指標をまとめて返す。
+指標ごとに鮮度の許容時間（鮮度予算）を定め、許容時間に対する経過時間の比率
+（鮮度比）が最も大きい・評価額が大きい銘柄から、1サイクルあたりのAPI呼び出し
+上限の範囲で `.info` を取得する。
+
+時価総額・PER・PBR・52週レンジのような株価連動の指標は、`.info` 取得時の株価
+（reference_price）と最新株価の比率でローカルに更新するため、鮮度予算を長く取れる。
+"""
+
+from datetime import datetime
+
+from flask import current_app, has_app_context
+
+from app.utils.logger import get_logger
+
+logger = get_logger("metrics_refresh_planner")
+
+
+class MetricsRefreshPlanner:
+    """評価指標の更新計画クラス"""
+
+    # 指標ごとの鮮度予算（時間）
+    FIELD_BUDGETS = {
+        # 株価連動（取得の間は最新株価でローカル更新）
+        "market_cap": 24 * 7,
+        "pe_ratio": 24 * 7,
+        "pb_ratio": 24 * 7,
+        "fifty_two_week_low": 24 * 7,
+        "fifty_two_week_high": 24 * 7,
+        # 企業価値（負債・現金を含むため株価比率では更新しない）
+        "ev_to_revenue": 24 * 3,
+        "ev_to_ebitda": 24 * 3,
+        # 決算ごとにしか変わらない指標
+        "eps": 24 * 14,
+        "revenue": 24 * 14,
+        "profit_margin": 24 * 14,
+        "beta": 24 * 30,
+    }
+
+    # 株価比率でローカル更新する指標
+    PRICE_SCALED_FIELDS = ("market_cap", "pe_ratio", "pb_ratio")
+
+    # 1サイクルあたりの `.info` 呼び出し上限
+    DEFAULT_CALL_BUDGET = 20
+
+    @staticmethod
+    def field_budgets():
+        """設定で上書きした鮮度予算（時間）"""
+        config = current_app.config if has_app_context() else {}
+        budgets = dict(MetricsRefreshPlanner.FIELD_BUDGETS)
+        budgets.update(config.get("METRICS_FIELD_BUDGET_HOURS") or {})
+        return budgets
+
+    @staticmethod
+    def call_budget():
+        """設定の1サイクルあたりのAPI呼び出し上限"""
+        config = current_app.config if has_app_context() else {}
+        return config.get(
+            "METRICS_CALL_BUDGET", MetricsRefreshPlanner.DEFAULT_CALL_BUDGET
+        )
+
+    @staticmethod
+    def staleness(metrics, now=None, budgets=None):
+        """
+        鮮度比（経過時間 / 値のある指標の鮮度予算 の最大値）
+
+        1以上なら `.info` の再取得が必要。未取得の銘柄は無限大。
+
+        Args:
+            metrics: StockMetrics または None
+            now: 現在時刻（UTC）
+            budgets: {指標: 鮮度予算（時間）}
+
+        Returns:
+            float: 鮮度比
+        """
+        if metrics is None or metrics.info_updated_at is None:
+            return float("inf")
+
+        now = now or datetime.utcnow()
+        budgets = budgets or MetricsRefreshPlanner.field_budgets()
+        age_hours = (now - metrics.info_updated_at).total_seconds() / 3600
+
+        # 値のない指標（ETFのPER等）は再取得しても埋まらないため予算から除外
+        applicable = [
+            hours
+            for field, hours in budgets.items()
+            if hours > 0 and getattr(metrics, field, None) is not None
+        ]
+        if not applicable:
+            applicable = [max(budgets.values())]
+
+        # 1回の `.info` で全指標を取得するため、経過時間は全指標で共通
+        return age_hours / min(applicable)
+
+    @staticmethod
+    def plan(ticker_symbols, metrics_by_ticker, values=None, now=None, budget=None):
+        """
+        `.info` を取得する銘柄を優先度順に決定
+
+        優先度 = 鮮度比 × (1 + 評価額 / 最大評価額)。
+
+        Args:
+            ticker_symbols: 銘柄のリスト
+            metrics_by_ticker: {銘柄: StockMetrics}
+            values: {銘柄: 評価額（円）}
+            now: 現在時刻（UTC）
+            budget: API呼び出し上限（デフォルト: 設定 METRICS_CALL_BUDGET）
+
+        Returns:
+            dict: {'fetch': [銘柄], 'deferred': [期限切れだが上限超過の銘柄],
+                   'fresh': [鮮度予算内の銘柄]}
+        """
+        now = now or datetime.utcnow()
+        budget = MetricsRefreshPlanner.call_budget() if budget is None else budget
+        budgets = MetricsRefreshPlanner.field_budgets()
+        values = values or {}
+        largest = max(values.values(), default=0) or 1
+
+        due = []
+        fresh = []
+        for ticker in ticker_symbols:
+            ratio = MetricsRefreshPlanner.staleness(
+                metrics_by_ticker.get(ticker), now, budgets
+            )
+            if ratio >= 1:
+                due.append((ratio * (1 + values.get(ticker, 0) / largest), ticker))
+            else:
+                fresh.append(ticker)
+
+        due.sort(key=lambda item: item[0], reverse=True)
+        ordered = [ticker for _, ticker in due]
+
+        logger.info(
+            f"評価指標の更新計画: 取得={min(len(ordered), budget)}, "
+            f"保留={max(len(ordered) - budget, 0)}, 鮮度内={len(fresh)}"
+        )
+        return {
+            "fetch": ordered[:budget],
+            "deferred": ordered[budget:],
+            "fresh": fresh,
+        }
+
+    @staticmethod
+    def roll_forward(metrics, current_price):
+        """
+        株価連動の指標を最新株価でローカル更新（API呼び出しなし）
+
+        Args:
+            metrics: StockMetrics
+            current_price: 最新株価（銘柄の通貨建て）
+
+        Returns:
+            bool: 更新した場合True
+        """
+        if not current_price or not metrics.reference_price:
+            return False
+
+        current_price = float(current_price)
+        ratio = current_price / float(metrics.reference_price)
+        for field in MetricsRefreshPlanner.PRICE_SCALED_FIELDS:
+            value = getattr(metrics, field)
+            if value is not None:
+                setattr(metrics, field, float(value) * ratio)
+
+        # 52週レンジは最新株価で広げる（期間から外れた高値・安値は次回取得で反映）
+        if metrics.fifty_two_week_high is not None:
+            metrics.fifty_two_week_high = max(
+                float(metrics.fifty_two_week_high), current_price
+            )
+        if metrics.fifty_two_week_low is not None:
+            metrics.fifty_two_week_low = min(
+                float(metrics.fifty_two_week_low), current_price
+            )
+
+        metrics.reference_price = current_price
+        metrics.last_updated = datetime.utcnow()
+        return True
@@ -2,12 +2,13 @@ from collections import defaultdict
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 
-import pandas as pd
-import yfinance as yf
-
 from app import db
-from app.models import Dividend, Holding, RealizedPnl, StockPrice, Transaction
+from app.models import Dividend, Holding, RealizedPnl, Transaction
+from app.services.analytics_loader import AnalyticsLoader
 from app.services.exchange_rate_fetcher import ExchangeRateFetcher
+from app.utils.logger import get_logger
+
+logger = get_logger("performance_service")
 
 
 class PerformanceService:
@@ -25,29 +26,9 @@ class PerformanceService:
         Returns:
             pd.DataFrame: 日付をインデックス、ティッカーをカラムとする価格DataFrame
         """
-        cached_prices = (
-            StockPrice.query.filter(
-                StockPrice.ticker_symbol.in_(tickers),
-                StockPrice.price_date >= start_date,
-                StockPrice.price_date <= end_date,
-            )
-            .order_by(StockPrice.price_date)
-            .all()
-        )
-
-        if not cached_prices:
-            return pd.DataFrame()
-
-        # DataFrameに変換
-        data = defaultdict(dict)
-        for p in cached_prices:
-            data[p.ticker_symbol][p.price_date] = float(p.close_price)
-
-        df = pd.DataFrame(data)
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
-
-        return df
+        matrix = AnalyticsLoader.price_matrix(list(tickers), start_date, end_date)
+        # 価格のない銘柄の列は含めない
+        return matrix.dropna(axis=1, how="all")
 
     @staticmethod
     def merge_price_data(cached_df, yf_df, tickers):
@@ -63,6 +44,8 @@ class PerformanceService:
         Returns:
             pd.DataFrame: マージされた価格DataFrame
         """
+        import pandas as pd
+
         if cached_df.empty:
             return yf_df
         if yf_df.empty:
@@ -96,6 +79,8 @@ class PerformanceService:
             float: 調整係数（分割があった場合は1より大きい/小さい値）
                    from_date価格 / 調整係数 = 分割調整後価格
         """
+        import yfinance as yf
+
         try:
             ticker = yf.Ticker(yf_ticker)
             splits = ticker.splits
@@ -124,7 +109,7 @@ class PerformanceService:
             return cumulative_ratio
 
         except Exception as e:
-            print(f"WARNING: Failed to get split data for {yf_ticker}: {e}")
+            logger.warning(f"Failed to get split data for {yf_ticker}: {e}")
             return 1.0
 
     @staticmethod
@@ -135,6 +120,8 @@ class PerformanceService:
         Returns:
             dict: {yf_ticker: {date: cumulative_split_ratio}}
         """
+        import yfinance as yf
+
         split_data = {}
 
         for ticker in tickers:
@@ -165,7 +152,7 @@ class PerformanceService:
                 split_data[yf_t] = cumulative
 
             except Exception as e:
-                print(f"WARNING: Failed to get split data for {ticker}: {e}")
+                logger.warning(f"Failed to get split data for {ticker}: {e}")
                 split_data[ticker] = {}
 
         return split_data
@@ -175,27 +162,27 @@ class PerformanceService:
         """
         過去N日間の日次損益推移を計算する
         """
+        import pandas as pd
+        import yfinance as yf
+
         try:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days)
 
-            print(f"DEBUG: get_performance_history called with days={days}")
-            print(f"DEBUG: Period: {start_date} to {end_date}")
+            logger.debug(f"get_performance_history called with days={days}")
+            logger.debug(f"Period: {start_date} to {end_date}")
 
             # 1. 全取引履歴を取得
-            transactions = Transaction.query.order_by(
-                Transaction.transaction_date
-            ).all()
+            transactions = AnalyticsLoader.records(AnalyticsLoader.transactions())
             if not transactions:
-                print("DEBUG: No transactions found")
+                logger.debug("No transactions found")
                 return []
 
-            print(f"DEBUG: Found {len(transactions)} transactions")
+            logger.debug(f"Found {len(transactions)} transactions")
         except Exception as e:
-            print(f"ERROR in get_performance_history initialization: {e}")
-            import traceback
-
-            traceback.print_exc()
+            logger.error(
+                f"get_performance_history initialization failed: {e}", exc_info=True
+            )
             raise
 
         # 2. 過去の全保有銘柄を特定
@@ -214,8 +201,8 @@ class PerformanceService:
         min_tx_date = transactions[0].transaction_date
         download_start = min(start_date, min_tx_date) - timedelta(days=10)
 
-        print(
-            f"DEBUG: Tickers={len(yf_tickers)}, Period={download_start} to {end_date}"
+        logger.debug(
+            f"Tickers={len(yf_tickers)}, Period={download_start} to {end_date}"
         )
 
         # バッチ処理で取得
@@ -224,8 +211,8 @@ class PerformanceService:
         for i in range(0, len(yf_tickers), batch_size):
             batch = yf_tickers[i : i + batch_size]
             try:
-                print(
-                    f"DEBUG: Downloading batch {i//batch_size + 1}/{(len(yf_tickers)-1)//batch_size + 1}: {len(batch)} tickers"
+                logger.debug(
+                    f"Downloading batch {i//batch_size + 1}/{(len(yf_tickers)-1)//batch_size + 1}: {len(batch)} tickers"
                 )
                 # auto_adjust=True を使用して、常に調整後終値を 'Close' として取得
                 batch_data = yf.download(
@@ -255,15 +242,12 @@ class PerformanceService:
                                     columns={"Close": batch[0]}
                                 )
                             )
-                    print(f"DEBUG: Batch {i//batch_size + 1} completed successfully")
+                    logger.debug(f"Batch {i//batch_size + 1} completed successfully")
             except Exception as e:
-                print(f"ERROR: Batch {batch} failed: {e}")
-                import traceback
-
-                traceback.print_exc()
+                logger.error(f"Batch {batch} failed: {e}", exc_info=True)
 
         if not all_data_frames:
-            print("DEBUG: No price data obtained.")
+            logger.debug("No price data obtained.")
             return []
 
         # 全ての DataFrame を横に結合
@@ -279,11 +263,11 @@ class PerformanceService:
             prices_df = PerformanceService.merge_price_data(
                 cached_df, prices_df, stock_tickers
             )
-            print(f"DEBUG: Merged {len(cached_df)} cached prices")
+            logger.debug(f"Merged {len(cached_df)} cached prices")
 
         prices_df = prices_df.ffill()  # 欠損値を埋める
 
-        print(f"DEBUG: Prices DataFrame Shape: {prices_df.shape}")
+        logger.debug(f"Prices DataFrame Shape: {prices_df.shape}")
 
         # 4. 日ごとの保有状況の推移を計算
         tx_by_date = defaultdict(list)
@@ -291,10 +275,22 @@ class PerformanceService:
             tx_by_date[tx.transaction_date].append(tx)
 
         div_by_date = defaultdict(list)
-        dividends = Dividend.query.all()
-        for div in dividends:
+        dividends = AnalyticsLoader.dividends().fillna(
+            {"dividend_amount": 0.0, "quantity_held": 0.0}
+        )
+        for div in AnalyticsLoader.records(dividends):
             div_by_date[div.ex_dividend_date].append(div)
 
+        # 日ごとの確定損益の合計
+        realized = AnalyticsLoader.realized_pnl(
+            start_date=start_date, end_date=end_date
+        )
+        realized_by_date = (
+            realized.groupby(realized["sell_date"].dt.date)["realized_pnl"]
+            .sum()
+            .to_dict()
+        )
+
         full_history_holdings = defaultdict(lambda: defaultdict(Decimal))
         temp_qty = defaultdict(Decimal)
 
@@ -382,12 +378,7 @@ class PerformanceService:
                 portfolio_value += float(curr_price) * float(qty) * float(rate)
 
             # B. 売却損益
-            daily_realized = (
-                db.session.query(db.func.sum(RealizedPnl.realized_pnl))
-                .filter(RealizedPnl.sell_date == d)
-                .scalar()
-            )
-            realized_pnl = float(daily_realized or 0)
+            realized_pnl = float(realized_by_date.get(d, 0))
 
             # C. 受取配当
             for div in div_by_date[d]:
@@ -428,13 +419,14 @@ class PerformanceService:
         """
         from datetime import datetime
 
+        import pandas as pd
         import yfinance as yf
 
         end_date = date.today()
         start_date = end_date - timedelta(days=400)  # 余裕を持って取得
 
         # 全取引を取得
-        transactions = Transaction.query.order_by(Transaction.transaction_date).all()
+        transactions = AnalyticsLoader.records(AnalyticsLoader.transactions())
         if not transactions:
             return []
 
@@ -505,11 +497,14 @@ class PerformanceService:
 
         # 実現損益と配当をマップ化
         realized_by_date = defaultdict(list)
-        for r in RealizedPnl.query.all():
+        for r in AnalyticsLoader.records(AnalyticsLoader.realized_pnl()):
             realized_by_date[r.sell_date].append(r)
 
         dividends_by_date = defaultdict(list)
-        for div in Dividend.query.all():
+        dividends = AnalyticsLoader.dividends().fillna(
+            {"dividend_amount": 0.0, "quantity_held": 0.0}
+        )
+        for div in AnalyticsLoader.records(dividends):
             dividends_by_date[div.ex_dividend_date].append(div)
 
         # 過去13ヶ月分の月を生成
@@ -727,6 +722,9 @@ class PerformanceService:
         """
         from datetime import datetime
 
+        import pandas as pd
+        import yfinance as yf
+
         # 月次データの場合(YYYY-MM形式)の処理
         if len(target_date_str) == 7 and target_date_str.count("-") == 1:
             # 月次データの場合は、その月の最終日を使用
@@ -1219,17 +1217,20 @@ class PerformanceService:
                 }
             }
         """
+        import pandas as pd
+        import yfinance as yf
+
         from app.services.benchmark_fetcher import BenchmarkFetcher
 
-        print(
-            f"DEBUG: get_performance_history_with_benchmark called with days={days}, benchmarks={benchmark_keys}"
+        logger.debug(
+            f"get_performance_history_with_benchmark called with days={days}, benchmarks={benchmark_keys}"
         )
 
         # 1. 既存のポートフォリオ損益データを取得
         portfolio_data = PerformanceService.get_performance_history(days=days)
 
         if not portfolio_data:
-            print("DEBUG: No portfolio data available")
+            logger.debug("No portfolio data available")
             return {"portfolio": [], "benchmarks": {}}
 
         # 2. 各日のポートフォリオ評価額を計算
@@ -1239,11 +1240,9 @@ class PerformanceService:
             start_date = end_date - timedelta(days=days)
 
             # 取引履歴を取得して保有状況を再計算
-            transactions = Transaction.query.order_by(
-                Transaction.transaction_date
-            ).all()
+            transactions = AnalyticsLoader.records(AnalyticsLoader.transactions())
             if not transactions:
-                print("DEBUG: No transactions found")
+                logger.debug("No transactions found")
                 return {"portfolio": portfolio_data, "benchmarks": {}}
 
             # 全銘柄を取得
@@ -1292,10 +1291,10 @@ class PerformanceService:
                                     )
                                 )
                 except Exception as e:
-                    print(f"ERROR: Batch {batch} failed: {e}")
+                    logger.error(f"Batch {batch} failed: {e}")
 
             if not all_data_frames:
-                print("DEBUG: No price data obtained")
+                logger.debug("No price data obtained")
                 return {"portfolio": portfolio_data, "benchmarks": {}}
 
             prices_df = pd.concat(all_data_frames, axis=1)
@@ -1376,16 +1375,13 @@ class PerformanceService:
                     item["portfolio_value"] = round(portfolio_value, 2)
 
                 except Exception as e:
-                    print(
-                        f"ERROR: Failed to calculate portfolio value for {date_obj}: {e}"
+                    logger.error(
+                        f"Failed to calculate portfolio value for {date_obj}: {e}"
                     )
                     item["portfolio_value"] = 0.0
 
         except Exception as e:
-            print(f"ERROR: Failed to calculate portfolio values: {e}")
-            import traceback
-
-            traceback.print_exc()
+            logger.error(f"Failed to calculate portfolio values: {e}", exc_info=True)
             # ポートフォリオ評価額なしで続行
             for item in portfolio_data:
                 item["portfolio_value"] = 0.0
@@ -1473,7 +1469,7 @@ class PerformanceService:
 
                 benchmarks_result[benchmark_key] = benchmark_result
 
-        print(f"DEBUG: Benchmark data prepared: {list(benchmarks_result.keys())}")
+        logger.debug(f"Benchmark data prepared: {list(benchmarks_result.keys())}")
 
         return {"portfolio": portfolio_data, "benchmarks": benchmarks_result}
 
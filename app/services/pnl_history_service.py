@@ -0,0 +1,210 @@
+"""損益推移サービス
+
+確定損益の累積推移を1回のGROUP BYクエリとプレフィックス和で構築し、
+保存済みのポートフォリオスナップショットから未実現損益を合成する
+"""
+
+import calendar
+from datetime import date, timedelta
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Holding, PortfolioSnapshot, RealizedPnl, Transaction
+from app.utils.data_version import cached_by_data_version
+from app.utils.logger import get_logger
+
+logger = get_logger("pnl_history_service")
+
+
+class PnlHistoryService:
+    """損益推移クラス
+
+    - 確定損益: 売却日単位の合計を1クエリで取得し、累積和で推移を作成
+    - 未実現損益: portfolio_snapshots の直近値を前方補完
+    - 粒度: daily / weekly（日曜締め） / monthly（月末締め）
+    """
+
+    GRANULARITIES = ("daily", "weekly", "monthly")
+    PERIODS = {"30d": 30, "1y": 365}
+
+    @staticmethod
+    def resolve_start_date(period, end_date):
+        """期間指定から開始日を決定
+
+        Args:
+            period: '30d' / '1y' / 'all'
+            end_date: 終了日
+
+        Returns:
+            date: 開始日（取引がない場合はNone）
+        """
+        days = PnlHistoryService.PERIODS.get(period)
+        if days is not None:
+            return end_date - timedelta(days=days)
+
+        return db.session.query(func.min(Transaction.transaction_date)).scalar()
+
+    @staticmethod
+    def get_pnl_history(period="30d", granularity="daily", end_date=None):
+        """損益推移を取得（キャッシュ付き）
+
+        Args:
+            period: '30d' / '1y' / 'all'
+            granularity: 'daily' / 'weekly' / 'monthly'
+            end_date: 終了日（デフォルト: 今日）
+
+        Returns:
+            list: [{'date', 'realized_pnl', 'unrealized_pnl', 'pnl'}, ...]
+        """
+        if end_date is None:
+            end_date = date.today()
+
+        def build():
+            start_date = PnlHistoryService.resolve_start_date(period, end_date)
+            if start_date is None:
+                return []
+            return PnlHistoryService.build_cumulative_series(
+                start_date, end_date, granularity
+            )
+
+        return cached_by_data_version(
+            f"pnl_history:{period}:{granularity}:{end_date.isoformat()}",
+            ["transactions", "realized_pnl", "portfolio_snapshots"],
+            build,
+        )
+
+    @staticmethod
+    def _period_end(d, granularity):
+        """日付が属する集計期間の最終日"""
+        if granularity == "weekly":
+            return d + timedelta(days=6 - d.weekday())
+        if granularity == "monthly":
+            return d.replace(day=calendar.monthrange(d.year, d.month)[1])
+        return d
+
+    @staticmethod
+    def build_cumulative_series(start_date, end_date, granularity="daily"):
+        """累積損益の系列を構築
+
+        Args:
+            start_date: 開始日（この日以降の確定損益を累積）
+            end_date: 終了日
+            granularity: 'daily' / 'weekly' / 'monthly'
+
+        Returns:
+            list: 各期間末時点の累積確定損益・未実現損益
+        """
+        if granularity not in PnlHistoryService.GRANULARITIES:
+            raise ValueError(f"無効な粒度: {granularity}")
+        if start_date > end_date:
+            return []
+
+        daily_realized = (
+            db.session.query(RealizedPnl.sell_date, func.sum(RealizedPnl.realized_pnl))
+            .filter(
+                RealizedPnl.sell_date >= start_date, RealizedPnl.sell_date <= end_date
+            )
+            .group_by(RealizedPnl.sell_date)
+            .order_by(RealizedPnl.sell_date)
+            .all()
+        )
+
+        # 開始日以前の直近スナップショットも含めて前方補完の起点にする
+        first_snapshot_date = (
+            db.session.query(func.max(PortfolioSnapshot.snapshot_date))
+            .filter(PortfolioSnapshot.snapshot_date <= start_date)
+            .scalar()
+        ) or start_date
+        snapshots = (
+            db.session.query(
+                PortfolioSnapshot.snapshot_date, PortfolioSnapshot.unrealized_pnl
+            )
+            .filter(
+                PortfolioSnapshot.snapshot_date >= first_snapshot_date,
+                PortfolioSnapshot.snapshot_date <= end_date,
+            )
+            .order_by(PortfolioSnapshot.snapshot_date)
+            .all()
+        )
+
+        series = []
+        cumulative_realized = 0.0
+        unrealized = 0.0
+        realized_idx = 0
+        snapshot_idx = 0
+
+        current = start_date
+        while current <= end_date:
+            while (
+                realized_idx < len(daily_realized)
+                and daily_realized[realized_idx][0] <= current
+            ):
+                cumulative_realized += float(daily_realized[realized_idx][1] or 0)
+                realized_idx += 1
+
+            while (
+                snapshot_idx < len(snapshots) and snapshots[snapshot_idx][0] <= current
+            ):
+                unrealized = float(snapshots[snapshot_idx][1] or 0)
+                snapshot_idx += 1
+
+            period_end = min(
+                PnlHistoryService._period_end(current, granularity), end_date
+            )
+            if current == period_end:
+                series.append(
+                    {
+                        "date": current.isoformat(),
+                        "realized_pnl": round(cumulative_realized, 2),
+                        "unrealized_pnl": round(unrealized, 2),
+                        "pnl": round(cumulative_realized + unrealized, 2),
+                    }
+                )
+
+            current += timedelta(days=1)
+
+        return series
+
+    @staticmethod
+    def record_snapshot(snapshot_date=None):
+        """現在の保有銘柄からポートフォリオスナップショットを保存（同日分は上書き）
+
+        Args:
+            snapshot_date: スナップショット日（デフォルト: 今日）
+
+        Returns:
+            PortfolioSnapshot: 保存したスナップショット
+        """
+        if snapshot_date is None:
+            snapshot_date = date.today()
+
+        count, total_cost, market_value, unrealized_pnl = (
+            db.session.query(
+                func.count(Holding.id),
+                func.sum(Holding.total_cost),
+                func.sum(func.coalesce(Holding.current_value, Holding.total_cost)),
+                func.sum(func.coalesce(Holding.unrealized_pnl, 0)),
+            )
+            .filter(Holding.total_quantity > 0)
+            .one()
+        )
+
+        snapshot = PortfolioSnapshot.query.filter_by(
+            snapshot_date=snapshot_date
+        ).first()
+        if snapshot is None:
+            snapshot = PortfolioSnapshot(snapshot_date=snapshot_date)
+            db.session.add(snapshot)
+
+        snapshot.holdings_count = count or 0
+        snapshot.total_cost = total_cost or 0
+        snapshot.market_value = market_value or 0
+        snapshot.unrealized_pnl = unrealized_pnl or 0
+
+        db.session.commit()
+        logger.info(
+            f"ポートフォリオスナップショット保存: {snapshot_date} "
+            f"評価額={float(snapshot.market_value):,.0f}"
+        )
+        return snapshot
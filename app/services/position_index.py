@@ -0,0 +1,109 @@
+"""保有数量タイムライン索引
+
+銘柄ごとに (取引日, 累積保有数量) のソート済み配列を1回のクエリで構築し、
+任意の日付の保有数量を二分探索で求める。
+索引は transactions のデータバージョンに紐づけてキャッシュし、
+取引の追加・更新・削除があれば次回参照時に再構築する。
+"""
+
+from bisect import bisect_right
+from itertools import groupby
+
+from app import db
+from app.models.transaction import Transaction
+from app.services.ledger_engine import LedgerEngine
+from app.utils.data_version import cached_by_data_version
+from app.utils.logger import get_logger
+
+logger = get_logger("position_index")
+
+
+class PositionIndex:
+    """保有数量タイムライン索引クラス
+
+    - 日付は取引日単位（同日の取引はまとめて日末の数量を保持）
+    - 数量は int64 固定小数点で累積するため、売買を繰り返しても誤差が出ない
+    - 買付を加算・売却を減算した純数量（売却可否の判定は行わない）
+    """
+
+    CACHE_KEY = "position_index"
+
+    def __init__(self, timelines):
+        # {銘柄: ([取引日, ...], [日末の累積数量（固定小数点）, ...])}
+        self._timelines = timelines
+
+    @classmethod
+    def load(cls):
+        """キャッシュ済みの索引を取得（取引に変更があれば再構築）"""
+        return cached_by_data_version(cls.CACHE_KEY, ["transactions"], cls.build)
+
+    @classmethod
+    def build(cls):
+        """全取引から索引を構築"""
+        rows = (
+            db.session.query(
+                Transaction.ticker_symbol,
+                Transaction.transaction_date,
+                Transaction.transaction_type,
+                Transaction.quantity,
+            )
+            .order_by(
+                Transaction.ticker_symbol,
+                Transaction.transaction_date,
+                Transaction.id,
+            )
+            .all()
+        )
+
+        timelines = {}
+        for ticker, group in groupby(rows, key=lambda row: row[0]):
+            dates = []
+            quantities = []
+            position = 0
+            for _, transaction_date, transaction_type, quantity in group:
+                if transaction_type == "BUY":
+                    position += LedgerEngine.to_fixed(quantity)
+                elif transaction_type == "SELL":
+                    position -= LedgerEngine.to_fixed(quantity)
+
+                if dates and dates[-1] == transaction_date:
+                    quantities[-1] = position
+                else:
+                    dates.append(transaction_date)
+                    quantities.append(position)
+
+            timelines[ticker] = (dates, quantities)
+
+        logger.info(f"保有数量索引を構築: {len(timelines)}銘柄 / {len(rows)}取引")
+        return cls(timelines)
+
+    def tickers(self):
+        """索引に含まれる銘柄"""
+        return list(self._timelines)
+
+    def quantity_at(self, ticker_symbol, dates):
+        """
+        指定日時点（当日の取引を含む）の保有数量を一括取得
+
+        Args:
+            ticker_symbol: 銘柄
+            dates: 日付のリスト（順不同）
+
+        Returns:
+            list: 各日付の保有数量（float）
+        """
+        timeline = self._timelines.get(ticker_symbol)
+        if timeline is None:
+            return [0.0 for _ in dates]
+
+        timeline_dates, quantities = timeline
+        scale = LedgerEngine.QUANTITY_SCALE
+        results = []
+        for target_date in dates:
+            position = bisect_right(timeline_dates, target_date)
+            results.append(quantities[position - 1] / scale if position else 0.0)
+        return results
+
+    def quantity_on(self, ticker_symbol, target_date):
+        """指定日時点の保有数量"""
+        return self.quantity_at(ticker_symbol, [target_date])[0]
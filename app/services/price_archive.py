@@ -0,0 +1,367 @@
+"""列指向の株価アーカイブ
+
+stock_prices（1行1終値）を年ごとの「日付 × 銘柄」の終値行列ファイルに書き出し、
+リターン計算・パフォーマンス集計の終値行列をメモリマップで読み込む。
+ファイルはOSのページキャッシュ上で共有されるため、複数ワーカーで同じ期間を
+読んでも物理メモリは1つで、ORMオブジェクトの生成やピボットも発生しない。
+
+- 形式: pyarrowがあれば Arrow IPC（非圧縮）、なければ NumPy の .npy（列優先）
+- 更新: 年ごとの件数・最大ID・終値合計を比較し、変化した年のファイルだけ書き直す
+- 鮮度: stock_prices のデータバージョンが書き出し時と異なれば使用しない
+  （呼び出し側はDBから読み込む）
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from flask import current_app, has_app_context
+from sqlalchemy import extract, func, select
+
+from app.models.stock_price import StockPrice
+from app.utils.data_version import get_data_version
+from app.utils.database import readonly_connection
+from app.utils.logger import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+    pa_ipc = None
+
+logger = get_logger("price_archive")
+
+MANIFEST_NAME = "manifest.json"
+
+# {パス: ((mtime_ns, size), 読み込んだ年データ)}（プロセス内でマップを再利用）
+_mapped = {}
+_mapped_lock = threading.Lock()
+
+
+class PriceArchive:
+    """年別の終値行列ファイルによる株価アーカイブクラス"""
+
+    DEFAULTS = {
+        "PRICE_ARCHIVE_ENABLED": False,
+        "PRICE_ARCHIVE_DIR": Path("data") / "price_archive",
+        # 'auto': pyarrowがあれば 'arrow'、なければ 'npy'
+        "PRICE_ARCHIVE_FORMAT": "auto",
+    }
+
+    @staticmethod
+    def _config(name):
+        config = current_app.config if has_app_context() else {}
+        return config.get(name, PriceArchive.DEFAULTS[name])
+
+    @staticmethod
+    def is_enabled():
+        """アーカイブを使用する設定かどうか"""
+        return bool(PriceArchive._config("PRICE_ARCHIVE_ENABLED"))
+
+    @staticmethod
+    def directory():
+        """アーカイブの保存先ディレクトリ"""
+        return Path(PriceArchive._config("PRICE_ARCHIVE_DIR"))
+
+    @staticmethod
+    def file_format():
+        """書き出すファイル形式（'arrow' または 'npy'）"""
+        file_format = PriceArchive._config("PRICE_ARCHIVE_FORMAT")
+        if file_format == "auto":
+            return "arrow" if pa is not None else "npy"
+        if file_format == "arrow" and pa is None:
+            raise RuntimeError("Arrow形式にはpyarrowのインストールが必要です")
+        return file_format
+
+    @staticmethod
+    def sync(full=False):
+        """
+        stock_prices の変更をアーカイブに反映（変化した年のファイルだけ書き直す）
+
+        Args:
+            full: Trueなら全ての年を書き直す
+
+        Returns:
+            dict: {'updated_years': list, 'unchanged_years': int,
+                   'removed_years': list, 'version': int, 'seconds': float}
+        """
+        started = time.perf_counter()
+        directory = PriceArchive.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        file_format = PriceArchive.file_format()
+
+        # 読み込み前のバージョンを記録（同期中の書き込みは次回の同期で反映）
+        ((version, _),) = get_data_version(StockPrice.__tablename__)
+        signatures = PriceArchive._year_signatures()
+
+        manifest = PriceArchive._read_manifest(directory)
+        if full or manifest is None or manifest.get("format") != file_format:
+            manifest = {"format": file_format, "version": None, "years": {}}
+
+        years = manifest["years"]
+        updated = []
+        for year, signature in sorted(signatures.items()):
+            entry = years.get(str(year))
+            if entry is not None and entry["signature"] == signature:
+                continue
+            years[str(year)] = PriceArchive._write_year(
+                directory, file_format, year, signature
+            )
+            updated.append(year)
+
+        removed = sorted(int(year) for year in years if int(year) not in signatures)
+        for year in removed:
+            for name in years.pop(str(year))["files"]:
+                (directory / name).unlink(missing_ok=True)
+
+        manifest["version"] = version
+        PriceArchive._write_manifest(directory, manifest)
+
+        seconds = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"株価アーカイブ同期: 更新={updated} 削除={removed} "
+            f"version={version} {seconds}秒"
+        )
+        return {
+            "updated_years": updated,
+            "unchanged_years": len(signatures) - len(updated),
+            "removed_years": removed,
+            "version": version,
+            "seconds": seconds,
+        }
+
+    @staticmethod
+    def is_fresh():
+        """アーカイブが stock_prices の最新の状態を反映しているか"""
+        manifest = PriceArchive._read_manifest(PriceArchive.directory())
+        if manifest is None:
+            return False
+        ((version, _),) = get_data_version(StockPrice.__tablename__)
+        return manifest["version"] == version
+
+    @staticmethod
+    def load_matrix(ticker_symbols, start_date, end_date):
+        """
+        アーカイブから終値行列を読み込み
+
+        Args:
+            ticker_symbols: 銘柄のリスト
+            start_date: 開始日
+            end_date: 終了日
+
+        Returns:
+            DataFrame or None: index=日付(DatetimeIndex), columns=銘柄, 値=終値(float)
+                （いずれかの銘柄に終値がある日のみ）。
+                アーカイブがない・古い場合は None
+        """
+        import numpy as np
+        import pandas as pd
+
+        directory = PriceArchive.directory()
+        manifest = PriceArchive._read_manifest(directory)
+        if manifest is None:
+            return None
+        ((version, _),) = get_data_version(StockPrice.__tablename__)
+        if manifest["version"] != version:
+            logger.debug(
+                f"株価アーカイブが古いため未使用: {manifest['version']} != {version}"
+            )
+            return None
+
+        start = np.datetime64(start_date, "D")
+        end = np.datetime64(end_date, "D")
+        segments = []
+        for year in range(start_date.year, end_date.year + 1):
+            entry = manifest["years"].get(str(year))
+            if entry is None:
+                continue
+            dates, column_index, fill = PriceArchive._open_year(
+                directory, manifest["format"], entry
+            )
+            lo = np.searchsorted(dates, start, side="left")
+            hi = np.searchsorted(dates, end, side="right")
+            if lo < hi:
+                segments.append((dates[lo:hi], column_index, fill, lo, hi))
+
+        rows = sum(len(segment[0]) for segment in segments)
+        if rows == 0:
+            return pd.DataFrame(columns=ticker_symbols, dtype=float)
+
+        # 列優先の出力にファイルから直接コピー（銘柄ごとの系列が連続）
+        values = np.empty((rows, len(ticker_symbols)), order="F")
+        offset = 0
+        for dates, column_index, fill, lo, hi in segments:
+            block = values[offset : offset + len(dates)]
+            targets, columns = [], []
+            for i, ticker in enumerate(ticker_symbols):
+                if ticker in column_index:
+                    targets.append(i)
+                    columns.append(column_index[ticker])
+                else:
+                    block[:, i] = np.nan
+            if targets:
+                fill(block, targets, columns, lo, hi)
+            offset += len(dates)
+
+        dates = np.concatenate([segment[0] for segment in segments])
+        present = ~np.isnan(values).all(axis=1)
+        if not present.all():
+            dates, values = dates[present], values[present]
+        return pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(dates, name="date"),
+            columns=pd.Index(ticker_symbols, name="ticker"),
+            copy=False,
+        )
+
+    # ------------------------------------------------------------------
+    # 書き出し
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _year_signatures():
+        """年ごとの (件数, 最大ID, 終値合計)（変化した年の検出用）"""
+        year = extract("year", StockPrice.price_date)
+        with readonly_connection() as connection:
+            rows = connection.execute(
+                select(
+                    year,
+                    func.count(),
+                    func.max(StockPrice.id),
+                    func.sum(StockPrice.close_price),
+                ).group_by(year)
+            ).all()
+        return {
+            int(row[0]): [row[1], row[2], round(float(row[3] or 0), 4)] for row in rows
+        }
+
+    @staticmethod
+    def _write_year(directory, file_format, year, signature):
+        """1年分の終値行列を書き出し（一時ファイルから置き換え）"""
+        import numpy as np
+        import pandas as pd
+
+        with readonly_connection() as connection:
+            rows = connection.execute(
+                select(
+                    StockPrice.price_date,
+                    StockPrice.ticker_symbol,
+                    StockPrice.close_price,
+                ).where(
+                    StockPrice.price_date >= date(year, 1, 1),
+                    StockPrice.price_date <= date(year, 12, 31),
+                )
+            ).all()
+
+        frame = pd.DataFrame(rows, columns=["date", "ticker", "close"])
+        frame["close"] = frame["close"].astype(float)
+        matrix = frame.pivot(index="date", columns="ticker", values="close")
+        matrix = matrix.sort_index().sort_index(axis=1)
+        dates = np.array(matrix.index, dtype="datetime64[D]")
+        tickers = [str(ticker) for ticker in matrix.columns]
+        # 銘柄ごとの系列が連続するよう列優先で保持
+        values = np.asfortranarray(matrix.to_numpy(dtype=np.float64))
+
+        if file_format == "arrow":
+            files = [f"{year}.arrow"]
+            table = pa.table(
+                [pa.array(dates)]
+                + [pa.array(values[:, i]) for i in range(len(tickers))],
+                names=["date"] + tickers,
+            )
+            PriceArchive._replace(
+                directory / files[0],
+                lambda f: PriceArchive._write_arrow(f, table),
+            )
+        else:
+            files = [f"{year}.dates.npy", f"{year}.close.npy"]
+            PriceArchive._replace(directory / files[0], lambda f: np.save(f, dates))
+            PriceArchive._replace(directory / files[1], lambda f: np.save(f, values))
+
+        return {
+            "signature": signature,
+            "files": files,
+            "tickers": tickers,
+            "rows": len(dates),
+        }
+
+    @staticmethod
+    def _write_arrow(f, table):
+        with pa_ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+
+    @staticmethod
+    def _replace(path, write):
+        """一時ファイルに書き出してから置き換え（読み込み中のマップは旧ファイルを参照）"""
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as f:
+            write(f)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def _read_manifest(directory):
+        path = Path(directory) / MANIFEST_NAME
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"株価アーカイブのマニフェストを読み込めません: {str(e)}")
+            return None
+
+    @staticmethod
+    def _write_manifest(directory, manifest):
+        PriceArchive._replace(
+            Path(directory) / MANIFEST_NAME,
+            lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode("utf-8")),
+        )
+
+    # ------------------------------------------------------------------
+    # 読み込み（メモリマップ）
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _open_year(directory, file_format, entry):
+        """
+        1年分のファイルをメモリマップで開く（ファイルが変わるまで再利用）
+
+        Returns:
+            tuple: (日付の配列, {銘柄: 列番号},
+                   fill(出力先, 出力先の列, ファイルの列, 開始行, 終了行))
+        """
+        import numpy as np
+
+        path = Path(directory) / entry["files"][-1]
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with _mapped_lock:
+            cached = _mapped.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        column_index = {ticker: i for i, ticker in enumerate(entry["tickers"])}
+        if file_format == "arrow":
+            table = pa_ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+            dates = table.column(0).to_numpy().astype("datetime64[D]")
+            series = [table.column(i + 1).to_numpy() for i in column_index.values()]
+
+            def fill(block, targets, columns, lo, hi):
+                for target, column in zip(targets, columns):
+                    block[:, target] = series[column][lo:hi]
+
+        else:
+            dates = np.load(Path(directory) / entry["files"][0], mmap_mode="r")
+            matrix = np.load(path, mmap_mode="r")
+
+            def fill(block, targets, columns, lo, hi):
+                block[:, targets] = matrix[lo:hi, columns]
+
+        opened = (dates, column_index, fill)
+        with _mapped_lock:
+            _mapped[path] = (key, opened)
+        return opened
@@ -0,0 +1,358 @@
+"""依存関係グラフ（DAG）に基づくデータ更新パイプライン
+
+各ステージは依存するステージを宣言し、依存が完了したステージから
+スレッドプールで並行実行する（為替 → 評価額、評価額 → スナップショット・評価指標。
+配当・ベンチマークは独立）。全体の所要時間は最長の依存チェーンで決まる。
+
+ステージの状態・所要時間・出力は refresh_stage_runs に記録し、
+resume=True で直近の未完了の実行を完了済みステージから再開する。
+"""
+
+import json
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+
+from app import db
+from app.models import Holding, RefreshStageRun
+from app.utils.logger import get_logger
+
+logger = get_logger("refresh_pipeline")
+
+
+class RefreshPipeline:
+    """データ更新パイプラインクラス"""
+
+    # {ステージ: 依存するステージ}（依存先が先に並ぶ順序で定義）
+    STAGES = {
+        "quotes": (),
+        "fx": (),
+        "valuation": ("quotes", "fx"),
+        "snapshot": ("valuation",),
+        # 評価指標の繰り越しは評価額の更新後の現在値（Holding.current_price）を使う
+        "metrics": ("valuation",),
+        "dividends": (),
+        "benchmarks": (),
+        # 株価（現在値・リターン計算用の終値）の保存後に書き出す
+        "price_archive": ("quotes", "metrics"),
+    }
+
+    DEFAULTS = {
+        "REFRESH_PIPELINE_WORKERS": 4,
+        # 中断した実行を再開できる期間（古い株価・為替を引き継がないため）
+        "REFRESH_PIPELINE_RESUME_MINUTES": 60,
+    }
+
+    @staticmethod
+    def _config(name):
+        config = current_app.config if has_app_context() else {}
+        return config.get(name, RefreshPipeline.DEFAULTS[name])
+
+    @staticmethod
+    def resolve(stages=None):
+        """
+        指定ステージと、その依存ステージを実行順に列挙
+
+        Args:
+            stages: 対象ステージ（デフォルト: 全ステージ）
+
+        Returns:
+            list: ステージ名（依存先が先）
+        """
+        if stages is None:
+            return list(RefreshPipeline.STAGES)
+
+        unknown = set(stages) - set(RefreshPipeline.STAGES)
+        if unknown:
+            raise ValueError(f"未定義のステージです: {sorted(unknown)}")
+
+        required = set()
+        queue = list(stages)
+        while queue:
+            stage = queue.pop()
+            if stage not in required:
+                required.add(stage)
+                queue.extend(RefreshPipeline.STAGES[stage])
+        return [stage for stage in RefreshPipeline.STAGES if stage in required]
+
+    @staticmethod
+    def critical_path(seconds):
+        """
+        最長の依存チェーンの所要時間（並行実行時の理論上の下限）
+
+        Args:
+            seconds: {ステージ: 所要時間（秒）}
+
+        Returns:
+            float: 秒
+        """
+        finish = {}
+        for stage, dependencies in RefreshPipeline.STAGES.items():
+            if stage in seconds:
+                finish[stage] = seconds[stage] + max(
+                    (finish.get(dep, 0) for dep in dependencies), default=0
+                )
+        return max(finish.values(), default=0)
+
+    @staticmethod
+    def run(stages=None, resume=False, max_workers=None):
+        """
+        パイプラインを実行
+
+        Args:
+            stages: 対象ステージ（依存ステージも実行、デフォルト: 全ステージ）
+            resume: 直近の未完了の実行を完了済みステージから再開
+            max_workers: 並行実行数（デフォルト: 設定 REFRESH_PIPELINE_WORKERS）
+
+        Returns:
+            dict: {'run_id', 'stages': {ステージ: {'status', 'seconds', 'error'}},
+                   'outputs': {ステージ: 出力}, 'seconds', 'critical_path_seconds'}
+        """
+        plan = RefreshPipeline.resolve(stages)
+        max_workers = max_workers or RefreshPipeline._config("REFRESH_PIPELINE_WORKERS")
+
+        run_id, completed = None, {}
+        if resume:
+            run_id, completed = RefreshPipeline._resumable(plan)
+        run_id = run_id or uuid.uuid4().hex
+
+        outputs = {stage: row.load_output() for stage, row in completed.items()}
+        report = {
+            stage: {"status": "success", "seconds": 0.0, "resumed": True}
+            for stage in completed
+        }
+        if completed:
+            logger.info(f"更新パイプライン再開: {run_id} 完了済み={sorted(completed)}")
+
+        app = current_app._get_current_object()
+        started = time.perf_counter()
+        remaining = [stage for stage in plan if stage not in completed]
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while remaining or running:
+                for stage in list(remaining):
+                    dependencies = RefreshPipeline.STAGES[stage]
+                    blocked = [
+                        dep
+                        for dep in dependencies
+                        if report.get(dep, {}).get("status") in ("failed", "skipped")
+                    ]
+                    if blocked:
+                        remaining.remove(stage)
+                        report[stage] = {
+                            "status": "skipped",
+                            "seconds": 0.0,
+                            "error": f"依存ステージが未完了: {', '.join(blocked)}",
+                        }
+                        RefreshPipeline._checkpoint(
+                            run_id, stage, "skipped", error=report[stage]["error"]
+                        )
+                    elif all(dep in outputs for dep in dependencies):
+                        remaining.remove(stage)
+                        RefreshPipeline._checkpoint(run_id, stage, "running")
+                        inputs = {dep: outputs[dep] for dep in dependencies}
+                        future = executor.submit(
+                            RefreshPipeline._execute, app, stage, inputs
+                        )
+                        running[future] = stage
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    output, seconds, error = future.result()
+                    if error is None:
+                        outputs[stage] = output
+                        report[stage] = {"status": "success", "seconds": seconds}
+                        RefreshPipeline._checkpoint(
+                            run_id, stage, "success", seconds=seconds, output=output
+                        )
+                    else:
+                        report[stage] = {
+                            "status": "failed",
+                            "seconds": seconds,
+                            "error": error,
+                        }
+                        RefreshPipeline._checkpoint(
+                            run_id, stage, "failed", seconds=seconds, error=error
+                        )
+                    logger.info(
+                        f"更新ステージ完了: {stage} {report[stage]['status']} "
+                        f"{seconds:.2f}秒"
+                    )
+
+        elapsed = round(time.perf_counter() - started, 3)
+        critical = round(
+            RefreshPipeline.critical_path(
+                {stage: info["seconds"] for stage, info in report.items()}
+            ),
+            3,
+        )
+        logger.info(
+            f"更新パイプライン完了: {run_id} {elapsed}秒 "
+            f"(最長チェーン {critical}秒, 並行数 {max_workers})"
+        )
+        return {
+            "run_id": run_id,
+            "stages": {stage: report[stage] for stage in plan},
+            "outputs": outputs,
+            "seconds": elapsed,
+            "critical_path_seconds": critical,
+        }
+
+    @staticmethod
+    def _execute(app, stage, inputs):
+        """ワーカースレッドでステージを実行（スレッドごとのセッション）"""
+        with app.app_context():
+            handler = getattr(RefreshPipeline, f"_stage_{stage}")
+            started = time.perf_counter()
+            try:
+                output = handler(inputs)
+                error = None
+            except Exception as e:
+                db.session.rollback()
+                output, error = None, str(e)
+                logger.error(f"更新ステージ失敗: {stage}: {error}")
+            return output, round(time.perf_counter() - started, 3), error
+
+    @staticmethod
+    def _resumable(plan):
+        """
+        再開対象の実行（直近の実行が未完了かつ再開可能期間内の場合）
+
+        Returns:
+            tuple: (run_id または None, {ステージ: 完了済みの RefreshStageRun})
+        """
+        latest = RefreshStageRun.query.order_by(RefreshStageRun.id.desc()).first()
+        if latest is None:
+            return None, {}
+
+        rows = RefreshStageRun.query.filter_by(run_id=latest.run_id).all()
+        completed = {row.stage: row for row in rows if row.status == "success"}
+        if all(stage in completed for stage in plan):
+            return None, {}
+
+        window = timedelta(
+            minutes=RefreshPipeline._config("REFRESH_PIPELINE_RESUME_MINUTES")
+        )
+        first_started = min(row.started_at for row in rows if row.started_at)
+        if datetime.utcnow() - first_started > window:
+            logger.info(f"再開可能期間を過ぎたため新規実行: {latest.run_id}")
+            return None, {}
+
+        return latest.run_id, {
+            stage: row for stage, row in completed.items() if stage in plan
+        }
+
+    @staticmethod
+    def _checkpoint(run_id, stage, status, seconds=None, output=None, error=None):
+        """ステージの状態を記録（コーディネータのスレッドでのみ書き込む）"""
+        row = RefreshStageRun.query.filter_by(run_id=run_id, stage=stage).first()
+        now = datetime.utcnow()
+        if row is None:
+            row = RefreshStageRun(run_id=run_id, stage=stage, started_at=now)
+            db.session.add(row)
+        elif status == "running":
+            # 失敗したステージを再開時に再実行
+            row.started_at = now
+        row.status = status
+        row.error = error[:500] if error else None
+        if status != "running":
+            row.finished_at = now
+            row.duration_ms = int((seconds or 0) * 1000)
+            row.output = (
+                json.dumps(output, ensure_ascii=False, default=str)
+                if output is not None
+                else None
+            )
+        db.session.commit()
+
+    # ------------------------------------------------------------------
+    # ステージ（inputs は {依存ステージ: 出力}、出力はJSONで保存できる値）
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _stage_quotes(inputs):
+        """保有銘柄の現在値を一括取得"""
+        from app.services.stock_price_fetcher import StockPriceFetcher
+
+        tickers = [ticker for (ticker,) in db.session.query(Holding.ticker_symbol)]
+        if not tickers:
+            return {}
+        return StockPriceFetcher.get_multiple_prices(tickers, use_cache=False)
+
+    @staticmethod
+    def _stage_fx(inputs):
+        """保有銘柄の通貨の為替レートを取得（株価と並行して取得）"""
+        from app.services.stock_price_fetcher import StockPriceFetcher
+
+        currencies = [
+            currency for (currency,) in db.session.query(Holding.currency).distinct()
+        ]
+        return StockPriceFetcher.fetch_exchange_rates(currencies)
+
+    @staticmethod
+    def _stage_valuation(inputs):
+        """取得した株価・為替レートで評価額を更新"""
+        from app.services.stock_price_fetcher import StockPriceFetcher
+
+        holdings = Holding.query.all()
+        return StockPriceFetcher.apply_prices(holdings, inputs["quotes"], inputs["fx"])
+
+    @staticmethod
+    def _stage_snapshot(inputs):
+        """損益推移用のポートフォリオスナップショットを保存"""
+        from app.services.pnl_history_service import PnlHistoryService
+
+        if not db.session.query(Holding.id).first():
+            return {"snapshot_date": None}
+        snapshot = PnlHistoryService.record_snapshot()
+        return {
+            "snapshot_date": snapshot.snapshot_date.isoformat(),
+            "holdings_count": snapshot.holdings_count,
+        }
+
+    @staticmethod
+    def _stage_metrics(inputs):
+        """評価指標を更新（鮮度予算・API呼び出し上限は MetricsRefreshPlanner）"""
+        from app.services.stock_metrics_fetcher import StockMetricsFetcher
+
+        return StockMetricsFetcher.update_all_holdings_metrics()
+
+    @staticmethod
+    def _stage_dividends(inputs):
+        """全銘柄（過去の保有を含む）の配当を更新"""
+        from app.services.dividend_fetcher import DividendFetcher
+
+        results = DividendFetcher.update_all_holdings_dividends()
+        return {key: value for key, value in results.items() if key != "details"}
+
+    @staticmethod
+    def _stage_benchmarks(inputs):
+        """ベンチマークの最新値を取得"""
+        from app.services.benchmark_fetcher import BenchmarkFetcher
+
+        failed = [
+            key
+            for key in BenchmarkFetcher.BENCHMARKS
+            if not BenchmarkFetcher.get_benchmark_price(key, use_cache=False)
+        ]
+        return {
+            "success": len(BenchmarkFetcher.BENCHMARKS) - len(failed),
+            "failed": failed,
+        }
+
+    @staticmethod
+    def _stage_price_archive(inputs):
+        """株価アーカイブに保存済みの終値を反映（設定で有効な場合のみ）"""
+        from app.services.price_archive import PriceArchive
+
+        if not PriceArchive.is_enabled():
+            return {"enabled": False}
+        return PriceArchive.sync()
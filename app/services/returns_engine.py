@@ -0,0 +1,411 @@
+"""リターン計算エンジン
+
+株価キャッシュ（stock_prices）から全銘柄の終値行列を1回のクエリで読み込み、
+YTD・期間リターン・ボラティリティを銘柄横断でベクトル計算する。
+Yahoo Financeからは、キャッシュに不足している期間（主に直近の末尾）だけを
+まとめて取得して stock_prices に追記する。
+"""
+
+from datetime import date, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, insert, select
+
+from app import db
+from app.models.stock_price import StockPrice
+from app.models.sync_state import SyncState
+from app.services.analytics_loader import AnalyticsLoader
+from app.utils.logger import get_logger, log_external_api_call
+from app.utils.market_calendar import market_for_ticker
+
+logger = get_logger("returns_engine")
+
+
+class ReturnsEngine:
+    """終値行列によるリターン計算クラス"""
+
+    # 期間キー: (StockMetricsのカラム名, 遡る日数)
+    PERIODS = {
+        "3m": ("three_month_return", 91),
+        "6m": ("six_month_return", 182),
+        "1y": ("one_year_return", 365),
+        "3y": ("three_year_return", 1095),
+        "5y": ("five_year_return", 1826),
+    }
+    DEFAULT_PERIODS = ("ytd", "3m", "6m", "1y", "volatility")
+
+    # ボラティリティ: 直近1年の日次対数リターンの標準偏差を年率換算
+    VOLATILITY_DAYS = 365
+    VOLATILITY_MIN_OBSERVATIONS = 20
+    TRADING_DAYS_PER_YEAR = 252
+
+    # キャッシュの期間先頭がこの日数以上欠けていれば期間全体を取得し直す
+    HEAD_TOLERANCE_DAYS = 7
+    # 営業日数に対するキャッシュ件数の比率がこれを下回れば歯抜けとみなす
+    MIN_COVERAGE = 0.8
+    # yfinanceの推奨バッチサイズ
+    DOWNLOAD_BATCH_SIZE = 15
+
+    @staticmethod
+    def required_start(as_of, periods=None):
+        """指定期間の計算に必要な株価の開始日"""
+        periods = ReturnsEngine._periods(periods)
+        days = [
+            lookback
+            for key, (_, lookback) in ReturnsEngine.PERIODS.items()
+            if key in periods
+        ]
+        if "volatility" in periods:
+            days.append(ReturnsEngine.VOLATILITY_DAYS)
+
+        start = as_of - timedelta(days=max(days, default=0))
+        if "ytd" in periods:
+            start = min(start, date(as_of.year, 1, 1))
+        return start - timedelta(days=ReturnsEngine.HEAD_TOLERANCE_DAYS)
+
+    @staticmethod
+    def calculate(
+        ticker_symbols, periods=None, as_of=None, fetch=True, currencies=None
+    ):
+        """
+        複数銘柄のリターンを一括計算
+
+        Args:
+            ticker_symbols: 銘柄のリスト
+            periods: 計算する期間キー（'ytd', '3m', '6m', '1y', '3y', '5y',
+                     'volatility'。デフォルト: 設定 METRICS_RETURN_PERIODS）
+            as_of: 基準日（デフォルト: 今日）
+            fetch: Trueならキャッシュに不足している株価をYahoo Financeから取得
+            currencies: {銘柄: 通貨} 取得した株価の保存時に使用
+
+        Returns:
+            dict: {銘柄: {'ytd_return': float or None, ...}}
+        """
+        ticker_symbols = list(dict.fromkeys(ticker_symbols))
+        if not ticker_symbols:
+            return {}
+
+        periods = ReturnsEngine._periods(periods)
+        as_of = as_of or date.today()
+        start = ReturnsEngine.required_start(as_of, periods)
+
+        if fetch:
+            try:
+                ReturnsEngine.sync_prices(ticker_symbols, start, as_of, currencies)
+            except Exception as e:
+                # 取得に失敗してもキャッシュ済みの株価で計算を続行
+                db.session.rollback()
+                logger.warning(f"株価の差分取得に失敗: {str(e)}")
+
+        prices = ReturnsEngine.load_price_matrix(ticker_symbols, start, as_of)
+        return ReturnsEngine.compute(prices, ticker_symbols, periods, as_of)
+
+    @staticmethod
+    def load_price_matrix(ticker_symbols, start_date, end_date):
+        """
+        株価キャッシュから終値行列を読み込み（AnalyticsLoader.price_matrix）
+
+        Returns:
+            DataFrame: index=日付(DatetimeIndex), columns=銘柄, 値=終値(float)
+        """
+        return AnalyticsLoader.price_matrix(ticker_symbols, start_date, end_date)
+
+    @staticmethod
+    def compute(prices, ticker_symbols, periods, as_of):
+        """
+        終値行列からリターンを計算（全銘柄を列方向にベクトル計算）
+
+        Args:
+            prices: load_price_matrix の結果
+            ticker_symbols: 銘柄のリスト
+            periods: 期間キー
+            as_of: 基準日
+
+        Returns:
+            dict: {銘柄: {カラム名: float or None}}
+        """
+        import numpy as np
+        import pandas as pd
+
+        as_of_ts = pd.Timestamp(as_of)
+        prices = prices.loc[:as_of_ts].reindex(columns=ticker_symbols)
+        filled = prices.ffill()
+        results = {}
+
+        if filled.empty:
+            current = pd.Series(np.nan, index=ticker_symbols)
+        else:
+            current = filled.iloc[-1]
+
+        if "ytd" in periods:
+            # 年初以降の最初の終値を基準とする
+            year_to_date = prices.loc[pd.Timestamp(as_of.year, 1, 1) :]
+            base = (
+                year_to_date.bfill().iloc[0]
+                if not year_to_date.empty
+                else pd.Series(np.nan, index=ticker_symbols)
+            )
+            results["ytd_return"] = current / base - 1
+
+        for key, (column, days) in ReturnsEngine.PERIODS.items():
+            if key not in periods:
+                continue
+            # 基準日から遡った日以前の直近の終値を基準とする
+            history = filled.loc[: as_of_ts - pd.Timedelta(days=days)]
+            base = (
+                history.iloc[-1]
+                if not history.empty
+                else pd.Series(np.nan, index=ticker_symbols)
+            )
+            results[column] = current / base - 1
+
+        if "volatility" in periods:
+            window = prices.loc[
+                as_of_ts - pd.Timedelta(days=ReturnsEngine.VOLATILITY_DAYS) :
+            ]
+            # 取引所ごとの休場日で行が欠けるため、各銘柄の取引日だけで日次リターンを取る
+            log_prices = np.log(window)
+            daily = log_prices.ffill().diff().where(window.notna())
+            volatility = daily.std() * np.sqrt(ReturnsEngine.TRADING_DAYS_PER_YEAR)
+            volatility[daily.count() < ReturnsEngine.VOLATILITY_MIN_OBSERVATIONS] = (
+                np.nan
+            )
+            results["volatility"] = volatility
+
+        table = pd.DataFrame(results, index=ticker_symbols)
+        table = table.replace([np.inf, -np.inf], np.nan).astype(object)
+        table = table.where(table.notna(), None)
+        return table.to_dict(orient="index")
+
+    @staticmethod
+    def sync_prices(ticker_symbols, start_date, end_date, currencies=None):
+        """
+        計算期間の株価のうちキャッシュに不足している分だけを取得して保存
+
+        Returns:
+            int: 追加した株価の件数
+        """
+        import pandas as pd
+
+        plan = ReturnsEngine.plan_fetch(ticker_symbols, start_date, end_date)
+        if not plan:
+            return 0
+
+        # 取得開始日が同じ銘柄をまとめてダウンロード
+        groups = {}
+        for ticker, fetch_start in plan.items():
+            groups.setdefault(fetch_start, []).append(ticker)
+
+        frames = []
+        for fetch_start, tickers in sorted(groups.items()):
+            for i in range(0, len(tickers), ReturnsEngine.DOWNLOAD_BATCH_SIZE):
+                batch = tickers[i : i + ReturnsEngine.DOWNLOAD_BATCH_SIZE]
+                frame = ReturnsEngine._download(batch, fetch_start, end_date)
+                if frame is not None and not frame.empty:
+                    frames.append(frame)
+                    if fetch_start == start_date:
+                        ReturnsEngine._record_first_dates(frame, start_date)
+
+        if not frames:
+            return 0
+
+        return ReturnsEngine._store(pd.concat(frames), currencies or {})
+
+    @staticmethod
+    def plan_fetch(ticker_symbols, start_date, end_date):
+        """
+        銘柄ごとの取得開始日を決定
+
+        - キャッシュなし・期間先頭の欠落・歯抜けが多い: 期間全体
+          （期間の途中で上場した銘柄は、記録済みの最古の取引日を期間先頭とみなす）
+        - 直近の営業日まで揃っていない: 最終キャッシュ日の翌日以降（末尾のみ）
+        - 揃っている: 取得しない
+
+        Returns:
+            dict: {銘柄: 取得開始日}
+        """
+        import numpy as np
+
+        coverage = {
+            ticker: (first, last, count)
+            for ticker, first, last, count in db.session.execute(
+                select(
+                    StockPrice.ticker_symbol,
+                    func.min(StockPrice.price_date),
+                    func.max(StockPrice.price_date),
+                    func.count(),
+                )
+                .where(
+                    StockPrice.ticker_symbol.in_(ticker_symbols),
+                    StockPrice.price_date >= start_date,
+                    StockPrice.price_date <= end_date,
+                )
+                .group_by(StockPrice.ticker_symbol)
+            )
+        }
+
+        last_business_day = np.busday_offset(end_date, 0, roll="backward").astype(
+            object
+        )
+        head_tolerance = timedelta(days=2 * ReturnsEngine.HEAD_TOLERANCE_DAYS)
+        first_dates = ReturnsEngine._first_dates(ticker_symbols)
+
+        plan = {}
+        for ticker in ticker_symbols:
+            if ticker not in coverage:
+                plan[ticker] = start_date
+                continue
+
+            first, last, count = coverage[ticker]
+            head_limit = max(start_date, first_dates.get(ticker, start_date))
+            expected = np.busday_count(first, last + timedelta(days=1))
+            if (
+                first > head_limit + head_tolerance
+                or count < expected * ReturnsEngine.MIN_COVERAGE
+            ):
+                plan[ticker] = start_date
+            elif last < last_business_day:
+                plan[ticker] = last + timedelta(days=1)
+
+        if plan:
+            logger.info(
+                f"株価の差分取得対象: {len(plan)}/{len(ticker_symbols)}銘柄 "
+                f"(末尾のみ: {sum(1 for s in plan.values() if s != start_date)}銘柄)"
+            )
+        return plan
+
+    @staticmethod
+    def _first_dates(ticker_symbols):
+        """記録済みの最古の取引日 {銘柄: 日付}"""
+        return dict(
+            db.session.execute(
+                select(SyncState.key, SyncState.first_available_date).where(
+                    SyncState.job == "prices",
+                    SyncState.key.in_(ticker_symbols),
+                    SyncState.first_available_date.isnot(None),
+                )
+            ).all()
+        )
+
+    @staticmethod
+    def _record_first_dates(frame, start_date):
+        """
+        期間全体を取得して先頭が欠けていた銘柄の最古の取引日を記録
+
+        期間の途中で上場した銘柄を、次回以降に先頭の欠落として再取得しないようにする。
+        """
+        head_limit = start_date + timedelta(days=ReturnsEngine.HEAD_TOLERANCE_DAYS)
+        first_dates = {}
+        for ticker in frame.columns:
+            first = frame[ticker].first_valid_index()
+            if first is not None and first.date() > head_limit:
+                first_dates[ticker] = first.date()
+        if not first_dates:
+            return
+
+        states = {
+            state.key: state
+            for state in SyncState.query.filter(
+                SyncState.job == "prices", SyncState.key.in_(list(first_dates))
+            )
+        }
+        for ticker, first in first_dates.items():
+            state = states.get(ticker)
+            if state is None:
+                state = SyncState(
+                    job="prices", key=ticker, market=market_for_ticker(ticker)
+                )
+                db.session.add(state)
+            state.first_available_date = first
+        db.session.commit()
+        logger.info(f"最古の取引日を記録: {first_dates}")
+
+    @staticmethod
+    def _download(tickers, start_date, end_date):
+        """Yahoo Financeから複数銘柄の終値を一括取得（index=日付, columns=銘柄）"""
+        import pandas as pd
+        import yfinance as yf
+
+        from app.services.stock_price_fetcher import StockPriceFetcher
+
+        yf_tickers = [StockPriceFetcher._format_ticker(t) for t in tickers]
+        params = {
+            "start": str(start_date),
+            "end": str(end_date),
+            "tickers": len(tickers),
+        }
+        try:
+            data = yf.download(
+                yf_tickers,
+                start=start_date,
+                end=end_date + timedelta(days=1),
+                auto_adjust=True,
+                progress=False,
+            )
+        except Exception as e:
+            log_external_api_call(
+                logger, "yfinance", "download", params, success=False, error=str(e)
+            )
+            return None
+
+        log_external_api_call(logger, "yfinance", "download", params, success=True)
+        if data is None or data.empty:
+            return None
+
+        close = data["Close"]
+        if isinstance(close, pd.Series):
+            close = close.to_frame(yf_tickers[0])
+        return close.rename(columns=dict(zip(yf_tickers, tickers)))
+
+    @staticmethod
+    def _store(frame, currencies):
+        """取得した終値のうち未保存の分を一括保存"""
+        long_form = frame.stack().dropna()
+        if long_form.empty:
+            return 0
+
+        tickers = list(long_form.index.get_level_values(1).unique())
+        dates = long_form.index.get_level_values(0)
+        existing = set(
+            db.session.execute(
+                select(StockPrice.ticker_symbol, StockPrice.price_date).where(
+                    StockPrice.ticker_symbol.in_(tickers),
+                    StockPrice.price_date >= dates.min().date(),
+                    StockPrice.price_date <= dates.max().date(),
+                )
+            ).all()
+        )
+
+        rows = []
+        seen = set()
+        for (timestamp, ticker), close in long_form.items():
+            key = (ticker, timestamp.date())
+            if key in existing or key in seen:
+                continue
+            seen.add(key)
+            rows.append(
+                {
+                    "ticker_symbol": ticker,
+                    "price_date": key[1],
+                    "close_price": float(close),
+                    "currency": currencies.get(ticker),
+                }
+            )
+
+        if rows:
+            db.session.execute(insert(StockPrice), rows)
+            db.session.commit()
+            logger.info(f"株価キャッシュに追加: {len(rows)}件")
+        return len(rows)
+
+    @staticmethod
+    def _periods(periods):
+        """期間キーを正規化（未指定なら設定値）"""
+        if periods is None:
+            config = current_app.config if has_app_context() else {}
+            periods = config.get(
+                "METRICS_RETURN_PERIODS", ReturnsEngine.DEFAULT_PERIODS
+            )
+        if isinstance(periods, str):
+            periods = [p.strip() for p in periods.split(",") if p.strip()]
+        return tuple(periods)
@@ -4,12 +4,12 @@ Yahoo Financeから財務・株価指標を取得してデータベースに保
 """
 
 import time
-from datetime import date, datetime, timedelta
-
-import yfinance as yf
+from datetime import datetime
 
 from app import db
 from app.models import Holding, StockMetrics
+from app.services.metrics_refresh_planner import MetricsRefreshPlanner
+from app.services.returns_engine import ReturnsEngine
 from app.utils.logger import get_logger
 
 logger = get_logger("stock_metrics_fetcher")
@@ -23,30 +23,32 @@ class StockMetricsFetcher:
     - 企業価値指標 (EV/Revenue、EV/EBITDA)
     - 財務指標 (売上、利益率)
     - 株価レンジ (52週高値・安値)
-    - リターン指標 (YTD、1年)
+    - リターン指標 (YTD、1年ほか) ※株価キャッシュから ReturnsEngine で計算
     """
 
     @staticmethod
-    def get_stock_metrics(ticker_symbol, use_cache=True):
+    def get_stock_metrics(ticker_symbol, use_cache=True, returns=None):
         """単一銘柄の評価指標を取得
 
         Args:
             ticker_symbol (str): ティッカーシンボル
             use_cache (bool): キャッシュ使用フラグ（デフォルト: True）
+            returns (dict): ReturnsEngineで計算済みのリターン（省略時はこの銘柄のみ計算）
 
         Returns:
             dict: 評価指標データ、取得失敗時はNone
         """
+        import yfinance as yf
+
         try:
-            # キャッシュチェック（当日データがあればreturn）
+            # キャッシュチェック（鮮度予算内ならreturn）
             if use_cache:
                 cached = StockMetrics.query.filter_by(
                     ticker_symbol=ticker_symbol
                 ).first()
-                if cached and cached.last_updated:
-                    if cached.last_updated.date() == date.today():
-                        logger.info(f"キャッシュから評価指標取得: {ticker_symbol}")
-                        return cached.to_dict()
+                if cached and MetricsRefreshPlanner.staleness(cached) < 1:
+                    logger.info(f"キャッシュから評価指標取得: {ticker_symbol}")
+                    return cached.to_dict()
 
             logger.info(f"評価指標取得開始: {ticker_symbol}")
             stock = yf.Ticker(ticker_symbol)
@@ -61,6 +63,7 @@ class StockMetricsFetcher:
             currency = info.get("currency", "USD")
 
             # 評価指標の抽出
+            now = datetime.utcnow()
             metrics_data = {
                 "ticker_symbol": ticker_symbol,
                 "market_cap": info.get("marketCap"),
@@ -75,13 +78,18 @@ class StockMetricsFetcher:
                 "fifty_two_week_low": info.get("fiftyTwoWeekLow"),
                 "fifty_two_week_high": info.get("fiftyTwoWeekHigh"),
                 "currency": currency,
-                "last_updated": datetime.utcnow(),
+                "reference_price": info.get("currentPrice")
+                or info.get("regularMarketPrice"),
+                "last_updated": now,
+                "info_updated_at": now,
             }
 
-            # YTD・1年リターンの計算
-            returns = StockMetricsFetcher._calculate_returns(stock)
-            metrics_data["ytd_return"] = returns.get("ytd_return")
-            metrics_data["one_year_return"] = returns.get("one_year_return")
+            # リターン指標（株価キャッシュから計算、不足分のみ取得）
+            if returns is None:
+                returns = StockMetricsFetcher._calculate_returns([ticker_symbol]).get(
+                    ticker_symbol, {}
+                )
+            metrics_data.update(returns)
 
             # データベースに保存
             StockMetricsFetcher._save_metrics_to_db(ticker_symbol, metrics_data)
@@ -94,101 +102,132 @@ class StockMetricsFetcher:
             return None
 
     @staticmethod
-    def _calculate_returns(stock):
-        """YTD・1年リターンを計算
+    def _calculate_returns(ticker_symbols, currencies=None):
+        """複数銘柄のリターン指標を一括計算
 
         Args:
-            stock: yfinance Tickerオブジェクト
+            ticker_symbols (list): ティッカーシンボルのリスト
+            currencies (dict): {銘柄: 通貨} 取得した株価の保存時に使用
 
         Returns:
-            dict: {'ytd_return': float, 'one_year_return': float}
+            dict: {ticker: {'ytd_return': float, 'one_year_return': float, ...}}
         """
         try:
-            # 過去2年分の履歴データを取得（安全マージン）
-            hist = stock.history(period="2y")
-            if hist.empty:
-                logger.warning("履歴データが空のためリターン計算スキップ")
-                return {"ytd_return": None, "one_year_return": None}
-
-            current_price = hist["Close"].iloc[-1]
-
-            # YTD Return: 年初からのリターン
-            ytd_return = None
-            year_start = date(date.today().year, 1, 1)
-            # タイムスタンプをdateに変換
-            try:
-                year_start_data = hist[hist.index.date >= year_start]
-            except AttributeError:
-                # DatetimeIndexの場合
-                year_start_data = hist[[d.date() >= year_start for d in hist.index]]
-
-            if not year_start_data.empty:
-                year_start_price = year_start_data["Close"].iloc[0]
-                ytd_return = (current_price - year_start_price) / year_start_price
-
-            # 1-Year Return: 365日前からのリターン
-            one_year_return = None
-            one_year_ago = date.today() - timedelta(days=365)
-            try:
-                one_year_data = hist[hist.index.date <= one_year_ago]
-            except AttributeError:
-                one_year_data = hist[[d.date() <= one_year_ago for d in hist.index]]
-
-            if not one_year_data.empty:
-                one_year_price = one_year_data["Close"].iloc[-1]
-                one_year_return = (current_price - one_year_price) / one_year_price
-
-            return {"ytd_return": ytd_return, "one_year_return": one_year_return}
-
+            return ReturnsEngine.calculate(ticker_symbols, currencies=currencies)
         except Exception as e:
             logger.error(f"リターン計算エラー: {str(e)}")
             import traceback
 
             logger.error(traceback.format_exc())
-            return {"ytd_return": None, "one_year_return": None}
+            return {}
 
     @staticmethod
-    def get_multiple_metrics(ticker_symbols, use_cache=True):
+    def get_multiple_metrics(ticker_symbols, use_cache=True, budget=None):
         """複数銘柄の評価指標を取得
 
+        use_cache=True の場合は鮮度予算を過ぎた銘柄のみ、評価額・鮮度比の
+        優先度順にAPI呼び出し上限まで取得し、残りはキャッシュを返す。
+
         Args:
             ticker_symbols (list): ティッカーシンボルのリスト
             use_cache (bool): キャッシュ使用フラグ
+            budget (int): API呼び出し上限（デフォルト: 設定 METRICS_CALL_BUDGET）
 
         Returns:
             dict: {ticker: metrics_dict} 形式の辞書
         """
+        cached = {}
+        to_fetch = list(ticker_symbols)
+        if use_cache:
+            cached = {
+                m.ticker_symbol: m
+                for m in StockMetrics.query.filter(
+                    StockMetrics.ticker_symbol.in_(ticker_symbols)
+                )
+            }
+            values = {
+                h.ticker_symbol: float(h.current_value or h.total_cost or 0)
+                for h in Holding.query.filter(Holding.ticker_symbol.in_(ticker_symbols))
+            }
+            to_fetch = MetricsRefreshPlanner.plan(
+                ticker_symbols, cached, values, budget=budget
+            )["fetch"]
+
+        # 取得対象の銘柄のリターンをまとめて計算
+        returns = StockMetricsFetcher._calculate_returns(to_fetch) if to_fetch else {}
+
         results = {}
         for ticker in ticker_symbols:
-            metrics = StockMetricsFetcher.get_stock_metrics(ticker, use_cache=use_cache)
+            if ticker in to_fetch:
+                metrics = StockMetricsFetcher.get_stock_metrics(
+                    ticker, use_cache=False, returns=returns.get(ticker, {})
+                )
+                time.sleep(0.1)  # レート制限対策
+            else:
+                metrics = cached[ticker].to_dict() if ticker in cached else None
             if metrics:
                 results[ticker] = metrics
-            time.sleep(0.1)  # レート制限対策
 
         logger.info(
-            f"複数銘柄の評価指標取得完了: {len(results)}/{len(ticker_symbols)}件成功"
+            f"複数銘柄の評価指標取得完了: {len(results)}/{len(ticker_symbols)}件 "
+            f"(API取得: {len(to_fetch)}件)"
         )
         return results
 
     @staticmethod
-    def update_all_holdings_metrics():
+    def update_all_holdings_metrics(budget=None, ticker_symbols=None):
         """全保有銘柄の評価指標を更新
 
+        鮮度予算を過ぎた銘柄のみ、優先度順にAPI呼び出し上限まで `.info` を取得する。
+        それ以外の銘柄は株価連動の指標を最新株価でローカル更新し、
+        リターン指標は全銘柄を株価キャッシュから再計算する。
+
+        Args:
+            budget (int): API呼び出し上限（デフォルト: 設定 METRICS_CALL_BUDGET）
+            ticker_symbols (list): 対象銘柄（デフォルト: 全保有銘柄）
+
         Returns:
-            dict: {'success': int, 'failed': int, 'details': list}
+            dict: {'success': int, 'failed': int, 'local': int, 'deferred': int,
+                   'details': list}
         """
         logger.info("全保有銘柄の評価指標更新開始")
 
-        holdings = Holding.query.all()
+        query = Holding.query
+        if ticker_symbols is not None:
+            query = query.filter(Holding.ticker_symbol.in_(ticker_symbols))
+        holdings = query.all()
         ticker_symbols = [h.ticker_symbol for h in holdings]
+        metrics_by_ticker = {
+            m.ticker_symbol: m
+            for m in StockMetrics.query.filter(
+                StockMetrics.ticker_symbol.in_(ticker_symbols)
+            )
+        }
+
+        # リターン指標は全銘柄分を株価キャッシュから一括計算
+        returns = StockMetricsFetcher._calculate_returns(
+            ticker_symbols, currencies={h.ticker_symbol: h.currency for h in holdings}
+        )
+
+        plan = MetricsRefreshPlanner.plan(
+            ticker_symbols,
+            metrics_by_ticker,
+            {
+                h.ticker_symbol: float(h.current_value or h.total_cost or 0)
+                for h in holdings
+            },
+            budget=budget,
+        )
 
         success_count = 0
         failed_count = 0
         details = []
 
-        for ticker in ticker_symbols:
+        for ticker in plan["fetch"]:
             try:
-                metrics = StockMetricsFetcher.get_stock_metrics(ticker, use_cache=False)
+                metrics = StockMetricsFetcher.get_stock_metrics(
+                    ticker, use_cache=False, returns=returns.get(ticker, {})
+                )
                 if metrics:
                     success_count += 1
                     details.append({"ticker": ticker, "status": "success"})
@@ -205,11 +244,38 @@ class StockMetricsFetcher:
                 details.append({"ticker": ticker, "status": "failed", "reason": str(e)})
                 logger.error(f"評価指標更新エラー ({ticker}): {str(e)}")
 
+        # API取得しなかった銘柄はローカルで更新
+        fetched = set(plan["fetch"])
+        local_count = 0
+        for holding in holdings:
+            metrics = metrics_by_ticker.get(holding.ticker_symbol)
+            if holding.ticker_symbol in fetched or metrics is None:
+                continue
+            MetricsRefreshPlanner.roll_forward(metrics, holding.current_price)
+            for key, value in returns.get(holding.ticker_symbol, {}).items():
+                setattr(metrics, key, value)
+            local_count += 1
+            details.append({"ticker": holding.ticker_symbol, "status": "local"})
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"評価指標のローカル更新エラー: {str(e)}")
+            raise
+
         logger.info(
-            f"全保有銘柄の評価指標更新完了: 成功={success_count}, 失敗={failed_count}"
+            f"全保有銘柄の評価指標更新完了: 成功={success_count}, 失敗={failed_count}, "
+            f"ローカル更新={local_count}, 保留={len(plan['deferred'])}"
         )
 
-        return {"success": success_count, "failed": failed_count, "details": details}
+        return {
+            "success": success_count,
+            "failed": failed_count,
+            "local": local_count,
+            "deferred": len(plan["deferred"]),
+            "details": details,
+        }
 
     @staticmethod
     def _save_metrics_to_db(ticker_symbol, metrics_data):
@@ -5,11 +5,11 @@ Fetches stock prices from Yahoo Finance using yfinance
 Includes caching mechanism to reduce API calls
 """
 
+import logging
 import ssl
 from datetime import datetime, timedelta
 
 import certifi
-import yfinance as yf
 from sqlalchemy.exc import IntegrityError
 
 from app import db
@@ -29,10 +29,8 @@ os.environ["REQUESTS_CA_BUNDLE"] = ""
 os.environ["SSL_CERT_FILE"] = ""
 ssl._create_default_https_context = ssl._create_unverified_context
 
-# Force yfinance to use requests instead of curl_cffi
-import yfinance as yf_module
-
-yf_module.utils.get_yf_logger().setLevel("CRITICAL")
+# Silence yfinance logging (set on the logger by name so yfinance loads on first use)
+logging.getLogger("yfinance").setLevel("CRITICAL")
 
 
 class StockPriceFetcher:
@@ -51,6 +49,8 @@ class StockPriceFetcher:
             dict: {'price': float, 'currency': str, 'timestamp': datetime}
             None: If fetch fails
         """
+        import yfinance as yf
+
         # Check cache first
         if use_cache:
             today = datetime.now().date()
@@ -236,11 +236,11 @@ class StockPriceFetcher:
                                     original_ticker, price, currency
                                 )
                         except Exception as e:
-                            print(f"Error fetching {original_ticker}: {e}")
+                            logger.warning(f"Error fetching {original_ticker}: {e}")
                             continue
 
                 except Exception as e:
-                    print(f"Batch fetch error: {e}")
+                    logger.warning(f"Batch fetch error: {e}")
                     # フォールバック: 個別取得
                     for ticker in batch:
                         price_data = StockPriceFetcher.get_current_price(
@@ -254,37 +254,86 @@ class StockPriceFetcher:
     @staticmethod
     def update_all_holdings_prices():
         """
-        Update current prices for all holdings (optimized batch processing)
+        Update current prices for all holdings
+
+        株価・為替の取得から評価額の更新までを RefreshPipeline で実行し、
+        評価額の更新後にスナップショット保存と評価指標の更新を並行して行う
 
         Returns:
-            dict: Summary of updates
+            dict: Summary of updates (with 'metrics' and per-stage 'stages')
         """
-        holdings = Holding.query.all()
-        results = {"success": 0, "failed": 0, "errors": []}
+        from app.services.refresh_pipeline import RefreshPipeline
+
+        run = RefreshPipeline.run(["snapshot", "metrics"])
+        outputs = run["outputs"]
+
+        results = outputs.get("valuation") or {
+            "success": 0,
+            "failed": 0,
+            "errors": [
+                {"error": run["stages"].get("valuation", {}).get("error", "未実行")}
+            ],
+        }
+        results["metrics"] = outputs.get("metrics") or {
+            "success": 0,
+            "failed": 0,
+            "error": run["stages"].get("metrics", {}).get("error"),
+        }
+        results["stages"] = run["stages"]
+        return results
 
+    @staticmethod
+    def update_holdings_prices(holdings):
+        """
+        Update current prices for the given holdings (Steps 1-5, single commit)
+
+        Args:
+            holdings: List of Holding
+
+        Returns:
+            dict: Summary of updates
+        """
         if not holdings:
-            return results
+            return {"success": 0, "failed": 0, "errors": []}
 
         # Step 1: 銘柄リストを収集
         ticker_symbols = [h.ticker_symbol for h in holdings]
 
         # Step 2: すべての株価を一括取得（バッチ処理で最適化）
-        print(f"Fetching prices for {len(ticker_symbols)} holdings...")
+        logger.info(f"Fetching prices for {len(ticker_symbols)} holdings...")
         prices_data = StockPriceFetcher.get_multiple_prices(
             ticker_symbols, use_cache=False
         )
 
         # Step 3: 株価データから実際の通貨を収集して為替レートを一括取得
         # 保有銘柄の currency ではなく、株価データから取得した実際の通貨を使用
-        currencies_needed = set()
-        for ticker, price_data in prices_data.items():
-            actual_currency = price_data.get("currency", "USD")
-            if actual_currency and actual_currency not in ["JPY", "日本円"]:
-                currencies_needed.add(actual_currency)
+        exchange_rates = StockPriceFetcher.fetch_exchange_rates(
+            price_data.get("currency", "USD") for price_data in prices_data.values()
+        )
+
+        # Step 4-5: 各保有銘柄を更新して一括コミット
+        return StockPriceFetcher.apply_prices(holdings, prices_data, exchange_rates)
+
+    @staticmethod
+    def fetch_exchange_rates(currencies):
+        """
+        Fetch JPY exchange rates for the given currencies
+
+        Args:
+            currencies: Iterable of currency codes
+
+        Returns:
+            dict: {currency: rate} (JPY is always 1.0, 1.0 as fallback)
+        """
+        currencies_needed = {
+            currency
+            for currency in currencies
+            if currency and currency not in ["JPY", "日本円"]
+        }
 
         exchange_rates = {"JPY": 1.0, "日本円": 1.0}
         if currencies_needed:
-            print(
+            logger.info(
                 f"Fetching exchange rates for {len(currencies_needed)} currencies: {currencies_needed}"
             )
             for currency in currencies_needed:
@@ -293,6 +342,35 @@ class StockPriceFetcher:
                     exchange_rates[currency] = rate_data["rate"]
                 else:
                     exchange_rates[currency] = 1.0  # フォールバック
+        return exchange_rates
+
+    @staticmethod
+    def apply_prices(holdings, prices_data, exchange_rates):
+        """
+        Apply fetched prices and exchange rates to holdings (single commit)
+
+        Args:
+            holdings: List of Holding
+            prices_data: {ticker: price data} from get_multiple_prices
+            exchange_rates: {currency: rate}; missing currencies are fetched
+
+        Returns:
+            dict: Summary of updates
+        """
+        results = {"success": 0, "failed": 0, "errors": []}
+
+        if not holdings:
+            return results
+
+        # 株価データの通貨が保有銘柄の通貨と異なる場合のレートを補完
+        missing = {
+            price_data.get("currency", "USD") for price_data in prices_data.values()
+        } - set(exchange_rates)
+        if missing:
+            exchange_rates = {
+                **exchange_rates,
+                **StockPriceFetcher.fetch_exchange_rates(missing),
+            }
 
         # Step 4: 各保有銘柄を更新
         for holding in holdings:
@@ -336,24 +414,12 @@ class StockPriceFetcher:
         # Step 5: データベースに一括コミット
         try:
             db.session.commit()
-            print(f"Updated {results['success']}/{len(holdings)} holdings successfully")
-        except Exception as e:
-            db.session.rollback()
-            results["errors"].append({"error": f"Database commit failed: {str(e)}"})
-
-        # Step 6: 評価指標の更新
-        try:
-            from app.services.stock_metrics_fetcher import StockMetricsFetcher
-
-            logger.info("株価更新後の評価指標更新を開始")
-            metrics_results = StockMetricsFetcher.update_all_holdings_metrics()
-            results["metrics"] = metrics_results
             logger.info(
-                f"評価指標更新完了: 成功={metrics_results['success']}, 失敗={metrics_results['failed']}"
+                f"Updated {results['success']}/{len(holdings)} holdings successfully"
             )
         except Exception as e:
-            logger.warning(f"評価指標更新スキップ: {str(e)}")
-            results["metrics"] = {"success": 0, "failed": 0, "error": str(e)}
+            db.session.rollback()
+            results["errors"].append({"error": f"Database commit failed: {str(e)}"})
 
         return results
 
@@ -370,6 +436,8 @@ class StockPriceFetcher:
         Returns:
             list: [{'date': datetime, 'close': float, 'currency': str}]
         """
+        import yfinance as yf
+
         try:
             yf_ticker = StockPriceFetcher._format_ticker(ticker_symbol)
             stock = yf.Ticker(yf_ticker)
@@ -400,7 +468,7 @@ class StockPriceFetcher:
             ]
 
         except Exception as e:
-            print(f"Error fetching historical prices for {ticker_symbol}: {e}")
+            logger.error(f"Error fetching historical prices for {ticker_symbol}: {e}")
             return []
 
     @staticmethod
@@ -455,4 +523,4 @@ class StockPriceFetcher:
             db.session.rollback()
         except Exception as e:
             db.session.rollback()
-            print(f"Error caching price: {e}")
+            logger.error(f"Error caching price: {e}")
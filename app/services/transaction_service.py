@@ -1,18 +1,233 @@
-from datetime import datetime
+import base64
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
 from decimal import Decimal
+from functools import partial
+from itertools import groupby
+
+from flask import current_app, has_app_context
+from sqlalchemy import Float, Numeric, and_, delete, insert, or_, type_coerce
 
 from app import db
 from app.models.holding import Holding
 from app.models.realized_pnl import RealizedPnl
 from app.models.transaction import Transaction
+from app.services.ledger_engine import LedgerEngine
 from app.utils.logger import get_logger, log_database_operation
 
 logger = get_logger("transaction_service")
 
+# 再計算に必要な取引カラム（先頭は銘柄。2番目以降が LedgerEntry に対応）
+LEDGER_COLUMNS = (
+    Transaction.ticker_symbol,
+    Transaction.transaction_date,
+    Transaction.transaction_type,
+    Transaction.quantity,
+    Transaction.unit_price,
+    Transaction.commission,
+    Transaction.settlement_amount,
+    Transaction.security_name,
+    Transaction.currency,
+)
+
+LedgerEntry = namedtuple(
+    "LedgerEntry",
+    [
+        "transaction_date",
+        "transaction_type",
+        "quantity",
+        "unit_price",
+        "commission",
+        "settlement_amount",
+        "security_name",
+        "currency",
+    ],
+)
+
+
+def replay_ledger(transactions, ticker_symbol=None):
+    """
+    1銘柄の取引を日付順に再生し、移動平均法で保有情報と確定損益を計算
+
+    DBにアクセスしない純粋関数（プロセスプールから呼び出せるようモジュール関数にしている）
+
+    Args:
+        transactions: 取引日順の Transaction または LedgerEntry のリスト
+        ticker_symbol: 銘柄（省略時は各取引の ticker_symbol 属性）
+
+    Returns:
+        tuple: (保有情報dict or None, 確定損益dictのリスト)
+    """
+    current_holding = None
+    pnl_records = []
+
+    for transaction in transactions:
+        ticker = ticker_symbol or transaction.ticker_symbol
+
+        if transaction.transaction_type == "BUY":
+            # 受渡金額を使用（手数料込みの実際の支払額）
+            transaction_cost = (
+                transaction.settlement_amount
+                if transaction.settlement_amount
+                else (
+                    transaction.quantity * transaction.unit_price
+                    + (transaction.commission or 0)
+                )
+            )
+
+            if current_holding:
+                # 平均単価を更新（移動平均法）
+                total_cost = current_holding["total_cost"] + transaction_cost
+                total_quantity = (
+                    current_holding["total_quantity"] + transaction.quantity
+                )
+                current_holding["average_cost"] = total_cost / total_quantity
+                current_holding["total_quantity"] = total_quantity
+                current_holding["total_cost"] = total_cost
+            else:
+                # 初回買付
+                current_holding = {
+                    "ticker_symbol": ticker,
+                    "security_name": transaction.security_name,
+                    "total_quantity": transaction.quantity,
+                    "average_cost": transaction_cost / transaction.quantity,
+                    "currency": transaction.currency,
+                    "total_cost": transaction_cost,
+                }
+
+        elif transaction.transaction_type == "SELL":
+            if (
+                not current_holding
+                or current_holding["total_quantity"] < transaction.quantity
+            ):
+                # データ不整合の場合はスキップ
+                continue
+
+            # 確定損益を計算 (JPYベース)
+            # transaction.settlement_amount は常に受渡金額 (JPY)
+            sell_proceeds_jpy = Decimal(str(transaction.settlement_amount or 0))
+            cost_basis_jpy = Decimal(
+                str(current_holding["average_cost"] or 0)
+            ) * Decimal(str(transaction.quantity or 0))
+            realized_pnl = sell_proceeds_jpy - cost_basis_jpy
+
+            realized_pnl_pct = None
+            if current_holding["average_cost"] > 0:
+                cost_basis = current_holding["average_cost"] * transaction.quantity
+                realized_pnl_pct = (realized_pnl / cost_basis) * 100
+
+            # 確定損益を記録
+            pnl_records.append(
+                {
+                    "ticker_symbol": ticker,
+                    "sell_date": transaction.transaction_date,
+                    "quantity": transaction.quantity,
+                    "average_cost": current_holding["average_cost"],
+                    "sell_price": transaction.unit_price,
+                    "realized_pnl": realized_pnl,
+                    "realized_pnl_pct": realized_pnl_pct,
+                    "commission": transaction.commission,
+                    "currency": transaction.currency,
+                }
+            )
+
+            # 保有数量を減少
+            current_holding["total_quantity"] -= transaction.quantity
+            current_holding["total_cost"] = (
+                current_holding["total_quantity"] * current_holding["average_cost"]
+            )
+
+            # 保有数量が0になった場合
+            if current_holding["total_quantity"] == 0:
+                current_holding = None
+
+    if current_holding and current_holding["total_quantity"] > 0:
+        return current_holding, pnl_records
+    return None, pnl_records
+
+
+def _to_decimal_entries(entries):
+    """float で読み込んだ取引を Decimal に戻す（Numeric(15, 4) の読み込み結果と同じ値）"""
+
+    def to_decimal(value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        return Decimal(f"{value:.4f}")
+
+    return [
+        LedgerEntry(
+            entry.transaction_date,
+            entry.transaction_type,
+            to_decimal(entry.quantity),
+            to_decimal(entry.unit_price),
+            to_decimal(entry.commission),
+            to_decimal(entry.settlement_amount),
+            entry.security_name,
+            entry.currency,
+        )
+        for entry in entries
+    ]
+
+
+def replay_ledgers(ledgers, engine="decimal", verify=False, tolerance=None):
+    """
+    複数銘柄の取引を再生（プロセスプールの1タスク分）
+
+    Args:
+        ledgers: [(銘柄, [LedgerEntry, ...]), ...]
+        engine: 'decimal'（基準実装） / 'float'（LedgerEngine）
+        verify: float使用時にDecimalでも再計算して差分を検出するか
+        tolerance: 検証モードの許容誤差（円）
+
+    Returns:
+        list: 銘柄ごとの (保有情報dict or None, 確定損益dictのリスト, 差分リスト)
+    """
+    results = []
+    for ticker, entries in ledgers:
+        if engine == "float":
+            holding, pnl_records = LedgerEngine.replay(entries, ticker)
+        else:
+            holding, pnl_records = replay_ledger(entries, ticker)
+
+        divergences = []
+        if verify and engine == "float":
+            divergences = [
+                {"ticker_symbol": ticker, **divergence}
+                for divergence in LedgerEngine.find_divergences(
+                    replay_ledger(_to_decimal_entries(entries), ticker),
+                    (holding, pnl_records),
+                    tolerance,
+                )
+            ]
+
+        results.append((holding, pnl_records, divergences))
+    return results
+
 
 class TransactionService:
     """取引データ管理サービス"""
 
+    # 取引一覧の1ページあたりの最大件数（1リクエストのメモリ使用量を制限）
+    MAX_PAGE_SIZE = 1000
+
+    # ストリーミング出力時にDBから一度に読み込む件数
+    STREAM_BATCH_SIZE = 500
+
+    # 一括インポート時に1回のINSERTにまとめる件数
+    BULK_CHUNK_SIZE = 1000
+
+    # 重複判定用ハッシュのIN検索1回あたりの件数（SQLiteのパラメータ上限対策）
+    FINGERPRINT_QUERY_CHUNK = 500
+
+    # 全銘柄再計算でプロセスプールを使う最小取引件数（少ない場合は起動・転送コストが上回る）
+    PARALLEL_MIN_TRANSACTIONS = 100000
+
+    # 全銘柄再計算でプロセスプールの1タスクにまとめる銘柄数
+    LEDGER_BATCH_SIZE = 50
+
     @staticmethod
     def save_transactions(transactions_data):
         """
@@ -37,14 +252,12 @@ class TransactionService:
         for data in sorted_data:
             try:
                 # 重複チェック
-                existing = Transaction.query.filter_by(
-                    transaction_date=data["transaction_date"],
-                    ticker_symbol=data["ticker_symbol"],
-                    quantity=data["quantity"],
-                    unit_price=data["unit_price"],
-                ).first()
-
-                if existing:
+                if TransactionService.check_duplicate(
+                    data["transaction_date"],
+                    data["ticker_symbol"],
+                    data["quantity"],
+                    data["unit_price"],
+                ):
                     logger.warning(
                         f"重複取引をスキップ: {data.get('ticker_symbol')} {data.get('transaction_date')}"
                     )
@@ -80,6 +293,171 @@ class TransactionService:
         logger.info(f"取引データ保存完了: 成功={success_count}, 失敗={failed_count}")
         return {"success": success_count, "failed": failed_count, "errors": errors}
 
+    @staticmethod
+    def _fingerprint_of(data):
+        """取引データの重複判定用ハッシュ（必須項目が欠けている場合はNone）"""
+        try:
+            return Transaction.compute_fingerprint(
+                data["transaction_date"],
+                data["ticker_symbol"],
+                data["quantity"],
+                data["unit_price"],
+            )
+        except (KeyError, TypeError, ValueError, ArithmeticError, AttributeError):
+            return None
+
+    @staticmethod
+    def find_existing_fingerprints(fingerprints):
+        """
+        登録済みの重複判定用ハッシュを一括検索
+
+        Args:
+            fingerprints: 候補ハッシュのイテラブル
+
+        Returns:
+            set: DBに既に存在するハッシュ
+        """
+        candidates = list(set(fingerprints))
+        chunk_size = TransactionService.FINGERPRINT_QUERY_CHUNK
+        existing = set()
+
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start : start + chunk_size]
+            existing.update(
+                fingerprint
+                for (fingerprint,) in db.session.query(Transaction.fingerprint).filter(
+                    Transaction.fingerprint.in_(chunk)
+                )
+            )
+
+        return existing
+
+    @staticmethod
+    def save_transactions_bulk(transactions_data, chunk_size=None):
+        """
+        取引データを一括保存（CSVインポート用）
+
+        既存取引の重複キーを1回のクエリでメモリに読み込み、新規行をチャンク単位で
+        1トランザクション内に一括INSERTした後、影響銘柄ごとに保有情報と確定損益を
+        1回だけ再構築する。行ごとのエラー内容は save_transactions と同じ形式で返す。
+
+        Args:
+            transactions_data: 取引データのリスト
+            chunk_size: 1回のINSERTにまとめる件数
+
+        Returns:
+            dict: 保存結果 {'success': 件数, 'failed': 件数, 'errors': エラーリスト}
+        """
+        chunk_size = chunk_size or TransactionService.BULK_CHUNK_SIZE
+        logger.info(f"取引データ一括保存開始: {len(transactions_data)}件")
+        errors = []
+
+        sorted_data = sorted(
+            transactions_data, key=lambda x: x.get("transaction_date", "")
+        )
+        if not sorted_data:
+            return {"success": 0, "failed": 0, "errors": errors}
+
+        tickers = {data.get("ticker_symbol") for data in sorted_data}
+        columns = set(Transaction.__table__.c.keys())
+
+        # 既存取引との重複をハッシュのIN検索で一括判定
+        existing_keys = TransactionService.find_existing_fingerprints(
+            fingerprint
+            for fingerprint in map(TransactionService._fingerprint_of, sorted_data)
+            if fingerprint
+        )
+
+        # 売却可否の判定用に現在の保有数量を一括読み込み
+        quantities = {
+            ticker: Decimal(str(quantity or 0))
+            for ticker, quantity in db.session.query(
+                Holding.ticker_symbol, Holding.total_quantity
+            ).filter(Holding.ticker_symbol.in_(tickers))
+        }
+
+        rows = []
+        for data in sorted_data:
+            try:
+                unknown = set(data) - columns
+                if unknown:
+                    raise ValueError(f"不明な項目: {', '.join(sorted(unknown))}")
+
+                key = Transaction.compute_fingerprint(
+                    data["transaction_date"],
+                    data["ticker_symbol"],
+                    data["quantity"],
+                    data["unit_price"],
+                )
+                if key in existing_keys:
+                    logger.warning(
+                        f"重複取引をスキップ: {data.get('ticker_symbol')} {data.get('transaction_date')}"
+                    )
+                    errors.append(
+                        {"data": data, "error": "重複する取引が既に存在します"}
+                    )
+                    continue
+
+                ticker = data["ticker_symbol"]
+                quantity = Decimal(str(data["quantity"]))
+                held = quantities.get(ticker, Decimal("0"))
+                if data.get("transaction_type") == "SELL":
+                    if ticker not in quantities:
+                        raise ValueError(
+                            f"保有していない銘柄を売却しようとしています: {ticker}"
+                        )
+                    if held < quantity:
+                        raise ValueError(f"保有数量が不足しています: {ticker}")
+                    held -= quantity
+                    if held == 0:
+                        del quantities[ticker]
+                    else:
+                        quantities[ticker] = held
+                else:
+                    quantities[ticker] = held + quantity
+
+                existing_keys.add(key)
+                # 一括INSERTはORMイベントを経由しないためハッシュを明示的に設定
+                rows.append({**data, "fingerprint": key})
+
+            except Exception as e:
+                logger.error(f"取引保存エラー ({data.get('ticker_symbol')}): {str(e)}")
+                errors.append({"data": data, "error": str(e)})
+
+        if rows:
+            try:
+                for start in range(0, len(rows), chunk_size):
+                    db.session.execute(
+                        insert(Transaction), rows[start : start + chunk_size]
+                    )
+
+                for ticker in sorted({data["ticker_symbol"] for data in rows}):
+                    TransactionService._replay_holding(ticker)
+
+                db.session.commit()
+                log_database_operation(
+                    logger, "INSERT", "transactions", f"{len(rows)}件（一括）"
+                )
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"取引一括保存エラー: {str(e)}")
+                log_database_operation(logger, "INSERT", "transactions", error=str(e))
+                errors.extend(
+                    {
+                        "data": {k: v for k, v in data.items() if k != "fingerprint"},
+                        "error": str(e),
+                    }
+                    for data in rows
+                )
+                rows = []
+
+        success_count = len(rows)
+        failed_count = len(errors)
+        logger.info(
+            f"取引データ一括保存完了: 成功={success_count}, 失敗={failed_count}"
+        )
+        return {"success": success_count, "failed": failed_count, "errors": errors}
+
     @staticmethod
     def _update_holding(transaction):
         """保有銘柄を更新（移動平均法）"""
@@ -167,14 +545,12 @@ class TransactionService:
 
     @staticmethod
     def check_duplicate(transaction_date, ticker_symbol, quantity, unit_price):
-        """重複チェック"""
+        """重複チェック（重複判定用ハッシュのインデックスを使用）"""
+        fingerprint = Transaction.compute_fingerprint(
+            transaction_date, ticker_symbol, quantity, unit_price
+        )
         return (
-            Transaction.query.filter_by(
-                transaction_date=transaction_date,
-                ticker_symbol=ticker_symbol,
-                quantity=quantity,
-                unit_price=unit_price,
-            ).first()
+            db.session.query(Transaction.id).filter_by(fingerprint=fingerprint).first()
             is not None
         )
 
@@ -184,6 +560,14 @@ class TransactionService:
         指定された銘柄の保有情報を取引履歴から再計算
         取引削除後などに使用
         """
+        TransactionService._replay_holding(ticker_symbol)
+        db.session.commit()
+
+    @staticmethod
+    def _replay_holding(ticker_symbol):
+        """
+        取引履歴を日付順に再生して保有情報と確定損益を再構築（コミットしない）
+        """
         # 既存の保有情報を削除
         holding = Holding.query.filter_by(ticker_symbol=ticker_symbol).first()
         if holding:
@@ -195,113 +579,358 @@ class TransactionService:
         # 取引履歴を日付順に取得
         transactions = (
             Transaction.query.filter_by(ticker_symbol=ticker_symbol)
-            .order_by(Transaction.transaction_date)
+            .order_by(Transaction.transaction_date, Transaction.id)
             .all()
         )
 
-        if not transactions:
-            # 取引がない場合は終了
+        holding_data, pnl_records, divergences = replay_ledgers(
+            [(ticker_symbol, transactions)], **TransactionService._ledger_options()
+        )[0]
+        TransactionService._log_divergences(divergences)
+
+        for record in pnl_records:
+            db.session.add(RealizedPnl(**record))
+
+        # 最終的な保有情報を保存
+        if holding_data:
+            db.session.add(Holding(**holding_data))
+
+    @staticmethod
+    def recalculate_all_holdings(workers=None, progress=None):
+        """
+        全銘柄の保有情報と確定損益を取引履歴から一括再計算
+
+        全取引を(銘柄, 取引日)順に1回で読み込み、銘柄ごとの移動平均計算を
+        プロセスプールで並列実行した後、1トランザクションで一括書き込みする。
+
+        Args:
+            workers: 並列プロセス数（デフォルト: CPU数。1以下なら直列実行）
+            progress: 進捗コールバック progress(処理済み銘柄数, 全銘柄数)
+
+        Returns:
+            dict: {'tickers': 銘柄数, 'holdings': 保有銘柄数, 'realized_pnl': 確定損益件数,
+                   'divergences': 検証モードで検出した差分件数}
+        """
+        try:
+            result = TransactionService.rebuild_holdings(
+                workers=workers, progress=progress
+            )
             db.session.commit()
-            return
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"全銘柄の再計算エラー: {str(e)}")
+            raise
 
-        # 取引を順番に処理して保有情報を再構築
-        current_holding = None
-
-        for transaction in transactions:
-            if transaction.transaction_type == "BUY":
-                # 受渡金額を使用（手数料込みの実際の支払額）
-                transaction_cost = (
-                    transaction.settlement_amount
-                    if transaction.settlement_amount
-                    else (
-                        transaction.quantity * transaction.unit_price
-                        + (transaction.commission or 0)
-                    )
-                )
+        return result
 
-                if current_holding:
-                    # 平均単価を更新（移動平均法）
-                    total_cost = current_holding["total_cost"] + transaction_cost
-                    total_quantity = (
-                        current_holding["total_quantity"] + transaction.quantity
-                    )
-                    current_holding["average_cost"] = total_cost / total_quantity
-                    current_holding["total_quantity"] = total_quantity
-                    current_holding["total_cost"] = total_cost
-                else:
-                    # 初回買付
-                    current_holding = {
-                        "ticker_symbol": transaction.ticker_symbol,
-                        "security_name": transaction.security_name,
-                        "total_quantity": transaction.quantity,
-                        "average_cost": transaction_cost / transaction.quantity,
-                        "currency": transaction.currency,
-                        "total_cost": transaction_cost,
-                    }
+    @staticmethod
+    def rebuild_holdings(tickers=None, workers=None, progress=None):
+        """
+        指定銘柄の保有情報と確定損益を一括再構築（コミットしない）
 
-            elif transaction.transaction_type == "SELL":
-                if (
-                    not current_holding
-                    or current_holding["total_quantity"] < transaction.quantity
-                ):
-                    # データ不整合の場合はスキップ
-                    continue
+        Args:
+            tickers: 対象銘柄のリスト（Noneの場合は取引履歴にある全銘柄）
+            workers: 並列プロセス数（デフォルト: CPU数。1以下なら直列実行）
+            progress: 進捗コールバック progress(処理済み銘柄数, 全銘柄数)
 
-                # 確定損益を計算 (JPYベース)
-                # transaction.settlement_amount は常に受渡金額 (JPY)
-                sell_proceeds_jpy = Decimal(str(transaction.settlement_amount or 0))
-                cost_basis_jpy = Decimal(
-                    str(current_holding["average_cost"] or 0)
-                ) * Decimal(str(transaction.quantity or 0))
-                realized_pnl = sell_proceeds_jpy - cost_basis_jpy
-
-                realized_pnl_pct = None
-                if current_holding["average_cost"] > 0:
-                    cost_basis = current_holding["average_cost"] * transaction.quantity
-                    realized_pnl_pct = (realized_pnl / cost_basis) * 100
-
-                # 確定損益を記録
-                pnl_record = RealizedPnl(
-                    ticker_symbol=transaction.ticker_symbol,
-                    sell_date=transaction.transaction_date,
-                    quantity=transaction.quantity,
-                    average_cost=current_holding["average_cost"],
-                    sell_price=transaction.unit_price,
-                    realized_pnl=realized_pnl,
-                    realized_pnl_pct=realized_pnl_pct,
-                    commission=transaction.commission,
-                    currency=transaction.currency,
+        Returns:
+            dict: {'tickers': 銘柄数, 'holdings': 保有銘柄数, 'realized_pnl': 確定損益件数,
+                   'divergences': 検証モードで検出した差分件数}
+        """
+        chunk_size = TransactionService.BULK_CHUNK_SIZE
+        options = TransactionService._ledger_options()
+
+        columns = LEDGER_COLUMNS
+        if options["engine"] == "float":
+            # Decimalへの変換を省いてfloatのまま読み込む
+            columns = [
+                (
+                    type_coerce(column, Float).label(column.key)
+                    if isinstance(column.type, Numeric)
+                    else column
                 )
-                db.session.add(pnl_record)
+                for column in LEDGER_COLUMNS
+            ]
 
-                # 保有数量を減少
-                current_holding["total_quantity"] -= transaction.quantity
-                current_holding["total_cost"] = (
-                    current_holding["total_quantity"] * current_holding["average_cost"]
-                )
+        query = db.session.query(*columns).order_by(
+            Transaction.ticker_symbol,
+            Transaction.transaction_date,
+            Transaction.id,
+        )
 
-                # 保有数量が0になった場合
-                if current_holding["total_quantity"] == 0:
-                    current_holding = None
+        if tickers is None:
+            rows = query.all()
+        else:
+            tickers = sorted(set(tickers))
+            rows = []
+            for start in range(0, len(tickers), chunk_size):
+                chunk = tickers[start : start + chunk_size]
+                rows.extend(query.filter(Transaction.ticker_symbol.in_(chunk)).all())
+
+        ledgers = [
+            (ticker, [LedgerEntry(*row[1:]) for row in group])
+            for ticker, group in groupby(rows, key=lambda row: row[0])
+        ]
+        if tickers is None:
+            tickers = [ticker for ticker, _ in ledgers]
+
+        total = len(ledgers)
+        logger.info(f"保有情報の再計算開始: {total}銘柄 / {len(rows)}取引")
+
+        replay = partial(replay_ledgers, **options)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        parallel = (
+            workers > 1 and len(rows) >= TransactionService.PARALLEL_MIN_TRANSACTIONS
+        )
 
-        # 最終的な保有情報を保存
-        if current_holding and current_holding["total_quantity"] > 0:
-            new_holding = Holding(**current_holding)
-            db.session.add(new_holding)
+        batch_size = TransactionService.LEDGER_BATCH_SIZE
+        batches = [
+            ledgers[start : start + batch_size] for start in range(0, total, batch_size)
+        ]
 
-        db.session.commit()
+        results = []
+        if parallel:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for batch_results in executor.map(replay, batches):
+                        results.extend(batch_results)
+                        TransactionService._report_progress(
+                            progress, len(results), total
+                        )
+            except (OSError, BrokenProcessPool) as e:
+                logger.warning(f"並列再計算に失敗したため直列で実行します: {str(e)}")
+                results = []
+                parallel = False
+
+        if not parallel:
+            for batch in batches:
+                results.extend(replay(batch))
+                TransactionService._report_progress(progress, len(results), total)
+
+        holdings = [holding for holding, _, _ in results if holding]
+        pnl_records = [record for _, records, _ in results for record in records]
+        divergences = [item for _, _, items in results for item in items]
+        TransactionService._log_divergences(divergences)
+
+        # 取引がなくなった銘柄も含めて既存の保有情報・確定損益を削除
+        for start in range(0, len(tickers), chunk_size):
+            chunk = tickers[start : start + chunk_size]
+            Holding.query.filter(Holding.ticker_symbol.in_(chunk)).delete(
+                synchronize_session=False
+            )
+            RealizedPnl.query.filter(RealizedPnl.ticker_symbol.in_(chunk)).delete(
+                synchronize_session=False
+            )
+
+        for model, records in ((Holding, holdings), (RealizedPnl, pnl_records)):
+            for start in range(0, len(records), chunk_size):
+                db.session.execute(insert(model), records[start : start + chunk_size])
+
+        logger.info(
+            f"保有情報の再計算完了: {total}銘柄, 保有={len(holdings)}, "
+            f"確定損益={len(pnl_records)}件"
+        )
+        return {
+            "tickers": total,
+            "holdings": len(holdings),
+            "realized_pnl": len(pnl_records),
+            "divergences": len(divergences),
+        }
+
+    @staticmethod
+    def _ledger_options():
+        """アプリ設定から台帳計算エンジンの設定を取得"""
+        config = current_app.config if has_app_context() else {}
+        return {
+            "engine": config.get("LEDGER_ENGINE", "decimal"),
+            "verify": config.get("LEDGER_VERIFY", False),
+            "tolerance": config.get(
+                "LEDGER_VERIFY_TOLERANCE", LedgerEngine.DEFAULT_TOLERANCE
+            ),
+        }
+
+    @staticmethod
+    def _log_divergences(divergences, limit=20):
+        """検証モードで検出した差分をログ出力"""
+        if not divergences:
+            return
+        for divergence in divergences[:limit]:
+            logger.warning(f"台帳計算の差分: {divergence}")
+        logger.warning(
+            f"台帳計算の差分が{len(divergences)}件あります（float と Decimal の結果が不一致）"
+        )
+
+    @staticmethod
+    def delete_transactions(transaction_ids):
+        """
+        取引を一括削除し、影響銘柄の保有情報・確定損益を1トランザクションで再構築
+
+        DELETE ... RETURNING で削除と同時に影響銘柄と銘柄ごとの最古取引日を取得する。
+
+        Args:
+            transaction_ids: 削除する取引IDのリスト
+
+        Returns:
+            dict: {'deleted_count': 削除件数, 'affected_tickers': 銘柄リスト,
+                   'earliest_dates': {銘柄: 削除した取引の最古取引日}}
+        """
+        ids = sorted({int(transaction_id) for transaction_id in transaction_ids})
+        chunk_size = TransactionService.BULK_CHUNK_SIZE
+        earliest_dates = {}
+        deleted_count = 0
+
+        try:
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start : start + chunk_size]
+                deleted = db.session.execute(
+                    delete(Transaction)
+                    .where(Transaction.id.in_(chunk))
+                    .returning(Transaction.ticker_symbol, Transaction.transaction_date)
+                ).all()
+
+                deleted_count += len(deleted)
+                for ticker, transaction_date in deleted:
+                    if (
+                        ticker not in earliest_dates
+                        or transaction_date < earliest_dates[ticker]
+                    ):
+                        earliest_dates[ticker] = transaction_date
+
+            if earliest_dates:
+                TransactionService.rebuild_holdings(list(earliest_dates))
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log_database_operation(logger, "DELETE", "transactions", error=str(e))
+            raise
+
+        log_database_operation(
+            logger,
+            "DELETE",
+            "transactions",
+            f"{deleted_count}件（影響銘柄: {len(earliest_dates)}）",
+        )
+        return {
+            "deleted_count": deleted_count,
+            "affected_tickers": sorted(earliest_dates),
+            "earliest_dates": earliest_dates,
+        }
 
     @staticmethod
-    def recalculate_all_holdings():
-        """全銘柄の保有情報を取引履歴から再計算"""
-        from app.models.transaction import Transaction
+    def _report_progress(progress, done, total):
+        if progress:
+            progress(done, total)
+        logger.debug(f"再計算進捗: {done}/{total}")
 
-        # 取引履歴にある全銘柄を抽出
-        tickers = db.session.query(Transaction.ticker_symbol).distinct().all()
-        ticker_list = [t[0] for t in tickers]
+    @staticmethod
+    def build_transaction_query(
+        ticker_symbol=None,
+        start_date=None,
+        end_date=None,
+        transaction_type=None,
+        currency=None,
+    ):
+        """
+        フィルター条件付きの取引クエリを作成（取引日・ID の降順）
+
+        Args:
+            ticker_symbol: ティッカーシンボル
+            start_date: 取引日の下限（含む）
+            end_date: 取引日の上限（含む）
+            transaction_type: 'BUY' or 'SELL'
+            currency: 通貨コード
 
-        print(f"Recalculating {len(ticker_list)} holdings...")
-        for ticker in ticker_list:
-            TransactionService.recalculate_holding(ticker)
+        Returns:
+            Query: 並び順が (transaction_date DESC, id DESC) のクエリ
+        """
+        query = Transaction.query
+
+        if ticker_symbol:
+            query = query.filter(Transaction.ticker_symbol == ticker_symbol)
+        if start_date:
+            query = query.filter(Transaction.transaction_date >= start_date)
+        if end_date:
+            query = query.filter(Transaction.transaction_date <= end_date)
+        if transaction_type:
+            query = query.filter(Transaction.transaction_type == transaction_type)
+        if currency:
+            query = query.filter(Transaction.currency == currency)
+
+        return query.order_by(
+            Transaction.transaction_date.desc(), Transaction.id.desc()
+        )
 
-        print("Recalculation complete.")
+    @staticmethod
+    def encode_cursor(transaction):
+        """取引の (取引日, ID) からページングカーソルを作成"""
+        raw = f"{transaction.transaction_date.isoformat()}:{transaction.id}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        ページングカーソルを (取引日, ID) に復元
+
+        Raises:
+            ValueError: カーソルが不正な場合
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")
+            date_str, id_str = raw.split(":", 1)
+            return date.fromisoformat(date_str), int(id_str)
+        except (ValueError, UnicodeError) as e:
+            raise ValueError(f"無効なカーソルです: {cursor}") from e
+
+    @staticmethod
+    def get_transactions_page(query, limit, cursor=None):
+        """
+        キーセットページングで取引を1ページ取得
+
+        Args:
+            query: build_transaction_query() で作成したクエリ
+            limit: ページサイズ（MAX_PAGE_SIZE で上限）
+            cursor: 前ページの next_cursor（先頭ページはNone）
+
+        Returns:
+            tuple: (取引リスト, 次ページのカーソル or None)
+        """
+        limit = max(1, min(limit, TransactionService.MAX_PAGE_SIZE))
+
+        if cursor:
+            cursor_date, cursor_id = TransactionService.decode_cursor(cursor)
+            query = query.filter(
+                or_(
+                    Transaction.transaction_date < cursor_date,
+                    and_(
+                        Transaction.transaction_date == cursor_date,
+                        Transaction.id < cursor_id,
+                    ),
+                )
+            )
+
+        # 1件多く取得して次ページの有無を判定
+        transactions = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            next_cursor = TransactionService.encode_cursor(transactions[-1])
+
+        return transactions, next_cursor
+
+    @staticmethod
+    def iter_transactions(query, batch_size=None):
+        """
+        取引をバッチ単位でDBから読み込みながら1件ずつ返す
+
+        Args:
+            query: build_transaction_query() で作成したクエリ
+            batch_size: 1回に読み込む件数
+
+        Yields:
+            Transaction: 取引
+        """
+        batch_size = batch_size or TransactionService.STREAM_BATCH_SIZE
+        yield from query.yield_per(batch_size)
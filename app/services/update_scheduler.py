@@ -0,0 +1,506 @@
+"""市場カレンダー連動の差分更新スケジューラ
+
+各銘柄の市場（東証・米国・KRX）の大引け後に、その取引日の分だけを
+株価 → 配当 → 評価指標 → ベンチマークの順に小さなバッチで更新する。
+どの取引日まで同期済みかを sync_states に記録し、前回同期以降の差分のみ取得する。
+
+gunicorn の複数ワーカー・複数プロセスから起動されても、scheduler_leases の
+リースを取得したリーダーの1プロセスだけがジョブを実行する。
+"""
+
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, has_app_context
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Holding, SchedulerLease, SyncState
+from app.utils.logger import get_logger
+from app.utils.market_calendar import MARKETS, latest_session, market_for_ticker
+
+logger = get_logger("update_scheduler")
+
+
+class UpdateScheduler:
+    """差分更新スケジューラクラス"""
+
+    # 実行順（株価の更新後に評価指標を更新する）
+    JOBS = ("prices", "dividends", "metrics", "benchmarks")
+
+    # 市場ごとのベンチマーク（BenchmarkFetcher.BENCHMARKS のキー）
+    BENCHMARKS = {"TSE": ["N225"], "US": ["SP500"], "KRX": []}
+
+    LEASE_NAME = "update_scheduler"
+
+    DEFAULTS = {
+        "UPDATE_SCHEDULER_POLL_SECONDS": 60,
+        # 大引けから更新開始までの待ち時間（終値の確定待ち）
+        "UPDATE_SCHEDULER_SETTLE_MINUTES": 20,
+        # 1ジョブ1回あたりの銘柄数
+        "UPDATE_SCHEDULER_BATCH_SIZE": 15,
+        "UPDATE_SCHEDULER_LEASE_SECONDS": 180,
+        # 失敗した銘柄を再試行するまでの間隔
+        "UPDATE_SCHEDULER_RETRY_MINUTES": 30,
+        # 配当の差分取得で前回同期日から遡る日数（権利落ち日の遅延反映対策）
+        "UPDATE_SCHEDULER_DIVIDEND_LOOKBACK_DAYS": 30,
+    }
+
+    _owner = None
+
+    @staticmethod
+    def new_owner():
+        """リースの所有者ID（常駐ループごとに一意）"""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def _config(name):
+        config = current_app.config if has_app_context() else {}
+        return config.get(name, UpdateScheduler.DEFAULTS[name])
+
+    # ------------------------------------------------------------------
+    # リーダー選出
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _default_owner():
+        # owner 省略時（単発の呼び出し）のプロセス共通ID
+        if UpdateScheduler._owner is None:
+            UpdateScheduler._owner = UpdateScheduler.new_owner()
+        return UpdateScheduler._owner
+
+    @staticmethod
+    def acquire_leadership(owner=None, now=None):
+        """
+        リースを取得または延長（期限切れか自分が保持している場合のみ）
+
+        Returns:
+            bool: リーダーならTrue
+        """
+        owner = owner or UpdateScheduler._default_owner()
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(
+            seconds=UpdateScheduler._config("UPDATE_SCHEDULER_LEASE_SECONDS")
+        )
+        table = SchedulerLease.__table__
+
+        try:
+            # 条件付きUPDATEはSQLiteの書き込みロック下で実行されるため、
+            # 同時に呼ばれても1プロセスだけが成功する
+            result = db.session.execute(
+                update(table)
+                .where(
+                    table.c.name == UpdateScheduler.LEASE_NAME,
+                    or_(table.c.owner == owner, table.c.expires_at < now),
+                )
+                .values(owner=owner, expires_at=expires_at)
+            )
+            acquired = result.rowcount == 1
+            if not acquired and not db.session.get(
+                SchedulerLease, UpdateScheduler.LEASE_NAME
+            ):
+                db.session.add(
+                    SchedulerLease(
+                        name=UpdateScheduler.LEASE_NAME,
+                        owner=owner,
+                        expires_at=expires_at,
+                        acquired_at=now,
+                    )
+                )
+                acquired = True
+            db.session.commit()
+            return acquired
+        except IntegrityError:
+            # 他プロセスが同時にリースを作成した
+            db.session.rollback()
+            return False
+
+    @staticmethod
+    def release_leadership(owner=None):
+        """保持しているリースを解放"""
+        owner = owner or UpdateScheduler._default_owner()
+        table = SchedulerLease.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.name == UpdateScheduler.LEASE_NAME, table.c.owner == owner)
+            .values(expires_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    @staticmethod
+    @contextmanager
+    def hold_leadership(app, owner=None):
+        """
+        リースを取得し、ブロックを抜けるまでバックグラウンドで延長し続ける
+
+        更新パイプライン等、ジョブ単位でリースを確認できない長い処理で使用する。
+
+        Yields:
+            bool: リーダーならTrue（Falseの場合は何もせずに抜ける）
+        """
+        owner = owner or UpdateScheduler.new_owner()
+        if not UpdateScheduler.acquire_leadership(owner):
+            yield False
+            return
+
+        lease_seconds = app.config.get(
+            "UPDATE_SCHEDULER_LEASE_SECONDS",
+            UpdateScheduler.DEFAULTS["UPDATE_SCHEDULER_LEASE_SECONDS"],
+        )
+        stop_event = threading.Event()
+
+        def renew():
+            # 期限の1/3ごとに延長（一時的なロック待ちで失効しないように）
+            while not stop_event.wait(lease_seconds / 3):
+                with app.app_context():
+                    try:
+                        if not UpdateScheduler.acquire_leadership(owner):
+                            logger.error(f"リースを失いました: {owner}")
+                            return
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.warning(f"リースの延長に失敗: {str(e)}")
+                    finally:
+                        db.session.remove()
+
+        thread = threading.Thread(target=renew, name="scheduler-lease", daemon=True)
+        thread.start()
+        try:
+            yield True
+        finally:
+            stop_event.set()
+            thread.join()
+            UpdateScheduler.release_leadership(owner)
+
+    # ------------------------------------------------------------------
+    # ジョブ計画
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def instruments():
+        """市場ごとの更新対象 {市場: {ジョブ: [キー]}}"""
+        tickers = {market: [] for market in MARKETS}
+        for (ticker,) in db.session.query(Holding.ticker_symbol).order_by(
+            Holding.ticker_symbol
+        ):
+            tickers[market_for_ticker(ticker)].append(ticker)
+
+        return {
+            market: {
+                "prices": tickers[market],
+                "dividends": tickers[market],
+                "metrics": tickers[market],
+                "benchmarks": list(UpdateScheduler.BENCHMARKS.get(market, [])),
+            }
+            for market in MARKETS
+        }
+
+    @staticmethod
+    def pending(now=None, jobs=None):
+        """
+        実行待ちのジョブ（取引日ごとに未同期のキー）
+
+        Args:
+            now: 現在時刻（timezone-aware）
+            jobs: 対象ジョブ（デフォルト: 全ジョブ）
+
+        Returns:
+            list: [{'job', 'market', 'session', 'keys', 'states'}]
+        """
+        now = now or datetime.now(timezone.utc)
+        jobs = jobs or UpdateScheduler.JOBS
+        settle = timedelta(
+            minutes=UpdateScheduler._config("UPDATE_SCHEDULER_SETTLE_MINUTES")
+        )
+        retry_after = now.astimezone(timezone.utc).replace(tzinfo=None) - timedelta(
+            minutes=UpdateScheduler._config("UPDATE_SCHEDULER_RETRY_MINUTES")
+        )
+        states = {(s.job, s.key): s for s in SyncState.query.all()}
+
+        pending = []
+        for market, keys_by_job in UpdateScheduler.instruments().items():
+            session = latest_session(market, now, settle)
+            for job in UpdateScheduler.JOBS:
+                if job not in jobs:
+                    continue
+                due = []
+                for key in keys_by_job[job]:
+                    state = states.get((job, key))
+                    if (
+                        state
+                        and state.last_session_date
+                        and (state.last_session_date >= session)
+                    ):
+                        continue
+                    if (
+                        state
+                        and state.last_error
+                        and state.last_attempt_at
+                        and state.last_attempt_at > retry_after
+                    ):
+                        continue
+                    due.append(key)
+                if due:
+                    pending.append(
+                        {
+                            "job": job,
+                            "market": market,
+                            "session": session,
+                            "keys": due,
+                            "states": {k: states.get((job, k)) for k in due},
+                        }
+                    )
+        return pending
+
+    # ------------------------------------------------------------------
+    # 実行
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def run_pending(now=None, jobs=None, batch_size=None, owner=None):
+        """
+        実行待ちのジョブを1バッチずつ実行
+
+        Args:
+            now: 現在時刻（timezone-aware）
+            jobs: 対象ジョブ（デフォルト: 全ジョブ）
+            batch_size: 1ジョブ1回あたりの銘柄数
+            owner: リースの所有者ID。指定時は各バッチの前にリースを延長し、
+                他のプロセスに取られていたらその時点で中断する
+
+        Returns:
+            list: [{'job', 'market', 'session', 'keys', 'failed'}]
+        """
+        now = now or datetime.now(timezone.utc)
+        batch_size = batch_size or UpdateScheduler._config(
+            "UPDATE_SCHEDULER_BATCH_SIZE"
+        )
+        summaries = []
+
+        for item in UpdateScheduler.pending(now, jobs):
+            # 1パスがリースの期限を超えても、失効後に別のリーダーと同時に実行しない
+            if owner and not UpdateScheduler.acquire_leadership(owner):
+                logger.warning(f"リースを失ったため中断: {owner}")
+                break
+
+            keys = item["keys"][:batch_size]
+            # 前回同期済みの最も古い取引日（未同期ならNone）から差分を取得
+            synced = [
+                item["states"][k].last_session_date
+                for k in keys
+                if item["states"][k] and item["states"][k].last_session_date
+            ]
+            since = min(synced) if len(synced) == len(keys) else None
+
+            handler = getattr(UpdateScheduler, f"_run_{item['job']}")
+            started = datetime.utcnow()
+            attempted_at = now.astimezone(timezone.utc).replace(tzinfo=None)
+            try:
+                failed = handler(keys, since, item["session"])
+                error = None
+            except Exception as e:
+                db.session.rollback()
+                failed = {key: str(e) for key in keys}
+                error = str(e)
+                logger.error(
+                    f"更新ジョブ失敗: {item['job']} {item['market']} {keys}: {error}"
+                )
+
+            UpdateScheduler._record(
+                item["job"], item["market"], keys, item["session"], failed, attempted_at
+            )
+            summaries.append(
+                {
+                    "job": item["job"],
+                    "market": item["market"],
+                    "session": item["session"].isoformat(),
+                    "keys": keys,
+                    "failed": sorted(failed),
+                    "seconds": round((datetime.utcnow() - started).total_seconds(), 2),
+                }
+            )
+            logger.info(
+                f"更新ジョブ完了: {item['job']} {item['market']} "
+                f"{item['session']} {len(keys) - len(failed)}/{len(keys)}件"
+            )
+
+        return summaries
+
+    @staticmethod
+    def _record(job, market, keys, session, failed, attempted_at):
+        """同期状態を記録（成功したキーのみ取引日を進める）"""
+        states = {
+            s.key: s
+            for s in SyncState.query.filter(
+                SyncState.job == job, SyncState.key.in_(keys)
+            )
+        }
+        now = datetime.utcnow()
+        for key in keys:
+            state = states.get(key)
+            if state is None:
+                state = SyncState(job=job, key=key, market=market)
+                db.session.add(state)
+            state.last_attempt_at = attempted_at
+            state.updated_at = now
+            if key in failed:
+                state.last_error = str(failed[key])[:500]
+            else:
+                state.last_session_date = session
+                state.last_success_at = now
+                state.last_error = None
+        db.session.commit()
+
+    @staticmethod
+    def _run_prices(tickers, since, session):
+        """前回同期以降の終値を補完し、保有銘柄の現在値を更新"""
+        from app.services.pnl_history_service import PnlHistoryService
+        from app.services.price_archive import PriceArchive
+        from app.services.returns_engine import ReturnsEngine
+        from app.services.stock_price_fetcher import StockPriceFetcher
+
+        holdings = Holding.query.filter(Holding.ticker_symbol.in_(tickers)).all()
+        start = since + timedelta(days=1) if since else session - timedelta(days=7)
+        ReturnsEngine.sync_prices(
+            tickers, start, session, {h.ticker_symbol: h.currency for h in holdings}
+        )
+
+        results = StockPriceFetcher.update_holdings_prices(holdings)
+        failed = {
+            error["ticker"]: error["error"]
+            for error in results["errors"]
+            if "ticker" in error
+        }
+
+        try:
+            PnlHistoryService.record_snapshot()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"スナップショット保存スキップ: {str(e)}")
+
+        if PriceArchive.is_enabled():
+            try:
+                PriceArchive.sync()
+            except Exception as e:
+                logger.warning(f"株価アーカイブ同期スキップ: {str(e)}")
+        return failed
+
+    @staticmethod
+    def _run_dividends(tickers, since, session):
+        """前回同期日（から遡って一定期間）以降の配当のみ保存"""
+        from app.services.dividend_fetcher import DividendFetcher
+
+        start = None
+        if since:
+            lookback = UpdateScheduler._config(
+                "UPDATE_SCHEDULER_DIVIDEND_LOOKBACK_DAYS"
+            )
+            start = datetime.combine(since, datetime.min.time()) - timedelta(
+                days=lookback
+            )
+
+        failed = {}
+        for ticker in tickers:
+            result = DividendFetcher.save_dividends_to_db(ticker, start_date=start)
+            if result["errors"]:
+                failed[ticker] = str(result["errors"][0])
+        return failed
+
+    @staticmethod
+    def _run_metrics(tickers, since, session):
+        """評価指標を更新（鮮度予算・API呼び出し上限は MetricsRefreshPlanner）"""
+        from app.services.stock_metrics_fetcher import StockMetricsFetcher
+
+        results = StockMetricsFetcher.update_all_holdings_metrics(
+            ticker_symbols=tickers
+        )
+        return {
+            detail["ticker"]: detail.get("reason", "取得失敗")
+            for detail in results["details"]
+            if detail["status"] == "failed"
+        }
+
+    @staticmethod
+    def _run_benchmarks(keys, since, session):
+        """ベンチマークの前回同期以降の終値を取得"""
+        from app.services.benchmark_fetcher import BenchmarkFetcher
+
+        failed = {}
+        for key in keys:
+            if since:
+                data = BenchmarkFetcher.get_historical_benchmark(
+                    key, since + timedelta(days=1), session
+                )
+            else:
+                data = BenchmarkFetcher.get_benchmark_price(key, use_cache=False)
+            if not data:
+                failed[key] = "取得失敗"
+        return failed
+
+    # ------------------------------------------------------------------
+    # 常駐ループ
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def run_forever(app, stop_event=None, jobs=None):
+        """
+        リーダーである間、実行待ちのジョブを繰り返し実行
+
+        Args:
+            app: Flaskアプリケーション
+            stop_event: 停止用の threading.Event
+            jobs: 対象ジョブ（デフォルト: 全ジョブ）
+        """
+        stop_event = stop_event or threading.Event()
+        poll_seconds = app.config.get(
+            "UPDATE_SCHEDULER_POLL_SECONDS",
+            UpdateScheduler.DEFAULTS["UPDATE_SCHEDULER_POLL_SECONDS"],
+        )
+        # 同じプロセス内の別のループ（アプリ内スケジューラとスクリプト等）とリースを共有しない
+        owner = UpdateScheduler.new_owner()
+        logger.info(f"更新スケジューラ開始: {owner}")
+
+        leader = False
+        while not stop_event.is_set():
+            with app.app_context():
+                try:
+                    is_leader = UpdateScheduler.acquire_leadership(owner)
+                    if is_leader != leader:
+                        leader = is_leader
+                        logger.info(
+                            "リーダーになりました"
+                            if leader
+                            else "リーダーではありません"
+                        )
+                    # 実行待ちがある間は待たずに次のバッチへ進む
+                    if leader and UpdateScheduler.run_pending(jobs=jobs, owner=owner):
+                        continue
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"更新スケジューラのエラー: {str(e)}")
+                finally:
+                    db.session.remove()
+            stop_event.wait(poll_seconds)
+
+        with app.app_context():
+            if leader:
+                UpdateScheduler.release_leadership(owner)
+        logger.info("更新スケジューラ停止")
+
+    @staticmethod
+    def start_background(app):
+        """バックグラウンドスレッドでスケジューラを起動"""
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=UpdateScheduler.run_forever,
+            args=(app, stop_event),
+            name="update-scheduler",
+            daemon=True,
+        )
+        thread.start()
+        return thread, stop_event
@@ -3,17 +3,48 @@
 
 アプリケーション起動時の自動バックアップと、
 テスト実行前のバックアップを提供します。
+
+バックアップは SQLite のオンラインバックアップAPIで一定ページ数ずつコピーするため、
+WALモードで書き込み中のデータベースからも一貫した内容を取得でき、
+コピー中も他の接続の書き込みを長時間止めません。
+起動時の自動バックアップはバックグラウンドスレッドで実行し、ファイルロックで
+複数ワーカーのうち1プロセスだけが作成します（ワーカーの起動時間はDBサイズに依存しない）。
+
+自動バックアップの形式（BACKUP_FORMAT）:
+- 'snapshot': 差分スナップショット（backups/snapshots、app/utils/backup_store.py）。
+  変更のあったチャンクだけを圧縮保存し、内容が前回と同じなら作成しない
+- 'copy': データベース全体のコピー（backups/stock_pnl_backup_*.db）
 """
 
 import os
-import shutil
+import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 
 from app.utils.logger import get_logger
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 logger = get_logger("backup")
 
+# オンラインバックアップの1ステップでコピーするページ数と、ステップ間の待ち時間（秒）
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+
+# 自動バックアップの排他用ロックファイル（バックアップディレクトリ内）
+AUTO_BACKUP_LOCK_NAME = ".auto_backup.lock"
+
+# 差分スナップショットの保存先（バックアップディレクトリ内）
+SNAPSHOT_DIR_NAME = "snapshots"
+
+BACKUP_FORMATS = ("snapshot", "copy")
+
 
 def get_backup_dir(app=None):
     """バックアップディレクトリを取得"""
@@ -62,15 +93,24 @@ def should_create_backup(backup_dir, hours=24):
     Returns:
         bool: バックアップを作成すべきかどうか
     """
+    from app.utils.backup_store import last_checked_at
+
+    times = []
     latest = get_latest_backup(backup_dir)
-    if latest is None:
+    if latest is not None:
+        times.append(datetime.fromtimestamp(latest.stat().st_mtime))
+
+    # 差分スナップショットは内容が同じで作成を省略した場合も確認時刻を記録する
+    checked_at = last_checked_at(Path(backup_dir) / SNAPSHOT_DIR_NAME)
+    if checked_at is not None:
+        times.append(checked_at)
+
+    if not times:
         return True
 
     # 最新バックアップの作成時刻を確認
-    mtime = datetime.fromtimestamp(latest.stat().st_mtime)
     threshold = datetime.now() - timedelta(hours=hours)
-
-    return mtime < threshold
+    return max(times) < threshold
 
 
 def create_backup(db_path, backup_dir, prefix="stock_pnl_backup"):
@@ -101,16 +141,52 @@ def create_backup(db_path, backup_dir, prefix="stock_pnl_backup"):
     backup_filename = f"{prefix}_{timestamp}.db"
     backup_path = backup_dir / backup_filename
 
+    # 完了前のファイルが最新のバックアップとして扱われないよう一時ファイルに作成
+    temporary_path = backup_dir / f"{backup_filename}.tmp"
+
     try:
-        shutil.copy2(db_path, backup_path)
+        started = time.perf_counter()
+        copy_database(db_path, temporary_path)
+        os.replace(temporary_path, backup_path)
+        elapsed = time.perf_counter() - started
         file_size = backup_path.stat().st_size / (1024 * 1024)  # MB
-        logger.info(f"バックアップ作成完了: {backup_path} ({file_size:.2f} MB)")
+        logger.info(
+            f"バックアップ作成完了: {backup_path} ({file_size:.2f} MB, {elapsed:.1f}秒)"
+        )
         return backup_path
     except Exception as e:
+        temporary_path.unlink(missing_ok=True)
         logger.error(f"バックアップ作成失敗: {e}")
         return None
 
 
+def copy_database(db_path, target_path, pages=None, sleep=None):
+    """
+    SQLiteのオンラインバックアップAPIでデータベースをコピー
+
+    WALの未書き戻し分を含むコミット済みの内容を一貫した状態でコピーする。
+    コピー中に他の接続から書き込まれた場合は、SQLiteが残りのステップで反映する。
+
+    Args:
+        db_path: コピー元のデータベースファイル
+        target_path: コピー先のファイル（既存なら上書き）
+        pages: 1ステップでコピーするページ数
+        sleep: ステップ間の待ち時間（秒）
+    """
+    pages = pages or BACKUP_PAGES_PER_STEP
+    sleep = BACKUP_STEP_SLEEP if sleep is None else sleep
+
+    source = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    try:
+        target = sqlite3.connect(str(target_path))
+        try:
+            source.backup(target, pages=pages, sleep=sleep)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
 def cleanup_old_backups(backup_dir, keep_days=7):
     """
     古いバックアップを削除
@@ -140,15 +216,108 @@ def cleanup_old_backups(backup_dir, keep_days=7):
         logger.info(f"{deleted_count}件の古いバックアップを削除しました")
 
 
-def create_auto_backup(app):
+def _try_lock(lock_path):
+    """
+    ロックファイルを排他ロック（待たずに失敗を返す）
+
+    Returns:
+        file: ロックしたファイル（release_lock() で解放）、他プロセスが保持中ならNone
+    """
+    handle = open(lock_path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def _release_lock(handle):
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        handle.close()
+
+
+def run_locked_backup(
+    db_path, backup_dir, interval_hours=24, keep_days=7, backup_format="snapshot"
+):
+    """
+    ロックを取得できた1プロセスだけがバックアップを作成
+
+    ロック取得後に最新バックアップの時刻を再確認するため、
+    同じ間隔内に複数のワーカーが起動してもバックアップは1つだけ作成される。
+
+    Args:
+        backup_format: 'snapshot'（差分スナップショット）または 'copy'（全体のコピー）
+
+    Returns:
+        dict or Path: 'snapshot' なら create_snapshot() の結果、
+            'copy' なら作成されたバックアップファイルのパス。スキップ時はNone
+    """
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    lock = _try_lock(backup_dir / AUTO_BACKUP_LOCK_NAME)
+    if lock is None:
+        logger.info("他のプロセスがバックアップ中のためスキップ")
+        return None
+
+    try:
+        if not should_create_backup(backup_dir, hours=interval_hours):
+            logger.info(f"{interval_hours}時間以内にバックアップ済みのためスキップ")
+            return None
+
+        # 中断されたバックアップの一時ファイルを削除
+        for leftover in backup_dir.glob("stock_pnl_backup_*.db.tmp"):
+            leftover.unlink(missing_ok=True)
+
+        if backup_format == "snapshot":
+            return _run_snapshot(db_path, backup_dir / SNAPSHOT_DIR_NAME, keep_days)
+
+        backup_path = create_backup(db_path, backup_dir)
+        cleanup_old_backups(backup_dir, keep_days=keep_days)
+        return backup_path
+    finally:
+        _release_lock(lock)
+
+
+def _run_snapshot(db_path, store_dir, keep_days):
+    from app.utils.backup_store import create_snapshot, prune_snapshots
+
+    if not Path(db_path).exists():
+        logger.warning(f"データベースファイルが存在しません: {db_path}")
+        return None
+
+    for leftover in Path(store_dir).glob(".*.tmp"):
+        leftover.unlink(missing_ok=True)
+
+    result = create_snapshot(db_path, store_dir)
+    prune_snapshots(store_dir, keep_days=keep_days)
+    return result
+
+
+def create_auto_backup(app, background=False):
     """
     アプリケーション起動時の自動バックアップ
 
     Args:
         app: Flaskアプリケーションインスタンス
+        background: Trueならバックグラウンドスレッドで作成して即座に戻る。
+            スレッドはプロセス終了時に中断されるため、サーバープロセスでのみ使用する
+            （CLI・スクリプトではマイグレーション前のバックアップを失わないよう同期で作成）
 
     Returns:
-        Path: 作成されたバックアップファイルのパス、スキップ時はNone
+        Thread or dict or Path: background=True なら作成中のスレッド、
+            False なら run_locked_backup() の結果。スキップ時はNone
     """
     # テスト環境ではスキップ
     if app.config.get("TESTING"):
@@ -163,20 +332,37 @@ def create_auto_backup(app):
     backup_dir = get_backup_dir(app)
     db_path = get_db_path(app)
 
-    # 24時間以内にバックアップがあればスキップ
+    # 間隔内にバックアップがあればスレッドを起動せずにスキップ
     backup_interval = app.config.get("BACKUP_INTERVAL_HOURS", 24)
     if not should_create_backup(backup_dir, hours=backup_interval):
-        logger.info("24時間以内にバックアップ済みのためスキップ")
+        logger.info(f"{backup_interval}時間以内にバックアップ済みのためスキップ")
         return None
 
-    # バックアップ作成
-    backup_path = create_backup(db_path, backup_dir)
-
-    # 古いバックアップを削除
     keep_days = app.config.get("BACKUP_RETENTION_DAYS", 7)
-    cleanup_old_backups(backup_dir, keep_days=keep_days)
+    backup_format = app.config.get("BACKUP_FORMAT", "snapshot")
+    if backup_format not in BACKUP_FORMATS:
+        raise ValueError(f"不正なバックアップ形式です: {backup_format}")
+
+    args = (db_path, backup_dir, backup_interval, keep_days, backup_format)
+    if not background:
+        return run_locked_backup(*args)
+
+    thread = threading.Thread(
+        target=_run_auto_backup,
+        args=args,
+        name="auto-backup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
 
-    return backup_path
+
+def _run_auto_backup(*args):
+    try:
+        run_locked_backup(*args)
+    except Exception as e:
+        # バックアップ失敗してもアプリは動作を続ける
+        logger.warning(f"自動バックアップ失敗: {e}")
 
 
 def create_test_backup(db_path=None, backup_dir=None):
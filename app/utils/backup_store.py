@@ -0,0 +1,371 @@
+"""
+差分スナップショットによるバックアップストア
+
+データベースを固定サイズのチャンクに分割し、チャンクごとに内容のハッシュ（SHA-256）を
+名前として圧縮保存する（コンテンツアドレス）。スナップショットはチャンクのハッシュの並びで、
+前回から変更のないチャンクは保存済みのものを共有するため、2回目以降の書き込み量は
+変更されたページを含むチャンクだけになる。内容が前回のスナップショットと同じ場合は
+スナップショット自体を作成しない。
+
+- 取得: SQLiteのオンラインバックアップAPIで一時ファイルにコピーしてから分割
+- 圧縮: zstandard があれば zstd、なければ gzip（チャンク単位で逐次処理）
+- 一覧: manifest.json のみを読み込む（チャンクを展開しない）
+- 復元: 全チャンクとファイル全体のハッシュ・PRAGMA integrity_check を確認してから置き換え
+
+構成:
+    <store_dir>/manifest.json
+    <store_dir>/objects/<ハッシュ先頭2文字>/<ハッシュ>.zst|.gz
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.utils.logger import get_logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger("backup_store")
+
+MANIFEST_NAME = "manifest.json"
+OBJECTS_DIR = "objects"
+
+# チャンクサイズ（SQLiteのページサイズの倍数）
+CHUNK_SIZE = 1024 * 1024
+
+CODEC_EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+COMPRESS_LEVELS = {"zstd": 3, "gzip": 6}
+
+
+class SnapshotError(Exception):
+    """スナップショットの検証・復元の失敗"""
+
+
+def default_codec():
+    """利用できる圧縮形式（zstandard があれば 'zstd'、なければ 'gzip'）"""
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def create_snapshot(db_path, store_dir, codec=None):
+    """
+    データベースのスナップショットを作成
+
+    Args:
+        db_path: データベースファイルのパス
+        store_dir: ストアのディレクトリ
+        codec: 'zstd' または 'gzip'（省略時は default_codec()）
+
+    Returns:
+        dict: {'id', 'created_at', 'sha256', 'size', 'chunks', 'new_chunks',
+               'stored_bytes', 'skipped'}（skipped=True なら前回と同じ内容のため未作成）
+    """
+    from app.utils.backup import copy_database
+
+    codec = codec or default_codec()
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("zstd圧縮にはzstandardのインストールが必要です")
+
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    now = datetime.now()
+    temporary = store_dir / f".snapshot.{os.getpid()}.db.tmp"
+
+    try:
+        copy_database(db_path, temporary)
+
+        total = hashlib.sha256()
+        chunks = []
+        new_chunks = 0
+        stored_bytes = 0
+        with open(temporary, "rb") as f:
+            while True:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                total.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                chunks.append(digest)
+                if _find_object(store_dir, digest) is None:
+                    stored_bytes += _write_object(store_dir, digest, data, codec)
+                    new_chunks += 1
+        size = temporary.stat().st_size
+    finally:
+        temporary.unlink(missing_ok=True)
+
+    manifest = load_manifest(store_dir)
+    snapshots = manifest["snapshots"]
+    snapshot = {
+        "id": now.strftime("%Y%m%d_%H%M%S"),
+        "created_at": now.isoformat(timespec="seconds"),
+        "sha256": total.hexdigest(),
+        "size": size,
+        "codec": codec,
+        "chunks": chunks,
+    }
+
+    skipped = bool(snapshots) and snapshots[-1]["sha256"] == snapshot["sha256"]
+    if skipped:
+        snapshot = snapshots[-1]
+        logger.info(f"前回と同じ内容のためスナップショットを省略: {snapshot['id']}")
+    else:
+        if snapshots and snapshots[-1]["id"] == snapshot["id"]:
+            snapshot["id"] = now.strftime("%Y%m%d_%H%M%S_%f")
+        snapshots.append(snapshot)
+        logger.info(
+            f"スナップショット作成: {snapshot['id']} "
+            f"({size / 1024 / 1024:.2f} MB, 新規チャンク {new_chunks}/{len(chunks)}, "
+            f"書き込み {stored_bytes / 1024 / 1024:.2f} MB)"
+        )
+
+    manifest["checked_at"] = now.isoformat(timespec="seconds")
+    _write_manifest(store_dir, manifest)
+
+    return {
+        **{key: snapshot[key] for key in ("id", "created_at", "sha256", "size")},
+        "chunks": len(snapshot["chunks"]),
+        "new_chunks": new_chunks,
+        "stored_bytes": stored_bytes,
+        "skipped": skipped,
+    }
+
+
+def list_snapshots(store_dir):
+    """
+    スナップショットの一覧（新しい順、マニフェストのみ参照）
+
+    Returns:
+        list: [{'id', 'created_at', 'sha256', 'size', 'codec', 'chunks'}, ...]
+    """
+    return list(reversed(load_manifest(store_dir)["snapshots"]))
+
+
+def get_snapshot(store_dir, snapshot_id=None):
+    """
+    スナップショットを取得
+
+    Args:
+        snapshot_id: スナップショットID（省略時は最新）
+
+    Returns:
+        dict: スナップショット（見つからなければ None）
+    """
+    snapshots = load_manifest(store_dir)["snapshots"]
+    if snapshot_id is None:
+        return snapshots[-1] if snapshots else None
+    return next((s for s in snapshots if s["id"] == snapshot_id), None)
+
+
+def last_checked_at(store_dir):
+    """最後にスナップショットを確認（作成または省略）した日時"""
+    checked_at = load_manifest(store_dir).get("checked_at")
+    return datetime.fromisoformat(checked_at) if checked_at else None
+
+
+def verify_snapshot(store_dir, snapshot_id=None):
+    """
+    スナップショットを展開してハッシュを確認（ファイルには書き出さない）
+
+    Raises:
+        SnapshotError: チャンクの欠落・ハッシュの不一致
+    """
+    snapshot = _require_snapshot(store_dir, snapshot_id)
+    total = hashlib.sha256()
+    for data in _iter_chunks(store_dir, snapshot):
+        total.update(data)
+    if total.hexdigest() != snapshot["sha256"]:
+        raise SnapshotError(
+            f"スナップショットのハッシュが一致しません: {snapshot['id']}"
+        )
+    return snapshot
+
+
+def restore_snapshot(store_dir, target_path, snapshot_id=None):
+    """
+    スナップショットからデータベースを復元
+
+    一時ファイルに展開し、全チャンク・ファイル全体のハッシュと
+    PRAGMA integrity_check を確認してから置き換える（失敗時は既存のDBを変更しない）。
+
+    Args:
+        store_dir: ストアのディレクトリ
+        target_path: 復元先のデータベースファイル
+        snapshot_id: スナップショットID（省略時は最新）
+
+    Returns:
+        dict: 復元したスナップショット
+
+    Raises:
+        SnapshotError: 検証の失敗
+    """
+    snapshot = _require_snapshot(store_dir, snapshot_id)
+    target_path = Path(target_path)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target_path.with_name(f".{target_path.name}.restore.tmp")
+
+    try:
+        total = hashlib.sha256()
+        with open(temporary, "wb") as f:
+            for data in _iter_chunks(store_dir, snapshot):
+                total.update(data)
+                f.write(data)
+        if total.hexdigest() != snapshot["sha256"]:
+            raise SnapshotError(
+                f"スナップショットのハッシュが一致しません: {snapshot['id']}"
+            )
+
+        conn = sqlite3.connect(str(temporary))
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != "ok":
+            raise SnapshotError(f"整合性チェックに失敗しました: {result}")
+
+        os.replace(temporary, target_path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+    # 復元前のDBのWAL・共有メモリファイルが残っていると復元後のDBに適用されるため削除
+    for suffix in ("-wal", "-shm"):
+        Path(f"{target_path}{suffix}").unlink(missing_ok=True)
+
+    logger.info(f"スナップショットから復元: {snapshot['id']} -> {target_path}")
+    return snapshot
+
+
+def prune_snapshots(store_dir, keep_days=7, keep_min=1):
+    """
+    保持期間を過ぎたスナップショットと、参照されなくなったチャンクを削除
+
+    Args:
+        keep_days: 保持する日数
+        keep_min: 期間に関わらず残す最新のスナップショット数
+
+    Returns:
+        dict: {'snapshots': 削除数, 'objects': 削除したチャンク数}
+    """
+    store_dir = Path(store_dir)
+    manifest = load_manifest(store_dir)
+    snapshots = manifest["snapshots"]
+    threshold = datetime.now() - timedelta(days=keep_days)
+
+    kept = [
+        s
+        for i, s in enumerate(snapshots)
+        if i >= len(snapshots) - keep_min
+        or datetime.fromisoformat(s["created_at"]) >= threshold
+    ]
+    removed_snapshots = len(snapshots) - len(kept)
+    if removed_snapshots:
+        manifest["snapshots"] = kept
+        _write_manifest(store_dir, manifest)
+
+    referenced = {digest for s in kept for digest in s["chunks"]}
+    removed_objects = 0
+    objects_dir = store_dir / OBJECTS_DIR
+    if objects_dir.exists():
+        for path in objects_dir.glob("*/*"):
+            if path.name.split(".")[0] not in referenced:
+                path.unlink()
+                removed_objects += 1
+
+    if removed_snapshots or removed_objects:
+        logger.info(
+            f"古いスナップショットを削除: {removed_snapshots}件 "
+            f"(チャンク {removed_objects}件)"
+        )
+    return {"snapshots": removed_snapshots, "objects": removed_objects}
+
+
+# ----------------------------------------------------------------------
+# マニフェスト・チャンク
+# ----------------------------------------------------------------------
+
+
+def load_manifest(store_dir):
+    """マニフェストを読み込み（未作成なら空）"""
+    path = Path(store_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {"version": 1, "chunk_size": CHUNK_SIZE, "snapshots": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_manifest(store_dir, manifest):
+    path = Path(store_dir) / MANIFEST_NAME
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8"
+    )
+    os.replace(temporary, path)
+
+
+def _require_snapshot(store_dir, snapshot_id):
+    snapshot = get_snapshot(store_dir, snapshot_id)
+    if snapshot is None:
+        raise SnapshotError(
+            f"スナップショットが見つかりません: {snapshot_id or '(最新)'}"
+        )
+    return snapshot
+
+
+def _object_path(store_dir, digest, codec):
+    return (
+        Path(store_dir)
+        / OBJECTS_DIR
+        / digest[:2]
+        / f"{digest}{CODEC_EXTENSIONS[codec]}"
+    )
+
+
+def _find_object(store_dir, digest):
+    """保存済みのチャンクを探す（圧縮形式によらない）"""
+    for codec in CODEC_EXTENSIONS:
+        path = _object_path(store_dir, digest, codec)
+        if path.exists():
+            return path, codec
+    return None
+
+
+def _write_object(store_dir, digest, data, codec):
+    """チャンクを圧縮して保存（一時ファイルから置き換え）し、保存したバイト数を返す"""
+    if codec == "zstd":
+        compressed = zstandard.ZstdCompressor(level=COMPRESS_LEVELS[codec]).compress(
+            data
+        )
+    else:
+        compressed = gzip.compress(data, compresslevel=COMPRESS_LEVELS[codec], mtime=0)
+
+    path = _object_path(store_dir, digest, codec)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(compressed)
+    os.replace(temporary, path)
+    return len(compressed)
+
+
+def _iter_chunks(store_dir, snapshot):
+    """スナップショットのチャンクを展開して順に返す（チャンクごとにハッシュを確認）"""
+    for digest in snapshot["chunks"]:
+        found = _find_object(store_dir, digest)
+        if found is None:
+            raise SnapshotError(f"チャンクが見つかりません: {digest}")
+        path, codec = found
+        if codec == "zstd" and zstandard is None:
+            raise SnapshotError("zstd形式のチャンクの展開にはzstandardが必要です")
+        try:
+            if codec == "zstd":
+                data = zstandard.ZstdDecompressor().decompress(path.read_bytes())
+            else:
+                data = gzip.decompress(path.read_bytes())
+        except Exception as e:
+            raise SnapshotError(f"チャンクを展開できません: {digest} ({e})") from e
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f"チャンクのハッシュが一致しません: {digest}")
+        yield data
@@ -0,0 +1,174 @@
+"""
+データバージョン管理
+
+テーブル単位の書き込みバージョンを data_versions テーブルで管理し、
+集計結果のキャッシュをバージョン一致で再利用する。
+ORMのflushとバルクUPDATE/DELETEを検知して自動でインクリメントするため、
+複数ワーカー間でもキャッシュの無効化が伝播する。
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from app.utils.logger import get_logger
+
+logger = get_logger("data_version")
+
+DATA_VERSION_TABLE = "data_versions"
+
+_listeners_registered = False
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _version_table():
+    from app.models.data_version import DataVersion
+
+    return DataVersion.__table__
+
+
+def bump_data_version(connection, table_names):
+    """
+    指定テーブルのバージョンをインクリメント
+
+    Args:
+        connection: SQLAlchemy Connection（書き込み中のトランザクション）
+        table_names: テーブル名のイテラブル
+    """
+    table = _version_table()
+    now = datetime.utcnow()
+
+    for table_name in sorted(set(table_names)):
+        if table_name == DATA_VERSION_TABLE:
+            continue
+
+        if connection.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+            stmt = sqlite_insert(table).values(
+                table_name=table_name, version=1, updated_at=now
+            )
+            connection.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[table.c.table_name],
+                    set_={"version": table.c.version + 1, "updated_at": now},
+                )
+            )
+        else:
+            result = connection.execute(
+                update(table)
+                .where(table.c.table_name == table_name)
+                .values(version=table.c.version + 1, updated_at=now)
+            )
+            if result.rowcount == 0:
+                connection.execute(
+                    table.insert().values(
+                        table_name=table_name, version=1, updated_at=now
+                    )
+                )
+
+
+def _tables_in_flush(session):
+    """flush対象のオブジェクトからテーブル名を収集"""
+    tables = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            tables.add(table.name)
+    return tables
+
+
+def _after_flush(session, flush_context):
+    tables = _tables_in_flush(session)
+    if tables:
+        bump_data_version(session.connection(), tables)
+
+
+def _do_orm_execute(orm_execute_state):
+    # query.delete() / query.update() などのバルク操作はflushを経由しない
+    if not (
+        orm_execute_state.is_update
+        or orm_execute_state.is_delete
+        or orm_execute_state.is_insert
+    ):
+        return
+
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+
+    bump_data_version(orm_execute_state.session.connection(), [mapper.local_table.name])
+
+
+def register_data_version_listeners():
+    """Sessionイベントにバージョン更新フックを登録（複数回呼んでも1度だけ登録）"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    _listeners_registered = True
+
+
+def get_data_version(*table_names):
+    """
+    テーブルの現在バージョンを取得
+
+    Args:
+        *table_names: テーブル名
+
+    Returns:
+        tuple: テーブル名順の (version, updated_at) タプル。未登録テーブルは (0, None)
+    """
+    from app import db
+
+    table = _version_table()
+    rows = db.session.execute(
+        select(table.c.table_name, table.c.version, table.c.updated_at).where(
+            table.c.table_name.in_(table_names)
+        )
+    ).all()
+    versions = {row.table_name: (row.version, row.updated_at) for row in rows}
+    return tuple(versions.get(name, (0, None)) for name in table_names)
+
+
+def cached_by_data_version(key, table_names, builder, max_age=None):
+    """
+    データバージョンが変わらない限り builder の結果を再利用する
+
+    Args:
+        key: キャッシュキー
+        table_names: 依存するテーブル名のリスト
+        builder: 結果を生成する引数なしの関数
+        max_age: 最大保持秒数（為替レートなど外部データに依存する場合に指定）
+
+    Returns:
+        builder() の結果（キャッシュヒット時は前回の結果）
+    """
+    version = get_data_version(*table_names)
+    now = time.monotonic()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None:
+        cached_version, cached_at, value = entry
+        if cached_version == version and (max_age is None or now - cached_at < max_age):
+            return value
+
+    value = builder()
+
+    with _cache_lock:
+        _cache[key] = (version, now, value)
+    logger.info(f"キャッシュ再構築: {key} version={[v[0] for v in version]}")
+    return value
+
+
+def clear_data_version_cache():
+    """プロセス内のキャッシュをクリア"""
+    with _cache_lock:
+        _cache.clear()
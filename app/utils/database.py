@@ -0,0 +1,153 @@
+"""
+SQLiteのストレージプロファイル
+
+接続確立時に PRAGMA を適用する（WALジャーナル・synchronous=NORMAL・
+mmap・ページキャッシュ・busy_timeout）。WALでは読み取りが書き込みを
+待たないため、複数ワーカーで株価キャッシュの更新中も参照系APIが詰まらない。
+
+集計・エクスポートのような長い読み取りは readonly_connection() の
+読み取り専用接続（mode=ro, query_only）で実行し、書き込み用の
+コネクションプールとセッションから切り離す。
+"""
+
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from app.utils.logger import get_logger
+
+logger = get_logger("database")
+
+SQLITE_PROFILE_DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+    "SQLITE_CACHE_SIZE_KB": 64 * 1024,
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+}
+
+_READONLY_ENGINE_KEY = "sqlite_readonly_engine"
+
+
+def is_file_sqlite(url):
+    """ファイルベースのSQLiteかどうか（インメモリDBを除く）"""
+    url = make_url(url)
+    return (
+        url.get_backend_name() == "sqlite"
+        and url.database not in (None, "", ":memory:")
+        and url.query.get("mode") != "memory"
+    )
+
+
+def sqlite_pragmas(config, readonly=False):
+    """
+    接続時に適用する PRAGMA の一覧
+
+    Args:
+        config: アプリケーション設定
+        readonly: 読み取り専用接続の場合True（journal_mode・synchronousは設定しない）
+
+    Returns:
+        list: [(PRAGMA名, 値)]
+    """
+
+    def setting(name):
+        return config.get(name, SQLITE_PROFILE_DEFAULTS[name])
+
+    pragmas = []
+    if readonly:
+        pragmas.append(("query_only", "ON"))
+    else:
+        if setting("SQLITE_JOURNAL_MODE"):
+            pragmas.append(("journal_mode", setting("SQLITE_JOURNAL_MODE")))
+        if setting("SQLITE_SYNCHRONOUS"):
+            pragmas.append(("synchronous", setting("SQLITE_SYNCHRONOUS")))
+    pragmas += [
+        ("mmap_size", int(setting("SQLITE_MMAP_SIZE"))),
+        # 負の値はKiB単位
+        ("cache_size", -int(setting("SQLITE_CACHE_SIZE_KB"))),
+        ("busy_timeout", int(setting("SQLITE_BUSY_TIMEOUT_MS"))),
+    ]
+    return pragmas
+
+
+def register_pragmas(engine, pragmas):
+    """接続確立時に PRAGMA を適用するイベントを登録"""
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def configure_sqlite(app, engine):
+    """
+    SQLiteエンジンに接続時の PRAGMA を登録
+
+    Args:
+        app: Flaskアプリケーション
+        engine: 書き込み用エンジン（db.engine）
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = sqlite_pragmas(app.config)
+    if not is_file_sqlite(engine.url):
+        # インメモリDBはWALに対応しない
+        pragmas = [p for p in pragmas if p[0] not in ("journal_mode", "mmap_size")]
+
+    register_pragmas(engine, pragmas)
+    logger.info(
+        "SQLiteプロファイル適用: "
+        + ", ".join(f"{name}={value}" for name, value in pragmas)
+    )
+
+
+def get_readonly_engine(app=None):
+    """
+    集計用の読み取り専用エンジン（アプリごとに1つ）
+
+    ファイルベースのSQLite以外では None（書き込み用のセッションで読み取る）
+    """
+    from app import db
+
+    app = app or current_app._get_current_object()
+    if _READONLY_ENGINE_KEY in app.extensions:
+        return app.extensions[_READONLY_ENGINE_KEY]
+
+    with app.app_context():
+        url = db.engine.url
+
+    engine = None
+    if app.config.get("SQLITE_READONLY_ANALYTICS", True) and is_file_sqlite(url):
+        engine = create_engine(f"sqlite:///file:{url.database}?mode=ro&uri=true")
+        register_pragmas(engine, sqlite_pragmas(app.config, readonly=True))
+        logger.info(f"読み取り専用エンジン作成: {url.database}")
+
+    app.extensions[_READONLY_ENGINE_KEY] = engine
+    return engine
+
+
+@contextmanager
+def readonly_connection():
+    """
+    集計・エクスポート用の読み取り専用接続
+
+    Yields:
+        Connection: 読み取り専用接続（使えない場合はセッションの接続）
+    """
+    from app import db
+
+    engine = get_readonly_engine()
+    if engine is None:
+        yield db.session.connection()
+        return
+
+    with engine.connect() as connection:
+        yield connection
@@ -71,13 +71,10 @@ def handle_app_error(error):
 
 def handle_generic_error(error):
     """一般的なエラーハンドラー"""
-    import traceback
+    from flask import current_app, jsonify
 
-    from flask import jsonify
-
-    # ログに詳細を記録（本番環境では適切なロギングシステムを使用）
-    print(f"Unhandled error: {str(error)}")
-    print(traceback.format_exc())
+    # ログに詳細を記録（トレースバックを含む）
+    current_app.logger.error(f"Unhandled error: {str(error)}", exc_info=error)
 
     response = jsonify({"success": False, "error": "予期しないエラーが発生しました"})
     response.status_code = 500
@@ -0,0 +1,142 @@
+"""
+HTTPキャッシュ（条件付きGET・レスポンス圧縮）
+
+参照系APIのETagを、依存テーブルのデータバージョン（data_versions）から作成する。
+ETagはレスポンス本文を生成せずに計算できるため、クライアントの If-None-Match と
+一致すれば集計を行わずに 304 を返す（データバージョンの取得1クエリのみ）。
+
+- ETag: リクエストのパス・クエリ、依存テーブルのバージョン、日付
+  （為替レート等の外部データに依存する場合は max_age 秒ごとの時間枠）から作成した弱いETag
+- 圧縮: 一定サイズ以上のJSONを、Accept-Encoding に応じて brotli（インストール時）
+  または gzip で圧縮
+"""
+
+import gzip
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+
+from flask import current_app, has_app_context, make_response, request
+
+from app.utils.data_version import get_data_version
+from app.utils.logger import get_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = get_logger("http_cache")
+
+DEFAULTS = {
+    "HTTP_CACHE_ENABLED": True,
+    # 圧縮する最小サイズ（バイト）
+    "HTTP_COMPRESS_MIN_BYTES": 1024,
+    "HTTP_COMPRESS_LEVEL": 6,
+}
+
+
+def _config(name):
+    config = current_app.config if has_app_context() else {}
+    return config.get(name, DEFAULTS[name])
+
+
+def compute_etag(table_names, max_age=None):
+    """
+    現在のリクエストとデータバージョンからETagを作成
+
+    Args:
+        table_names: レスポンスが依存するテーブル名のリスト
+        max_age: 外部データに依存する場合の最大保持秒数（この時間枠ごとにETagが変わる）
+
+    Returns:
+        str: ETag（引用符なし）
+    """
+    versions = get_data_version(*table_names)
+    parts = [
+        request.full_path,
+        ",".join(
+            f"{name}={version}" for name, (version, _) in zip(table_names, versions)
+        ),
+        date.today().isoformat(),
+    ]
+    if max_age:
+        parts.append(str(int(time.time() // max_age)))
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def compress_response(response):
+    """
+    Accept-Encoding に応じてレスポンスを圧縮（閾値未満・圧縮済み・ストリームは対象外）
+
+    Args:
+        response: Flask の Response
+
+    Returns:
+        Response: 圧縮した（または元の）レスポンス
+    """
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < _config("HTTP_COMPRESS_MIN_BYTES"):
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        encoding = "br"
+        compressed = brotli.compress(body, quality=_config("HTTP_COMPRESS_LEVEL"))
+    elif accepted["gzip"]:
+        encoding = "gzip"
+        compressed = gzip.compress(
+            body, compresslevel=_config("HTTP_COMPRESS_LEVEL"), mtime=0
+        )
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def conditional_response(table_names, max_age=None):
+    """
+    参照系APIに条件付きGET（ETag/304）と圧縮を適用するデコレータ
+
+    Args:
+        table_names: レスポンスが依存するテーブル名のリスト
+        max_age: 外部データ（為替レート等）に依存する場合の最大保持秒数
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _config("HTTP_CACHE_ENABLED"):
+                return view(*args, **kwargs)
+
+            etag = compute_etag(table_names, max_age)
+            if request.if_none_match.contains_weak(etag):
+                logger.debug(f"304 Not Modified: {request.path}")
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                response.cache_control.no_cache = True
+                response.vary.add("Accept-Encoding")
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                # 毎回ETagで再検証させる
+                response.cache_control.no_cache = True
+            return compress_response(response)
+
+        return wrapper
+
+    return decorator
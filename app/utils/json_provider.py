@@ -0,0 +1,84 @@
+"""
+JSONシリアライザ
+
+Flask の JSON プロバイダを orjson ベースに置き換える。orjson は date/datetime・
+dataclass・NumPy配列をネイティブに（C実装で）シリアライズし、UTF-8 のバイト列を
+直接生成するため、str を経由した encode が発生しない。
+orjson がインストールされていない環境では標準ライブラリの json で同じ形式を出力する。
+
+- date/datetime: ISO 8601（to_dict() の isoformat() と同じ）
+- Decimal: float
+- 非ASCII文字: エスケープせず UTF-8 のまま出力
+"""
+
+import dataclasses
+import json
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+)
+
+
+def _default(value):
+    """組み込み型以外の値の変換（orjson・標準ライブラリ共通）"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "tolist"):
+        # NumPy のスカラー・配列
+        return value.tolist()
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """
+    オブジェクトを UTF-8 の JSON バイト列に変換
+
+    Args:
+        obj: シリアライズする値
+
+    Returns:
+        bytes: JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONProvider(JSONProvider):
+    """orjson（なければ標準ライブラリ）を使う Flask の JSON プロバイダ"""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        # インデント等のオプション指定時は標準ライブラリで出力
+        if kwargs:
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", False)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
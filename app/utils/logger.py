@@ -1,54 +1,356 @@
 """
 ロギング設定
+
+ログはキュー（QueueHandler）に積むだけで、ファイルへの書き込みはバックグラウンドの
+スレッド（QueueListener）が行う。リクエスト処理のスレッドはディスクI/Oを待たない。
+
+- 出力先・ローテーション（LOG_ROTATION）:
+  date（既定）: logs/<ロガー名>_YYYYMMDD.log に日付ごとに出力（改名しないため複数ワーカーでも安全）
+  none: logs/<ロガー名>.log（外部の logrotate 向け。ローテーション後は新しいファイルを開き直す）
+  time（日次）/ size（LOG_MAX_BYTES ごと）: logs/<ロガー名>.log を改名してローテーション
+  （各プロセスが改名するため単一プロセスでの実行時のみ）
+- 形式（LOG_FORMAT）: text / json（1行1オブジェクト。extra で渡した値もフィールドとして出力）
+- DEBUGログは呼び出し箇所ごとに1秒あたり LOG_DEBUG_RATE_LIMIT 件までに間引き、
+  間引いた件数を次に出力するログに付記する
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
 
+LOG_DIR = Path(__file__).parent.parent.parent / "logs"
+
+DEFAULTS = {
+    # None: DEBUGモードでは DEBUG、それ以外は INFO
+    "LOG_LEVEL": None,
+    "LOG_FORMAT": "text",
+    "LOG_ROTATION": "date",
+    "LOG_MAX_BYTES": 10 * 1024 * 1024,
+    # 保持するローテーション済みファイル数（time: 日数、size: ファイル数）
+    "LOG_BACKUP_COUNT": 7,
+    # 呼び出し箇所ごとの1秒あたりのDEBUGログ件数（0: 間引かない）
+    "LOG_DEBUG_RATE_LIMIT": 20,
+}
+
+LOG_FORMATS = ("text", "json")
+LOG_ROTATIONS = ("date", "none", "time", "size")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# LogRecord の標準属性（これ以外は extra で渡された値）
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "destination",
+}
+
+# setup_logger() で確定する設定（アプリ外のスクリプトでは既定値）
+_settings = dict(DEFAULTS, LOG_LEVEL="INFO")
+
+_queue = queue.SimpleQueue()
+_listener = None
+_listener_lock = threading.Lock()
+_stopped = False
+
+# {ロガー名: ロガー}（setup_logger() でレベルを再設定する対象）
+_loggers = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1オブジェクトのJSONに整形"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created)
+            .astimezone()
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DatedFileHandler(logging.FileHandler):
+    """日付ごとのファイル（<名前>_YYYYMMDD.log）に追記するハンドラー
+
+    ファイルの改名・削除を行わないため、複数プロセスが同じログに書き込んでも失われない。
+    """
 
-def setup_logger(app):
+    def __init__(self, directory, name, encoding="utf-8"):
+        self._directory = Path(directory)
+        self._prefix = name
+        self._date = datetime.now().strftime("%Y%m%d")
+        super().__init__(self._path(), encoding=encoding, delay=True)
+
+    def _path(self):
+        return self._directory / f"{self._prefix}_{self._date}.log"
+
+    def emit(self, record):
+        date = datetime.fromtimestamp(record.created).strftime("%Y%m%d")
+        if date != self._date:
+            # 日付が変わったら次のファイルを開く
+            self._date = date
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = os.path.abspath(self._path())
+        super().emit(record)
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """DEBUGログを呼び出し箇所ごとに1秒あたりの件数で間引くフィルタ"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # {(ファイル, 行): [1秒間の開始時刻, 出力件数, 間引いた件数]}
+        self._windows = {}
+
+    def filter(self, record):
+        limit = _settings["LOG_DEBUG_RATE_LIMIT"]
+        if record.levelno > logging.DEBUG or not limit:
+            return True
+
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= 1.0:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [record.created, 1, 0]
+            elif window[1] < limit:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} （同じ箇所のDEBUGログを{suppressed}件省略）"
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """出力先（ロガー名）を付けてキューに積むハンドラー"""
+
+    def __init__(self, destination):
+        super().__init__(_queue)
+        self.destination = destination
+
+    def prepare(self, record):
+        # 例外のトレースバックは文字列にして残す（JSON形式で別フィールドにするため）
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.destination = self.destination
+        return record
+
+    def enqueue(self, record):
+        if _stopped:
+            # 終了処理後は呼び出し元のスレッドで書き込む
+            _router.handle(record)
+            return
+        _queue.put_nowait(record)
+        if _listener is None:
+            _start_listener()
+
+
+class _LogRouter(logging.Handler):
+    """キューから取り出したログを出力先ごとのファイルハンドラーに振り分ける"""
+
+    def __init__(self):
+        super().__init__()
+        self._handlers = {}
+        # アプリケーションログ（app）のみコンソールにも出力
+        self.console = None
+
+    def emit(self, record):
+        flush_event = getattr(record, "flush_event", None)
+        if flush_event is not None:
+            for handler in self._handlers.values():
+                handler.flush()
+            flush_event.set()
+            return
+
+        handler = self._handlers.get(record.destination)
+        if handler is None:
+            handler = self._handlers[record.destination] = _create_file_handler(
+                record.destination
+            )
+        handler.handle(record)
+        if (
+            record.destination == "app"
+            and self.console is not None
+            and record.levelno >= self.console.level
+        ):
+            self.console.handle(record)
+
+    def reset(self):
+        """ファイルハンドラーを閉じる（次のログで現在の設定により開き直す）"""
+        with self.lock:
+            for handler in self._handlers.values():
+                handler.close()
+            self._handlers.clear()
+
+
+_router = _LogRouter()
+_debug_filter = DebugRateLimitFilter()
+
+
+def _formatter():
+    if _settings["LOG_FORMAT"] == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+
+def _create_file_handler(name):
+    """LOG_ROTATION に応じたファイルハンドラーを作成"""
+    LOG_DIR.mkdir(exist_ok=True)
+    log_file = LOG_DIR / f"{name}.log"
+    rotation = _settings["LOG_ROTATION"]
+    if rotation == "date":
+        handler = DatedFileHandler(LOG_DIR, name)
+    elif rotation == "size":
+        handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=_settings["LOG_MAX_BYTES"],
+            backupCount=_settings["LOG_BACKUP_COUNT"],
+            encoding="utf-8",
+            delay=True,
+        )
+    elif rotation == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file,
+            when="midnight",
+            backupCount=_settings["LOG_BACKUP_COUNT"],
+            encoding="utf-8",
+            delay=True,
+        )
+    else:
+        handler = logging.handlers.WatchedFileHandler(
+            log_file, encoding="utf-8", delay=True
+        )
+    handler.setFormatter(_formatter())
+    return handler
+
+
+def _start_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None and not _stopped:
+            listener = logging.handlers.QueueListener(_queue, _router)
+            listener.start()
+            _listener = listener
+
+
+def flush_logging(timeout=5.0):
     """
-    ロガーをセットアップ
+    キューに積まれたログの書き込みを待つ
 
     Args:
-        app: Flask application instance
+        timeout: 最大待ち時間（秒）
+
+    Returns:
+        bool: 書き込みが完了した場合 True
     """
-    # ログディレクトリの作成
-    log_dir = Path(__file__).parent.parent.parent / "logs"
-    log_dir.mkdir(exist_ok=True)
+    if _listener is None:
+        return True
+    event = threading.Event()
+    _queue.put_nowait(logging.makeLogRecord({"flush_event": event}))
+    return event.wait(timeout)
 
-    # ログファイル名（日付付き）
-    log_file = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
 
-    # ログフォーマット
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+def stop_logging():
+    """キューに残ったログを書き込んでリスナーを停止（プロセス終了時に自動で実行）"""
+    global _listener, _stopped
+    with _listener_lock:
+        _stopped = True
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+    _router.reset()
+
 
-    # ファイルハンドラー
-    file_handler = logging.FileHandler(log_file, encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
+def _after_fork_in_child():
+    # リスナーのスレッドは fork 先に引き継がれないため、キューを作り直して次のログで開始
+    global _queue, _listener
+    _queue = queue.SimpleQueue()
+    _listener = None
 
-    # コンソールハンドラー（開発環境のみ）
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG if app.debug else logging.WARNING)
-    console_handler.setFormatter(formatter)
 
-    # Flaskアプリケーションのロガー設定
-    app.logger.setLevel(logging.DEBUG if app.debug else logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(console_handler)
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
-    # 既存のハンドラーを削除（重複防止）
-    if app.logger.hasHandlers():
-        for handler in app.logger.handlers[
-            :-2
-        ]:  # 最後の2つ（上で追加したもの）以外を削除
-            app.logger.removeHandler(handler)
+
+def _attach(logger, destination):
+    """ロガーにキューへのハンドラーとDEBUGログの間引きを設定"""
+    logger.addHandler(_QueueHandler(destination))
+    logger.addFilter(_debug_filter)
+    logger.setLevel(_settings["LOG_LEVEL"])
+    _loggers[logger.name] = logger
+
+
+def setup_logger(app):
+    """
+    ロガーをセットアップ
+
+    Args:
+        app: Flask application instance
+    """
+    config = app.config
+    settings = {name: config.get(name, default) for name, default in DEFAULTS.items()}
+    if settings["LOG_FORMAT"] not in LOG_FORMATS:
+        raise ValueError(f"不正なログ形式です: {settings['LOG_FORMAT']}")
+    if settings["LOG_ROTATION"] not in LOG_ROTATIONS:
+        raise ValueError(
+            f"不正なログのローテーション方式です: {settings['LOG_ROTATION']}"
+        )
+    settings["LOG_LEVEL"] = (
+        settings["LOG_LEVEL"] or ("DEBUG" if app.debug else "INFO")
+    ).upper()
+
+    # キューに積まれたログを書き込んでから設定を切り替える
+    flush_logging()
+    with _router.lock:
+        _settings.update(settings)
+        _router.reset()
+        # コンソールハンドラー（開発環境のみDEBUGから出力）
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.DEBUG if app.debug else logging.WARNING)
+        console_handler.setFormatter(_formatter())
+        _router.console = console_handler
+
+    # Flaskアプリケーションのロガー設定（既存のハンドラーを削除して重複防止）
+    for handler in list(app.logger.handlers):
+        app.logger.removeHandler(handler)
+    _attach(app.logger, "app")
+    for logger in _loggers.values():
+        logger.setLevel(_settings["LOG_LEVEL"])
 
     app.logger.info("=" * 70)
     app.logger.info(
@@ -71,27 +373,8 @@ def get_logger(name):
     """
     logger = logging.getLogger(name)
 
-    if not logger.handlers:
-        # ログディレクトリの作成
-        log_dir = Path(__file__).parent.parent.parent / "logs"
-        log_dir.mkdir(exist_ok=True)
-
-        # ログファイル名
-        log_file = log_dir / f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
-
-        # フォーマッター
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
-
-        # ファイルハンドラー
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-
-        logger.addHandler(file_handler)
-        logger.setLevel(logging.INFO)
+    if name not in _loggers:
+        _attach(logger, name)
 
     return logger
 
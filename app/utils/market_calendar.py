@@ -0,0 +1,301 @@
+"""
+市場カレンダー
+
+東証（TSE）・米国市場（NYSE/NASDAQ）・韓国取引所（KRX）の取引時間と休場日を扱う。
+休場日は規則（祝日法・NYSEの祝日規則）から年ごとに算出し、
+規則で求められない休場日（KRXの旧暦の祝日・臨時休場）は表と設定
+MARKET_EXTRA_HOLIDAYS（{'KRX': ['2027-02-08', ...]}）で補う。
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from flask import current_app, has_app_context
+
+from app.utils.logger import get_logger
+
+logger = get_logger("market_calendar")
+
+MARKETS = {
+    "TSE": {
+        "name": "東京証券取引所",
+        "timezone": "Asia/Tokyo",
+        "open": time(9, 0),
+        "close": time(15, 30),
+    },
+    "US": {
+        "name": "NYSE / NASDAQ",
+        "timezone": "America/New_York",
+        "open": time(9, 30),
+        "close": time(16, 0),
+    },
+    "KRX": {
+        "name": "韓国取引所",
+        "timezone": "Asia/Seoul",
+        "open": time(9, 0),
+        "close": time(15, 30),
+    },
+}
+
+# 東京五輪に伴う祝日の移動
+_JP_HOLIDAY_OVERRIDES = {
+    2020: {
+        "remove": [(7, 20), (8, 11), (10, 12)],
+        "add": [(7, 23), (7, 24), (8, 10)],
+    },
+    2021: {
+        "remove": [(7, 19), (8, 11), (10, 11)],
+        "add": [(7, 22), (7, 23), (8, 8), (8, 9)],
+    },
+}
+
+# KRXの旧暦の祝日（旧正月・釈迦誕生日・秋夕）と振替休日
+_KRX_LUNAR_HOLIDAYS = {
+    2024: [
+        "2024-02-09",
+        "2024-02-12",
+        "2024-05-15",
+        "2024-09-16",
+        "2024-09-17",
+        "2024-09-18",
+    ],
+    2025: [
+        "2025-01-28",
+        "2025-01-29",
+        "2025-01-30",
+        "2025-05-06",
+        "2025-10-06",
+        "2025-10-07",
+        "2025-10-08",
+    ],
+    2026: [
+        "2026-02-16",
+        "2026-02-17",
+        "2026-02-18",
+        "2026-05-25",
+        "2026-09-24",
+        "2026-09-25",
+    ],
+}
+
+
+def market_for_ticker(ticker_symbol):
+    """銘柄コードから市場を判定（数字のみ・.T は東証、.KS/.KQ はKRX）"""
+    ticker = ticker_symbol.upper()
+    if ticker.isdigit() or ticker.endswith(".T") or ticker == "^N225":
+        return "TSE"
+    if ticker.endswith(".KS") or ticker.endswith(".KQ"):
+        return "KRX"
+    return "US"
+
+
+def _nth_weekday(year, month, weekday, n):
+    """月の第n曜日（n=-1で最終）"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """復活祭の日付（グレゴリオ暦）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _japan_holidays(year):
+    """日本の国民の祝日（振替休日・国民の休日を含む）"""
+    offset = year - 1980
+    vernal = int(20.8431 + 0.242194 * offset - offset // 4)
+    autumnal = int(23.2488 + 0.242194 * offset - offset // 4)
+
+    holidays = {
+        date(year, 1, 1),
+        _nth_weekday(year, 1, 0, 2),  # 成人の日
+        date(year, 2, 11),
+        date(year, 3, vernal),
+        date(year, 4, 29),
+        date(year, 5, 3),
+        date(year, 5, 4),
+        date(year, 5, 5),
+        _nth_weekday(year, 7, 0, 3),  # 海の日
+        date(year, 8, 11),
+        _nth_weekday(year, 9, 0, 3),  # 敬老の日
+        date(year, 9, autumnal),
+        _nth_weekday(year, 10, 0, 2),  # スポーツの日
+        date(year, 11, 3),
+        date(year, 11, 23),
+    }
+    if year >= 2020:
+        holidays.add(date(year, 2, 23))  # 天皇誕生日
+
+    override = _JP_HOLIDAY_OVERRIDES.get(year)
+    if override:
+        holidays -= {date(year, m, d) for m, d in override["remove"]}
+        holidays |= {date(year, m, d) for m, d in override["add"]}
+
+    # 振替休日: 日曜の祝日の後の最初の平日
+    for holiday in sorted(holidays):
+        if holiday.weekday() == 6:
+            substitute = holiday + timedelta(days=1)
+            while substitute in holidays:
+                substitute += timedelta(days=1)
+            holidays.add(substitute)
+
+    # 国民の休日: 祝日に挟まれた平日
+    for holiday in sorted(holidays):
+        between = holiday + timedelta(days=1)
+        if between not in holidays and between + timedelta(days=1) in holidays:
+            if between.weekday() != 6:
+                holidays.add(between)
+
+    return holidays
+
+
+def _observed_us(day):
+    """NYSEの振替（土曜→前日金曜、日曜→翌月曜）"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _us_holidays(year):
+    """NYSEの休場日"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed_us(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving Day
+        _observed_us(date(year, 12, 25)),
+    }
+    # 元日が土曜の場合は前年12/31に振り替えない（NYSE規則）
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed_us(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed_us(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+def _krx_holidays(year):
+    """KRXの休場日（新暦の祝日・労働者の日・年末休場と旧暦の祝日表）"""
+    holidays = {
+        date(year, month, day)
+        for month, day in [
+            (1, 1),
+            (3, 1),
+            (5, 1),
+            (5, 5),
+            (6, 6),
+            (8, 15),
+            (10, 3),
+            (10, 9),
+            (12, 25),
+            (12, 31),
+        ]
+    }
+    holidays |= {date.fromisoformat(d) for d in _KRX_LUNAR_HOLIDAYS.get(year, [])}
+    return holidays
+
+
+@lru_cache(maxsize=64)
+def _rule_holidays(market, year):
+    if market == "TSE":
+        # 年末年始（12/31〜1/3）は休場
+        return frozenset(
+            _japan_holidays(year)
+            | {date(year, 1, 2), date(year, 1, 3), date(year, 12, 31)}
+        )
+    if market == "US":
+        return frozenset(_us_holidays(year))
+    if market == "KRX":
+        if year not in _KRX_LUNAR_HOLIDAYS:
+            logger.warning(
+                f"KRXの旧暦の祝日が未登録です: {year}年（MARKET_EXTRA_HOLIDAYSで指定）"
+            )
+        return frozenset(_krx_holidays(year))
+    raise ValueError(f"未対応の市場です: {market}")
+
+
+def market_holidays(market, year):
+    """
+    市場の休場日（土日を除く）
+
+    Args:
+        market: 'TSE', 'US', 'KRX'
+        year: 年
+
+    Returns:
+        frozenset: 休場日
+    """
+    config = current_app.config if has_app_context() else {}
+    extra = (config.get("MARKET_EXTRA_HOLIDAYS") or {}).get(market, [])
+    holidays = _rule_holidays(market, year)
+    if extra:
+        holidays = holidays | {
+            d for d in map(date.fromisoformat, extra) if d.year == year
+        }
+    return holidays
+
+
+def is_trading_day(market, day):
+    """取引日かどうか"""
+    return day.weekday() < 5 and day not in market_holidays(market, day.year)
+
+
+def previous_trading_day(market, day):
+    """指定日より前の直近の取引日"""
+    day -= timedelta(days=1)
+    while not is_trading_day(market, day):
+        day -= timedelta(days=1)
+    return day
+
+
+def session_close(market, day):
+    """指定日の大引け時刻（UTC）"""
+    spec = MARKETS[market]
+    local = datetime.combine(day, spec["close"], tzinfo=ZoneInfo(spec["timezone"]))
+    return local.astimezone(timezone.utc)
+
+
+def latest_session(market, now=None, delay=timedelta(0)):
+    """
+    大引け（+ delay）を過ぎた直近の取引日
+
+    Args:
+        market: 市場
+        now: 現在時刻（timezone-aware、デフォルト: 現在のUTC）
+        delay: 大引けから更新開始までの待ち時間
+
+    Returns:
+        date: 市場の現地日付
+    """
+    now = now or datetime.now(timezone.utc)
+    day = now.astimezone(ZoneInfo(MARKETS[market]["timezone"])).date()
+    if not is_trading_day(market, day) or session_close(market, day) + delay > now:
+        day = previous_trading_day(market, day)
+    return day
+
+
+def next_session_close(market, now=None):
+    """次の大引け時刻（UTC）"""
+    now = now or datetime.now(timezone.utc)
+    day = now.astimezone(ZoneInfo(MARKETS[market]["timezone"])).date()
+    while not is_trading_day(market, day) or session_close(market, day) <= now:
+        day += timedelta(days=1)
+    return session_close(market, day)
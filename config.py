@@ -17,6 +17,16 @@ class Config:
         f'sqlite:///{_db_path}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite storage profile (接続時に PRAGMA として適用、app/utils/database.py)
+    # WALでは読み取りが書き込みを待たないため、複数ワーカーでのロック待ちを避けられる
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = 'NORMAL'  # WALではコミットごとのfsyncを省略しても破損しない
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+    SQLITE_BUSY_TIMEOUT_MS = 5000  # ロック待ちの上限（"database is locked" を回避）
+    # 集計・エクスポートを読み取り専用接続で実行
+    SQLITE_READONLY_ANALYTICS = True
+
     # File upload configuration
     UPLOAD_FOLDER = BASE_DIR / 'data' / 'uploads'
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB max file size
@@ -33,8 +43,61 @@ class Config:
     # Backup configuration
     BACKUP_DIR = BASE_DIR / 'backups'
     AUTO_BACKUP_ENABLED = True
+    # 起動時のバックアップをバックグラウンドで作成（サーバープロセスのみ。wsgi.py・run.py で有効化）
+    AUTO_BACKUP_BACKGROUND = False
     BACKUP_RETENTION_DAYS = 7  # バックアップ保持日数
     BACKUP_INTERVAL_HOURS = 24  # バックアップ間隔（時間）
+    # 自動バックアップの形式: snapshot（差分スナップショット）/ copy（全体のコピー）
+    BACKUP_FORMAT = os.environ.get('BACKUP_FORMAT', 'snapshot')
+
+    # Ledger engine configuration
+    # 'decimal': Decimalの基準実装, 'float': int64固定小数点/float64の高速エンジン
+    # 実データで一致を確認するまでは既定を 'decimal' とする（'float' は LEDGER_VERIFY と併用して検証）
+    LEDGER_ENGINE = os.environ.get('LEDGER_ENGINE', 'decimal')
+    # 有効にするとDecimalでも再計算し、許容誤差（円）を超える差分をログ出力
+    LEDGER_VERIFY = os.environ.get('LEDGER_VERIFY', '').lower() in ('1', 'true', 'yes')
+    LEDGER_VERIFY_TOLERANCE = 1.0
+
+    # Stock metrics returns
+    # 株価キャッシュから計算する期間（ytd, 3m, 6m, 1y, 3y, 5y, volatility）
+    # 3y/5y は初回に長期の株価取得が必要なため既定では無効
+    METRICS_RETURN_PERIODS = os.environ.get('METRICS_RETURN_PERIODS', 'ytd,3m,6m,1y,volatility')
+    # 1サイクルあたりの .info 呼び出し上限（鮮度比・評価額の大きい銘柄から取得）
+    METRICS_CALL_BUDGET = int(os.environ.get('METRICS_CALL_BUDGET', '20'))
+    # 指標ごとの鮮度予算（時間）の上書き 例: {'ev_to_ebitda': 168}
+    METRICS_FIELD_BUDGET_HOURS = {}
+
+    # Update scheduler (scripts/update_all_data.py / バックグラウンドスレッド)
+    # 有効にするとアプリ起動時にスケジューラを開始（複数ワーカーでもリースで1プロセスのみ実行）
+    UPDATE_SCHEDULER_ENABLED = os.environ.get('UPDATE_SCHEDULER_ENABLED', '').lower() in ('1', 'true', 'yes')
+    UPDATE_SCHEDULER_POLL_SECONDS = 60
+    UPDATE_SCHEDULER_SETTLE_MINUTES = 20  # 大引けから更新開始までの待ち時間
+    UPDATE_SCHEDULER_BATCH_SIZE = 15  # 1ジョブ1回あたりの銘柄数
+    UPDATE_SCHEDULER_LEASE_SECONDS = 180
+    UPDATE_SCHEDULER_RETRY_MINUTES = 30
+    UPDATE_SCHEDULER_DIVIDEND_LOOKBACK_DAYS = 30
+    # Refresh pipeline (株価一括更新・scripts/update_all_data.py --full)
+    REFRESH_PIPELINE_WORKERS = 4  # 依存のないステージの並行実行数
+    REFRESH_PIPELINE_RESUME_MINUTES = 60  # 中断した実行を再開できる期間
+    # Price archive (年別の終値行列ファイル、app/services/price_archive.py)
+    # 有効にすると終値行列をDBの代わりにメモリマップしたファイルから読み込む
+    PRICE_ARCHIVE_ENABLED = os.environ.get('PRICE_ARCHIVE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PRICE_ARCHIVE_DIR = BASE_DIR / 'data' / 'price_archive'
+    PRICE_ARCHIVE_FORMAT = os.environ.get('PRICE_ARCHIVE_FORMAT', 'auto')  # auto / arrow / npy
+    # HTTP cache (参照系APIの ETag/304 と圧縮、app/utils/http_cache.py)
+    HTTP_CACHE_ENABLED = True
+    HTTP_COMPRESS_MIN_BYTES = 1024  # これ未満のレスポンスは圧縮しない
+    HTTP_COMPRESS_LEVEL = 6
+    # Logging (app/utils/logger.py、ファイルへの書き込みはバックグラウンドスレッド)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')  # 未設定: DEBUGモードでは DEBUG、それ以外は INFO
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # text / json
+    # date（日付ごとのファイル）/ none（外部のlogrotate）/ time・size（単一プロセスのみ）
+    LOG_ROTATION = os.environ.get('LOG_ROTATION', 'date')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '7'))  # time: 日数, size: ファイル数（date では不使用）
+    LOG_DEBUG_RATE_LIMIT = 20  # 呼び出し箇所ごとの1秒あたりのDEBUGログ件数（0: 間引かない）
+    # 規則で算出できない休場日 例: {'KRX': ['2027-02-08']}
+    MARKET_EXTRA_HOLIDAYS = {}
 
 
 class DevelopmentConfig(Config):
@@ -60,6 +123,9 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     AUTO_BACKUP_ENABLED = False  # テスト環境では自動バックアップ無効
+    # テストでは高速エンジンで計算し、Decimalとの一致を常に検証
+    LEDGER_ENGINE = 'float'
+    LEDGER_VERIFY = True
 
 
 # Configuration dictionary
@@ -0,0 +1,31 @@
+"""Add stock metrics refresh tracking columns
+
+Revision ID: 2f6a8c0d5e17
+Revises: 7d3b9e1f4a62
+Create Date: 2026-10-19 17:05:43.902116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6a8c0d5e17'
+down_revision = '7d3b9e1f4a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('stock_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('info_updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('reference_price', sa.Numeric(precision=15, scale=4), nullable=True))
+
+    # 既存の指標は last_updated 時点で .info を取得したものとみなす
+    op.execute('UPDATE stock_metrics SET info_updated_at = last_updated')
+
+
+def downgrade():
+    with op.batch_alter_table('stock_metrics', schema=None) as batch_op:
+        batch_op.drop_column('reference_price')
+        batch_op.drop_column('info_updated_at')
@@ -0,0 +1,29 @@
+"""Add data_versions table
+
+Revision ID: 3a7f1c9e2b41
+Revises: df3c33605d6e
+Create Date: 2026-10-19 09:12:31.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7f1c9e2b41'
+down_revision = 'df3c33605d6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_versions',
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
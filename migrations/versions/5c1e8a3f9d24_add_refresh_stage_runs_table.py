@@ -0,0 +1,41 @@
+"""Add refresh stage runs table
+
+Revision ID: 5c1e8a3f9d24
+Revises: 9b4e2d7c1f30
+Create Date: 2026-10-19 20:41:07.318452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e8a3f9d24'
+down_revision = '9b4e2d7c1f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('refresh_stage_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.String(length=32), nullable=False),
+    sa.Column('stage', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_ms', sa.Integer(), nullable=True),
+    sa.Column('output', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'stage', name='uix_refresh_run_stage')
+    )
+    with op.batch_alter_table('refresh_stage_runs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_refresh_stage_runs_run_id'), ['run_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('refresh_stage_runs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_refresh_stage_runs_run_id'))
+
+    op.drop_table('refresh_stage_runs')
@@ -0,0 +1,50 @@
+"""Add ticker composite indexes
+
+Revision ID: 6a2f0c8e4b19
+Revises: 5c1e8a3f9d24
+Create Date: 2026-10-19 21:36:48.207915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2f0c8e4b19'
+down_revision = '5c1e8a3f9d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 銘柄の単一カラムインデックスは複合インデックスの先頭カラムで代替する
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_ticker_symbol')
+        batch_op.create_index('ix_transactions_ticker_date_id', ['ticker_symbol', 'transaction_date', 'id'], unique=False)
+        batch_op.create_index('ix_transactions_ticker_type_amount', ['ticker_symbol', 'transaction_type', 'settlement_amount'], unique=False)
+
+    with op.batch_alter_table('dividends', schema=None) as batch_op:
+        batch_op.drop_index('ix_dividends_ticker_symbol')
+        batch_op.create_index('ix_dividends_ticker_ex_date', ['ticker_symbol', 'ex_dividend_date'], unique=False)
+
+    with op.batch_alter_table('realized_pnl', schema=None) as batch_op:
+        batch_op.drop_index('ix_realized_pnl_ticker_symbol')
+        batch_op.create_index('ix_realized_pnl_ticker_sell_date', ['ticker_symbol', 'sell_date'], unique=False)
+
+    # クエリプランナーの統計を更新
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    with op.batch_alter_table('realized_pnl', schema=None) as batch_op:
+        batch_op.drop_index('ix_realized_pnl_ticker_sell_date')
+        batch_op.create_index('ix_realized_pnl_ticker_symbol', ['ticker_symbol'], unique=False)
+
+    with op.batch_alter_table('dividends', schema=None) as batch_op:
+        batch_op.drop_index('ix_dividends_ticker_ex_date')
+        batch_op.create_index('ix_dividends_ticker_symbol', ['ticker_symbol'], unique=False)
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_ticker_type_amount')
+        batch_op.drop_index('ix_transactions_ticker_date_id')
+        batch_op.create_index('ix_transactions_ticker_symbol', ['ticker_symbol'], unique=False)
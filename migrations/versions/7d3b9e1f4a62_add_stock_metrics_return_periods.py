@@ -0,0 +1,36 @@
+"""Add stock metrics return periods and volatility
+
+Revision ID: 7d3b9e1f4a62
+Revises: e4a9c2b7d615
+Create Date: 2026-10-19 16:21:08.114305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3b9e1f4a62'
+down_revision = 'e4a9c2b7d615'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    'three_month_return',
+    'six_month_return',
+    'three_year_return',
+    'five_year_return',
+    'volatility',
+)
+
+
+def upgrade():
+    with op.batch_alter_table('stock_metrics', schema=None) as batch_op:
+        for name in COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Numeric(precision=10, scale=4), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('stock_metrics', schema=None) as batch_op:
+        for name in reversed(COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,39 @@
+"""Add portfolio_snapshots table
+
+Revision ID: 8c2d4e6f1a03
+Revises: 3a7f1c9e2b41
+Create Date: 2026-10-19 10:41:07.225918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2d4e6f1a03'
+down_revision = '3a7f1c9e2b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('portfolio_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snapshot_date', sa.Date(), nullable=False),
+    sa.Column('holdings_count', sa.Integer(), nullable=False),
+    sa.Column('total_cost', sa.Numeric(precision=20, scale=4), nullable=False),
+    sa.Column('market_value', sa.Numeric(precision=20, scale=4), nullable=False),
+    sa.Column('unrealized_pnl', sa.Numeric(precision=20, scale=4), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('portfolio_snapshots', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_portfolio_snapshots_snapshot_date'), ['snapshot_date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('portfolio_snapshots', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_portfolio_snapshots_snapshot_date'))
+
+    op.drop_table('portfolio_snapshots')
@@ -0,0 +1,44 @@
+"""Add sync states and scheduler leases
+
+Revision ID: 9b4e2d7c1f30
+Revises: 2f6a8c0d5e17
+Create Date: 2026-10-19 18:12:26.440871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e2d7c1f30'
+down_revision = '2f6a8c0d5e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=20), nullable=False),
+    sa.Column('market', sa.String(length=10), nullable=True),
+    sa.Column('last_session_date', sa.Date(), nullable=True),
+    sa.Column('last_success_at', sa.DateTime(), nullable=True),
+    sa.Column('last_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job', 'key', name='uix_sync_job_key')
+    )
+    op.create_table('scheduler_leases',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('owner', sa.String(length=100), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('acquired_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('scheduler_leases')
+    op.drop_table('sync_states')
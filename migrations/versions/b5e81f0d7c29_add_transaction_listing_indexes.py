@@ -0,0 +1,30 @@
+"""Add transaction listing indexes
+
+Revision ID: b5e81f0d7c29
+Revises: 8c2d4e6f1a03
+Create Date: 2026-10-19 11:26:52.913604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e81f0d7c29'
+down_revision = '8c2d4e6f1a03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_date_id', ['transaction_date', 'id'], unique=False)
+        batch_op.create_index('ix_transactions_type_date', ['transaction_type', 'transaction_date'], unique=False)
+        batch_op.create_index('ix_transactions_currency_date', ['currency', 'transaction_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_currency_date')
+        batch_op.drop_index('ix_transactions_type_date')
+        batch_op.drop_index('ix_transactions_date_id')
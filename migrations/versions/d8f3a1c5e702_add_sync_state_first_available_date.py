@@ -0,0 +1,26 @@
+"""Add sync state first available date
+
+Revision ID: d8f3a1c5e702
+Revises: 6a2f0c8e4b19
+Create Date: 2026-10-20 10:12:27.581904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3a1c5e702'
+down_revision = '6a2f0c8e4b19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sync_states', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('first_available_date', sa.Date(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('sync_states', schema=None) as batch_op:
+        batch_op.drop_column('first_available_date')
@@ -0,0 +1,80 @@
+"""Add transaction fingerprint
+
+Revision ID: e4a9c2b7d615
+Revises: b5e81f0d7c29
+Create Date: 2026-10-19 14:02:37.518220
+
+"""
+import hashlib
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9c2b7d615'
+down_revision = 'b5e81f0d7c29'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _fingerprint(transaction_date, ticker_symbol, quantity, unit_price):
+    # Transaction.compute_fingerprint と同じ正規化（マイグレーション時点の定義を固定）
+    scale = Decimal('0.0001')
+    payload = '|'.join([
+        transaction_date.isoformat(),
+        ticker_symbol,
+        str(Decimal(str(quantity)).quantize(scale)),
+        str(Decimal(str(unit_price)).quantize(scale)),
+    ])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_transactions_fingerprint', ['fingerprint'], unique=False)
+
+    transactions = sa.table(
+        'transactions',
+        sa.column('id', sa.Integer),
+        sa.column('transaction_date', sa.Date),
+        sa.column('ticker_symbol', sa.String),
+        sa.column('quantity', sa.Numeric(15, 4)),
+        sa.column('unit_price', sa.Numeric(15, 4)),
+        sa.column('fingerprint', sa.String),
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(
+        transactions.c.id,
+        transactions.c.transaction_date,
+        transactions.c.ticker_symbol,
+        transactions.c.quantity,
+        transactions.c.unit_price,
+    )).all()
+
+    update = (
+        transactions.update()
+        .where(transactions.c.id == sa.bindparam('row_id'))
+        .values(fingerprint=sa.bindparam('row_fingerprint'))
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(update, [
+            {
+                'row_id': row.id,
+                'row_fingerprint': _fingerprint(
+                    row.transaction_date, row.ticker_symbol, row.quantity, row.unit_price
+                ),
+            }
+            for row in rows[start:start + BATCH_SIZE]
+        ])
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_fingerprint')
+        batch_op.drop_column('fingerprint')
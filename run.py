@@ -18,7 +18,12 @@ if not os.environ.get('DATABASE_URL'):
 from app import create_app, db
 
 # Create app instance
-app = create_app(os.getenv('FLASK_ENV', 'development'))
+# 起動時のバックアップは開発サーバー（python run.py）ではバックグラウンドで作成し、
+# flask db upgrade 等のCLIでは完了を待つ（プロセス終了で中断されないように）
+app = create_app(
+    os.getenv('FLASK_ENV', 'development'),
+    config_overrides={'AUTO_BACKUP_BACKGROUND': __name__ == '__main__'},
+)
 
 
 @app.shell_context_processor
@@ -8,8 +8,10 @@ Usage:
 Options:
     --output-dir DIR    バックアップ保存先ディレクトリ（デフォルト: backups）
     --keep-days DAYS    保存期間（デフォルト: 30日）
-    --compress          バックアップを圧縮（gzip）
-    --upload-cloud      クラウドストレージにアップロード（AWS S3）
+    --format FORMAT     snapshot（差分スナップショット）/ copy（全体のコピー）
+                        （デフォルト: snapshot、--compress / --upload-cloud 指定時は copy）
+    --compress          バックアップを圧縮（gzip、copy形式）
+    --upload-cloud      クラウドストレージにアップロード（AWS S3、copy形式）
 """
 
 import os
@@ -25,6 +27,8 @@ sys.path.insert(0, str(project_root))
 
 from dotenv import load_dotenv
 
+from app.utils.backup import SNAPSHOT_DIR_NAME, copy_database, run_locked_backup
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -55,15 +59,20 @@ def create_backup(db_path, output_dir, compress=False):
     try:
         print(f"[INFO] バックアップ開始: {db_path}")
 
-        if compress:
-            # gzipで圧縮
-            import gzip
-            with open(db_path, 'rb') as f_in:
-                with gzip.open(backup_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-        else:
-            # 通常のコピー
-            shutil.copy2(db_path, backup_path)
+        # オンラインバックアップAPIでコピー（WALモードのコミット済みの内容も含む）
+        temporary_path = output_dir / f"{backup_filename}.tmp"
+        try:
+            copy_database(db_path, temporary_path)
+            if compress:
+                # gzipで圧縮
+                import gzip
+                with open(temporary_path, 'rb') as f_in:
+                    with gzip.open(backup_path, 'wb') as f_out:
+                        shutil.copyfileobj(f_in, f_out)
+            else:
+                os.replace(temporary_path, backup_path)
+        finally:
+            temporary_path.unlink(missing_ok=True)
 
         # ファイルサイズを取得
         file_size = backup_path.stat().st_size / (1024 * 1024)  # MB
@@ -78,6 +87,37 @@ def create_backup(db_path, output_dir, compress=False):
         return None
 
 
+def create_snapshot_backup(db_path, output_dir, keep_days):
+    """差分スナップショットを作成（内容が前回と同じなら省略）"""
+    if not Path(db_path).exists():
+        print(f"[ERROR] データベースファイルが見つかりません: {db_path}")
+        return None
+
+    store_dir = Path(output_dir) / SNAPSHOT_DIR_NAME
+    print(f"[INFO] スナップショット作成開始: {db_path} -> {store_dir}")
+    try:
+        # 起動時の自動バックアップと同じロックで排他
+        result = run_locked_backup(db_path, output_dir, interval_hours=0, keep_days=keep_days)
+    except Exception as e:
+        print(f"[ERROR] スナップショット作成失敗: {str(e)}")
+        return None
+
+    if result is None:
+        print("[ERROR] 他のプロセスがバックアップ中です")
+        return None
+
+    if result['skipped']:
+        print(f"[SUCCESS] 前回のスナップショットと同じ内容のため省略: {result['id']}")
+    else:
+        print(f"[SUCCESS] スナップショット作成完了: {result['id']}")
+        print(
+            f"[INFO] DBサイズ: {result['size'] / (1024 * 1024):.2f} MB / "
+            f"新規チャンク: {result['new_chunks']}/{result['chunks']} / "
+            f"書き込み: {result['stored_bytes'] / (1024 * 1024):.2f} MB"
+        )
+    return result
+
+
 def cleanup_old_backups(output_dir, keep_days):
     """古いバックアップを削除"""
     output_dir = Path(output_dir)
@@ -185,9 +225,18 @@ def main():
 
     # クラウドにアップロード
     python scripts/backup_database.py --compress --upload-cloud
+
+    # 全体のコピーを作成
+    python scripts/backup_database.py --format copy
         """
     )
 
+    parser.add_argument(
+        '--format',
+        choices=['snapshot', 'copy'],
+        help='snapshot（差分スナップショット）/ copy（全体のコピー）'
+    )
+
     parser.add_argument(
         '--output-dir',
         default='backups',
@@ -233,6 +282,19 @@ def main():
     print("=" * 60)
     print()
 
+    backup_format = args.format or ('copy' if args.compress or args.upload_cloud else 'snapshot')
+
+    if backup_format == 'snapshot':
+        # 差分スナップショット（保持期間を過ぎたスナップショットも削除）
+        if not create_snapshot_backup(args.db_path, args.output_dir, args.keep_days):
+            sys.exit(1)
+
+        print()
+        print("=" * 60)
+        print("バックアップ処理完了")
+        print("=" * 60)
+        return
+
     # バックアップ作成
     backup_path = create_backup(
         args.db_path,
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+分析用データローダー ベンチマーク
+
+一時DBに指定件数の取引・配当・確定損益を投入し、読み込みコストを比較する。
+- orm:  Model.query...all() でORMオブジェクトを生成し、数値を float() で取り出す
+        （損益推移の計算での従来の読み込み方）
+- core: AnalyticsLoader（Core の select() で必要なカラムのみ、float64 の DataFrame）
+
+Usage:
+    python scripts/benchmark_analytics_loader.py [options]
+
+Options:
+    --rows N[,N...]  件数（カンマ区切り、デフォルト: 100000,1000000）
+    --tables T[,T...] 対象テーブル transactions / dividends / realized_pnl（デフォルト: すべて）
+    --repeat N       各方式の測定回数（デフォルト: 3）
+"""
+
+import gc
+import sys
+import time
+import argparse
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from app import db
+from app.models import Dividend, RealizedPnl, Transaction
+from app.services.analytics_loader import AnalyticsLoader
+from app.utils.data_version import register_data_version_listeners
+from app.utils.database import configure_sqlite
+
+INSERT_CHUNK = 50000
+BASE_DATE = date(2005, 1, 3)
+
+
+def make_transaction(i):
+    return {
+        'transaction_date': BASE_DATE + timedelta(days=i % 7300),
+        'ticker_symbol': f'T{i % 500:04d}',
+        'security_name': f'銘柄{i % 500}',
+        'transaction_type': 'SELL' if i % 4 == 3 else 'BUY',
+        'currency': 'JPY',
+        'quantity': 100,
+        'unit_price': 1000 + i % 977,
+        'commission': 100,
+        'settlement_amount': 100000 + i % 97700,
+    }
+
+
+def make_dividend(i):
+    return {
+        'ticker_symbol': f'T{i % 500:04d}',
+        'ex_dividend_date': BASE_DATE + timedelta(days=i % 7300),
+        'dividend_amount': 12.5,
+        'currency': 'JPY',
+        'total_dividend': 1250,
+        'quantity_held': 100,
+    }
+
+
+def make_realized(i):
+    return {
+        'ticker_symbol': f'T{i % 500:04d}',
+        'sell_date': BASE_DATE + timedelta(days=i % 7300),
+        'quantity': 100,
+        'average_cost': 1000,
+        'sell_price': 1000 + i % 977,
+        'realized_pnl': (i % 977) * 100,
+        'currency': 'JPY',
+    }
+
+
+# {テーブル: (モデル, 行の生成, 日付カラム, ローダー)}
+TABLES = {
+    'transactions': (Transaction, make_transaction, 'transaction_date', AnalyticsLoader.transactions),
+    'dividends': (Dividend, make_dividend, 'ex_dividend_date', AnalyticsLoader.dividends),
+    'realized_pnl': (RealizedPnl, make_realized, 'sell_date', AnalyticsLoader.realized_pnl),
+}
+
+
+def create_bench_app(db_path):
+    """一時DBを使う最小構成のアプリ"""
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{Path(db_path).as_posix()}',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    register_data_version_listeners()
+    with app.app_context():
+        configure_sqlite(app, db.engine)
+        db.create_all()
+    return app
+
+
+def seed(model, make_row, rows):
+    for start in range(0, rows, INSERT_CHUNK):
+        db.session.execute(
+            insert(model), [make_row(i) for i in range(start, min(rows, start + INSERT_CHUNK))]
+        )
+    db.session.commit()
+
+
+def load_orm(model, date_column, float_columns):
+    """ORMオブジェクトを生成して数値を float() で取り出す"""
+    objects = model.query.order_by(getattr(model, date_column), model.id).all()
+    values = [[float(getattr(obj, column)) for column in float_columns] for obj in objects]
+    db.session.remove()
+    return len(values)
+
+
+def measure(function, repeat):
+    """最小の所要時間（秒）"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析用データローダー ベンチマーク（ORM と Core の読み込み）')
+    parser.add_argument('--rows', default='100000,1000000', help='件数（カンマ区切り）')
+    parser.add_argument('--tables', default=','.join(TABLES), help='対象テーブル（カンマ区切り）')
+    parser.add_argument('--repeat', type=int, default=3, help='各方式の測定回数')
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.rows.split(',')]
+    tables = args.tables.split(',')
+
+    print("=" * 60)
+    print("分析用データローダー ベンチマーク")
+    print("=" * 60)
+
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            app = create_bench_app(Path(workdir) / 'bench.db')
+            with app.app_context():
+                print(f"[RESULT] {rows}行")
+                for table in tables:
+                    model, make_row, date_column, loader = TABLES[table]
+                    seed(model, make_row, rows)
+
+                    frame = loader()
+                    float_columns = [c for c, kind in frame.dtypes.items() if kind == 'float64']
+                    orm = measure(lambda: load_orm(model, date_column, float_columns), args.repeat)
+                    core = measure(loader, args.repeat)
+                    print(
+                        f"  {table:14s} orm={orm * 1000:9.1f}ms  core={core * 1000:9.1f}ms  "
+                        f"({orm / core:.1f}倍)"
+                    )
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
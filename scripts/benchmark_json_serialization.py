@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+JSONシリアライズ ベンチマーク
+
+一時DBに指定件数の取引・株価を投入し、一覧APIのレスポンス生成コストを比較する。
+- legacy: Model.query.all() → to_dict() → 標準ライブラリの JSON プロバイダ
+          （一覧APIの従来の組み立て方）
+- fast:   ApiSerializer（Core の select() の行タプルから辞書）→ FastJSONProvider
+          （orjson がなければ標準ライブラリ）
+
+CPU時間（プロセス時間）と tracemalloc によるピークメモリを出力する。
+
+Usage:
+    python scripts/benchmark_json_serialization.py [options]
+
+Options:
+    --rows N[,N...]  件数（カンマ区切り、デフォルト: 10000,100000）
+    --repeat N       各方式の測定回数（デフォルト: 3）
+"""
+
+import gc
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert
+
+from app import db
+from app.models import StockPrice, Transaction
+from app.services.api_serializer import ApiSerializer
+from app.utils import json_provider
+from app.utils.data_version import register_data_version_listeners
+from app.utils.database import configure_sqlite
+from app.utils.json_provider import FastJSONProvider
+
+INSERT_CHUNK = 50000
+BASE_DATE = date(1900, 1, 1)
+
+
+def make_transaction(i):
+    return {
+        'transaction_date': BASE_DATE + timedelta(days=i % 36500),
+        'ticker_symbol': f'T{i % 500:04d}',
+        'security_name': f'銘柄{i % 500}',
+        'transaction_type': 'SELL' if i % 4 == 3 else 'BUY',
+        'currency': 'JPY',
+        'quantity': 100,
+        'unit_price': 1000.25 + i % 977,
+        'commission': 100,
+        'settlement_amount': 100025 + i % 97700,
+    }
+
+
+def make_price(i):
+    return {
+        'ticker_symbol': f'T{i // 36500:04d}',
+        'price_date': BASE_DATE + timedelta(days=i % 36500),
+        'close_price': 1000.5 + i % 977,
+        'currency': 'JPY',
+    }
+
+
+# {データセット: (モデル, 行の生成)}
+DATASETS = {
+    'transactions': (Transaction, make_transaction),
+    'stock_prices': (StockPrice, make_price),
+}
+
+
+def create_bench_app(db_path):
+    """一時DBを使う最小構成のアプリ"""
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{Path(db_path).as_posix()}',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    register_data_version_listeners()
+    with app.app_context():
+        configure_sqlite(app, db.engine)
+        db.create_all()
+    return app
+
+
+def seed(model, make_row, rows):
+    for start in range(0, rows, INSERT_CHUNK):
+        db.session.execute(
+            insert(model), [make_row(i) for i in range(start, min(rows, start + INSERT_CHUNK))]
+        )
+    db.session.commit()
+
+
+def respond_legacy(app, model):
+    """ORMオブジェクト → to_dict() → 標準ライブラリの JSON"""
+    items = [obj.to_dict() for obj in model.query.all()]
+    response = DefaultJSONProvider(app).response({'success': True, 'items': items})
+    db.session.remove()
+    return response.get_data()
+
+
+def respond_fast(app, model):
+    """行タプル → 辞書 → FastJSONProvider"""
+    items = ApiSerializer.fetch(model)
+    response = FastJSONProvider(app).response({'success': True, 'items': items})
+    return response.get_data()
+
+
+def measure(function, repeat):
+    """最小のCPU時間（秒）・ピークメモリ（MB）と最後の結果"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.process_time()
+        result = function()
+        timings.append(time.process_time() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / 1024 / 1024, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSONシリアライズ ベンチマーク（一覧APIのレスポンス生成）')
+    parser.add_argument('--rows', default='10000,100000', help='件数（カンマ区切り）')
+    parser.add_argument('--repeat', type=int, default=3, help='各方式の測定回数')
+    args = parser.parse_args()
+
+    sizes = [int(n) for n in args.rows.split(',')]
+
+    print("=" * 60)
+    print("JSONシリアライズ ベンチマーク")
+    print("=" * 60)
+    print(f"[INFO] シリアライザ: {'orjson' if json_provider.orjson is not None else '標準ライブラリ json'}")
+
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            app = create_bench_app(Path(workdir) / 'bench.db')
+            with app.app_context():
+                print(f"[RESULT] {rows}行")
+                for name, (model, make_row) in DATASETS.items():
+                    seed(model, make_row, rows)
+
+                    legacy_cpu, legacy_peak, legacy = measure(lambda: respond_legacy(app, model), args.repeat)
+                    fast_cpu, fast_peak, fast = measure(lambda: respond_fast(app, model), args.repeat)
+                    matches = app.json.loads(legacy) == app.json.loads(fast)
+                    print(
+                        f"  {name:13s} legacy={legacy_cpu * 1000:8.1f}ms/{legacy_peak:6.1f}MB  "
+                        f"fast={fast_cpu * 1000:8.1f}ms/{fast_peak:6.1f}MB  "
+                        f"({legacy_cpu / fast_cpu:.1f}倍, {len(legacy) / 1024 / 1024:.1f}MB→"
+                        f"{len(fast) / 1024 / 1024:.1f}MB, 一致: {'OK' if matches else 'NG'})"
+                    )
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
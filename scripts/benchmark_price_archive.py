@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+株価アーカイブ ベンチマーク
+
+一時DBに「年数 × 銘柄数」の日次終値を投入し、終値行列の読み込み時間を比較する。
+- orm:     PerformanceService.get_cached_prices_as_df（ORMオブジェクトから辞書で組み立て）
+- core:    ReturnsEngine.load_price_matrix（1クエリ + pandasのピボット）
+- archive: 株価アーカイブ（年別の終値行列ファイルをメモリマップ）
+
+Usage:
+    python scripts/benchmark_price_archive.py [options]
+
+Options:
+    --years N       年数（デフォルト: 20）
+    --tickers N     銘柄数（デフォルト: 500）
+    --repeat N      各方式の測定回数（デフォルト: 5）
+    --format F      アーカイブの形式 auto / arrow / npy（デフォルト: auto）
+    --skip-orm      ORMでの読み込みを測定しない（大量データでは数十秒かかるため）
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from datetime import date
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+from sqlalchemy import insert
+
+from app import db
+from app.models import StockPrice
+from app.services import price_archive
+from app.services.performance_service import PerformanceService
+from app.services.price_archive import PriceArchive
+from app.services.returns_engine import ReturnsEngine
+from app.utils.data_version import register_data_version_listeners
+from app.utils.database import configure_sqlite
+
+INSERT_CHUNK = 50000
+
+
+def create_bench_app(workdir, file_format):
+    """一時DB・一時アーカイブを使う最小構成のアプリ"""
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{(Path(workdir) / 'bench.db').as_posix()}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        PRICE_ARCHIVE_DIR=Path(workdir) / 'price_archive',
+        PRICE_ARCHIVE_FORMAT=file_format,
+    )
+    db.init_app(app)
+    register_data_version_listeners()
+    with app.app_context():
+        configure_sqlite(app, db.engine)
+        db.create_all()
+    return app
+
+
+def seed_prices(years, tickers, end_year):
+    """営業日 × 銘柄のランダムウォークの終値を投入"""
+    dates = pd.bdate_range(date(end_year - years + 1, 1, 1), date(end_year, 12, 31)).date
+    rng = np.random.default_rng(0)
+    closes = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), tickers)), axis=0))
+    symbols = [f'T{i:04d}' for i in range(tickers)]
+
+    rows = []
+    total = 0
+    for j, symbol in enumerate(symbols):
+        for i, price_date in enumerate(dates):
+            rows.append(
+                {
+                    'ticker_symbol': symbol,
+                    'price_date': price_date,
+                    'close_price': round(float(closes[i, j]), 4),
+                    'currency': 'JPY',
+                }
+            )
+        if len(rows) >= INSERT_CHUNK:
+            db.session.execute(insert(StockPrice), rows)
+            total += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(StockPrice), rows)
+        total += len(rows)
+    db.session.commit()
+    return symbols, dates[0], dates[-1], total
+
+
+def measure(function, repeat):
+    """最小・中央値の所要時間（ミリ秒）と最後の結果"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), float(np.median(timings)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='株価アーカイブ ベンチマーク（終値行列の読み込み）')
+    parser.add_argument('--years', type=int, default=20, help='年数')
+    parser.add_argument('--tickers', type=int, default=500, help='銘柄数')
+    parser.add_argument('--repeat', type=int, default=5, help='各方式の測定回数')
+    parser.add_argument('--format', default='auto', choices=['auto', 'arrow', 'npy'], help='アーカイブの形式')
+    parser.add_argument('--skip-orm', action='store_true', help='ORMでの読み込みを測定しない')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("株価アーカイブ ベンチマーク")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_bench_app(workdir, args.format)
+        with app.app_context():
+            started = time.perf_counter()
+            symbols, start, end, total = seed_prices(args.years, args.tickers, date.today().year - 1)
+            print(
+                f"[INFO] {args.years}年 × {args.tickers}銘柄 = {total}行を投入 "
+                f"({time.perf_counter() - started:.1f}秒)"
+            )
+
+            started = time.perf_counter()
+            result = PriceArchive.sync(full=True)
+            size = sum(p.stat().st_size for p in PriceArchive.directory().iterdir())
+            print(
+                f"[INFO] アーカイブ作成: 形式={PriceArchive.file_format()} "
+                f"{len(result['updated_years'])}年分 {size / 1024 / 1024:.1f}MB "
+                f"({time.perf_counter() - started:.2f}秒)"
+            )
+            started = time.perf_counter()
+            PriceArchive.sync()
+            print(f"[INFO] 差分同期（変更なし）: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+            results = {}
+            app.config['PRICE_ARCHIVE_ENABLED'] = False
+            if not args.skip_orm:
+                results['orm'] = measure(
+                    lambda: PerformanceService.get_cached_prices_as_df(symbols, start, end),
+                    max(1, args.repeat // 5),
+                )
+            results['core'] = measure(
+                lambda: ReturnsEngine.load_price_matrix(symbols, start, end), args.repeat
+            )
+
+            app.config['PRICE_ARCHIVE_ENABLED'] = True
+            price_archive._mapped.clear()
+            results['archive (初回)'] = measure(
+                lambda: ReturnsEngine.load_price_matrix(symbols, start, end), 1
+            )
+            results['archive'] = measure(
+                lambda: ReturnsEngine.load_price_matrix(symbols, start, end), args.repeat
+            )
+
+            expected = results['core'][2]
+            actual = results['archive'][2]
+            matches = np.allclose(
+                expected.to_numpy(), actual.to_numpy(), equal_nan=True
+            ) and expected.index.equals(actual.index)
+
+            print(f"[RESULT] 終値行列 {expected.shape[0]}日 × {expected.shape[1]}銘柄")
+            for name, (best, median, _) in results.items():
+                print(f"  {name:14s} 最小={best:10.1f}ms  中央値={median:10.1f}ms")
+            print(f"  一致: {'OK' if matches else 'NG'}")
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+SQLite 同時実行ベンチマーク
+
+複数プロセス（gunicornのワーカー相当）で株価キャッシュへの一括保存とコミットを
+続けながら、別プロセスで集計クエリを繰り返し、読み取りレイテンシと
+ロック待ちエラーを測定する。既定のロールバックジャーナル（legacy）と
+ストレージプロファイル（WAL・synchronous=NORMAL・mmap等 + 読み取り専用接続）を比較する。
+
+Usage:
+    python scripts/benchmark_sqlite_concurrency.py [options]
+
+Options:
+    --seconds N     各プロファイルの測定時間（秒、デフォルト: 10）
+    --writers N     書き込みプロセス数（デフォルト: 2）
+    --readers N     読み取りプロセス数（デフォルト: 2）
+    --rows N        初期データの行数（デフォルト: 50000）
+    --batch N       1コミットあたりの書き込み行数（デフォルト: 200）
+    --interval N    書き込みプロセスのコミット間隔（秒、デフォルト: 0.02）
+                    両プロファイルで同じ書き込み負荷をかけるため一定間隔でコミットする
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+from datetime import date, timedelta
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import StockPrice
+from app.utils.database import SQLITE_PROFILE_DEFAULTS, register_pragmas, sqlite_pragmas
+
+TICKERS = [f'T{i:04d}' for i in range(100)]
+BASE_DATE = date(2000, 1, 1)
+
+READ_QUERY = text(
+    'SELECT ticker_symbol, COUNT(*), AVG(close_price), MAX(price_date) '
+    'FROM stock_prices WHERE price_date >= :since GROUP BY ticker_symbol'
+)
+
+
+def make_engine(db_path, profile, readonly=False):
+    """プロファイルに応じたエンジンを作成"""
+    if profile == 'legacy':
+        # 従来の設定（pysqliteの既定: ロールバックジャーナル、ロック待ち5秒）
+        return create_engine(f'sqlite:///{db_path}')
+
+    if readonly:
+        engine = create_engine(f'sqlite:///file:{db_path}?mode=ro&uri=true')
+    else:
+        engine = create_engine(f'sqlite:///{db_path}')
+    register_pragmas(engine, sqlite_pragmas(SQLITE_PROFILE_DEFAULTS, readonly=readonly))
+    return engine
+
+
+def setup_database(db_path, profile, rows):
+    """テーブルを作成して初期データを投入"""
+    engine = make_engine(db_path, profile)
+    db.metadata.create_all(engine, tables=[StockPrice.__table__])
+    with engine.begin() as conn:
+        if profile == 'legacy':
+            conn.execute(text('PRAGMA journal_mode=DELETE'))
+        records = [
+            {
+                'ticker_symbol': TICKERS[i % len(TICKERS)],
+                'price_date': BASE_DATE + timedelta(days=i // len(TICKERS)),
+                'close_price': 100 + (i % 97),
+                'currency': 'JPY',
+            }
+            for i in range(rows)
+        ]
+        conn.execute(insert(StockPrice), records)
+    engine.dispose()
+
+
+def writer(db_path, profile, worker_id, batch, interval, stop_at, results):
+    """株価キャッシュへの一括保存を繰り返す"""
+    engine = make_engine(db_path, profile)
+    latencies = []
+    errors = 0
+    ticker = f'W{worker_id:03d}'
+    day = 0
+    while time.time() < stop_at:
+        records = []
+        for _ in range(batch):
+            records.append(
+                {
+                    'ticker_symbol': ticker,
+                    'price_date': BASE_DATE + timedelta(days=day),
+                    'close_price': 100,
+                    'currency': 'JPY',
+                }
+            )
+            day += 1
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(StockPrice), records)
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+        time.sleep(interval)
+    engine.dispose()
+    results.put(('write', latencies, errors))
+
+
+def reader(db_path, profile, stop_at, results):
+    """集計クエリを繰り返してレイテンシを記録"""
+    engine = make_engine(db_path, profile, readonly=True)
+    latencies = []
+    errors = 0
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(READ_QUERY, {'since': BASE_DATE + timedelta(days=200)}).all()
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put(('read', latencies, errors))
+
+
+def percentile(values, p):
+    """パーセンタイル（ミリ秒）"""
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index] * 1000
+
+
+def run_profile(profile, args, workdir):
+    """1プロファイルを測定"""
+    db_path = (Path(workdir) / f'bench_{profile}.db').as_posix()
+    setup_database(db_path, profile, args.rows)
+
+    results = multiprocessing.Queue()
+    stop_at = time.time() + args.seconds
+    processes = [
+        multiprocessing.Process(
+            target=writer,
+            args=(db_path, profile, i, args.batch, args.interval, stop_at, results),
+        )
+        for i in range(args.writers)
+    ] + [
+        multiprocessing.Process(target=reader, args=(db_path, profile, stop_at, results))
+        for _ in range(args.readers)
+    ]
+    for process in processes:
+        process.start()
+
+    collected = {'read': ([], 0), 'write': ([], 0)}
+    for _ in processes:
+        kind, latencies, errors = results.get()
+        previous, previous_errors = collected[kind]
+        collected[kind] = (previous + latencies, previous_errors + errors)
+    for process in processes:
+        process.join()
+
+    return collected
+
+
+def print_report(profile, collected, seconds):
+    """測定結果を表示"""
+    reads, read_errors = collected['read']
+    writes, write_errors = collected['write']
+    print(f"[RESULT] {profile}")
+    print(
+        f"  読み取り: {len(reads) / seconds:8.1f} 回/秒  "
+        f"p50={percentile(reads, 50):7.2f}ms  p95={percentile(reads, 95):7.2f}ms  "
+        f"p99={percentile(reads, 99):7.2f}ms  max={percentile(reads, 100):7.2f}ms  "
+        f"ロックエラー={read_errors}"
+    )
+    print(
+        f"  書き込み: {len(writes) / seconds:8.1f} コミット/秒  "
+        f"p50={percentile(writes, 50):7.2f}ms  p95={percentile(writes, 95):7.2f}ms  "
+        f"ロックエラー={write_errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='SQLite 同時実行ベンチマーク（書き込み負荷下の読み取りレイテンシ）'
+    )
+    parser.add_argument('--seconds', type=float, default=10, help='各プロファイルの測定時間（秒）')
+    parser.add_argument('--writers', type=int, default=2, help='書き込みプロセス数')
+    parser.add_argument('--readers', type=int, default=2, help='読み取りプロセス数')
+    parser.add_argument('--rows', type=int, default=50000, help='初期データの行数')
+    parser.add_argument('--batch', type=int, default=200, help='1コミットあたりの書き込み行数')
+    parser.add_argument('--interval', type=float, default=0.02, help='コミット間隔（秒）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SQLite 同時実行ベンチマーク")
+    print("=" * 60)
+    print(
+        f"[INFO] 書き込み={args.writers}プロセス 読み取り={args.readers}プロセス "
+        f"初期データ={args.rows}行 バッチ={args.batch}行 測定={args.seconds}秒"
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for profile in ('legacy', 'profile'):
+            collected = run_profile(profile, args, workdir)
+            print_report(profile, collected, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
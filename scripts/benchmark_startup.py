@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+起動時間ベンチマーク
+
+新しいPythonプロセスで `python -X importtime` を使ってアプリファクトリを実行し、
+ワーカー1プロセスあたりの起動コストを測定する。
+- factory:  create_app() まで（gunicorn ワーカーの起動に相当）
+- eager:    create_app() の後、全サービスと重い依存ライブラリを読み込んだ状態
+            （遅延読み込みなしの場合に相当）
+
+起動時間（プロセス内の実測）、import の累積時間、最大RSS、読み込まれた重い依存
+ライブラリと、累積時間の大きいモジュールを出力する。
+
+Usage:
+    python scripts/benchmark_startup.py [options]
+
+Options:
+    --target NAME[,NAME...]  測定対象（factory, eager、デフォルト: factory,eager）
+    --repeat N               測定回数（中央値を表示、デフォルト: 5）
+    --top N                  表示するモジュール数（デフォルト: 15）
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+# 遅延読み込みの対象（アプリ起動時には読み込まない）
+HEAVY_MODULES = ('pandas', 'numpy', 'yfinance', 'bs4', 'lxml')
+
+# 子プロセスで実行するコード（最後の行に測定結果をJSONで出力）
+CHILD_CODE = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app('testing')
+if {eager!r}:
+    import importlib
+    import app.services as services
+    for name in services.__all__:
+        getattr(services, name)
+    for name in {heavy!r}:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+elapsed = time.perf_counter() - started
+# 最大RSS（Linuxの ru_maxrss は fork 元の値を引き継ぐため /proc の VmHWM を使う）
+rss_mb = None
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                rss_mb = int(line.split()[1]) / 1024
+except OSError:
+    try:
+        import resource
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024
+    except ImportError:
+        pass
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'rss_mb': rss_mb, 'modules': len(sys.modules), 'heavy': heavy}}))
+'''
+
+TARGETS = {
+    'factory': False,
+    'eager': True,
+}
+
+
+def run_child(eager):
+    """-X importtime 付きの子プロセスで測定し、(結果, {モジュール: (自身, 累積)}) を返す"""
+    code = CHILD_CODE.format(eager=eager, heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # import time: self [us] | cumulative | imported package
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # モジュール名の前のインデントは import の入れ子の深さ
+        modules[name[1:]] = (int(self_us), int(cumulative_us))
+    return result, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='起動時間ベンチマーク（python -X importtime）')
+    parser.add_argument('--target', default='factory,eager', help='測定対象（カンマ区切り）')
+    parser.add_argument('--repeat', type=int, default=5, help='測定回数')
+    parser.add_argument('--top', type=int, default=15, help='表示するモジュール数')
+    args = parser.parse_args()
+
+    targets = args.target.split(',')
+    for target in targets:
+        if target not in TARGETS:
+            parser.error(f'不明な測定対象: {target}（{", ".join(TARGETS)}）')
+
+    print("=" * 60)
+    print("起動時間ベンチマーク")
+    print("=" * 60)
+
+    for target in targets:
+        runs = [run_child(TARGETS[target]) for _ in range(args.repeat)]
+        results = [result for result, _ in runs]
+        # import の累積時間はトップレベル（インデントなし）の合計
+        import_ms = [
+            sum(cumulative for name, (_, cumulative) in modules.items() if not name.startswith(' ')) / 1000
+            for _, modules in runs
+        ]
+        rss = [r['rss_mb'] for r in results if r['rss_mb'] is not None]
+
+        print(f"[RESULT] {target}")
+        print(f"  起動時間:   {statistics.median(r['seconds'] for r in results) * 1000:8.1f}ms（中央値, {args.repeat}回）")
+        print(f"  import:     {statistics.median(import_ms):8.1f}ms")
+        if rss:
+            print(f"  最大RSS:    {statistics.median(rss):8.1f}MB")
+        print(f"  モジュール: {results[-1]['modules']:6d}")
+        print(f"  重い依存:   {', '.join(results[-1]['heavy']) or 'なし'}")
+
+        _, modules = runs[-1]
+        slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+        print(f"  累積時間の上位{args.top}モジュール:")
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"    {cumulative_us / 1000:8.1f}ms（自身 {self_us / 1000:6.1f}ms）  {name.strip()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 """全銘柄の保有情報を移動平均法で再計算するスクリプト"""
-from app import create_app, db
-from app.models.holding import Holding
+import time
+
+from app import create_app
 from app.services.transaction_service import TransactionService
 
 app = create_app()
@@ -11,35 +12,26 @@ print('=' * 60)
 print('全銘柄の保有情報を移動平均法で再計算します')
 print('=' * 60)
 
-# すべての保有銘柄を取得
-holdings = Holding.query.all()
-
-if not holdings:
-    print('\n保有銘柄がありません')
-else:
-    print(f'\n対象銘柄数: {len(holdings)}件\n')
-
-    success_count = 0
-    error_count = 0
-
-    for holding in holdings:
-        ticker = holding.ticker_symbol
-        name = holding.security_name or ticker
-
-        print(f'再計算中: {ticker} ({name})... ', end='', flush=True)
-
-        try:
-            # 再計算実行
-            TransactionService.recalculate_holding(ticker)
-            print('OK')
-            success_count += 1
-        except Exception as e:
-            print(f'ERROR: {str(e)}')
-            error_count += 1
-
-    print('\n' + '=' * 60)
-    print('再計算完了')
-    print('=' * 60)
-    print(f'成功: {success_count}件')
-    print(f'エラー: {error_count}件')
-    print('\nブラウザをリフレッシュして、ダッシュボードを確認してください。')
+
+def show_progress(done, total):
+    print(f'\r再計算中: {done}/{total}銘柄', end='', flush=True)
+
+
+started = time.perf_counter()
+
+try:
+    result = TransactionService.recalculate_all_holdings(progress=show_progress)
+except Exception as e:
+    print(f'\nERROR: {str(e)}')
+    raise SystemExit(1)
+
+elapsed = time.perf_counter() - started
+
+print('\n\n' + '=' * 60)
+print('再計算完了')
+print('=' * 60)
+print(f'対象銘柄数: {result["tickers"]}件')
+print(f'保有銘柄数: {result["holdings"]}件')
+print(f'確定損益: {result["realized_pnl"]}件')
+print(f'処理時間: {elapsed:.1f}秒')
+print('\nブラウザをリフレッシュして、ダッシュボードを確認してください。')
@@ -4,15 +4,18 @@
 
 Usage:
     python scripts/restore_database.py <backup_file> [options]
+    python scripts/restore_database.py --snapshot [ID] [options]
 
 Options:
     --force             確認なしで実行
     --no-backup         復元前の自動バックアップをスキップ
+    --snapshot [ID]     差分スナップショットから復元（ID省略時は最新）
+    --verify-only       スナップショットを検証のみ（復元しない）
 """
 
-import os
 import sys
 import shutil
+import sqlite3
 import argparse
 import gzip
 from datetime import datetime
@@ -22,6 +25,9 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from app.utils import backup_store
+from app.utils.backup import SNAPSHOT_DIR_NAME, copy_database
+
 
 def confirm_restore():
     """復元実行の確認"""
@@ -49,7 +55,8 @@ def backup_current_db(db_path):
 
     try:
         print(f"[INFO] 現在のデータベースをバックアップ中...")
-        shutil.copy2(db_path, backup_path)
+        # オンラインバックアップAPIでコピー（WALモードのコミット済みの内容も含む）
+        copy_database(db_path, backup_path)
         print(f"[SUCCESS] バックアップ完了: {backup_path}")
         return backup_path
     except Exception as e:
@@ -91,6 +98,12 @@ def restore_database(backup_file, db_path, skip_backup=False):
             # 通常のファイル
             shutil.copy2(backup_file, db_path)
 
+        # 復元前のDBのWAL・共有メモリファイルが残っていると復元後のDBに適用されるため削除
+        for suffix in ('-wal', '-shm'):
+            stale = Path(f"{db_path}{suffix}")
+            if stale.exists():
+                stale.unlink()
+
         # ファイルサイズを取得
         file_size = db_path.stat().st_size / (1024 * 1024)  # MB
 
@@ -104,11 +117,46 @@ def restore_database(backup_file, db_path, skip_backup=False):
         return False
 
 
+def restore_from_snapshot(store_dir, snapshot_id, db_path, skip_backup=False):
+    """差分スナップショットから復元（ハッシュと整合性を確認してから置き換え）"""
+    snapshot = backup_store.get_snapshot(store_dir, snapshot_id)
+    if snapshot is None:
+        print(f"[ERROR] スナップショットが見つかりません: {snapshot_id or '(最新)'}")
+        return False
+
+    if not skip_backup:
+        current_backup = backup_current_db(db_path)
+        if current_backup is None and Path(db_path).exists():
+            print("[ERROR] 復元前のバックアップに失敗しました")
+            return False
+
+    try:
+        print(f"[INFO] スナップショットから復元中: {snapshot['id']}")
+        backup_store.restore_snapshot(store_dir, db_path, snapshot['id'])
+    except backup_store.SnapshotError as e:
+        print(f"[ERROR] スナップショットの検証に失敗しました: {str(e)}")
+        print("[INFO] 現在のデータベースは変更していません")
+        return False
+
+    print(f"[SUCCESS] データベース復元完了: {db_path}")
+    print(f"[INFO] ハッシュ・整合性チェック: OK ({snapshot['size'] / (1024 * 1024):.2f} MB)")
+    return True
+
+
+def verify_snapshot(store_dir, snapshot_id):
+    """差分スナップショットを展開してハッシュを確認"""
+    try:
+        snapshot = backup_store.verify_snapshot(store_dir, snapshot_id)
+    except backup_store.SnapshotError as e:
+        print(f"[ERROR] スナップショットの検証に失敗しました: {str(e)}")
+        return False
+    print(f"[SUCCESS] スナップショットの検証: OK ({snapshot['id']})")
+    return True
+
+
 def verify_database(db_path):
     """データベースの整合性を確認"""
     try:
-        import sqlite3
-
         print("[INFO] データベースの整合性を確認中...")
 
         conn = sqlite3.connect(db_path)
@@ -183,6 +231,27 @@ def list_available_backups(backup_dir='backups'):
     return backups
 
 
+def list_available_snapshots(store_dir):
+    """差分スナップショットの一覧を表示（マニフェストのみ参照）"""
+    snapshots = backup_store.list_snapshots(store_dir)
+    if not snapshots:
+        print(f"[INFO] スナップショットが見つかりません: {store_dir}")
+        return []
+
+    print()
+    print("=" * 80)
+    print("利用可能なスナップショット（--snapshot ID で復元）:")
+    print("=" * 80)
+
+    for i, snapshot in enumerate(snapshots[:20], 1):  # 最新20件
+        print(f"{i:2d}. {snapshot['id']}")
+        print(f"    サイズ: {snapshot['size'] / (1024 * 1024):.2f} MB")
+        print(f"    日時:   {snapshot['created_at'].replace('T', ' ')}")
+        print()
+
+    return snapshots
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Stock P&L Manager データベースリストアツール',
@@ -200,6 +269,12 @@ def main():
 
     # 復元前のバックアップをスキップ
     python scripts/restore_database.py backups/stock_pnl_20260111_030000.db --no-backup --force
+
+    # 最新の差分スナップショットから復元
+    python scripts/restore_database.py --snapshot
+
+    # スナップショットを検証のみ
+    python scripts/restore_database.py --snapshot 20260111_030000 --verify-only
         """
     )
 
@@ -233,6 +308,25 @@ def main():
         help='利用可能なバックアップ一覧を表示'
     )
 
+    parser.add_argument(
+        '--snapshot',
+        nargs='?',
+        const='latest',
+        help='差分スナップショットから復元（ID省略時は最新）'
+    )
+
+    parser.add_argument(
+        '--snapshot-dir',
+        default=str(Path('backups') / SNAPSHOT_DIR_NAME),
+        help='スナップショットの保存先（デフォルト: backups/snapshots）'
+    )
+
+    parser.add_argument(
+        '--verify-only',
+        action='store_true',
+        help='スナップショットを検証のみ（復元しない）'
+    )
+
     parser.add_argument(
         '--verify',
         action='store_true',
@@ -248,6 +342,35 @@ def main():
     # バックアップ一覧表示
     if args.list:
         list_available_backups()
+        list_available_snapshots(args.snapshot_dir)
+        sys.exit(0)
+
+    # 差分スナップショットから復元
+    if args.snapshot:
+        snapshot_id = None if args.snapshot == 'latest' else args.snapshot
+
+        if args.verify_only:
+            sys.exit(0 if verify_snapshot(args.snapshot_dir, snapshot_id) else 1)
+
+        if not args.force:
+            if not confirm_restore():
+                print("[INFO] リストアをキャンセルしました")
+                sys.exit(0)
+
+        print()
+        if not restore_from_snapshot(
+            args.snapshot_dir, snapshot_id, args.db_path, skip_backup=args.no_backup
+        ):
+            print()
+            print("[ERROR] データベースリストアに失敗しました")
+            sys.exit(1)
+
+        print()
+        print("=" * 80)
+        print("リストア処理完了")
+        print("=" * 80)
+        print()
+        print("[INFO] アプリケーションを再起動してください")
         sys.exit(0)
 
     # バックアップファイルが指定されていない場合
@@ -126,7 +126,7 @@ waitress-serve ^
     --port=%PORT% ^
     --threads=%WORKERS% ^
     --channel-timeout=%TIMEOUT% ^
-    --call app:create_app
+    wsgi:app
 
 REM If waitress exits, show error
 if errorlevel 1 (
@@ -110,4 +110,4 @@ exec gunicorn \
     --log-level info \
     --capture-output \
     --enable-stdio-inheritance \
-    'app:create_app("production")'
+    wsgi:app
@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 """
-全データ更新スクリプト
+データ更新スケジューラ
+
+各銘柄の市場（東証・米国・KRX）の大引け後に、前回同期以降の差分だけを
+株価 → 配当 → 評価指標 → ベンチマークの順に小さなバッチで更新し続ける。
+複数ホスト・複数プロセスで起動しても、リースを取得した1プロセスだけが実行する。
 
 Usage:
     python scripts/update_all_data.py [options]
 
 Options:
+    --once              実行待ちのジョブをすべて実行して終了
+    --full              市場カレンダーによらず全データを更新パイプラインで一括更新して終了
+    --resume            --full で前回中断した実行を完了済みステージから再開
     --skip-prices       株価更新をスキップ
     --skip-dividends    配当更新をスキップ
     --skip-metrics      評価指標更新をスキップ
@@ -14,7 +21,9 @@ Options:
 
 import os
 import sys
+import signal
 import argparse
+import threading
 from datetime import datetime
 from pathlib import Path
 
@@ -27,271 +36,166 @@ from dotenv import load_dotenv
 # 環境変数を読み込み
 load_dotenv()
 
-from app import create_app, db
-from app.models import Holding
-from app.services import (
-    StockPriceFetcher,
-    DividendFetcher,
-    StockMetricsFetcher
-)
-from app.services.benchmark_fetcher import BenchmarkFetcher
-
-
-def update_stock_prices():
-    """全保有銘柄の株価を更新"""
-    print()
-    print("=" * 60)
-    print("株価更新")
-    print("=" * 60)
-
-    holdings = Holding.query.all()
-
-    if not holdings:
-        print("[INFO] 保有銘柄がありません")
-        return {'success': 0, 'failed': 0}
-
-    print(f"[INFO] {len(holdings)}銘柄の株価を更新します...")
-
-    success_count = 0
-    failed_count = 0
-
-    for holding in holdings:
-        try:
-            print(f"[INFO] {holding.ticker_symbol} ({holding.security_name}) 更新中...")
-
-            # 株価取得
-            price_data = StockPriceFetcher.get_current_price(
-                holding.ticker_symbol,
-                use_cache=False
-            )
-
-            if price_data:
-                # 為替レート（外国株の場合）
-                exchange_rate = 1.0
-                if holding.currency == 'USD':
-                    from app.services.exchange_rate_fetcher import ExchangeRateFetcher
-                    rate_data = ExchangeRateFetcher.get_rate('USD', 'JPY')
-                    if rate_data:
-                        exchange_rate = rate_data.get('rate', 1.0)
-
-                # 保有銘柄の株価を更新
-                holding.update_current_price(
-                    price_data.get('current_price'),
-                    exchange_rate=exchange_rate,
-                    previous_close=price_data.get('previous_close')
-                )
-
-                db.session.commit()
+from app import create_app
+from app.services.refresh_pipeline import RefreshPipeline
+from app.services.update_scheduler import UpdateScheduler
+from app.utils.market_calendar import MARKETS, latest_session, next_session_close
 
-                print(f"[SUCCESS] {holding.ticker_symbol}: ¥{holding.current_price:,.2f}")
-                success_count += 1
-            else:
-                print(f"[WARNING] {holding.ticker_symbol}: 株価取得失敗")
-                failed_count += 1
-
-        except Exception as e:
-            print(f"[ERROR] {holding.ticker_symbol}: {str(e)}")
-            failed_count += 1
-            db.session.rollback()
-
-    print()
-    print(f"[INFO] 株価更新完了: 成功={success_count}, 失敗={failed_count}")
-
-    return {'success': success_count, 'failed': failed_count}
-
-
-def update_dividends():
-    """全保有銘柄の配当データを更新"""
-    print()
-    print("=" * 60)
-    print("配当データ更新")
-    print("=" * 60)
 
-    holdings = Holding.query.all()
+def print_status():
+    """市場ごとの同期対象の取引日と次の大引けを表示"""
+    for market, spec in MARKETS.items():
+        print(
+            f"[INFO] {spec['name']}: 同期対象={latest_session(market)} "
+            f"次の大引け={next_session_close(market).astimezone():%Y-%m-%d %H:%M}"
+        )
 
-    if not holdings:
-        print("[INFO] 保有銘柄がありません")
-        return {'success': 0, 'failed': 0}
 
-    print(f"[INFO] {len(holdings)}銘柄の配当データを更新します...")
-
-    success_count = 0
-    failed_count = 0
-
-    for holding in holdings:
-        try:
-            print(f"[INFO] {holding.ticker_symbol} 配当データ取得中...")
-
-            dividends = DividendFetcher.fetch_dividends(holding.ticker_symbol)
-
-            if dividends:
-                print(f"[SUCCESS] {holding.ticker_symbol}: {len(dividends)}件の配当データ")
-                success_count += 1
-            else:
-                print(f"[INFO] {holding.ticker_symbol}: 配当データなし")
-
-        except Exception as e:
-            print(f"[ERROR] {holding.ticker_symbol}: {str(e)}")
-            failed_count += 1
-
-    print()
-    print(f"[INFO] 配当データ更新完了: 成功={success_count}, 失敗={failed_count}")
-
-    return {'success': success_count, 'failed': failed_count}
-
-
-def update_stock_metrics():
-    """全保有銘柄の評価指標を更新"""
-    print()
-    print("=" * 60)
-    print("評価指標更新")
-    print("=" * 60)
+def run_once(jobs):
+    """実行待ちのジョブがなくなるまで実行"""
+    owner = UpdateScheduler.new_owner()
+    if not UpdateScheduler.acquire_leadership(owner):
+        print("[INFO] 他のプロセスが更新中のため終了します")
+        return 0
 
+    failed = 0
     try:
-        results = StockMetricsFetcher.update_all_holdings_metrics()
-
-        print()
-        print(f"[INFO] 評価指標更新完了: 成功={results['success']}, 失敗={results['failed']}")
-
-        return results
-
-    except Exception as e:
-        print(f"[ERROR] 評価指標更新エラー: {str(e)}")
-        return {'success': 0, 'failed': 0}
-
-
-def update_benchmarks():
-    """ベンチマーク価格を更新"""
-    print()
-    print("=" * 60)
-    print("ベンチマーク価格更新")
-    print("=" * 60)
-
-    benchmarks = [
-        ('^N225', '日経平均株価'),
-        ('^GSPC', 'S&P 500')
-    ]
-
-    success_count = 0
-    failed_count = 0
-
-    for ticker, name in benchmarks:
-        try:
-            print(f"[INFO] {name} ({ticker}) 更新中...")
-
-            price_data = BenchmarkFetcher.get_current_price(ticker)
-
-            if price_data:
-                # データベースに保存
-                BenchmarkFetcher.save_price(ticker, price_data)
-
-                print(f"[SUCCESS] {name}: {price_data.get('current_price'):,.2f}")
-                success_count += 1
-            else:
-                print(f"[WARNING] {name}: 価格取得失敗")
-                failed_count += 1
-
-        except Exception as e:
-            print(f"[ERROR] {name}: {str(e)}")
-            failed_count += 1
-
-    print()
-    print(f"[INFO] ベンチマーク更新完了: 成功={success_count}, 失敗={failed_count}")
-
-    return {'success': success_count, 'failed': failed_count}
+        while True:
+            # バッチごとにリースを延長し、他のプロセスに取られたら中断する
+            summaries = UpdateScheduler.run_pending(jobs=jobs, owner=owner)
+            if not summaries:
+                break
+            for s in summaries:
+                print(
+                    f"[INFO] {s['job']:10s} {s['market']:4s} {s['session']} "
+                    f"成功={len(s['keys']) - len(s['failed']):3d} 失敗={len(s['failed']):3d} "
+                    f"({s['seconds']}秒)"
+                )
+                failed += len(s['failed'])
+            if not UpdateScheduler.acquire_leadership(owner):
+                print("[WARN] 他のプロセスがリースを取得したため中断します")
+                break
+    finally:
+        UpdateScheduler.release_leadership(owner)
+    return failed
+
+
+def run_full(app, jobs, resume):
+    """全データを更新パイプラインで一括更新（依存のないステージは並行実行）"""
+    # スケジューラのジョブとパイプラインの終端ステージの対応
+    stages = [{'prices': 'snapshot'}.get(job, job) for job in jobs]
+    if 'prices' in jobs and 'metrics' in jobs:
+        # 株価アーカイブ（PRICE_ARCHIVE_ENABLED の場合のみ書き出し）
+        stages.append('price_archive')
+
+    # アプリ内スケジューラ・他の更新プロセスと同時に実行しないよう同じリースを保持する
+    with UpdateScheduler.hold_leadership(app) as leader:
+        if not leader:
+            print("[INFO] 他のプロセスが更新中のため終了します")
+            return 0
+        run = RefreshPipeline.run(stages, resume=resume)
+
+    print(f"[INFO] 実行ID: {run['run_id']}")
+    failed = 0
+    for stage, info in run['stages'].items():
+        note = '（再開: 完了済み）' if info.get('resumed') else ''
+        print(f"[INFO] {stage:10s} {info['status']:8s} {info['seconds']:7.2f}秒{note}")
+        if info.get('error'):
+            print(f"       {info['error']}")
+        if info['status'] != 'success':
+            failed += 1
+    print(
+        f"[INFO] 所要時間: {run['seconds']}秒 "
+        f"(最長チェーン: {run['critical_path_seconds']}秒)"
+    )
+    return failed
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Stock P&L Manager 全データ更新ツール',
+        description='Stock P&L Manager データ更新スケジューラ',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 使用例:
-    # 全データ更新
+    # 常駐して各市場の大引け後に差分更新
     python scripts/update_all_data.py
 
-    # 株価のみ更新
-    python scripts/update_all_data.py --skip-dividends --skip-metrics --skip-benchmarks
+    # 未同期の分だけ更新して終了
+    python scripts/update_all_data.py --once
+
+    # 全データを一括更新（中断した場合は --resume で再開）
+    python scripts/update_all_data.py --full
+    python scripts/update_all_data.py --full --resume
 
-    # 配当と評価指標を更新
-    python scripts/update_all_data.py --skip-prices --skip-benchmarks
+    # 株価のみ更新
+    python scripts/update_all_data.py --once --skip-dividends --skip-metrics --skip-benchmarks
         """
     )
 
     parser.add_argument(
-        '--skip-prices',
+        '--once',
         action='store_true',
-        help='株価更新をスキップ'
+        help='実行待ちのジョブをすべて実行して終了'
     )
 
     parser.add_argument(
-        '--skip-dividends',
+        '--full',
         action='store_true',
-        help='配当更新をスキップ'
+        help='全データを更新パイプラインで一括更新して終了'
     )
 
     parser.add_argument(
-        '--skip-metrics',
+        '--resume',
         action='store_true',
-        help='評価指標更新をスキップ'
+        help='--full で前回中断した実行を再開'
     )
 
-    parser.add_argument(
-        '--skip-benchmarks',
-        action='store_true',
-        help='ベンチマーク更新をスキップ'
-    )
+    for job, label in [
+        ('prices', '株価'),
+        ('dividends', '配当'),
+        ('metrics', '評価指標'),
+        ('benchmarks', 'ベンチマーク'),
+    ]:
+        parser.add_argument(
+            f'--skip-{job}',
+            action='store_true',
+            help=f'{label}更新をスキップ'
+        )
 
     args = parser.parse_args()
+    jobs = [job for job in UpdateScheduler.JOBS if not getattr(args, f'skip_{job}')]
+
+    # Flaskアプリケーションを作成（アプリ内スケジューラとの二重起動を避ける）
+    # 設定クラスは import 時に環境変数を読み込むため、環境変数ではなく設定を直接上書きする
+    app = create_app(
+        os.getenv('FLASK_ENV', 'development'),
+        config_overrides={'UPDATE_SCHEDULER_ENABLED': False},
+    )
 
-    # Flaskアプリケーションコンテキストを作成
-    app = create_app(os.getenv('FLASK_ENV', 'development'))
+    print("=" * 60)
+    print("Stock P&L Manager - データ更新スケジューラ")
+    print("=" * 60)
+    print(f"[INFO] 開始時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"[INFO] 対象ジョブ: {', '.join(jobs)}")
 
     with app.app_context():
-        print("=" * 60)
-        print("Stock P&L Manager - 全データ更新")
-        print("=" * 60)
-        print(f"[INFO] 開始時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-        results = {}
-
-        # 株価更新
-        if not args.skip_prices:
-            results['prices'] = update_stock_prices()
-
-        # 配当更新
-        if not args.skip_dividends:
-            results['dividends'] = update_dividends()
-
-        # 評価指標更新
-        if not args.skip_metrics:
-            results['metrics'] = update_stock_metrics()
-
-        # ベンチマーク更新
-        if not args.skip_benchmarks:
-            results['benchmarks'] = update_benchmarks()
-
-        # 結果サマリー
-        print()
-        print("=" * 60)
-        print("更新結果サマリー")
-        print("=" * 60)
-
-        total_success = sum(r.get('success', 0) for r in results.values())
-        total_failed = sum(r.get('failed', 0) for r in results.values())
-
-        for key, result in results.items():
-            if result:
-                print(f"{key:15s}: 成功={result.get('success', 0):3d}, 失敗={result.get('failed', 0):3d}")
-
-        print("-" * 60)
-        print(f"{'合計':15s}: 成功={total_success:3d}, 失敗={total_failed:3d}")
-        print()
-        print(f"[INFO] 完了時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 60)
-
-        if total_failed > 0:
-            sys.exit(1)
+        print_status()
+
+        if args.full:
+            failed = run_full(app, jobs, args.resume)
+            print(f"[INFO] 完了時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            sys.exit(1 if failed else 0)
+
+        if args.once:
+            failed = run_once(jobs)
+            print(f"[INFO] 完了時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            sys.exit(1 if failed else 0)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    UpdateScheduler.run_forever(app, stop_event, jobs=jobs)
 
 
 if __name__ == '__main__':
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from app import create_app, db
 from app.models.transaction import Transaction
 from app.models.dividend import Dividend
+from app.services.position_index import PositionIndex
 from sqlalchemy import func
 
 # Disable SSL verification
@@ -32,21 +33,13 @@ def get_currency_from_ticker(ticker_symbol):
     else:
         return 'USD'
 
-def get_holdings_at_date(ticker_symbol, target_date):
-    """Calculate holdings quantity at a specific date"""
-    transactions = Transaction.query.filter(
-        Transaction.ticker_symbol == ticker_symbol,
-        Transaction.transaction_date <= target_date
-    ).order_by(Transaction.transaction_date).all()
-
-    total_quantity = Decimal('0')
-    for t in transactions:
-        if t.transaction_type == 'BUY':
-            total_quantity += t.quantity
-        elif t.transaction_type == 'SELL':
-            total_quantity -= t.quantity
-
-    return total_quantity
+def get_holdings_at_dates(ticker_symbol, target_dates):
+    """Calculate holdings quantity at each of the given dates (one indexed lookup)"""
+    quantities = PositionIndex.load().quantity_at(ticker_symbol, target_dates)
+    return {
+        target_date: Decimal(str(quantity))
+        for target_date, quantity in zip(target_dates, quantities)
+    }
 
 def get_exchange_rate_at_date(ticker_symbol, target_date):
     """Get exchange rate from transactions near the target date"""
@@ -133,12 +126,16 @@ with app.app_context():
                 new_count = 0
                 updated_count = 0
 
+                # Calculate holdings at every dividend date at once
+                holdings_at_dates = get_holdings_at_dates(
+                    ticker_symbol, [d.date() for d in dividends.index]
+                )
+
                 for div_date, div_amount in dividends.items():
                     # Convert pandas Timestamp to datetime.date
                     div_date_only = div_date.date()
 
-                    # Calculate holdings at dividend date
-                    quantity_held = get_holdings_at_date(ticker_symbol, div_date_only)
+                    quantity_held = holdings_at_dates[div_date_only]
 
                     if quantity_held <= 0:
                         continue  # Skip if no holdings at this date
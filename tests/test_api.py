@@ -35,6 +35,42 @@ class TestHoldingsAPI:
         assert "1475" in tickers
         assert "AAPL" in tickers
 
+    def test_get_holdings_conditional_get(self, client, db_session, sample_holdings):
+        """データが変わらなければ 304、書き込み後は新しいETagで 200"""
+        from app.models import Holding
+
+        first = client.get("/api/holdings")
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        cached = client.get("/api/holdings", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.data == b""
+
+        holding = Holding.query.filter_by(ticker_symbol="AAPL").first()
+        holding.current_price = 190
+        db_session.commit()
+
+        updated = client.get("/api/holdings", headers={"If-None-Match": etag})
+        assert updated.status_code == 200
+        assert updated.headers["ETag"] != etag
+
+    def test_get_holdings_gzip(
+        self, app, client, db_session, sample_holdings, monkeypatch
+    ):
+        """閾値以上のレスポンスは Accept-Encoding に応じて gzip で圧縮"""
+        import gzip
+
+        monkeypatch.setitem(app.config, "HTTP_COMPRESS_MIN_BYTES", 100)
+
+        plain = client.get("/api/holdings")
+        compressed = client.get("/api/holdings", headers={"Accept-Encoding": "gzip"})
+
+        assert "Content-Encoding" not in plain.headers
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in compressed.headers["Vary"]
+        assert gzip.decompress(compressed.data) == plain.data
+
 
 class TestTransactionsAPI:
     """取引履歴APIのテスト"""
@@ -66,6 +102,51 @@ class TestTransactionsAPI:
         assert data["success"] is True
         assert len(data["transactions"]) <= 2
 
+    def test_get_transactions_keyset_pagination(
+        self, client, db_session, sample_transactions
+    ):
+        """カーソルで全ページを重複なく取得できる"""
+        response = client.get("/api/transactions?limit=2")
+        first = json.loads(response.data)
+        assert first["total_count"] == 3
+        assert first["has_more"] is True
+        assert [t["transaction_date"] for t in first["transactions"]] == [
+            "2024-03-20",
+            "2024-02-15",
+        ]
+
+        response = client.get(
+            f"/api/transactions?limit=2&cursor={first['next_cursor']}"
+        )
+        second = json.loads(response.data)
+        assert second["has_more"] is False
+        assert second["next_cursor"] is None
+        assert [t["transaction_date"] for t in second["transactions"]] == ["2024-01-10"]
+
+    def test_get_transactions_filters(self, client, db_session, sample_transactions):
+        """期間・種別・通貨フィルター"""
+        response = client.get(
+            "/api/transactions?start_date=2024-02-01&type=buy&currency=USD"
+        )
+        data = json.loads(response.data)
+        assert data["total_count"] == 1
+        assert data["transactions"][0]["ticker_symbol"] == "AAPL"
+
+    def test_get_transactions_invalid_cursor(self, client, db_session):
+        """不正なカーソル"""
+        response = client.get("/api/transactions?cursor=invalid")
+        assert response.status_code == 400
+
+    def test_get_transactions_ndjson(self, client, db_session, sample_transactions):
+        """NDJSONストリーミング"""
+        response = client.get("/api/transactions?format=ndjson&ticker=1475")
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+
+        lines = response.get_data(as_text=True).strip().split("\n")
+        rows = [json.loads(line) for line in lines]
+        assert [r["transaction_type"] for r in rows] == ["SELL", "BUY"]
+
     def test_get_single_transaction(self, client, db_session, sample_transactions):
         """単一取引の取得"""
         # まず全取引を取得してIDを取得
@@ -118,6 +199,30 @@ class TestTransactionsAPI:
 
         assert response.status_code == 404
 
+    def test_delete_transactions_bulk(self, client, db_session, sample_transactions):
+        """取引の一括削除と影響銘柄の再計算"""
+        from app.models import Holding, RealizedPnl, Transaction
+
+        sell = sample_transactions[2]
+        ids = [sell.id, 99999]
+
+        response = client.post(
+            "/api/transactions/delete",
+            data=json.dumps({"transaction_ids": ids}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["deleted_count"] == 1
+        assert data["affected_tickers"] == ["1475"]
+        assert data["earliest_dates"] == {"1475": "2024-03-20"}
+
+        assert Transaction.query.count() == 2
+        assert RealizedPnl.query.filter_by(ticker_symbol="1475").count() == 0
+        holding = Holding.query.filter_by(ticker_symbol="1475").first()
+        assert holding.total_quantity == 100
+
 
 class TestRealizedPnlAPI:
     """実現損益APIのテスト"""
@@ -227,6 +332,86 @@ class TestDashboardAPI:
         assert "yearly_stats" in data
         assert "total" in data
 
+    def test_get_pnl_history_all_monthly(
+        self, client, db_session, sample_transactions, sample_realized_pnl
+    ):
+        """損益推移（全期間・月次）"""
+        from app.models import PortfolioSnapshot
+
+        db_session.add(
+            PortfolioSnapshot(
+                snapshot_date=date(2024, 2, 1),
+                holdings_count=2,
+                total_cost=226805.0,
+                market_value=236805.0,
+                unrealized_pnl=10000.0,
+            )
+        )
+        db_session.commit()
+
+        response = client.get(
+            "/api/dashboard/pnl-history?period=all&granularity=monthly"
+        )
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["success"] is True
+        by_date = {p["date"]: p for p in data["data"]}
+        # 取引開始月（2024-01）は未実現損益・確定損益ともにゼロ
+        assert by_date["2024-01-31"]["pnl"] == 0
+        assert by_date["2024-02-29"]["unrealized_pnl"] == 10000.0
+        assert by_date["2024-03-31"]["realized_pnl"] == 4900.0
+        assert by_date["2024-03-31"]["pnl"] == 14900.0
+
+    def test_get_pnl_history_invalid_granularity(self, client, db_session):
+        """損益推移（不正な粒度）"""
+        response = client.get("/api/dashboard/pnl-history?granularity=hourly")
+        assert response.status_code == 400
+
+
+class TestExportAPI:
+    """エクスポートAPIのテスト"""
+
+    def test_export_transactions_csv(self, client, db_session, sample_transactions):
+        """取引CSVエクスポート（日付昇順・フィルター適用）"""
+        response = client.get("/api/export/transactions?type=buy")
+        assert response.status_code == 200
+        assert response.mimetype == "text/csv"
+        assert "attachment" in response.headers["Content-Disposition"]
+
+        lines = response.data.decode("utf-8-sig").splitlines()
+        assert lines[0].startswith("id,transaction_date,ticker_symbol")
+        assert len(lines) == 3
+        assert lines[1].split(",")[1] == "2024-01-10"
+        assert lines[2].split(",")[1] == "2024-02-15"
+
+    def test_export_realized_pnl_ndjson_gzip(
+        self, client, db_session, sample_realized_pnl
+    ):
+        """確定損益NDJSONエクスポート（gzip）"""
+        import gzip
+
+        response = client.get("/api/export/realized-pnl?format=ndjson&gzip=1")
+        assert response.status_code == 200
+        assert response.mimetype == "application/gzip"
+
+        lines = gzip.decompress(response.data).decode("utf-8").splitlines()
+        assert len(lines) == 1
+        record = json.loads(lines[0])
+        assert record["ticker_symbol"] == "1475"
+        assert record["sell_date"] == "2024-03-20"
+        assert record["realized_pnl"] == 4900.0
+
+    def test_export_unknown_dataset(self, client, db_session):
+        """存在しないデータセット"""
+        response = client.get("/api/export/unknown")
+        assert response.status_code == 404
+
+    def test_export_invalid_format(self, client, db_session):
+        """不正なフォーマット"""
+        response = client.get("/api/export/dividends?format=xml")
+        assert response.status_code == 400
+
 
 class TestPerformanceAPI:
     """損益推移APIのテスト"""
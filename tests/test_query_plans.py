@@ -0,0 +1,284 @@
+"""
+クエリプランの回帰テスト
+
+大量データを投入したDBでサービス層の処理を実行し、発行されたSQLの
+EXPLAIN QUERY PLAN を取得する。
+- 取引・配当・確定損益・保有銘柄・株価のテーブルをインデックスなしで全件走査
+  （SCAN <テーブル>）するクエリがあれば失敗
+- tests/query_plans.json の記録と異なるプランは差分を警告として表示
+
+プランの記録を更新する場合:
+    UPDATE_QUERY_PLANS=1 python -m pytest tests/test_query_plans.py
+"""
+
+import difflib
+import json
+import os
+import re
+import warnings
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import db
+from app.models import Dividend, Holding, RealizedPnl, Transaction
+
+BASELINE_PATH = Path(__file__).resolve().parent / "query_plans.json"
+
+# 全件走査を許容しないテーブル
+HOT_TABLES = {"transactions", "dividends", "realized_pnl", "holdings", "stock_prices"}
+
+TICKER_COUNT = 400
+TRANSACTIONS_PER_TICKER = 25
+DIVIDENDS_PER_TICKER = 10
+SELLS_PER_TICKER = 5
+
+
+def _seed_large_database():
+    """銘柄数×取引数の大量データを一括投入して統計を更新"""
+    tickers = [f"T{i:04d}" for i in range(TICKER_COUNT)]
+    start = date(2015, 1, 5)
+
+    transactions = []
+    dividends = []
+    realized = []
+    holdings = []
+    for n, ticker in enumerate(tickers):
+        for i in range(TRANSACTIONS_PER_TICKER):
+            sell = i % 5 == 4
+            transactions.append(
+                {
+                    "transaction_date": start + timedelta(days=i * 30 + n % 30),
+                    "ticker_symbol": ticker,
+                    "security_name": f"銘柄{ticker}",
+                    "transaction_type": "SELL" if sell else "BUY",
+                    "currency": "JPY",
+                    "quantity": 10,
+                    "unit_price": 1000 + i,
+                    "commission": 0,
+                    "settlement_amount": 10000 + i * 10,
+                }
+            )
+        for i in range(DIVIDENDS_PER_TICKER):
+            dividends.append(
+                {
+                    "ticker_symbol": ticker,
+                    "ex_dividend_date": start + timedelta(days=i * 90 + n % 30),
+                    "dividend_amount": 10,
+                    "currency": "JPY",
+                    "total_dividend": 100,
+                    "quantity_held": 10,
+                }
+            )
+        for i in range(SELLS_PER_TICKER):
+            realized.append(
+                {
+                    "ticker_symbol": ticker,
+                    "sell_date": start + timedelta(days=i * 150 + 120 + n % 30),
+                    "quantity": 10,
+                    "average_cost": 1000,
+                    "sell_price": 1100,
+                    "realized_pnl": 1000,
+                    "currency": "JPY",
+                }
+            )
+        holdings.append(
+            {
+                "ticker_symbol": ticker,
+                "security_name": f"銘柄{ticker}",
+                "total_quantity": 150,
+                "average_cost": 1000,
+                "total_cost": 150000,
+                "currency": "JPY",
+            }
+        )
+
+    for model, rows in [
+        (Transaction, transactions),
+        (Dividend, dividends),
+        (RealizedPnl, realized),
+        (Holding, holdings),
+    ]:
+        db.session.execute(insert(model), rows)
+    db.session.commit()
+    db.session.connection().exec_driver_sql("ANALYZE")
+    db.session.commit()
+
+
+@contextmanager
+def _capture_statements():
+    """実行されたSELECT/UPDATE/DELETE文とパラメータを収集"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if many:
+            return
+        if (
+            statement.lstrip()
+            .upper()
+            .startswith(("SELECT", "WITH", "UPDATE", "DELETE"))
+        ):
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _explain(statement, parameters):
+    """EXPLAIN QUERY PLAN をツリー表示の行リストで取得"""
+    rows = (
+        db.session.connection()
+        .exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        .all()
+    )
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def _collect_plans(action):
+    """処理を実行し、重複を除いたSQLごとのプランを取得"""
+    with _capture_statements() as statements:
+        action()
+
+    plans = []
+    seen = set()
+    for statement, parameters in statements:
+        sql = " ".join(statement.split())
+        if sql in seen:
+            continue
+        seen.add(sql)
+        plans.append({"sql": sql, "plan": _explain(statement, parameters)})
+    return plans
+
+
+def _full_scans(plans, allowed=()):
+    """インデックスを使わない全件走査（SCAN <テーブル>）を検出"""
+    scans = []
+    for entry in plans:
+        for line in entry["plan"]:
+            match = re.fullmatch(r"\s*SCAN (\w+)", line)
+            if match and match.group(1) in HOT_TABLES - set(allowed):
+                scans.append(f"{line.strip()}\n    {entry['sql']}")
+    return scans
+
+
+def _render(plans):
+    lines = []
+    for entry in plans:
+        lines.append(f"-- {entry['sql']}")
+        lines.extend(entry["plan"])
+    return lines
+
+
+def _compare_with_baseline(name, plans):
+    """記録済みプランとの差分を表示（UPDATE_QUERY_PLANS=1 で記録を更新）"""
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+
+    if os.environ.get("UPDATE_QUERY_PLANS"):
+        baseline[name] = plans
+        BASELINE_PATH.write_text(
+            json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+        )
+        return
+
+    if name not in baseline:
+        warnings.warn(f"クエリプランの記録がありません: {name}")
+        return
+
+    diff = list(
+        difflib.unified_diff(
+            _render(baseline[name]),
+            _render(plans),
+            fromfile=f"{name} (記録)",
+            tofile=f"{name} (現在)",
+            lineterm="",
+        )
+    )
+    if diff:
+        warnings.warn(f"クエリプランが変更されました: {name}\n" + "\n".join(diff))
+
+
+def _recalculate_holding():
+    from app.services.transaction_service import TransactionService
+
+    TransactionService.recalculate_holding("T0001")
+
+
+def _rebuild_holdings():
+    from app.services.transaction_service import TransactionService
+
+    TransactionService.rebuild_holdings(tickers=["T0001", "T0002", "T0003"], workers=1)
+
+
+def _position_index():
+    from app.services.position_index import PositionIndex
+
+    PositionIndex.build().quantity_on("T0001", date(2016, 1, 1))
+
+
+def _ticker_dividends():
+    from app.services.dividend_fetcher import DividendFetcher
+
+    DividendFetcher.calculate_total_dividends(
+        ticker_symbol="T0001", start_date=date(2016, 1, 1)
+    )
+
+
+def _realized_irr():
+    from app.services.performance_service import PerformanceService
+
+    PerformanceService.calculate_irr_for_realized("T0001")
+
+
+def _investment_totals():
+    from app.services.dividend_aggregation_service import DividendAggregationService
+
+    DividendAggregationService.aggregate_investments()
+
+
+def _realized_pnl_list(client):
+    def action():
+        response = client.get("/api/realized-pnl")
+        assert response.status_code == 200
+
+    return action
+
+
+SCENARIOS = {
+    "recalculate_holding": _recalculate_holding,
+    "rebuild_holdings": _rebuild_holdings,
+    "position_index": _position_index,
+    "ticker_dividends": _ticker_dividends,
+    "realized_irr": _realized_irr,
+    "investment_totals": _investment_totals,
+    "realized_pnl_list": None,
+}
+
+# 全件を返す処理で走査を許容するテーブル
+ALLOWED_SCANS = {"realized_pnl_list": {"realized_pnl"}}
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_service_queries_use_indexes(name, app, client, db_session):
+    """サービスのクエリが主要テーブルを全件走査しない"""
+    _seed_large_database()
+    action = SCENARIOS[name] or _realized_pnl_list(client)
+
+    plans = _collect_plans(action)
+    assert plans, f"クエリが実行されていません: {name}"
+
+    scans = _full_scans(plans, ALLOWED_SCANS.get(name, set()))
+    assert not scans, f"全件走査のクエリがあります ({name}):\n" + "\n".join(scans)
+
+    _compare_with_baseline(name, plans)
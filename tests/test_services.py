@@ -7,7 +7,7 @@ from decimal import Decimal
 
 import pytest
 
-from app.models import Holding, RealizedPnl, Transaction
+from app.models import Dividend, Holding, RealizedPnl, Transaction
 from app.services.transaction_service import TransactionService
 
 
@@ -267,3 +267,1351 @@ class TestTransactionService:
 
         holding = Holding.query.filter_by(ticker_symbol="NONEXIST").first()
         assert holding is None
+
+    def test_save_transactions_bulk(self, db_session, sample_transactions):
+        """一括保存（重複・売却不可の行エラーと保有情報の再構築）"""
+
+        def row(day, ticker, tx_type, quantity, unit_price):
+            return {
+                "transaction_date": day,
+                "ticker_symbol": ticker,
+                "security_name": ticker,
+                "transaction_type": tx_type,
+                "currency": "JPY",
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "commission": 0,
+                "settlement_amount": quantity * unit_price,
+            }
+
+        TransactionService.recalculate_holding("1475")
+
+        result = TransactionService.save_transactions_bulk(
+            [
+                # 既存取引と重複
+                row(date(2024, 1, 10), "1475", "BUY", 100.0, 2000.0),
+                row(date(2024, 4, 1), "1475", "SELL", 50.0, 2200.0),
+                row(date(2024, 4, 1), "7203", "BUY", 100.0, 3000.0),
+                # ファイル内で重複
+                row(date(2024, 4, 1), "7203", "BUY", 100.0, 3000.0),
+                row(date(2024, 4, 2), "9984", "SELL", 10.0, 8000.0),
+            ],
+            chunk_size=1,
+        )
+
+        assert result["success"] == 2
+        assert result["failed"] == 3
+        messages = [e["error"] for e in result["errors"]]
+        assert messages.count("重複する取引が既に存在します") == 2
+        assert any("9984" in m for m in messages)
+
+        # 1475は全量売却済み、7203は新規保有
+        assert Holding.query.filter_by(ticker_symbol="1475").first() is None
+        assert RealizedPnl.query.filter_by(ticker_symbol="1475").count() == 2
+        holding = Holding.query.filter_by(ticker_symbol="7203").first()
+        assert holding.total_quantity == 100
+        assert Transaction.query.count() == 5
+
+    def test_fingerprint_maintained_and_bulk_lookup(
+        self, db_session, sample_transactions
+    ):
+        """重複判定用ハッシュの自動更新と一括検索"""
+        buy = sample_transactions[0]
+        assert buy.fingerprint == Transaction.compute_fingerprint(
+            "2024-01-10", "1475", Decimal("100"), "2000"
+        )
+        assert TransactionService.check_duplicate(date(2024, 1, 10), "1475", 100, 2000)
+
+        buy.unit_price = 2050.0
+        db_session.commit()
+        assert not TransactionService.check_duplicate(
+            date(2024, 1, 10), "1475", 100, 2000
+        )
+
+        candidates = [t.fingerprint for t in sample_transactions] + ["0" * 64]
+        existing = TransactionService.find_existing_fingerprints(candidates)
+        assert existing == {t.fingerprint for t in sample_transactions}
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_recalculate_all_holdings(
+        self, db_session, sample_transactions, monkeypatch, workers
+    ):
+        """全銘柄の一括再計算（直列・プロセスプール）が銘柄単位の再計算と一致"""
+        monkeypatch.setattr(TransactionService, "PARALLEL_MIN_TRANSACTIONS", 1)
+        monkeypatch.setattr(TransactionService, "LEDGER_BATCH_SIZE", 1)
+
+        for ticker in ("1475", "AAPL"):
+            TransactionService.recalculate_holding(ticker)
+        expected_holdings = {
+            h.ticker_symbol: (h.total_quantity, h.average_cost, h.total_cost)
+            for h in Holding.query.all()
+        }
+        expected_pnl = [
+            (p.ticker_symbol, p.sell_date, p.realized_pnl)
+            for p in RealizedPnl.query.all()
+        ]
+
+        progress = []
+        result = TransactionService.recalculate_all_holdings(
+            workers=workers, progress=lambda done, total: progress.append(done)
+        )
+
+        assert result == {
+            "tickers": 2,
+            "holdings": 2,
+            "realized_pnl": 1,
+            "divergences": 0,
+        }
+        assert progress[-1] == 2
+        assert {
+            h.ticker_symbol: (h.total_quantity, h.average_cost, h.total_cost)
+            for h in Holding.query.all()
+        } == expected_holdings
+        assert [
+            (p.ticker_symbol, p.sell_date, p.realized_pnl)
+            for p in RealizedPnl.query.all()
+        ] == expected_pnl
+
+
+class TestLedgerEngine:
+    """LedgerEngineのテスト"""
+
+    def _entries(self):
+        from app.services.transaction_service import LedgerEntry
+
+        def entry(day, tx_type, quantity, price, commission, settlement, name):
+            # DBのNumericカラムと同じくDecimalで渡す
+            return LedgerEntry(
+                day,
+                tx_type,
+                Decimal(quantity),
+                Decimal(price),
+                Decimal(commission),
+                Decimal(settlement) if settlement else None,
+                name,
+                "JPY",
+            )
+
+        return [
+            entry(date(2024, 1, 10), "BUY", "0.3", "1000", "0", "300", "X"),
+            entry(date(2024, 1, 11), "BUY", "0.1", "1100", "5", None, "X"),
+            # 保有数量を超える売却はスキップ
+            entry(date(2024, 1, 12), "SELL", "1", "1200", "0", "1200", "X"),
+            entry(date(2024, 1, 15), "SELL", "0.4", "1200", "0", "480", "X"),
+            # 全量売却後の再購入
+            entry(date(2024, 2, 1), "BUY", "3", "999.99", "1", "3000.97", "X2"),
+            entry(date(2024, 2, 2), "SELL", "1.5", "1010.5", "1", "1514.75", "X2"),
+        ]
+
+    def test_float_engine_matches_decimal(self):
+        """float版とDecimal版の計算結果が一致"""
+        from app.services.ledger_engine import LedgerEngine
+        from app.services.transaction_service import replay_ledger
+
+        entries = self._entries()
+        expected = replay_ledger(entries, "X")
+        actual = LedgerEngine.replay(entries, "X")
+
+        assert LedgerEngine.find_divergences(expected, actual, tolerance=1e-6) == []
+        holding, pnl_records = actual
+        assert holding["total_quantity"] == 1.5
+        assert holding["security_name"] == "X2"
+        assert len(pnl_records) == 2
+
+    def test_find_divergences_beyond_tolerance(self):
+        """許容誤差を超える差分を検出"""
+        from app.services.ledger_engine import LedgerEngine
+
+        entries = self._entries()
+        holding, pnl_records = LedgerEngine.replay(entries, "X")
+        tampered = [dict(record) for record in pnl_records]
+        tampered[0]["realized_pnl"] += 5
+
+        divergences = LedgerEngine.find_divergences(
+            (holding, pnl_records), (holding, tampered), tolerance=1.0
+        )
+        assert [d["field"] for d in divergences] == ["realized_pnl[0].realized_pnl"]
+
+
+class TestPositionIndex:
+    """PositionIndexのテスト"""
+
+    def test_quantity_at_dates(self, app, db_session, sample_transactions):
+        """指定日時点の保有数量を一括取得（当日の取引を含む）"""
+        from app.services.position_index import PositionIndex
+
+        index = PositionIndex.load()
+        dates = [
+            date(2024, 3, 20),
+            date(2024, 1, 9),
+            date(2024, 1, 10),
+            date(2024, 3, 19),
+        ]
+
+        assert index.quantity_at("1475", dates) == [50.0, 0.0, 100.0, 100.0]
+        assert index.quantity_on("AAPL", date(2024, 12, 31)) == 10.0
+        assert index.quantity_on("UNKNOWN", date(2024, 12, 31)) == 0.0
+
+    def test_rebuilt_after_transaction_write(
+        self, app, db_session, sample_transactions
+    ):
+        """取引の追加後は索引が再構築される"""
+        from app.services.position_index import PositionIndex
+
+        assert PositionIndex.load().quantity_on("1475", date(2024, 4, 1)) == 50.0
+
+        db_session.add(
+            Transaction(
+                transaction_date=date(2024, 4, 1),
+                ticker_symbol="1475",
+                security_name="iシェアーズ TOPIXコアETF",
+                transaction_type="BUY",
+                quantity=25,
+                unit_price=2200.0,
+                currency="JPY",
+            )
+        )
+        db_session.commit()
+
+        index = PositionIndex.load()
+        assert index.quantity_at("1475", [date(2024, 3, 31), date(2024, 4, 1)]) == [
+            50.0,
+            75.0,
+        ]
+
+
+class TestReturnsEngine:
+    """ReturnsEngineのテスト"""
+
+    def _store_prices(self, db_session, ticker, start, closes):
+        from datetime import timedelta
+
+        from app.models import StockPrice
+
+        for offset, close in enumerate(closes):
+            db_session.add(
+                StockPrice(
+                    ticker_symbol=ticker,
+                    price_date=start + timedelta(days=offset),
+                    close_price=close,
+                    currency="JPY",
+                )
+            )
+        db_session.commit()
+
+    def test_calculate_from_price_cache(self, app, db_session):
+        """株価キャッシュから複数銘柄のリターンを一括計算"""
+        from app.services.returns_engine import ReturnsEngine
+
+        # 2023-01-01 から毎日 100 → 1日1ずつ上昇
+        self._store_prices(db_session, "AAA", date(2023, 1, 1), range(100, 700))
+        self._store_prices(db_session, "BBB", date(2024, 6, 1), [50.0] * 60)
+
+        results = ReturnsEngine.calculate(
+            ["AAA", "BBB", "CCC"],
+            periods=["ytd", "1y", "5y", "volatility"],
+            as_of=date(2024, 7, 30),
+            fetch=False,
+        )
+
+        aaa = results["AAA"]
+        # 2024-07-30 = 100 + 576, 2024-01-01 = 100 + 365, 2023-07-31 = 100 + 211
+        assert aaa["ytd_return"] == pytest.approx(676 / 465 - 1)
+        assert aaa["one_year_return"] == pytest.approx(676 / 311 - 1)
+        assert aaa["five_year_return"] is None
+        assert aaa["volatility"] > 0
+
+        assert results["BBB"]["ytd_return"] == 0
+        assert results["BBB"]["one_year_return"] is None
+        assert results["BBB"]["volatility"] == 0
+        assert results["CCC"] == {
+            "ytd_return": None,
+            "one_year_return": None,
+            "five_year_return": None,
+            "volatility": None,
+        }
+
+    def test_plan_fetch_only_missing_tail(self, app, db_session):
+        """キャッシュ済みの銘柄は末尾のみ、未取得の銘柄は期間全体を取得"""
+        from app.services.returns_engine import ReturnsEngine
+
+        self._store_prices(db_session, "AAA", date(2024, 1, 1), [100.0] * 180)
+
+        plan = ReturnsEngine.plan_fetch(
+            ["AAA", "CCC"], date(2024, 1, 1), date(2024, 7, 31)
+        )
+
+        assert plan == {"AAA": date(2024, 6, 29), "CCC": date(2024, 1, 1)}
+
+    def test_sync_prices_stores_downloaded_tail(self, app, db_session, monkeypatch):
+        """取得した末尾の株価のうち未保存の分だけを追加"""
+        import pandas as pd
+
+        from app.models import StockPrice
+        from app.services.returns_engine import ReturnsEngine
+
+        self._store_prices(db_session, "AAA", date(2024, 1, 1), [100.0] * 180)
+        requests = []
+
+        def fake_download(tickers, start_date, end_date):
+            requests.append((tickers, start_date))
+            index = pd.to_datetime(["2024-06-28", "2024-07-01", "2024-07-02"])
+            return pd.DataFrame({"AAA": [100.0, 101.0, 102.0]}, index=index)
+
+        monkeypatch.setattr(ReturnsEngine, "_download", staticmethod(fake_download))
+
+        added = ReturnsEngine.sync_prices(
+            ["AAA"], date(2024, 1, 1), date(2024, 7, 2), {"AAA": "JPY"}
+        )
+
+        assert requests == [(["AAA"], date(2024, 6, 29))]
+        assert added == 2
+        assert StockPrice.query.filter_by(ticker_symbol="AAA").count() == 182
+
+    def test_sync_prices_remembers_listing_date(self, app, db_session, monkeypatch):
+        """期間の途中で上場した銘柄は、次回から末尾の差分だけを取得"""
+        import pandas as pd
+
+        from app.services.returns_engine import ReturnsEngine
+
+        requests = []
+
+        def fake_download(tickers, start_date, end_date):
+            requests.append((tickers, start_date))
+            # 2024-05-01 上場（それ以前の終値は返らない）
+            index = pd.date_range(max(start_date, date(2024, 5, 1)), end_date)
+            return pd.DataFrame({"NEW": 100.0}, index=index)
+
+        monkeypatch.setattr(ReturnsEngine, "_download", staticmethod(fake_download))
+
+        ReturnsEngine.sync_prices(["NEW"], date(2024, 1, 1), date(2024, 7, 1))
+        ReturnsEngine.sync_prices(["NEW"], date(2024, 1, 1), date(2024, 7, 2))
+
+        assert requests == [
+            (["NEW"], date(2024, 1, 1)),
+            (["NEW"], date(2024, 7, 2)),
+        ]
+        assert ReturnsEngine._first_dates(["NEW"]) == {"NEW": date(2024, 5, 1)}
+
+
+class TestPriceArchive:
+    """PriceArchiveのテスト"""
+
+    @pytest.fixture
+    def archive(self, app, db_session, tmp_path, monkeypatch):
+        """2023/12〜2024/1の株価（2銘柄）と一時ディレクトリのアーカイブ設定"""
+        from datetime import timedelta
+
+        from app.models import StockPrice
+
+        monkeypatch.setitem(app.config, "PRICE_ARCHIVE_DIR", tmp_path / "archive")
+        monkeypatch.setitem(app.config, "PRICE_ARCHIVE_FORMAT", "npy")
+        for ticker, start, closes in [
+            ("AAA", date(2023, 12, 1), range(100, 160)),
+            ("BBB", date(2024, 1, 15), [50.0] * 20),
+        ]:
+            for offset, close in enumerate(closes):
+                db_session.add(
+                    StockPrice(
+                        ticker_symbol=ticker,
+                        price_date=start + timedelta(days=offset),
+                        close_price=close,
+                        currency="JPY",
+                    )
+                )
+        db_session.commit()
+
+    def test_load_matrix_matches_database(self, app, archive, monkeypatch):
+        """年をまたぐ期間の終値行列がDBからの読み込みと一致"""
+        import pandas as pd
+
+        from app.services.performance_service import PerformanceService
+        from app.services.price_archive import PriceArchive
+        from app.services.returns_engine import ReturnsEngine
+
+        result = PriceArchive.sync()
+        assert result["updated_years"] == [2023, 2024]
+
+        args = (["BBB", "AAA", "CCC"], date(2023, 12, 20), date(2024, 1, 20))
+        expected = ReturnsEngine.load_price_matrix(*args)
+        expected_df = PerformanceService.get_cached_prices_as_df(*args)
+
+        monkeypatch.setitem(app.config, "PRICE_ARCHIVE_ENABLED", True)
+        matrix = PriceArchive.load_matrix(*args)
+        assert matrix is not None
+        pd.testing.assert_frame_equal(ReturnsEngine.load_price_matrix(*args), expected)
+        pd.testing.assert_frame_equal(
+            PerformanceService.get_cached_prices_as_df(*args),
+            expected_df,
+            check_names=False,
+            check_like=True,
+        )
+
+    def test_sync_rewrites_changed_years_only(self, app, db_session, archive):
+        """変更のあった年だけ書き直し、同期前の変更があればアーカイブを使わない"""
+        from app.models import StockPrice
+        from app.services.price_archive import PriceArchive
+
+        PriceArchive.sync()
+        assert PriceArchive.is_fresh()
+
+        price = StockPrice.query.filter_by(
+            ticker_symbol="AAA", price_date=date(2024, 1, 10)
+        ).one()
+        price.close_price = 999
+        db_session.commit()
+
+        assert not PriceArchive.is_fresh()
+        assert (
+            PriceArchive.load_matrix(["AAA"], date(2024, 1, 1), date(2024, 1, 31))
+            is None
+        )
+
+        result = PriceArchive.sync()
+        assert result["updated_years"] == [2024]
+        assert result["unchanged_years"] == 1
+
+        matrix = PriceArchive.load_matrix(["AAA"], date(2024, 1, 10), date(2024, 1, 10))
+        assert matrix["AAA"].tolist() == [999.0]
+
+
+class TestAnalyticsLoader:
+    """AnalyticsLoaderのテスト"""
+
+    def test_loaders_match_orm_values(
+        self, db_session, sample_transactions, sample_dividends, sample_realized_pnl
+    ):
+        """Coreで読み込んだ値がORMと一致し、数値はfloat64で返る"""
+        from app.services.analytics_loader import AnalyticsLoader
+
+        for frame, model, date_column in [
+            (AnalyticsLoader.transactions(), Transaction, "transaction_date"),
+            (AnalyticsLoader.dividends(), Dividend, "ex_dividend_date"),
+            (AnalyticsLoader.realized_pnl(), RealizedPnl, "sell_date"),
+        ]:
+            objects = model.query.order_by(getattr(model, date_column), model.id).all()
+            assert frame["id"].tolist() == [obj.id for obj in objects]
+            assert frame[date_column].dt.date.tolist() == [
+                getattr(obj, date_column) for obj in objects
+            ]
+            for column, kind in frame.dtypes.items():
+                if kind == "float64":
+                    assert frame[column].tolist() == [
+                        float(getattr(obj, column)) for obj in objects
+                    ]
+
+    def test_filters_and_records(self, db_session, sample_transactions):
+        """銘柄・期間で絞り込み、行ごとの処理向けに date の名前付きタプルへ変換"""
+        from app.services.analytics_loader import AnalyticsLoader
+
+        frame = AnalyticsLoader.transactions(
+            ticker_symbols=["1475"], start_date=date(2024, 1, 1)
+        )
+        records = AnalyticsLoader.records(frame)
+
+        assert len(records) == len(frame) > 0
+        assert all(r.ticker_symbol == "1475" for r in records)
+        assert isinstance(records[0].transaction_date, date)
+        assert isinstance(records[0].quantity, float)
+        assert AnalyticsLoader.transactions(ticker_symbols=["NONE"]).empty
+
+
+class TestApiSerializer:
+    """ApiSerializer・FastJSONProviderのテスト"""
+
+    def test_rows_match_to_dict(
+        self, app, db_session, sample_transactions, sample_holdings, sample_dividends
+    ):
+        """行タプルから組み立てた辞書が to_dict() のJSONと一致"""
+        from app.services.api_serializer import ApiSerializer
+
+        for model in (Holding, Transaction, Dividend):
+            expected = [obj.to_dict() for obj in model.query.order_by(model.id)]
+            actual = ApiSerializer.fetch(model, order_by=[model.id])
+            assert app.json.loads(app.json.dumps(actual)) == expected
+
+    def test_provider_handles_date_decimal_and_text(self, app):
+        """date/datetime は ISO 8601、Decimal は数値、日本語はエスケープしない"""
+        from datetime import datetime
+
+        from app.utils.json_provider import dumps_bytes
+
+        body = dumps_bytes(
+            {
+                "date": date(2024, 1, 2),
+                "at": datetime(2024, 1, 2, 3, 4, 5),
+                "amount": Decimal("1.25"),
+                "name": "トヨタ",
+                2024: 1,
+            }
+        )
+
+        assert "トヨタ".encode("utf-8") in body
+        assert app.json.loads(body) == {
+            "date": "2024-01-02",
+            "at": "2024-01-02T03:04:05",
+            "amount": 1.25,
+            "name": "トヨタ",
+            "2024": 1,
+        }
+
+
+class TestMetricsRefreshPlanner:
+    """MetricsRefreshPlannerのテスト"""
+
+    def _metrics(self, ticker, hours_ago, **fields):
+        from datetime import datetime, timedelta
+
+        from app.models import StockMetrics
+
+        return StockMetrics(
+            ticker_symbol=ticker,
+            info_updated_at=datetime(2024, 7, 1) - timedelta(hours=hours_ago),
+            **fields,
+        )
+
+    def test_plan_prioritizes_stale_and_large_holdings(self, app):
+        """鮮度比・評価額の大きい銘柄から呼び出し上限まで取得"""
+        from datetime import datetime
+
+        from app.services.metrics_refresh_planner import MetricsRefreshPlanner
+
+        metrics = {
+            # EV/EBITDA（予算72時間）あり → 鮮度比 1.0
+            "AAA": self._metrics("AAA", 72, ev_to_ebitda=10),
+            "BBB": self._metrics("BBB", 72, ev_to_ebitda=10),
+            # 値のある指標は株価連動のみ（予算168時間） → 鮮度比 0.5
+            "ETF": self._metrics("ETF", 84, market_cap=1000),
+        }
+        values = {"AAA": 100, "BBB": 1000, "ETF": 5000, "NEW": 1}
+
+        plan = MetricsRefreshPlanner.plan(
+            ["AAA", "BBB", "ETF", "NEW"],
+            metrics,
+            values,
+            now=datetime(2024, 7, 1),
+            budget=2,
+        )
+
+        assert plan == {"fetch": ["NEW", "BBB"], "deferred": ["AAA"], "fresh": ["ETF"]}
+
+    def test_roll_forward_scales_price_linked_fields(self, app):
+        """株価連動の指標を最新株価でローカル更新"""
+        from app.services.metrics_refresh_planner import MetricsRefreshPlanner
+
+        metrics = self._metrics(
+            "AAA",
+            0,
+            market_cap=1000,
+            pe_ratio=20,
+            eps=5,
+            fifty_two_week_high=110,
+            fifty_two_week_low=90,
+            reference_price=100,
+        )
+
+        assert MetricsRefreshPlanner.roll_forward(metrics, 120)
+        assert metrics.market_cap == pytest.approx(1200)
+        assert metrics.pe_ratio == pytest.approx(24)
+        assert metrics.eps == 5
+        assert (metrics.fifty_two_week_low, metrics.fifty_two_week_high) == (90, 120)
+        assert metrics.reference_price == 120
+
+    def test_update_all_holdings_within_budget(self, app, db_session, monkeypatch):
+        """上限を超えた銘柄は .info を取得せずローカル更新"""
+        from datetime import datetime, timedelta
+
+        from app.models import StockMetrics
+        from app.services.stock_metrics_fetcher import StockMetricsFetcher
+
+        for ticker, value in [("AAA", 100), ("BBB", 1000)]:
+            db_session.add(
+                Holding(
+                    ticker_symbol=ticker,
+                    total_quantity=1,
+                    average_cost=value,
+                    total_cost=value,
+                    current_price=110,
+                    current_value=value,
+                    currency="USD",
+                )
+            )
+            db_session.add(
+                StockMetrics(
+                    ticker_symbol=ticker,
+                    market_cap=1000,
+                    reference_price=100,
+                    info_updated_at=datetime.utcnow() - timedelta(days=30),
+                )
+            )
+        db_session.commit()
+
+        fetched = []
+
+        def fake_get_stock_metrics(ticker_symbol, use_cache=True, returns=None):
+            fetched.append(ticker_symbol)
+            return {"ticker_symbol": ticker_symbol}
+
+        monkeypatch.setattr(
+            StockMetricsFetcher,
+            "get_stock_metrics",
+            staticmethod(fake_get_stock_metrics),
+        )
+        monkeypatch.setattr(
+            StockMetricsFetcher,
+            "_calculate_returns",
+            staticmethod(
+                lambda tickers, currencies=None: {
+                    t: {"one_year_return": 0.1} for t in tickers
+                }
+            ),
+        )
+        monkeypatch.setattr(
+            "app.services.stock_metrics_fetcher.time.sleep", lambda seconds: None
+        )
+
+        results = StockMetricsFetcher.update_all_holdings_metrics(budget=1)
+
+        assert fetched == ["BBB"]
+        assert (results["success"], results["local"], results["deferred"]) == (1, 1, 1)
+        local = StockMetrics.query.filter_by(ticker_symbol="AAA").first()
+        assert float(local.market_cap) == pytest.approx(1100)
+        assert float(local.one_year_return) == pytest.approx(0.1)
+
+
+class TestUpdateScheduler:
+    """UpdateScheduler・市場カレンダーのテスト"""
+
+    def test_latest_session_follows_each_market_close(self):
+        """各市場の大引け後に、その市場の取引日を同期対象とする"""
+        from datetime import datetime, timedelta, timezone
+
+        from app.utils.market_calendar import is_trading_day, latest_session
+
+        # 2024-07-04 (木) 07:00 UTC = 東京 16:00 / ニューヨーク 03:00
+        now = datetime(2024, 7, 4, 7, 0, tzinfo=timezone.utc)
+        settle = timedelta(minutes=20)
+
+        assert latest_session("TSE", now, settle) == date(2024, 7, 4)
+        assert latest_session("US", now, settle) == date(2024, 7, 3)
+        # 独立記念日の大引け後も、同期対象は前営業日のまま
+        assert latest_session("US", now + timedelta(hours=18)) == date(2024, 7, 3)
+        # 振替休日・年末年始休場
+        assert not is_trading_day("TSE", date(2024, 5, 6))
+        assert not is_trading_day("TSE", date(2025, 1, 3))
+        assert not is_trading_day("US", date(2025, 4, 18))  # Good Friday
+
+    def test_leadership_is_exclusive(self, app, db_session):
+        """リースは期限切れまで1プロセスだけが保持"""
+        from datetime import datetime, timedelta
+
+        from app.services.update_scheduler import UpdateScheduler
+
+        now = datetime(2024, 7, 1, 12, 0)
+        assert UpdateScheduler.acquire_leadership("host-a", now)
+        assert not UpdateScheduler.acquire_leadership("host-b", now)
+        assert UpdateScheduler.acquire_leadership("host-a", now + timedelta(minutes=1))
+        assert UpdateScheduler.acquire_leadership("host-b", now + timedelta(minutes=10))
+        # 同じプロセス内の常駐ループもそれぞれ別の所有者
+        assert UpdateScheduler.new_owner() != UpdateScheduler.new_owner()
+
+    def test_run_pending_syncs_each_session_once(self, app, db_session, monkeypatch):
+        """同期済みの取引日は再実行せず、次の取引日は前回同期日からの差分で実行"""
+        from datetime import datetime, timezone
+
+        from app.models import SyncState
+        from app.services.update_scheduler import UpdateScheduler
+
+        for ticker in ["7203", "AAPL"]:
+            db_session.add(
+                Holding(
+                    ticker_symbol=ticker,
+                    total_quantity=1,
+                    average_cost=100,
+                    total_cost=100,
+                    currency="JPY",
+                )
+            )
+        db_session.commit()
+
+        calls = []
+
+        def fake_prices(tickers, since, session):
+            calls.append((tickers, since, session))
+            return {"AAPL": "取得失敗"} if session == date(2024, 7, 3) else {}
+
+        monkeypatch.setattr(UpdateScheduler, "_run_prices", staticmethod(fake_prices))
+
+        # 2024-07-05 (金) 07:00 UTC: 東証は7/5、米国は7/3が同期対象
+        now = datetime(2024, 7, 5, 7, 0, tzinfo=timezone.utc)
+        summaries = UpdateScheduler.run_pending(now, jobs=["prices"])
+
+        assert calls == [
+            (["7203"], None, date(2024, 7, 5)),
+            (["AAPL"], None, date(2024, 7, 3)),
+        ]
+        assert [s["failed"] for s in summaries] == [[], ["AAPL"]]
+        # 同期済みの取引日・再試行間隔内の失敗銘柄は実行しない
+        assert UpdateScheduler.run_pending(now, jobs=["prices"]) == []
+
+        # 2024-07-08 (月) 21:00 UTC: 両市場とも7/8の大引け後
+        calls.clear()
+        later = datetime(2024, 7, 8, 21, 0, tzinfo=timezone.utc)
+        UpdateScheduler.run_pending(later, jobs=["prices"])
+
+        assert calls == [
+            (["7203"], date(2024, 7, 5), date(2024, 7, 8)),
+            (["AAPL"], None, date(2024, 7, 8)),
+        ]
+        state = SyncState.query.filter_by(job="prices", key="AAPL").first()
+        assert state.last_session_date == date(2024, 7, 8)
+        assert state.last_error is None
+
+    def test_run_pending_stops_when_lease_is_lost(self, app, db_session, monkeypatch):
+        """バッチごとにリースを延長し、他のプロセスに取られたら残りを実行しない"""
+        from datetime import datetime, timedelta, timezone
+
+        from app.models import SchedulerLease
+        from app.services.update_scheduler import UpdateScheduler
+
+        for ticker in ["7203", "AAPL"]:
+            db_session.add(
+                Holding(
+                    ticker_symbol=ticker,
+                    total_quantity=1,
+                    average_cost=100,
+                    total_cost=100,
+                    currency="JPY",
+                )
+            )
+        db_session.commit()
+
+        calls = []
+
+        def fake_prices(tickers, since, session):
+            calls.append(tickers)
+            # 1バッチ目の実行中にリースが失効し、別のプロセスが取得した
+            lease = db_session.get(SchedulerLease, UpdateScheduler.LEASE_NAME)
+            lease.owner = "host-b"
+            lease.expires_at = datetime.utcnow() + timedelta(minutes=3)
+            db_session.commit()
+            return {}
+
+        monkeypatch.setattr(UpdateScheduler, "_run_prices", staticmethod(fake_prices))
+
+        assert UpdateScheduler.acquire_leadership("host-a")
+        now = datetime(2024, 7, 5, 7, 0, tzinfo=timezone.utc)
+        summaries = UpdateScheduler.run_pending(now, jobs=["prices"], owner="host-a")
+
+        assert calls == [["7203"]]
+        assert [s["keys"] for s in summaries] == [["7203"]]
+
+
+class TestRefreshPipeline:
+    """RefreshPipelineのテスト"""
+
+    def test_resolve_includes_dependencies(self):
+        """指定ステージの依存ステージを依存先から順に含める"""
+        from app.services.refresh_pipeline import RefreshPipeline
+
+        assert RefreshPipeline.resolve(["snapshot", "metrics"]) == [
+            "quotes",
+            "fx",
+            "valuation",
+            "snapshot",
+            "metrics",
+        ]
+        assert RefreshPipeline.critical_path(
+            {"quotes": 3, "fx": 1, "valuation": 1, "snapshot": 1, "metrics": 4}
+        ) == pytest.approx(8)
+
+    def test_independent_stages_run_concurrently(self, app, db_session, monkeypatch):
+        """株価と為替は並行して取得し、評価額は両方の完了後に実行"""
+        import threading
+
+        from app.models import RefreshStageRun
+        from app.services.refresh_pipeline import RefreshPipeline
+
+        # 2ステージが同時に実行中でなければ通過できない
+        barrier = threading.Barrier(2, timeout=5)
+        calls = []
+
+        def fake_quotes(inputs):
+            barrier.wait()
+            return {"AAPL": {"price": 200.0, "currency": "USD"}}
+
+        def fake_fx(inputs):
+            barrier.wait()
+            return {"JPY": 1.0, "USD": 150.0}
+
+        def fake_valuation(inputs):
+            calls.append(("valuation", inputs))
+            return {"success": 1, "failed": 0, "errors": []}
+
+        def fake_snapshot(inputs):
+            calls.append(("snapshot", inputs))
+            return {"snapshot_date": "2024-07-01"}
+
+        for stage, fake in [
+            ("quotes", fake_quotes),
+            ("fx", fake_fx),
+            ("valuation", fake_valuation),
+            ("snapshot", fake_snapshot),
+        ]:
+            monkeypatch.setattr(RefreshPipeline, f"_stage_{stage}", staticmethod(fake))
+
+        run = RefreshPipeline.run(["snapshot"], max_workers=2)
+
+        assert {stage: info["status"] for stage, info in run["stages"].items()} == {
+            "quotes": "success",
+            "fx": "success",
+            "valuation": "success",
+            "snapshot": "success",
+        }
+        assert calls[0] == (
+            "valuation",
+            {
+                "quotes": {"AAPL": {"price": 200.0, "currency": "USD"}},
+                "fx": {"JPY": 1.0, "USD": 150.0},
+            },
+        )
+        assert calls[1][0] == "snapshot"
+        rows = RefreshStageRun.query.filter_by(run_id=run["run_id"]).all()
+        assert len(rows) == 4
+        assert all(row.duration_ms is not None for row in rows)
+
+    def test_resume_skips_completed_stages(self, app, db_session, monkeypatch):
+        """失敗したステージと後続だけを、保存した出力から再実行"""
+        from app.services.refresh_pipeline import RefreshPipeline
+
+        calls = []
+        state = {"fail": True}
+
+        def fake_quotes(inputs):
+            calls.append("quotes")
+            return {"7203": {"price": 3000.0, "currency": "JPY"}}
+
+        def fake_fx(inputs):
+            calls.append("fx")
+            return {"JPY": 1.0}
+
+        def fake_valuation(inputs):
+            calls.append("valuation")
+            if state["fail"]:
+                raise RuntimeError("database is locked")
+            return {"success": len(inputs["quotes"]), "failed": 0, "errors": []}
+
+        def fake_snapshot(inputs):
+            calls.append("snapshot")
+            return {"snapshot_date": "2024-07-01"}
+
+        for stage, fake in [
+            ("quotes", fake_quotes),
+            ("fx", fake_fx),
+            ("valuation", fake_valuation),
+            ("snapshot", fake_snapshot),
+        ]:
+            monkeypatch.setattr(RefreshPipeline, f"_stage_{stage}", staticmethod(fake))
+
+        first = RefreshPipeline.run(["snapshot"])
+        assert first["stages"]["valuation"]["status"] == "failed"
+        assert first["stages"]["snapshot"]["status"] == "skipped"
+
+        calls.clear()
+        state["fail"] = False
+        second = RefreshPipeline.run(["snapshot"], resume=True)
+
+        assert second["run_id"] == first["run_id"]
+        assert sorted(calls) == ["snapshot", "valuation"]
+        assert second["stages"]["quotes"]["resumed"] is True
+        assert second["outputs"]["valuation"]["success"] == 1
+
+        # 完了した実行は再開せず新規実行
+        third = RefreshPipeline.run(["snapshot"], resume=True)
+        assert third["run_id"] != first["run_id"]
+
+
+class TestDividendAggregationService:
+    """DividendAggregationServiceのテスト"""
+
+    def _add_jpy_data(self, db_session):
+        db_session.add_all(
+            [
+                Transaction(
+                    transaction_date=date(2021, 1, 10),
+                    ticker_symbol="8306",
+                    security_name="三菱UFJフィナンシャル・グループ",
+                    transaction_type="BUY",
+                    quantity=100,
+                    unit_price=1000.0,
+                    currency="JPY",
+                    commission=0,
+                    settlement_amount=100000.0,
+                ),
+                Transaction(
+                    transaction_date=date(2023, 1, 10),
+                    ticker_symbol="8306",
+                    security_name="三菱UFJ",
+                    transaction_type="BUY",
+                    quantity=100,
+                    unit_price=1000.0,
+                    currency="JPY",
+                    commission=0,
+                    settlement_amount=100000.0,
+                ),
+                Dividend(
+                    ticker_symbol="8306",
+                    ex_dividend_date=date(2021, 9, 29),
+                    dividend_amount=14,
+                    quantity_held=100,
+                    total_dividend=1400,
+                    currency="JPY",
+                ),
+                Dividend(
+                    ticker_symbol="8306",
+                    ex_dividend_date=date(2023, 3, 30),
+                    dividend_amount=16,
+                    quantity_held=200,
+                    total_dividend=3200,
+                    currency="JPY",
+                ),
+                Dividend(
+                    ticker_symbol="8306",
+                    ex_dividend_date=date(2023, 9, 28),
+                    dividend_amount=16,
+                    quantity_held=200,
+                    total_dividend=3200,
+                    currency="JPY",
+                ),
+            ]
+        )
+        db_session.commit()
+
+    def test_summary_groups_by_ticker_and_year(self, db_session):
+        """銘柄・年単位で集計されることをテスト"""
+        from app.services.dividend_aggregation_service import (
+            DividendAggregationService,
+        )
+
+        self._add_jpy_data(db_session)
+
+        summary = DividendAggregationService.build_dividend_summary()
+
+        assert len(summary["dividends"]) == 1
+        item = summary["dividends"][0]
+        assert item["ticker_symbol"] == "8306"
+        assert item["security_name"] == "三菱UFJフィナンシャル・グループ"
+        assert item["total_dividends"] == 7800.0
+        assert item["total_investment"] == 200000.0
+        assert abs(item["dividend_yield"] - 3.9) < 0.0001
+        assert list(item["yearly_dividends"].items()) == [
+            ("2023", 6400.0),
+            ("2022年以前", 1400.0),
+        ]
+        assert summary["totals"]["total_dividends"] == 7800.0
+
+    def test_summary_cache_invalidated_on_write(self, db_session):
+        """配当追加でキャッシュが無効化されることをテスト"""
+        from app.services.dividend_aggregation_service import (
+            DividendAggregationService,
+        )
+
+        self._add_jpy_data(db_session)
+        first = DividendAggregationService.get_dividend_summary()
+        assert DividendAggregationService.get_dividend_summary() is first
+
+        db_session.add(
+            Dividend(
+                ticker_symbol="8306",
+                ex_dividend_date=date(2024, 3, 28),
+                dividend_amount=20,
+                quantity_held=200,
+                total_dividend=4000,
+                currency="JPY",
+            )
+        )
+        db_session.commit()
+
+        second = DividendAggregationService.get_dividend_summary()
+        assert second is not first
+        assert second["totals"]["total_dividends"] == 11800.0
+
+
+class TestCSVParser:
+    """CSVParserのテスト"""
+
+    def _write_csv(self, tmp_path):
+        lines = [
+            "約定日,銘柄コード,銘柄名,取引,数量,約定単価,手数料,受渡金額",
+            '2024年1月10日,7203,トヨタ自動車,買付,100,"2,500",100,"250,100"',
+            '2024年2月15日,AAPL,Apple Inc.,買付,10,180.5,0,"270,750"',
+            '2024/03/20,7203,トヨタ自動車,売却,50,"2,800",50,"139,950"',
+            '不正な日付,7203,トヨタ自動車,売却,50,"2,800",50,"139,950"',
+            '2024年4月1日,7203,トヨタ自動車,保有,50,"2,800",50,"139,950"',
+        ]
+        path = tmp_path / "sbi.csv"
+        path.write_bytes(("\r\n".join(lines) + "\r\n").encode("cp932"))
+        return str(path)
+
+    @pytest.mark.parametrize("use_pandas", [False, True])
+    def test_iter_csv(self, tmp_path, use_pandas):
+        """ストリーミング解析（書式推定・pandas高速パス）"""
+        from app.services.csv_parser import CSVParser
+
+        path = self._write_csv(tmp_path)
+        assert CSVParser.detect_encoding(path).lower() == "cp932"
+
+        errors = []
+        transactions = list(CSVParser.iter_csv(path, errors, use_pandas=use_pandas))
+
+        assert [t["transaction_date"] for t in transactions] == [
+            date(2024, 1, 10),
+            date(2024, 2, 15),
+            date(2024, 3, 20),
+        ]
+        assert transactions[0]["unit_price"] == Decimal("2500")
+        assert transactions[0]["settlement_amount"] == Decimal("250100")
+        assert transactions[1]["currency"] == "USD"
+        assert transactions[2]["transaction_type"] == "SELL"
+
+        assert [e["row"] for e in errors] == [5, 6]
+        assert "無効な日付形式" in errors[0]["error"]
+        assert errors[0]["data"]["銘柄コード"] == "7203"
+
+
+class TestSqliteProfile:
+    """SQLiteストレージプロファイルのテスト"""
+
+    def test_pragmas_applied_on_connect(self, app, tmp_path):
+        """ファイルDBではWAL等を接続時に適用し、読み取り専用接続は書き込めない"""
+        from sqlalchemy import create_engine, text
+        from sqlalchemy.exc import OperationalError
+
+        from app.utils.database import (
+            configure_sqlite,
+            register_pragmas,
+            sqlite_pragmas,
+        )
+
+        db_path = (tmp_path / "profile.db").as_posix()
+        engine = create_engine(f"sqlite:///{db_path}")
+        configure_sqlite(app, engine)
+
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+        readonly = create_engine(f"sqlite:///file:{db_path}?mode=ro&uri=true")
+        register_pragmas(readonly, sqlite_pragmas(app.config, readonly=True))
+        with readonly.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM t")).scalar() == 0
+            with pytest.raises(OperationalError):
+                conn.execute(text("INSERT INTO t (id) VALUES (1)"))
+
+        readonly.dispose()
+        engine.dispose()
+
+    def test_services_read_through_readonly_engine(self, tmp_path):
+        """ファイルDBでは集計・エクスポートが読み取り専用エンジンで読み、コミット済みの書き込みが見える"""
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+
+        from app import create_app, db
+        from app.services.analytics_loader import AnalyticsLoader
+        from app.services.api_serializer import ApiSerializer
+        from app.services.export_service import ExportService
+        from app.utils.database import get_readonly_engine, readonly_connection
+
+        db_path = (tmp_path / "readonly.db").as_posix()
+        file_app = create_app(
+            "testing",
+            config_overrides={"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"},
+        )
+
+        def add_transaction(day):
+            db.session.add(
+                Transaction(
+                    transaction_date=day,
+                    ticker_symbol="7203",
+                    security_name="トヨタ自動車",
+                    transaction_type="BUY",
+                    quantity=100,
+                    unit_price=2500.0,
+                    currency="JPY",
+                    commission=0,
+                    settlement_amount=250000.0,
+                )
+            )
+            db.session.commit()
+
+        with file_app.app_context():
+            db.create_all()
+            readonly = get_readonly_engine()
+            try:
+                assert readonly is not None
+                assert readonly.url.database != db.engine.url.database
+
+                add_transaction(date(2024, 1, 10))
+                db.session.add(
+                    Holding(
+                        ticker_symbol="7203",
+                        total_quantity=100,
+                        average_cost=2500,
+                        total_cost=250000,
+                        currency="JPY",
+                    )
+                )
+                db.session.commit()
+
+                assert len(AnalyticsLoader.transactions()) == 1
+                assert [h["ticker_symbol"] for h in ApiSerializer.holdings()] == [
+                    "7203"
+                ]
+                assert len(list(ExportService.iter_rows("transactions"))) == 1
+
+                # WAL上のコミット済みの書き込みは次の読み取りで見える
+                add_transaction(date(2024, 2, 15))
+                assert len(AnalyticsLoader.transactions()) == 2
+                assert len(list(ExportService.iter_rows("transactions"))) == 2
+
+                with readonly_connection() as connection:
+                    assert connection.engine is readonly
+                    assert connection.execute(text("PRAGMA query_only")).scalar() == 1
+                    with pytest.raises(OperationalError):
+                        connection.execute(text("DELETE FROM transactions"))
+            finally:
+                db.session.remove()
+                if readonly is not None:
+                    readonly.dispose()
+                db.engine.dispose()
+
+
+class TestBackup:
+    """データベースバックアップのテスト"""
+
+    def _create_wal_db(self, db_path, rows):
+        import sqlite3
+
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO t (id) VALUES (?)", [(i,) for i in range(rows)])
+        conn.commit()
+        return conn
+
+    def test_backup_includes_uncheckpointed_wal(self, tmp_path):
+        """WALに残ったコミット済みの行もバックアップに含まれる"""
+        import sqlite3
+
+        from app.utils.backup import create_backup
+
+        db_path = tmp_path / "live.db"
+        conn = self._create_wal_db(db_path, 5000)
+        assert (tmp_path / "live.db-wal").stat().st_size > 0
+
+        backup_path = create_backup(db_path, tmp_path / "backups")
+        conn.close()
+
+        backup = sqlite3.connect(str(backup_path))
+        assert backup.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 5000
+        backup.close()
+        assert not list((tmp_path / "backups").glob("*.tmp"))
+
+    def test_auto_backup_runs_once_per_interval(self, app, tmp_path, monkeypatch):
+        """ロック保持中はスキップし、バックグラウンドで1つだけ作成"""
+        from app.utils import backup
+
+        db_path = tmp_path / "live.db"
+        self._create_wal_db(db_path, 10).close()
+        backup_dir = tmp_path / "backups"
+        backup_dir.mkdir()
+
+        lock = backup._try_lock(backup_dir / backup.AUTO_BACKUP_LOCK_NAME)
+        assert backup.run_locked_backup(db_path, backup_dir) is None
+        backup._release_lock(lock)
+
+        monkeypatch.setitem(app.config, "TESTING", False)
+        monkeypatch.setitem(app.config, "AUTO_BACKUP_ENABLED", True)
+        monkeypatch.setitem(app.config, "BACKUP_DIR", backup_dir)
+        monkeypatch.setitem(app.config, "BACKUP_FORMAT", "copy")
+        monkeypatch.setitem(
+            app.config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{db_path.as_posix()}"
+        )
+        thread = backup.create_auto_backup(app, background=True)
+        thread.join(timeout=30)
+
+        assert len(list(backup_dir.glob("stock_pnl_backup_*.db"))) == 1
+        assert backup.create_auto_backup(app) is None
+        assert backup.run_locked_backup(db_path, backup_dir) is None
+
+    def test_snapshot_dedup_incremental_and_verified_restore(self, tmp_path):
+        """変更のないチャンクは共有し、同じ内容は省略、復元はハッシュを検証"""
+        import sqlite3
+
+        from app.utils import backup_store
+
+        db_path = tmp_path / "live.db"
+        store_dir = tmp_path / "snapshots"
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)")
+        conn.executemany(
+            "INSERT INTO t (id, body) VALUES (?, ?)",
+            [(i, f"{i:08d}" * 50) for i in range(10000)],
+        )
+        conn.commit()
+
+        first = backup_store.create_snapshot(db_path, store_dir, codec="gzip")
+        assert first["chunks"] > 2
+        assert first["new_chunks"] == first["chunks"]
+        assert backup_store.create_snapshot(db_path, store_dir)["skipped"] is True
+
+        conn.execute("UPDATE t SET body = 'changed' WHERE id = 9999")
+        conn.commit()
+        conn.close()
+        second = backup_store.create_snapshot(db_path, store_dir, codec="gzip")
+        assert not second["skipped"]
+        assert 0 < second["new_chunks"] < second["chunks"]
+        assert [s["id"] for s in backup_store.list_snapshots(store_dir)] == [
+            second["id"],
+            first["id"],
+        ]
+
+        target = tmp_path / "restored.db"
+        backup_store.restore_snapshot(store_dir, target, first["id"])
+        restored = sqlite3.connect(str(target))
+        assert restored.execute("SELECT body FROM t WHERE id = 9999").fetchone()[0] != (
+            "changed"
+        )
+        restored.close()
+
+        # 破損したチャンクは検出し、復元先を変更しない
+        digest = backup_store.get_snapshot(store_dir, first["id"])["chunks"][0]
+        chunk = store_dir / "objects" / digest[:2] / f"{digest}.gz"
+        chunk.write_bytes(b"broken")
+        before = target.read_bytes()
+        with pytest.raises(backup_store.SnapshotError):
+            backup_store.restore_snapshot(store_dir, target, first["id"])
+        assert target.read_bytes() == before
+
+
+class TestLogger:
+    """キュー経由のロギングのテスト"""
+
+    def test_json_output_with_size_rotation(self, tmp_path, monkeypatch):
+        """JSON形式で extra も出力し、サイズでローテーション"""
+        import json
+
+        from app.utils import logger as logger_module
+
+        monkeypatch.setattr(logger_module, "LOG_DIR", tmp_path)
+        monkeypatch.setitem(logger_module._settings, "LOG_FORMAT", "json")
+        monkeypatch.setitem(logger_module._settings, "LOG_ROTATION", "size")
+        monkeypatch.setitem(logger_module._settings, "LOG_MAX_BYTES", 1024)
+        monkeypatch.setitem(logger_module._settings, "LOG_BACKUP_COUNT", 20)
+        logger_module.flush_logging()
+        logger_module._router.reset()
+        try:
+            logger = logger_module.get_logger("test_structured")
+            try:
+                raise ValueError("broken row")
+            except ValueError:
+                logger.exception("取り込みに失敗しました")
+            for i in range(20):
+                logger.info("取引を取り込みました", extra={"rows": i})
+            assert logger_module.flush_logging()
+        finally:
+            logger_module._router.reset()
+
+        # test_structured.log.N（古い順）→ test_structured.log
+        paths = sorted(
+            tmp_path.glob("test_structured.log.*"),
+            key=lambda path: -int(path.suffix[1:]),
+        )
+        assert paths
+        entries = [
+            json.loads(line)
+            for path in paths + [tmp_path / "test_structured.log"]
+            for line in path.read_text("utf-8").splitlines()
+        ]
+        assert entries[0]["level"] == "ERROR"
+        assert "ValueError: broken row" in entries[0]["exc_info"]
+        assert [entry["rows"] for entry in entries[1:]] == list(range(20))
+        assert entries[-1]["message"] == "取引を取り込みました"
+
+    def test_dated_file_switches_by_record_date(self, tmp_path):
+        """既定の日付ごとのファイルは改名せず、日付が変わると次のファイルに追記"""
+        import logging
+        from datetime import datetime
+
+        from app.utils.logger import DatedFileHandler
+
+        handler = DatedFileHandler(tmp_path, "app")
+        for day in (datetime(2026, 1, 10, 23, 59), datetime(2026, 1, 11, 0, 1)):
+            handler.emit(
+                logging.makeLogRecord({"msg": f"{day:%d}", "created": day.timestamp()})
+            )
+        handler.close()
+
+        assert (tmp_path / "app_20260110.log").read_text("utf-8") == "10\n"
+        assert (tmp_path / "app_20260111.log").read_text("utf-8") == "11\n"
+
+    def test_debug_rate_limit_per_call_site(self, monkeypatch):
+        """DEBUGログは呼び出し箇所ごとに間引き、省略件数を次のログに付記"""
+        import logging
+
+        from app.utils import logger as logger_module
+
+        monkeypatch.setitem(logger_module._settings, "LOG_DEBUG_RATE_LIMIT", 2)
+        rate_filter = logger_module.DebugRateLimitFilter()
+
+        def record(created, level=logging.DEBUG, lineno=10):
+            return logging.makeLogRecord(
+                {
+                    "msg": "batch done",
+                    "levelno": level,
+                    "pathname": "performance_service.py",
+                    "lineno": lineno,
+                    "created": created,
+                }
+            )
+
+        assert [rate_filter.filter(record(100.0 + i * 0.1)) for i in range(5)] == [
+            True,
+            True,
+            False,
+            False,
+            False,
+        ]
+        # 他の呼び出し箇所・INFO以上は間引かない
+        assert rate_filter.filter(record(100.5, lineno=20))
+        assert rate_filter.filter(record(100.5, level=logging.INFO))
+
+        later = record(101.5)
+        assert rate_filter.filter(later)
+        assert later.suppressed == 3
+        assert "3件省略" in later.getMessage()
+
+
+class TestExportService:
+    """ExportServiceのテスト"""
+
+    def test_gzip_stream_batches_sync_flushes(self):
+        """1行ごとのチャンクでも GZIP_FLUSH_BYTES ごとにフラッシュし、圧縮率を保つ"""
+        import gzip
+        import json
+
+        from app.services.export_service import ExportService
+
+        rows = [
+            json.dumps({"id": i, "ticker_symbol": "AAPL", "quantity": i}) + "\n"
+            for i in range(5000)
+        ]
+        parts = list(ExportService.gzip_stream(iter(rows)))
+        body = "".join(rows).encode("utf-8")
+
+        assert gzip.decompress(b"".join(parts)) == body
+        # 先頭から逐次展開できる程度に分割しつつ、一括圧縮と同程度のサイズ
+        assert len(parts) > 1
+        assert len(b"".join(parts)) < len(gzip.compress(body)) * 1.1
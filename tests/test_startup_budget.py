@@ -0,0 +1,85 @@
+"""
+起動コストの回帰テスト
+
+新しいPythonプロセスで create_app() を実行し、ワーカー1プロセスあたりの起動コストを測定する。
+- pandas・yfinance 等の重い依存ライブラリがアプリ起動時に読み込まれたら失敗
+- 起動時間・最大RSSが予算を超えたら失敗
+
+予算は環境変数で変更できる（遅いCI環境など）:
+    STARTUP_TIME_BUDGET=3.0 STARTUP_RSS_BUDGET_MB=150 python -m pytest tests/test_startup_budget.py
+
+内訳の確認には scripts/benchmark_startup.py を使用する。
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 初回利用時に読み込む依存ライブラリ
+HEAVY_MODULES = ("pandas", "numpy", "yfinance", "bs4", "lxml")
+
+# 現状（約0.8秒・約70MB）に余裕を持たせた値。遅延読み込みなしでは約135MB
+STARTUP_TIME_BUDGET = float(os.environ.get("STARTUP_TIME_BUDGET", "2.0"))
+STARTUP_RSS_BUDGET_MB = float(os.environ.get("STARTUP_RSS_BUDGET_MB", "100"))
+
+CHILD_CODE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app("testing")
+elapsed = time.perf_counter() - started
+# 最大RSS（Linuxの ru_maxrss は fork 元の値を引き継ぐため /proc の VmHWM を使う）
+rss_mb = None
+try:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                rss_mb = int(line.split()[1]) / 1024
+except OSError:
+    try:
+        import resource
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024
+    except ImportError:
+        pass
+print(json.dumps({"seconds": elapsed, "rss_mb": rss_mb, "modules": sorted(sys.modules)}))
+"""
+
+
+@pytest.fixture(scope="module")
+def startup():
+    """create_app() を新しいプロセスで実行した結果（3回のうち最速）"""
+    runs = []
+    for _ in range(3):
+        completed = subprocess.run(
+            [sys.executable, "-c", CHILD_CODE],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def test_app_factory_does_not_import_heavy_dependencies(startup):
+    """アプリ起動時に重い依存ライブラリを読み込まない"""
+    loaded = [name for name in HEAVY_MODULES if name in startup["modules"]]
+    assert loaded == [], f"create_app() で読み込まれた重い依存ライブラリ: {loaded}"
+
+
+def test_app_factory_within_startup_budget(startup):
+    """起動時間・ワーカーあたりの最大RSSが予算内"""
+    assert (
+        startup["seconds"] <= STARTUP_TIME_BUDGET
+    ), f"起動時間 {startup['seconds']:.2f}s が予算 {STARTUP_TIME_BUDGET}s を超過"
+    if startup["rss_mb"] is None:
+        pytest.skip("この環境ではRSSを取得できません")
+    assert (
+        startup["rss_mb"] <= STARTUP_RSS_BUDGET_MB
+    ), f"最大RSS {startup['rss_mb']:.1f}MB が予算 {STARTUP_RSS_BUDGET_MB}MB を超過"
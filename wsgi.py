@@ -8,7 +8,8 @@ import os
 from app import create_app
 
 # 本番環境用のアプリケーションを作成
-app = create_app('production')
+# 常駐するサーバープロセスのため、起動時のバックアップはバックグラウンドで作成する
+app = create_app('production', config_overrides={'AUTO_BACKUP_BACKGROUND': True})
 
 if __name__ == '__main__':
     # 直接実行時は開発サーバーを起動